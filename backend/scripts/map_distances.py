@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Precompute all-pairs city hop distances for every data/maps/*.json.
+
+DistanceService.getCityDistance / searchDistance run a BFS over the map on
+every call.  This tool computes every pair once and writes one uint8 matrix
+per map that can be memory-mapped and indexed directly.
+
+The BFS is bit-parallel: each city's neighbour set and each BFS frontier is
+a Python int used as a bitset, so expanding a frontier is a handful of ORs
+over the cities in it rather than a queue walk over every edge.  Edges
+follow `connections` as listed (directed), exactly like DistanceService.
+
+Artifact layout (little-endian), <out>/<map>.dist:
+  header   b'OSDM' | u16 version | u16 n_cities
+  ids      u16 city_id[n_cities]            (ascending; row/column order)
+  matrix   u8 dist[n_cities * n_cities]     (row = from, column = to;
+                                             255 = unreachable)
+
+Usage:
+  map_distances.py build [--out-dir DIR] [MAP ...]
+  map_distances.py check --base-url http://localhost:8080 [--sample N] [MAP ...]
+      cross-check sampled pairs against the live /api/maps/{mapName} data
+"""
+
+import argparse
+import glob
+import json
+import mmap
+import os
+import random
+import struct
+import sys
+import urllib.request
+from array import array
+from collections import deque
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAP_DIR = os.path.join(PROJECT_ROOT, 'shared', 'src', 'main', 'resources', 'data', 'maps')
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache')
+OUT_DIR = os.path.join(CACHE_DIR, 'distances')
+
+MAGIC = b'OSDM'
+VERSION = 1
+HEADER = struct.Struct('<4sHH')
+UNREACHABLE = 255
+
+
+def map_files(map_dir=MAP_DIR, names=None):
+    """{name: path} for data/maps/*.json, optionally limited to ``names``."""
+    paths = sorted(glob.glob(os.path.join(map_dir, '*.json')))
+    found = {os.path.splitext(os.path.basename(p))[0]: p for p in paths}
+    if names:
+        missing = set(names) - set(found)
+        if missing:
+            raise SystemExit(f'Unknown map(s): {", ".join(sorted(missing))}')
+        return {n: found[n] for n in names}
+    return found
+
+
+def adjacency(cities):
+    """(sorted city ids, {id: [neighbour ids]}) from a map's `cities` list."""
+    ids = sorted(c['id'] for c in cities)
+    return ids, {c['id']: list(c.get('connections') or []) for c in cities}
+
+
+# ── Computation ──────────────────────────────────────────────────────────────
+def all_pairs(ids, connections):
+    """Row-major bytes of the n x n hop-distance matrix (255 = unreachable)."""
+    n = len(ids)
+    if n > 0xFFFF:
+        raise ValueError(f'{n} cities do not fit a u16 id table')
+    index = {cid: i for i, cid in enumerate(ids)}
+    neighbours = [0] * n
+    for cid, targets in connections.items():
+        if cid not in index:
+            continue
+        mask = 0
+        for t in targets:
+            if t in index:
+                mask |= 1 << index[t]
+        neighbours[index[cid]] = mask
+
+    matrix = bytearray([UNREACHABLE]) * (n * n)
+    for src in range(n):
+        row = src * n
+        visited = frontier = 1 << src
+        dist = 0
+        while frontier:
+            # Write this level's distances, then expand every frontier city.
+            nxt = 0
+            f = frontier
+            while f:
+                low = f & -f
+                i = low.bit_length() - 1
+                matrix[row + i] = dist
+                nxt |= neighbours[i]
+                f ^= low
+            dist += 1
+            frontier = nxt & ~visited
+            visited |= frontier
+            if frontier and dist >= UNREACHABLE:
+                raise ValueError(f'hop distance {dist} does not fit uint8')
+    return bytes(matrix)
+
+
+def bfs_distance(connections, start, end):
+    """Scalar BFS mirroring DistanceService.getCityDistance (None = unreachable)."""
+    if start == end:
+        return 0
+    visited = {start}
+    queue = deque([(start, 0)])
+    while queue:
+        current, dist = queue.popleft()
+        for neighbour in connections.get(current, ()):
+            if neighbour == end:
+                return dist + 1
+            if neighbour not in visited:
+                visited.add(neighbour)
+                queue.append((neighbour, dist + 1))
+    return None
+
+
+# ── Artifacts ────────────────────────────────────────────────────────────────
+def write_matrix(path, ids, matrix):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(ids)))
+        f.write(array('H', ids).tobytes())
+        f.write(matrix)
+    os.replace(tmp, path)
+
+
+class DistanceMatrix:
+    """Memory-mapped ``.dist`` artifact."""
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, n = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'{path}: not a v{VERSION} distance matrix')
+        self.n = n
+        self.ids = array('H', self._mm[HEADER.size:HEADER.size + 2 * n]).tolist()
+        self.index = {cid: i for i, cid in enumerate(self.ids)}
+        self._base = HEADER.size + 2 * n
+
+    def distance(self, start, end):
+        """Hops from ``start`` to ``end``; None if unreachable or unknown."""
+        i, j = self.index.get(start), self.index.get(end)
+        if i is None or j is None:
+            return None
+        d = self._mm[self._base + i * self.n + j]
+        return None if d == UNREACHABLE else d
+
+    def within(self, start, hops):
+        """{city_id: distance} for cities at most ``hops`` away (searchDistance)."""
+        i = self.index[start]
+        row = self._mm[self._base + i * self.n:self._base + (i + 1) * self.n]
+        return {cid: d for cid, d in zip(self.ids, row) if d <= hops}
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+
+def build(map_dir=MAP_DIR, out_dir=OUT_DIR, names=None):
+    for name, path in map_files(map_dir, names).items():
+        with open(path, 'r', encoding='utf-8') as f:
+            ids, connections = adjacency(json.load(f)['cities'])
+        matrix = all_pairs(ids, connections)
+        out = os.path.join(out_dir, f'{name}.dist')
+        write_matrix(out, ids, matrix)
+        reachable = sum(1 for d in matrix if d != UNREACHABLE)
+        diameter = max((d for d in matrix if d != UNREACHABLE), default=0)
+        print(f'  {name}: {len(ids)} cities, {reachable}/{len(matrix)} reachable pairs, '
+              f'diameter {diameter} -> {out}')
+
+
+# ── Live cross-check ─────────────────────────────────────────────────────────
+def fetch_map(base_url, name):
+    with urllib.request.urlopen(f'{base_url.rstrip("/")}/api/maps/{name}', timeout=30) as r:
+        return json.load(r)
+
+
+def check(base_url, out_dir=OUT_DIR, names=None, sample=500, seed=0):
+    """Compare sampled pairs of each artifact with BFS over the live map JSON.
+
+    Returns the number of mismatches (missing artifacts and id-set
+    differences count as one each).
+    """
+    rnd = random.Random(seed)
+    failures = 0
+    for name in map_files(names=names):
+        path = os.path.join(out_dir, f'{name}.dist')
+        if not os.path.exists(path):
+            print(f'  {name}: no artifact at {path} (run build first)')
+            failures += 1
+            continue
+        ids, connections = adjacency(fetch_map(base_url, name)['cities'])
+        matrix = DistanceMatrix(path)
+        try:
+            if ids != matrix.ids:
+                print(f'  {name}: city ids differ from the live map')
+                failures += 1
+                continue
+            pairs = [(a, b) for a in ids for b in ids]
+            if len(pairs) > sample:
+                pairs = rnd.sample(pairs, sample)
+            bad = [(a, b) for a, b in pairs
+                   if matrix.distance(a, b) != bfs_distance(connections, a, b)]
+            failures += len(bad)
+            status = 'OK' if not bad else f'{len(bad)} MISMATCHED, e.g. {bad[:3]}'
+            print(f'  {name}: {len(pairs)} pairs checked: {status}')
+        finally:
+            matrix.close()
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Precompute / verify map hop-distance matrices.')
+    parser.add_argument('command', choices=('build', 'check'))
+    parser.add_argument('maps', nargs='*', help='map names (default: every data/maps/*.json)')
+    parser.add_argument('--out-dir', default=OUT_DIR)
+    parser.add_argument('--base-url', default='http://localhost:8080')
+    parser.add_argument('--sample', type=int, default=500, help='pairs checked per map')
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        print(f'Writing distance matrices to {args.out_dir}')
+        build(out_dir=args.out_dir, names=args.maps)
+        return 0
+    print(f'Cross-checking against {args.base_url}/api/maps/*')
+    return 1 if check(args.base_url, args.out_dir, args.maps, args.sample) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -16,19 +16,32 @@ New tuple format (13-16 elements):
 
 Stats are sourced from 삼국지14 무장정보.xlsx when available.
 For unmatched generals, politics/charm are derived from the 3 stats.
+Tuples already in the new format are left alone, and files with nothing
+left to migrate are not rewritten, so re-running the script is safe.
+
+Usage:
+  migrate_5stat.py [--dry-run] [--jobs N] [--incremental]
+
+  --jobs N        migrate files in N worker processes (default 1)
+  --incremental   skip files whose content hash and the xlsx hash match the
+                  manifest written by the previous run (.cache/migrate_5stat.json)
 """
 
+import argparse
+import hashlib
 import json
 import os
 import glob
-import sys
-from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 
-import openpyxl
+from xlsx_stats import file_hash, open_index
 
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 XLSX_PATH = os.path.join(PROJECT_ROOT, '..', '삼국지14 무장정보.xlsx')
-SCENARIO_DIR = os.path.join(PROJECT_ROOT, 'src', 'main', 'resources', 'data', 'scenarios')
+SCENARIO_DIR = os.path.join(PROJECT_ROOT, 'shared', 'src', 'main', 'resources', 'data', 'scenarios')
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache')
+MANIFEST_PATH = os.path.join(CACHE_DIR, 'migrate_5stat.json')
+MANIFEST_VERSION = 1
 
 
 def derive_politics(leadership, strength, intel):
@@ -47,39 +60,28 @@ def load_xlsx_stats(xlsx_path):
     """Load 5-stat data from xlsx. Returns:
     - by_name_birth: dict of (name, birthYear) -> (lead, str, int, pol, charm)
     - by_name: dict of name -> (lead, str, int, pol, charm) for non-duplicate names
-    """
-    wb = openpyxl.load_workbook(xlsx_path, read_only=True)
-    ws = wb['무장']
-
-    name_entries = defaultdict(list)
-    for row in ws.iter_rows(min_row=3, values_only=True):
-        name = row[2]
-        if not name:
-            continue
-        name = str(name)
-        birth_year = int(row[4]) if row[4] is not None else None
-        leadership = int(row[9]) if row[9] is not None else 50
-        strength = int(row[10]) if row[10] is not None else 50
-        intel = int(row[11]) if row[11] is not None else 50
-        politics = int(row[12]) if row[12] is not None else 50
-        charm = int(row[13]) if row[13] is not None else 50
-        stats = (leadership, strength, intel, politics, charm)
-        name_entries[name].append((birth_year, stats))
-
-    wb.close()
-
-    by_name_birth = {}
-    by_name = {}
-    for name, entries in name_entries.items():
-        for birth_year, stats in entries:
-            if birth_year is not None:
-                by_name_birth[(name, birth_year)] = stats
-        if len(entries) == 1:
-            by_name[name] = entries[0][1]
 
+    Reads the compiled index from xlsx_stats.py, which only re-parses the
+    spreadsheet when its hash changes.
+    """
+    index = open_index(xlsx_path)
+    try:
+        by_name_birth, by_name, _ = index.tables()
+    finally:
+        index.close()
     return by_name_birth, by_name
 
 
+def is_five_stat(general):
+    """True if a general tuple is already in the new 5-stat format.
+
+    Both formats are 13-16 elements long.  Positions 11 and 12 tell them
+    apart: birth/death year (ints) in the new format, personality/special
+    (text or null) in the old one.
+    """
+    return len(general) >= 13 and all(type(v) is int for v in general[11:13])
+
+
 def migrate_general(old_tuple, by_name_birth, by_name):
     """Convert old-format general tuple to new 5-stat format."""
     # Extract old positions
@@ -143,17 +145,28 @@ def migrate_general(old_tuple, by_name_birth, by_name):
 
 
 def migrate_scenario(filepath, by_name_birth, by_name, dry_run=False):
-    """Migrate a single scenario file. Returns (matched, total) counts."""
+    """Migrate a single scenario file.
+
+    Returns (matched, total, skipped, digest): generals migrated and matched
+    from xlsx, generals migrated, generals already in 5-stat format, and the
+    sha256 of the file as left on disk (None on a dry run).  A file with
+    nothing to migrate is not rewritten.
+    """
     with open(filepath, 'r', encoding='utf-8') as f:
         data = json.load(f)
 
     matched = 0
     total = 0
+    skipped = 0
 
     for key in ('general', 'general_ex'):
         generals = data.get(key, [])
         new_generals = []
         for g in generals:
+            if is_five_stat(g):
+                skipped += 1
+                new_generals.append(g)
+                continue
             total += 1
             name_str = str(g[1])
             birth_int = int(g[9]) if len(g) > 9 and g[9] is not None else None
@@ -167,38 +180,129 @@ def migrate_scenario(filepath, by_name_birth, by_name, dry_run=False):
             new_generals.append(migrate_general(g, by_name_birth, by_name))
         data[key] = new_generals
 
-    if not dry_run:
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-            f.write('\n')
-
-    return matched, total
-
+    if dry_run:
+        return matched, total, skipped, None
+    if total == 0:
+        return matched, total, skipped, file_hash(filepath)
+
+    out = (json.dumps(data, ensure_ascii=False, indent=2) + '\n').encode('utf-8')
+    with open(filepath, 'wb') as f:
+        f.write(out)
+    return matched, total, skipped, hashlib.sha256(out).hexdigest()
+
+
+# ── Process-pool workers ────────────────────────────────────────────────────
+_worker_stats = None
+
+
+def _init_worker(by_name_birth, by_name):
+    """Receive the xlsx lookup tables once per worker instead of once per file."""
+    global _worker_stats
+    _worker_stats = (by_name_birth, by_name)
+
+
+def _migrate_in_worker(filepath, dry_run):
+    return migrate_scenario(filepath, *_worker_stats, dry_run)
+
+
+# ── Incremental manifest ────────────────────────────────────────────────────
+def load_manifest(path=MANIFEST_PATH):
+    """Manifest of the previous run: {"version", "xlsx", "files": {name: sha256}}."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {'version': MANIFEST_VERSION, 'xlsx': None, 'files': {}}
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {'version': MANIFEST_VERSION, 'xlsx': None, 'files': {}}
+    return manifest
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write('\n')
+    os.replace(tmp, path)
+
+
+def stale_files(scenario_files, manifest, xlsx_hash):
+    """Files that changed since the manifest, or all of them if the xlsx did."""
+    if manifest.get('xlsx') != xlsx_hash:
+        return list(scenario_files)
+    recorded = manifest.get('files', {})
+    return [p for p in scenario_files if recorded.get(os.path.basename(p)) != file_hash(p)]
+
+
+def migrate_files(scenario_files, by_name_birth, by_name, dry_run=False, jobs=1):
+    """Yield (filepath, matched, total, skipped, digest) in input order."""
+    if jobs <= 1 or len(scenario_files) <= 1:
+        for filepath in scenario_files:
+            yield (filepath, *migrate_scenario(filepath, by_name_birth, by_name, dry_run))
+        return
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                             initargs=(by_name_birth, by_name)) as pool:
+        results = pool.map(_migrate_in_worker, scenario_files, [dry_run] * len(scenario_files))
+        for filepath, result in zip(scenario_files, results):
+            yield (filepath, *result)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Migrate scenario generals to 5-stat tuples.')
+    parser.add_argument('--dry-run', action='store_true', help='report matches without writing files')
+    parser.add_argument('--jobs', type=int, default=1, help='worker processes (default 1)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='skip files unchanged since the last run (same xlsx)')
+    args = parser.parse_args(argv)
+    dry_run = args.dry_run
 
-def main():
-    dry_run = '--dry-run' in sys.argv
+    scenario_files = sorted(glob.glob(os.path.join(SCENARIO_DIR, 'scenario_*.json')))
+    xlsx_hash = file_hash(XLSX_PATH)
+    manifest = load_manifest()
+    if args.incremental:
+        todo = stale_files(scenario_files, manifest, xlsx_hash)
+        print(f'Incremental: {len(todo)}/{len(scenario_files)} scenario files changed')
+        if not todo:
+            print('\nNothing to do.')
+            return
+    else:
+        todo = scenario_files
 
     print(f'Loading xlsx from: {XLSX_PATH}')
     by_name_birth, by_name = load_xlsx_stats(XLSX_PATH)
     print(f'  by (name,birth): {len(by_name_birth)} entries')
     print(f'  by name (unique): {len(by_name)} entries')
 
-    scenario_files = sorted(glob.glob(os.path.join(SCENARIO_DIR, 'scenario_*.json')))
-    print(f'\nMigrating {len(scenario_files)} scenario files{"  (DRY RUN)" if dry_run else ""}...')
+    print(f'\nMigrating {len(todo)} scenario files{"  (DRY RUN)" if dry_run else ""}'
+          f'{f" with {args.jobs} workers" if args.jobs > 1 else ""}...')
+
+    if manifest.get('xlsx') != xlsx_hash:
+        manifest = {'version': MANIFEST_VERSION, 'xlsx': xlsx_hash, 'files': {}}
 
     total_matched = 0
     total_generals = 0
-    for filepath in scenario_files:
+    total_skipped = 0
+    for filepath, matched, total, skipped, digest in migrate_files(
+            todo, by_name_birth, by_name, dry_run, args.jobs):
         filename = os.path.basename(filepath)
-        matched, total = migrate_scenario(filepath, by_name_birth, by_name, dry_run)
         total_matched += matched
         total_generals += total
+        total_skipped += skipped
+        if digest is not None:
+            manifest['files'][filename] = digest
         if total > 0:
             print(f'  {filename}: {matched}/{total} matched from xlsx')
+        elif skipped > 0:
+            print(f'  {filename}: already 5-stat, unchanged')
 
     print(f'\nDone. {total_matched}/{total_generals} generals matched from xlsx.')
+    if total_skipped:
+        print(f'{total_skipped} generals were already 5-stat and left as they were.')
     if dry_run:
         print('(No files were modified - dry run)')
+    else:
+        save_manifest(manifest)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+"""
+Compile every data/scenarios/scenario_*.json into one columnar binary pack.
+
+General tuples (general, general_ex, general_neutral) are positional, so
+they are stored column by column: one int8/16/32 array per tuple position
+(the narrowest that fits), with strings interned in a pack-wide string table.  Everything else in a
+scenario (title, nations, cities, events, ...) is kept as one compact JSON
+blob.  An offset table lets a reader decode a single scenario without
+touching the rest of the file, and the whole file can be memory-mapped.
+
+Layout (little-endian):
+  header   b'OSPK' | u16 version | u16 reserved | u32 n_scenarios
+           | u64 strings_offset | u64 index_offset
+  blocks   one per scenario (see _encode_block)
+  strings  u32 count | u32 end_offsets[count] | utf-8 bytes
+  index    n_scenarios x (u32 code_string_id | u64 offset | u64 length)
+
+Usage:
+  scenario_pack.py build  [--out PATH]   compile the pack
+  scenario_pack.py verify [--pack PATH]  round-trip every scenario against its JSON
+  scenario_pack.py bench  [--pack PATH]  startup load time: pack vs JSON parsing
+
+The pack is about 2.7x smaller than the JSON, but not much faster to read
+from Python: decoding every scenario takes about as long as json.load of
+every file (0.8-1.4x across runs), and opening the pack (string table,
+index) costs more than parsing one small scenario.  Only repeated loads from
+an already-open pack beat json.load, by about 1.6x on the largest scenario.
+'bench' reports all three cases.
+"""
+
+import argparse
+import glob
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIO_DIR = os.path.join(PROJECT_ROOT, 'shared', 'src', 'main', 'resources', 'data', 'scenarios')
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache')
+PACK_PATH = os.path.join(CACHE_DIR, 'scenarios.pack')
+
+MAGIC = b'OSPK'
+VERSION = 1
+TUPLE_KEYS = ('general', 'general_ex', 'general_neutral')
+
+HEADER = struct.Struct('<4sHHIQQ')
+INDEX_ENTRY = struct.Struct('<IQQ')
+U32 = struct.Struct('<I')
+
+# Cell kinds for mixed columns.  Columns whose cells are all ints skip the
+# kind array entirely.
+KIND_ABSENT = 0   # tuple shorter than this column
+KIND_NULL = 1
+KIND_INT = 2
+KIND_STR = 3      # value = string id
+KIND_JSON = 4     # value = string id of the JSON text (bools, floats, nested)
+COLUMN_INT = 0
+COLUMN_MIXED = 1
+
+INT32_MIN, INT32_MAX = -2**31, 2**31 - 1
+
+# Narrowest signed array typecode per column, by byte width.
+TYPECODES = {1: 'b', 2: 'h', 4: 'i'}
+
+assert [array(t).itemsize for t in TYPECODES.values()] == list(TYPECODES)
+
+
+def _width(values):
+    lo, hi = min(values, default=0), max(values, default=0)
+    for width in (1, 2):
+        bound = 1 << (8 * width - 1)
+        if -bound <= lo and hi < bound:
+            return width
+    return 4
+
+
+def scenario_files(scenario_dir=SCENARIO_DIR):
+    """{code: path} for every scenario_*.json, in code order."""
+    paths = sorted(glob.glob(os.path.join(scenario_dir, 'scenario_*.json')))
+    return {os.path.basename(p)[len('scenario_'):-len('.json')]: p for p in paths}
+
+
+def _is_tuple_table(value):
+    return isinstance(value, list) and all(isinstance(row, list) for row in value)
+
+
+# ── Building ─────────────────────────────────────────────────────────────────
+class StringTable:
+    """Interned strings, numbered in first-seen order."""
+
+    def __init__(self):
+        self.ids = {}
+        self.strings = []
+
+    def intern(self, s):
+        sid = self.ids.get(s)
+        if sid is None:
+            sid = self.ids[s] = len(self.strings)
+            self.strings.append(s)
+        return sid
+
+    def encode(self):
+        blobs = [s.encode('utf-8') for s in self.strings]
+        ends = array('I')
+        pos = 0
+        for b in blobs:
+            pos += len(b)
+            ends.append(pos)
+        return U32.pack(len(blobs)) + ends.tobytes() + b''.join(blobs)
+
+
+def _encode_cell(value, strings):
+    if value is None:
+        return KIND_NULL, 0
+    if isinstance(value, int) and not isinstance(value, bool) and INT32_MIN <= value <= INT32_MAX:
+        return KIND_INT, value
+    if isinstance(value, str):
+        return KIND_STR, strings.intern(value)
+    return KIND_JSON, strings.intern(json.dumps(value, ensure_ascii=False))
+
+
+def _encode_table(rows, strings):
+    """u32 n_rows | u8 n_cols | u8 lengths[n_rows] | columns.
+
+    Each column: u8 column_kind | u8 width | (u8 kinds[n_rows] if mixed)
+    | int{8,16,32} values[n_rows], the width being the narrowest that fits.
+    """
+    n_cols = max((len(r) for r in rows), default=0)
+    out = [U32.pack(len(rows)), bytes([n_cols]), bytes(len(r) for r in rows)]
+    for c in range(n_cols):
+        kinds = bytearray(len(rows))
+        values = [0] * len(rows)
+        for i, row in enumerate(rows):
+            if c < len(row):
+                kinds[i], values[i] = _encode_cell(row[c], strings)
+        width = _width(values)
+        if all(k == KIND_INT for k in kinds):
+            out.append(bytes([COLUMN_INT, width]))
+        else:
+            out.append(bytes([COLUMN_MIXED, width]))
+            out.append(bytes(kinds))
+        out.append(array(TYPECODES[width], values).tobytes())
+    return b''.join(out)
+
+
+def _encode_block(scenario, strings):
+    """u32 meta_len | meta JSON | u8 n_tables | (u32 key_id | u32 len | table)*.
+
+    The meta JSON keeps the scenario's key order; tuple tables appear there
+    as null and are filled back in from the columnar section.
+    """
+    meta = {}
+    tables = []
+    for key, value in scenario.items():
+        if key in TUPLE_KEYS and _is_tuple_table(value):
+            meta[key] = None
+            tables.append((key, _encode_table(value, strings)))
+        else:
+            meta[key] = value
+    meta_bytes = json.dumps(meta, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    out = [U32.pack(len(meta_bytes)), meta_bytes, bytes([len(tables)])]
+    for key, table in tables:
+        out.append(struct.pack('<II', strings.intern(key), len(table)))
+        out.append(table)
+    return b''.join(out)
+
+
+def build_pack(scenario_dir=SCENARIO_DIR, out_path=PACK_PATH):
+    """Compile all scenarios; returns (n_scenarios, pack size in bytes)."""
+    files = scenario_files(scenario_dir)
+    strings = StringTable()
+    blocks = []
+    offset = HEADER.size
+    index = []
+    for code, path in files.items():
+        with open(path, 'r', encoding='utf-8') as f:
+            block = _encode_block(json.load(f), strings)
+        index.append((strings.intern(code), offset, len(block)))
+        blocks.append(block)
+        offset += len(block)
+
+    string_bytes = strings.encode()
+    strings_offset = offset
+    index_offset = strings_offset + len(string_bytes)
+
+    os.makedirs(os.path.dirname(out_path) or '.', exist_ok=True)
+    tmp = out_path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, len(index), strings_offset, index_offset))
+        for block in blocks:
+            f.write(block)
+        f.write(string_bytes)
+        for entry in index:
+            f.write(INDEX_ENTRY.pack(*entry))
+    os.replace(tmp, out_path)
+    return len(index), index_offset + INDEX_ENTRY.size * len(index)
+
+
+# ── Reading ──────────────────────────────────────────────────────────────────
+class ScenarioPack:
+    """Memory-mapped reader; ``load(code)`` decodes one scenario on demand."""
+
+    def __init__(self, path=PACK_PATH):
+        self._file = open(path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mm)
+        magic, version, _, n, strings_offset, index_offset = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'{path}: not a v{VERSION} scenario pack')
+
+        count = U32.unpack_from(self._mm, strings_offset)[0]
+        self._ends = self._view[strings_offset + 4:strings_offset + 4 + 4 * count].cast('I')
+        self._strings_base = strings_offset + 4 + 4 * count
+        self._strings = [None] * count
+
+        self.index = {}
+        for i in range(n):
+            sid, offset, length = INDEX_ENTRY.unpack_from(self._mm, index_offset + i * INDEX_ENTRY.size)
+            self.index[self.string(sid)] = (offset, length)
+
+    def string(self, sid):
+        s = self._strings[sid]
+        if s is None:
+            start = self._ends[sid - 1] if sid else 0
+            s = self._strings[sid] = str(
+                self._view[self._strings_base + start:self._strings_base + self._ends[sid]], 'utf-8')
+        return s
+
+    def codes(self):
+        return list(self.index)
+
+    def _decode_table(self, pos):
+        view, string = self._view, self.string
+        n_rows = U32.unpack_from(view, pos)[0]
+        n_cols = view[pos + 4]
+        pos += 5
+        lengths = view[pos:pos + n_rows]
+        pos += n_rows
+        decode = {KIND_NULL: lambda v: None, KIND_INT: int, KIND_STR: string,
+                  KIND_JSON: lambda v: json.loads(string(v)), KIND_ABSENT: lambda v: None}
+        columns = []
+        for _ in range(n_cols):
+            column_kind, width = view[pos], view[pos + 1]
+            pos += 2
+            kinds = None
+            if column_kind == COLUMN_MIXED:
+                kinds = view[pos:pos + n_rows]
+                pos += n_rows
+            values = view[pos:pos + width * n_rows].cast(TYPECODES[width]).tolist()
+            pos += width * n_rows
+            if kinds is not None:
+                values = [v if k == KIND_INT else decode[k](v) for k, v in zip(kinds, values)]
+            columns.append(values)
+        rows = list(map(list, zip(*columns)))
+        # Columns past a row's length were padded; trim them back off.
+        for row, n in zip(rows, lengths):
+            if n < n_cols:
+                del row[n:]
+        return rows
+
+    def load(self, code):
+        """The scenario dict, equal to ``json.load`` of its source file."""
+        offset, _ = self.index[code]
+        view = self._view
+        meta_len = U32.unpack_from(view, offset)[0]
+        pos = offset + 4
+        scenario = json.loads(str(view[pos:pos + meta_len], 'utf-8'))
+        pos += meta_len
+        n_tables = view[pos]
+        pos += 1
+        for _ in range(n_tables):
+            key_id, length = struct.unpack_from('<II', view, pos)
+            pos += 8
+            scenario[self.string(key_id)] = self._decode_table(pos)
+            pos += length
+        return scenario
+
+    def close(self):
+        self._ends.release()
+        self._view.release()
+        self._mm.close()
+        self._file.close()
+
+
+# ── Verify / bench ───────────────────────────────────────────────────────────
+def verify_pack(pack_path=PACK_PATH, scenario_dir=SCENARIO_DIR):
+    """Codes whose decoded scenario differs from the JSON (empty list = OK)."""
+    files = scenario_files(scenario_dir)
+    pack = ScenarioPack(pack_path)
+    try:
+        bad = sorted(set(files) ^ set(pack.index))
+        for code, path in files.items():
+            if code not in pack.index:
+                continue
+            with open(path, 'r', encoding='utf-8') as f:
+                expected = json.load(f)
+            actual = pack.load(code)
+            # Compare the serialized form so int/float/bool differences show.
+            if (json.dumps(actual, ensure_ascii=False) != json.dumps(expected, ensure_ascii=False)):
+                bad.append(code)
+        return bad
+    finally:
+        pack.close()
+
+
+def _best(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_pack(pack_path=PACK_PATH, scenario_dir=SCENARIO_DIR, repeat=5):
+    files = scenario_files(scenario_dir)
+
+    def load_json():
+        for path in files.values():
+            with open(path, 'r', encoding='utf-8') as f:
+                json.load(f)
+
+    def load_pack_all():
+        pack = ScenarioPack(pack_path)
+        for code in pack.index:
+            pack.load(code)
+        pack.close()
+
+    # The largest scenario: the most general tuples to decode.
+    one = max(files, key=lambda code: os.path.getsize(files[code]))
+
+    def load_json_one():
+        with open(files[one], 'r', encoding='utf-8') as f:
+            json.load(f)
+
+    def load_pack_one():
+        pack = ScenarioPack(pack_path)
+        pack.load(one)
+        pack.close()
+
+    opened = ScenarioPack(pack_path)
+
+    json_size = sum(os.path.getsize(p) for p in files.values())
+    print(f'{len(files)} scenarios: JSON {json_size / 1e6:.2f} MB, '
+          f'pack {os.path.getsize(pack_path) / 1e6:.2f} MB')
+    t_json = _best(load_json, repeat)
+    t_all = _best(load_pack_all, repeat)
+    t_json_one = _best(load_json_one, repeat)
+    t_one = _best(load_pack_one, repeat)
+    t_open_one = _best(lambda: opened.load(one), repeat)
+    opened.close()
+    rows = [
+        ('json.load all', t_json, None),
+        ('pack load all', t_all, t_json),
+        (f'json.load {one}', t_json_one, None),
+        (f'pack open + load {one}', t_one, t_json_one),
+        (f'pack load {one} (open)', t_open_one, t_json_one),
+    ]
+    for label, seconds, baseline in rows:
+        ratio = f'  ({baseline / seconds:.2f}x)' if baseline else ''
+        print(f'  {label:<24}: {seconds * 1000:8.2f} ms{ratio}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build / verify / benchmark the scenario pack.')
+    parser.add_argument('command', choices=('build', 'verify', 'bench'))
+    parser.add_argument('--pack', '--out', dest='pack', default=PACK_PATH)
+    parser.add_argument('--scenario-dir', default=SCENARIO_DIR)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        n, size = build_pack(args.scenario_dir, args.pack)
+        print(f'Wrote {n} scenarios to {args.pack} ({size / 1e6:.2f} MB)')
+        bad = verify_pack(args.pack, args.scenario_dir)
+    elif args.command == 'verify':
+        bad = verify_pack(args.pack, args.scenario_dir)
+    else:
+        bench_pack(args.pack, args.scenario_dir, args.repeat)
+        return 0
+
+    if bad:
+        print(f'Round-trip mismatch: {", ".join(bad)}', file=sys.stderr)
+        return 1
+    print('Round-trip OK')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
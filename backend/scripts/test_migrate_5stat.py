@@ -0,0 +1,64 @@
+"""
+Offline checks — migrate_5stat on the real scenario files.
+
+The scenario files are already in the 5-stat format; running the migration
+over them again must leave them byte-for-byte unchanged.  Old 3-stat tuples
+rebuilt from real generals must migrate back to the originals.
+"""
+import json
+import os
+import shutil
+
+import pytest
+
+from migrate_5stat import SCENARIO_DIR, is_five_stat, migrate_files
+from xlsx_stats import file_hash
+
+SCENARIO = os.path.join(SCENARIO_DIR, 'scenario_1010.json')
+
+
+@pytest.fixture
+def scenario(tmp_path):
+    path = tmp_path / 'scenario_1010.json'
+    shutil.copyfile(SCENARIO, path)
+    return str(path)
+
+
+def _three_stat(general):
+    """The old layout of a 16-element 5-stat tuple (politics/charm at the end)."""
+    return general[:8] + general[10:16] + general[8:10]
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_migrated_scenario_is_left_unchanged(scenario, jobs):
+    before = file_hash(scenario)
+    [(_, matched, total, skipped, digest)] = migrate_files([scenario], {}, {}, jobs=jobs)
+    with open(SCENARIO, encoding='utf-8') as f:
+        data = json.load(f)
+    assert (matched, total) == (0, 0)
+    assert skipped == len(data['general']) + len(data.get('general_ex', []))
+    assert digest == before == file_hash(scenario)
+
+
+def test_old_tuples_are_migrated_next_to_new_ones(scenario):
+    with open(scenario, encoding='utf-8') as f:
+        data = json.load(f)
+    originals = {i: g for i, g in enumerate(data['general']) if len(g) == 16}
+    assert originals and all(is_five_stat(g) for g in data['general'])
+    for i, g in originals.items():
+        data['general'][i] = _three_stat(g)
+        assert not is_five_stat(data['general'][i])
+    with open(scenario, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+
+    [(_, _, total, skipped, digest)] = migrate_files([scenario], {}, {})
+    assert total == len(originals)
+    assert digest == file_hash(scenario)
+    with open(scenario, encoding='utf-8') as f:
+        migrated = json.load(f)
+    with open(SCENARIO, encoding='utf-8') as f:
+        assert migrated == json.load(f)
+
+    # A second run finds nothing left to do.
+    [(_, _, total, _, again)] = migrate_files([scenario], {}, {})
+    assert total == 0 and again == digest
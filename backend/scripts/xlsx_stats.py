@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Compiled index of general stats from 삼국지14 무장정보.xlsx.
+
+Walking the `무장` sheet through openpyxl is by far the slowest part of
+migrate_5stat.py.  This module compiles the sheet once into a SQLite sidecar
+(.cache/xlsx_stats.sqlite) keyed by the xlsx file's sha256 and only rebuilds
+it when the spreadsheet changes.
+
+The sidecar holds every row as (name, birthYear, leadership, strength,
+intel, politics, charm); the lookup tables used by migrate_5stat are derived
+from it:
+  - by_name_birth: (name, birthYear) -> stats
+  - by_name: name -> stats, for names that appear exactly once
+  - duplicates: name -> [(birthYear, stats), ...] for names that repeat
+
+Other tools can query it directly:
+
+  from xlsx_stats import open_index
+  index = open_index()
+  index.lookup('유비', 161)   # -> (lead, str, int, pol, charm) or None
+
+Usage:
+  xlsx_stats.py [--rebuild] [NAME [BIRTH_YEAR]]
+"""
+
+import argparse
+import hashlib
+import os
+import sqlite3
+import sys
+from collections import defaultdict
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+XLSX_PATH = os.path.join(PROJECT_ROOT, '..', '삼국지14 무장정보.xlsx')
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache')
+INDEX_PATH = os.path.join(CACHE_DIR, 'xlsx_stats.sqlite')
+# Bump when the row parsing below changes so stale sidecars are rebuilt.
+INDEX_VERSION = '1'
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE general (
+    seq INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    birth_year INTEGER,
+    leadership INTEGER NOT NULL,
+    strength INTEGER NOT NULL,
+    intel INTEGER NOT NULL,
+    politics INTEGER NOT NULL,
+    charm INTEGER NOT NULL
+);
+CREATE INDEX general_name_birth ON general (name, birth_year);
+"""
+
+
+def file_hash(path):
+    """sha256 hex digest of a file's bytes."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def read_xlsx_rows(xlsx_path):
+    """Yield (name, birthYear, (lead, str, int, pol, charm)) from the `무장` sheet."""
+    import openpyxl
+
+    wb = openpyxl.load_workbook(xlsx_path, read_only=True)
+    try:
+        ws = wb['무장']
+        for row in ws.iter_rows(min_row=3, values_only=True):
+            name = row[2]
+            if not name:
+                continue
+            birth_year = int(row[4]) if row[4] is not None else None
+            leadership = int(row[9]) if row[9] is not None else 50
+            strength = int(row[10]) if row[10] is not None else 50
+            intel = int(row[11]) if row[11] is not None else 50
+            politics = int(row[12]) if row[12] is not None else 50
+            charm = int(row[13]) if row[13] is not None else 50
+            yield str(name), birth_year, (leadership, strength, intel, politics, charm)
+    finally:
+        wb.close()
+
+
+class StatIndex:
+    """Read-only view over a compiled sidecar."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    @property
+    def xlsx_hash(self):
+        return self.conn.execute("SELECT value FROM meta WHERE key = 'xlsx_sha256'").fetchone()[0]
+
+    def entries(self):
+        """All rows in sheet order as (name, birthYear, stats)."""
+        for name, birth, *stats in self.conn.execute(
+                'SELECT name, birth_year, leadership, strength, intel, politics, charm '
+                'FROM general ORDER BY seq'):
+            yield name, birth, tuple(stats)
+
+    def lookup(self, name, birth_year=None):
+        """Stats by (name, birthYear), falling back to a unique name match."""
+        cols = 'leadership, strength, intel, politics, charm'
+        if birth_year is not None:
+            row = self.conn.execute(
+                f'SELECT {cols} FROM general WHERE name = ? AND birth_year = ? '
+                'ORDER BY seq DESC LIMIT 1', (name, birth_year)).fetchone()
+            if row:
+                return tuple(row)
+        rows = self.conn.execute(f'SELECT {cols} FROM general WHERE name = ? LIMIT 2', (name,)).fetchall()
+        return tuple(rows[0]) if len(rows) == 1 else None
+
+    def tables(self):
+        """(by_name_birth, by_name, duplicates) — see module docstring."""
+        name_entries = defaultdict(list)
+        for name, birth, stats in self.entries():
+            name_entries[name].append((birth, stats))
+
+        by_name_birth = {}
+        by_name = {}
+        duplicates = {}
+        for name, entries in name_entries.items():
+            for birth_year, stats in entries:
+                if birth_year is not None:
+                    by_name_birth[(name, birth_year)] = stats
+            if len(entries) == 1:
+                by_name[name] = entries[0][1]
+            else:
+                duplicates[name] = entries
+        return by_name_birth, by_name, duplicates
+
+    def close(self):
+        self.conn.close()
+
+
+def build_index(xlsx_path, index_path, xlsx_hash=None):
+    """Compile the xlsx into a fresh sidecar (written atomically)."""
+    xlsx_hash = xlsx_hash or file_hash(xlsx_path)
+    os.makedirs(os.path.dirname(index_path) or '.', exist_ok=True)
+    tmp = index_path + '.tmp'
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    conn = sqlite3.connect(tmp)
+    try:
+        conn.executescript(SCHEMA)
+        conn.executemany(
+            'INSERT INTO general (name, birth_year, leadership, strength, intel, politics, charm) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            ((name, birth, *stats) for name, birth, stats in read_xlsx_rows(xlsx_path)))
+        conn.executemany('INSERT INTO meta VALUES (?, ?)', [
+            ('xlsx_sha256', xlsx_hash), ('version', INDEX_VERSION),
+        ])
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp, index_path)
+
+
+def _is_current(index_path, xlsx_hash):
+    try:
+        conn = sqlite3.connect(f'file:{index_path}?mode=ro', uri=True)
+    except sqlite3.Error:
+        return False
+    try:
+        meta = dict(conn.execute('SELECT key, value FROM meta'))
+    except sqlite3.Error:
+        return False
+    finally:
+        conn.close()
+    return meta.get('xlsx_sha256') == xlsx_hash and meta.get('version') == INDEX_VERSION
+
+
+def open_index(xlsx_path=XLSX_PATH, index_path=INDEX_PATH, rebuild=False):
+    """Open the sidecar for ``xlsx_path``, compiling it first if missing or stale."""
+    xlsx_hash = file_hash(xlsx_path)
+    if rebuild or not os.path.exists(index_path) or not _is_current(index_path, xlsx_hash):
+        build_index(xlsx_path, index_path, xlsx_hash)
+    return StatIndex(sqlite3.connect(f'file:{index_path}?mode=ro', uri=True))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compile / query the xlsx general stat index.')
+    parser.add_argument('--rebuild', action='store_true', help='recompile even if the xlsx is unchanged')
+    parser.add_argument('name', nargs='?')
+    parser.add_argument('birth_year', nargs='?', type=int)
+    args = parser.parse_args(argv)
+
+    index = open_index(rebuild=args.rebuild)
+    try:
+        if args.name:
+            print(index.lookup(args.name, args.birth_year))
+            return
+        by_name_birth, by_name, duplicates = index.tables()
+        print(f'Index: {INDEX_PATH} (xlsx {index.xlsx_hash[:12]})')
+        print(f'  by (name,birth): {len(by_name_birth)} entries')
+        print(f'  by name (unique): {len(by_name)} entries')
+        print(f'  duplicate names: {len(duplicates)}')
+    finally:
+        index.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,278 @@
+"""
+Baseline snapshot / restore for the parity databases.
+
+Every suite mutates the shared worlds (auth registers users, commands reserve
+turns, the soak advances the clock), and rebuilding the volumes plus
+``new-bootstrap`` is the only other way back.  This module snapshots both
+databases once and restores them in seconds:
+
+  - PostgreSQL: ``CREATE DATABASE <db>_baseline TEMPLATE <db>`` — a
+    file-level copy — and ``CREATE DATABASE <target> TEMPLATE <db>_baseline``
+    to restore or clone.
+  - MariaDB has no templates: tables are copied server-side into
+    ``<db>_baseline`` (``CREATE TABLE … LIKE`` + ``INSERT … SELECT``), or,
+    with ``PARITY_LEGACY_DUMP``, dumped once with ``mysqldump
+    --single-transaction`` and replayed with the ``mysql`` client.
+
+A baseline that already exists on the server is reused (set
+``PARITY_DB_BASELINE=refresh`` to retake it).  Template and table-copy
+baselines live in the same volume as the world, so tearing the volumes down
+discards them too; a dump file outlives the volumes until it is deleted.
+
+``PARITY_DB_RESET`` selects how conftest uses it:
+
+  - ``off``    — nothing (default).
+  - ``suite``  — restore the shared databases before each suite (test file)
+    that talks to the stacks.  Serial runs only: restoring under a
+    concurrently running suite would pull its world away.
+  - ``worker`` — each xdist worker gets ``<db>_<worker>`` clones and its DB
+    fixtures read and write those.  The apps still serve the shared
+    databases, so this isolates DB-level suites, not HTTP ones.
+
+    reset = WorldReset("suite", legacy=MariaDbBaseline(connect_root, "sammo"),
+                       new=PostgresBaseline(connect_maintenance, "opensam"))
+    reset.prepare()      # once per run
+    reset.restore()      # before each suite
+"""
+from __future__ import annotations
+
+import os
+import re
+import subprocess
+import time
+from contextlib import closing
+from typing import Any, Callable
+
+MODES = ("off", "suite", "worker")
+MODE = os.environ.get("PARITY_DB_RESET", "off")
+REFRESH = os.environ.get("PARITY_DB_BASELINE", "") == "refresh"
+LEGACY_DUMP = os.environ.get("PARITY_LEGACY_DUMP") or None
+SUFFIX = "baseline"
+# Marks a fully copied MariaDB baseline; a half-finished copy has none.
+MARKER_TABLE = "_parity_baseline"
+
+_NAME = re.compile(r"^[A-Za-z0-9_]+$")
+
+
+def _ident(name: str) -> str:
+    # Database names come from the environment and are spliced into DDL.
+    if not _NAME.match(name):
+        raise ValueError(f"unsafe database name: {name!r}")
+    return name
+
+
+# ── PostgreSQL ───────────────────────────────────────────────────────────────
+class PostgresBaseline:
+    """Template-database snapshot of one PostgreSQL database.
+
+    ``connect()`` must return an autocommit connection to a *different*
+    database on the same server (``postgres``) as a role allowed to create
+    databases.
+    """
+
+    def __init__(self, connect: Callable[[], Any], database: str, *, suffix: str = SUFFIX):
+        self.connect = connect
+        self.database = _ident(database)
+        self.baseline = _ident(f"{database}_{suffix}")
+
+    def _exists(self, cur, name: str) -> bool:
+        cur.execute("SELECT 1 FROM pg_database WHERE datname = %s", (name,))
+        return cur.fetchone() is not None
+
+    def exists(self) -> bool:
+        with closing(self.connect()) as conn, conn.cursor() as cur:
+            return self._exists(cur, self.baseline)
+
+    def capture(self, *, refresh: bool = False) -> bool:
+        """Snapshot ``database``; returns False if an existing baseline was kept.
+
+        A template's source may have no other sessions, so the apps are
+        locked out and disconnected for the duration of the copy; their
+        pools reconnect afterwards.
+        """
+        with closing(self.connect()) as conn, conn.cursor() as cur:
+            if self._exists(cur, self.baseline):
+                if not refresh:
+                    return False
+                cur.execute(f'ALTER DATABASE "{self.baseline}" WITH IS_TEMPLATE false')
+                cur.execute(f'DROP DATABASE "{self.baseline}"')
+            cur.execute(f'ALTER DATABASE "{self.database}" WITH ALLOW_CONNECTIONS false')
+            try:
+                cur.execute(
+                    "SELECT pg_terminate_backend(pid) FROM pg_stat_activity "
+                    "WHERE datname = %s AND pid <> pg_backend_pid()",
+                    (self.database,),
+                )
+                cur.execute(f'CREATE DATABASE "{self.baseline}" TEMPLATE "{self.database}"')
+            finally:
+                cur.execute(f'ALTER DATABASE "{self.database}" WITH ALLOW_CONNECTIONS true')
+            # Nobody may connect to the template, or the next clone would fail.
+            cur.execute(f'ALTER DATABASE "{self.baseline}" WITH IS_TEMPLATE true ALLOW_CONNECTIONS false')
+        return True
+
+    def restore(self, target: str | None = None) -> None:
+        """Replace ``target`` (default: the live database) with a baseline copy."""
+        target = _ident(target or self.database)
+        with closing(self.connect()) as conn, conn.cursor() as cur:
+            cur.execute(f'DROP DATABASE IF EXISTS "{target}" WITH (FORCE)')
+            cur.execute(f'CREATE DATABASE "{target}" TEMPLATE "{self.baseline}"')
+
+    def drop(self, target: str) -> None:
+        with closing(self.connect()) as conn, conn.cursor() as cur:
+            cur.execute(f'DROP DATABASE IF EXISTS "{_ident(target)}" WITH (FORCE)')
+
+
+# ── MariaDB ──────────────────────────────────────────────────────────────────
+class MariaDbBaseline:
+    """Table-copy (or ``mysqldump``) snapshot of one MariaDB database.
+
+    ``connect()`` returns a connection with no default database as a user
+    allowed to create databases.  ``login`` (``host``/``port``/``user``/
+    ``password``) is only needed for the dump variant, which shells out to
+    the client tools installed in the runner image.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        database: str,
+        *,
+        suffix: str = SUFFIX,
+        dump_path: str | None = None,
+        login: dict | None = None,
+        run: Callable[..., Any] = subprocess.run,
+    ):
+        self.connect = connect
+        self.database = _ident(database)
+        self.baseline = _ident(f"{database}_{suffix}")
+        self.dump_path = dump_path
+        self.login = login or {}
+        self._run = run
+
+    @staticmethod
+    def _tables(cur, database: str) -> list[str]:
+        cur.execute(
+            "SELECT table_name FROM information_schema.tables "
+            "WHERE table_schema = %s AND table_type = 'BASE TABLE' ORDER BY table_name",
+            (database,),
+        )
+        return [row[0] for row in cur.fetchall()]
+
+    def exists(self) -> bool:
+        if self.dump_path:
+            return os.path.exists(self.dump_path)
+        with closing(self.connect()) as conn, conn.cursor() as cur:
+            return MARKER_TABLE in self._tables(cur, self.baseline)
+
+    def _copy(self, cur, source: str, target: str, *, exclude: tuple[str, ...] = ()) -> int:
+        """Make ``target`` hold exactly ``source``'s tables and rows; returns table count."""
+        tables = [t for t in self._tables(cur, source) if t not in exclude]
+        cur.execute("SET SESSION foreign_key_checks = 0")
+        cur.execute(f"CREATE DATABASE IF NOT EXISTS `{target}`")
+        for stale in set(self._tables(cur, target)) - set(tables):
+            cur.execute(f"DROP TABLE `{target}`.`{stale}`")
+        for table in tables:
+            cur.execute(f"DROP TABLE IF EXISTS `{target}`.`{table}`")
+            cur.execute(f"CREATE TABLE `{target}`.`{table}` LIKE `{source}`.`{table}`")
+            cur.execute(f"INSERT INTO `{target}`.`{table}` SELECT * FROM `{source}`.`{table}`")
+        return len(tables)
+
+    def capture(self, *, refresh: bool = False) -> bool:
+        """Snapshot ``database``; returns False if an existing baseline was kept."""
+        if self.exists() and not refresh:
+            return False
+        if self.dump_path:
+            with open(self.dump_path, "wb") as out:
+                self._client("mysqldump", "--single-transaction", "--skip-lock-tables",
+                             "--routines", self.database, stdout=out)
+            return True
+        with closing(self.connect()) as conn, conn.cursor() as cur:
+            cur.execute(f"DROP DATABASE IF EXISTS `{self.baseline}`")
+            self._copy(cur, self.database, self.baseline)
+            cur.execute(f"CREATE TABLE `{self.baseline}`.`{MARKER_TABLE}` (captured_at DATETIME)")
+            cur.execute(f"INSERT INTO `{self.baseline}`.`{MARKER_TABLE}` VALUES (NOW())")
+            conn.commit()
+        return True
+
+    def restore(self, target: str | None = None) -> None:
+        """Replace ``target`` (default: the live database) with a baseline copy."""
+        target = _ident(target or self.database)
+        with closing(self.connect()) as conn, conn.cursor() as cur:
+            if self.dump_path:
+                # The dump drops and recreates each table it contains.
+                cur.execute(f"CREATE DATABASE IF NOT EXISTS `{target}`")
+            else:
+                self._copy(cur, self.baseline, target, exclude=(MARKER_TABLE,))
+            conn.commit()
+        if self.dump_path:
+            with open(self.dump_path, "rb") as dump:
+                self._client("mysql", target, stdin=dump)
+
+    def drop(self, target: str) -> None:
+        with closing(self.connect()) as conn, conn.cursor() as cur:
+            cur.execute(f"DROP DATABASE IF EXISTS `{_ident(target)}`")
+
+    def _client(self, tool: str, *args: str, **kw):
+        argv = [tool, f"--host={self.login.get('host', 'localhost')}",
+                f"--port={self.login.get('port', 3306)}", f"--user={self.login.get('user', 'root')}", *args]
+        # Password through the environment, not argv (visible in ps).
+        env = {**os.environ, "MYSQL_PWD": self.login.get("password", "")}
+        return self._run(argv, env=env, check=True, **kw)
+
+
+# ── Orchestration ────────────────────────────────────────────────────────────
+class WorldReset:
+    """Applies ``PARITY_DB_RESET`` to whichever sides are reachable.
+
+    ``legacy`` / ``new`` are ``MariaDbBaseline`` / ``PostgresBaseline`` (or
+    ``None`` for a side that is down).  ``timings`` records seconds per
+    operation for the run summary.
+    """
+
+    def __init__(self, mode: str = MODE, *, legacy: MariaDbBaseline | None = None,
+                 new: PostgresBaseline | None = None):
+        if mode not in MODES:
+            raise ValueError(f"PARITY_DB_RESET must be one of {MODES}, not {mode!r}")
+        self.mode = mode
+        self.sides = {side: b for side, b in (("legacy", legacy), ("new", new)) if b is not None}
+        self.timings: list[tuple[str, str, float]] = []
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off" and bool(self.sides)
+
+    def _timed(self, op: str, side: str, fn: Callable[[], Any]):
+        start = time.perf_counter()
+        result = fn()
+        self.timings.append((op, side, time.perf_counter() - start))
+        return result
+
+    def prepare(self, *, refresh: bool = REFRESH) -> dict[str, bool]:
+        """Take (or reuse) both baselines; ``{side: newly_captured}``."""
+        return {side: self._timed("capture", side, lambda b=b: b.capture(refresh=refresh))
+                for side, b in self.sides.items()}
+
+    def restore(self) -> None:
+        """Put the shared databases back to the baseline (``suite`` mode)."""
+        for side, b in self.sides.items():
+            self._timed("restore", side, b.restore)
+
+    def isolate(self, worker: str) -> dict[str, str]:
+        """Clone per-worker databases (``worker`` mode); ``{side: database}``."""
+        names = {}
+        for side, b in self.sides.items():
+            name = _ident(f"{b.database}_{worker}")
+            self._timed("clone", side, lambda b=b, name=name: b.restore(name))
+            names[side] = name
+        return names
+
+    def cleanup(self, names: dict[str, str]) -> None:
+        for side, name in names.items():
+            self.sides[side].drop(name)
+
+    def summary(self) -> list[str]:
+        by_op: dict[tuple[str, str], list[float]] = {}
+        for op, side, seconds in self.timings:
+            by_op.setdefault((side, op), []).append(seconds)
+        return [f"{side:<7} {op:<8} x{len(s):<3} total {sum(s):7.2f}s  max {max(s):6.2f}s"
+                for (side, op), s in sorted(by_op.items())]
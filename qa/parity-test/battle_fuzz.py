@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+"""
+Battle-simulation parity fuzzer.
+
+Generates thousands of attacker/defender match-ups from the scenario general
+pools (``data/scenarios/*.json``) and the ``che`` unit set, submits them to
+``Global/BattleSimulate`` and ``/api/battle/simulate`` in concurrent batches,
+and compares the *outcome distributions* of both stacks instead of single
+responses:
+
+  - winner (attacker / defender / draw) — chi-square test of homogeneity
+  - rounds, attacker and defender casualties — two-sample Kolmogorov–Smirnov
+
+Tests run per stat bucket (log2 of the attacker/defender power ratio) and
+are flagged when ``p < alpha / number_of_tests`` (Bonferroni).
+
+    python battle_fuzz.py --count 5000 --workers 16 --out /results/battle_fuzz.json
+"""
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable
+
+from comparison import FIELD_MAP_KR_EN, normalize_payload
+
+DATA_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "..", "..", "backend", "shared", "src", "main", "resources", "data",
+)
+TERRAINS = ("plain", "forest", "hill", "mountain", "river")
+WEATHERS = ("clear", "rain", "snow", "storm")
+OUTCOMES = ("attacker", "defender", "draw")
+DISTRIBUTIONS = ("rounds", "attacker_casualties", "defender_casualties")
+MIN_BUCKET_SAMPLES = 20
+
+Simulator = Callable[[dict], "dict | None"]
+
+
+@dataclass(frozen=True)
+class PoolGeneral:
+    name: str
+    leadership: int
+    strength: int
+    intel: int
+
+
+# ── Scenario generation ──────────────────────────────────────────────────────
+def load_general_pool(data_dir: str = DATA_DIR) -> list[PoolGeneral]:
+    """Distinct generals from every scenario's ``general`` / ``general_ex`` rows.
+
+    Row layout follows ``ScenarioService.parseGeneral``: name at 1,
+    leadership / strength / intel at 5–7.
+    """
+    pool: dict[str, PoolGeneral] = {}
+    for path in sorted(glob.glob(os.path.join(data_dir, "scenarios", "scenario_*.json"))):
+        with open(path, encoding="utf-8") as f:
+            scenario = json.load(f)
+        for row in scenario.get("general", []) + scenario.get("general_ex", []):
+            if len(row) > 7 and isinstance(row[1], str) and row[1] not in pool:
+                pool[row[1]] = PoolGeneral(row[1], int(row[5]), int(row[6]), int(row[7]))
+    return list(pool.values())
+
+
+def load_crew_types(data_dir: str = DATA_DIR) -> list[int]:
+    """Recruitable crew type IDs from ``unitset_che.json`` (walls excluded)."""
+    with open(os.path.join(data_dir, "unitset_che.json"), encoding="utf-8") as f:
+        unitset = json.load(f)
+    return [
+        ct["id"] for ct in unitset["crewTypes"]
+        if not any(r.get("type") == "Impossible" for r in ct.get("requirements") or [])
+    ]
+
+
+def _unit(rnd: random.Random, general: PoolGeneral, tag: str, crew_types: list[int]) -> dict:
+    return {
+        "name": f"{general.name}#{tag}",
+        "leadership": general.leadership,
+        "strength": general.strength,
+        "intel": general.intel,
+        "crew": rnd.randrange(500, 10_001, 100),
+        "crewType": rnd.choice(crew_types),
+        "train": rnd.randint(40, 100),
+        "atmos": rnd.randint(40, 100),
+    }
+
+
+def generate_scenarios(
+    count: int,
+    *,
+    seed: int = 0,
+    pool: list[PoolGeneral] | None = None,
+    crew_types: list[int] | None = None,
+) -> list[dict]:
+    """``count`` reproducible match-ups: ``{"id", "attacker", "defender", "terrain", "weather"}``.
+
+    Unit names carry the scenario index so the new stack's per-battle RNG seed
+    (attacker name + defender name + terrain + weather) differs per scenario.
+    """
+    rnd = random.Random(seed)
+    pool = pool or load_general_pool()
+    crew_types = crew_types or load_crew_types()
+    scenarios = []
+    for i in range(count):
+        a, d = rnd.sample(pool, 2)
+        scenarios.append({
+            "id": i,
+            "attacker": _unit(rnd, a, f"{i}a", crew_types),
+            "defender": _unit(rnd, d, f"{i}d", crew_types),
+            "terrain": rnd.choice(TERRAINS),
+            "weather": rnd.choice(WEATHERS),
+        })
+    return scenarios
+
+
+def power_bucket(scenario: dict) -> str:
+    """Stat bucket: log2 of (leadership + strength) × crew, attacker over defender."""
+    def power(u):
+        return max(1, (u["leadership"] + u["strength"]) * u["crew"])
+    ratio = math.log2(power(scenario["attacker"]) / power(scenario["defender"]))
+    edge = max(-2.0, min(2.0, math.floor(ratio * 2) / 2))
+    return f"{edge:+.1f}"
+
+
+def new_request(scenario: dict) -> dict:
+    """``SimulateRequest`` body (BattleSimDtos.kt)."""
+    return {k: scenario[k] for k in ("attacker", "defender", "terrain", "weather")}
+
+
+def legacy_request(scenario: dict) -> dict:
+    """``Global/BattleSimulate`` body, units in legacy ``general`` column names."""
+    def unit(u):
+        return {
+            "name": u["name"], "leadership": u["leadership"], "strength": u["strength"],
+            "intel": u["intel"], "crew": u["crew"], "crewtype": u["crewType"],
+            "train": u["train"], "atmos": u["atmos"],
+        }
+    return {
+        "attacker": unit(scenario["attacker"]),
+        "defender": unit(scenario["defender"]),
+        "terrain": scenario["terrain"],
+        "weather": scenario["weather"],
+    }
+
+
+# ── Outcome extraction ───────────────────────────────────────────────────────
+def _winner(value: Any) -> str | None:
+    if isinstance(value, bool):
+        return "attacker" if value else "defender"
+    if not isinstance(value, str):
+        return None
+    v = value.lower()
+    if v.startswith("공격") or v.startswith("attacker"):
+        return "attacker"
+    if v.startswith("방어") or v.startswith("defender"):
+        return "defender"
+    if v.startswith("교착") or v in ("draw", "stalemate"):
+        return "draw"
+    return None
+
+
+def _first(data: dict, *keys: str) -> Any:
+    for k in keys:
+        if k in data:
+            return data[k]
+    return None
+
+
+def outcome(scenario: dict, data: Any) -> dict | None:
+    """``{"winner", "rounds", "attacker_casualties", "defender_casualties"}`` or None.
+
+    Accepts the new ``SimulateResult`` shape and legacy payloads after
+    Korean → English key mapping.
+    """
+    data, _ = normalize_payload(data, FIELD_MAP_KR_EN)
+    if not isinstance(data, dict):
+        return None
+    winner = _winner(_first(data, "winner", "attackerWon"))
+    rounds = _first(data, "rounds", "phase", "round")
+    att_left = _first(data, "attackerRemaining", "attackerCrew")
+    def_left = _first(data, "defenderRemaining", "defenderCrew")
+    if winner is None or not all(isinstance(v, (int, float)) for v in (rounds, att_left, def_left)):
+        return None
+    return {
+        "winner": winner,
+        "rounds": int(rounds),
+        "attacker_casualties": scenario["attacker"]["crew"] - max(0, int(att_left)),
+        "defender_casualties": scenario["defender"]["crew"] - max(0, int(def_left)),
+    }
+
+
+# ── Statistics (pure Python; no SciPy in the runner image) ───────────────────
+def _gamma_q(a: float, x: float) -> float:
+    """Regularized upper incomplete gamma Q(a, x)."""
+    if x <= 0:
+        return 1.0
+    gln = math.lgamma(a)
+    if x < a + 1:
+        term = total = 1.0 / a
+        ap = a
+        for _ in range(500):
+            ap += 1
+            term *= x / ap
+            total += term
+            if abs(term) < abs(total) * 1e-15:
+                break
+        return max(0.0, 1.0 - total * math.exp(-x + a * math.log(x) - gln))
+    # Continued fraction (modified Lentz).
+    tiny = 1e-300
+    b = x + 1 - a
+    c = 1 / tiny
+    d = 1 / b
+    h = d
+    for i in range(1, 500):
+        an = -i * (i - a)
+        b += 2
+        d = an * d + b
+        d = tiny if abs(d) < tiny else d
+        c = b + an / c
+        c = tiny if abs(c) < tiny else c
+        d = 1 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1) < 1e-15:
+            break
+    return math.exp(-x + a * math.log(x) - gln) * h
+
+
+def chi_square(legacy: Counter, new: Counter) -> dict:
+    """Chi-square test of homogeneity on two category counts."""
+    cats = [c for c in set(legacy) | set(new) if legacy[c] + new[c] > 0]
+    n1, n2 = sum(legacy[c] for c in cats), sum(new[c] for c in cats)
+    if len(cats) < 2 or not n1 or not n2:
+        return {"statistic": 0.0, "df": 0, "p": 1.0}
+    total = n1 + n2
+    stat = 0.0
+    for c in cats:
+        col = legacy[c] + new[c]
+        for observed, n in ((legacy[c], n1), (new[c], n2)):
+            expected = n * col / total
+            stat += (observed - expected) ** 2 / expected
+    df = len(cats) - 1
+    return {"statistic": stat, "df": df, "p": _gamma_q(df / 2, stat / 2)}
+
+
+def _kolmogorov_q(lam: float) -> float:
+    if lam < 1e-3:
+        return 1.0
+    total, sign = 0.0, 1.0
+    for j in range(1, 101):
+        term = sign * math.exp(-2 * j * j * lam * lam)
+        total += term
+        if abs(term) < 1e-12:
+            break
+        sign = -sign
+    return max(0.0, min(1.0, 2 * total))
+
+
+def ks_2samp(a: list[float], b: list[float]) -> dict:
+    """Two-sample Kolmogorov–Smirnov test (asymptotic p-value)."""
+    if not a or not b:
+        return {"statistic": 0.0, "p": 1.0}
+    a, b = sorted(a), sorted(b)
+    n, m = len(a), len(b)
+    i = j = 0
+    d = 0.0
+    while i < n and j < m:
+        x = min(a[i], b[j])
+        while i < n and a[i] == x:
+            i += 1
+        while j < m and b[j] == x:
+            j += 1
+        d = max(d, abs(i / n - j / m))
+    en = math.sqrt(n * m / (n + m))
+    return {"statistic": d, "p": _kolmogorov_q((en + 0.12 + 0.11 / en) * d)}
+
+
+# ── Runner ───────────────────────────────────────────────────────────────────
+def http_simulators(legacy_base: str, new_base: str) -> tuple[Simulator, Simulator]:
+    """Thread-safe simulators: one legacy/new client pair per worker thread."""
+    from conftest import LegacyClient, NewClient
+
+    local = threading.local()
+
+    def clients():
+        if not hasattr(local, "legacy"):
+            local.legacy, local.new = LegacyClient(legacy_base), NewClient(new_base)
+        return local.legacy, local.new
+
+    def legacy(scenario):
+        r = clients()[0].call("Global/BattleSimulate", legacy_request(scenario))
+        return r.json() if r.status_code == 200 else None
+
+    def new(scenario):
+        r = clients()[1].post("/api/battle/simulate", new_request(scenario))
+        return r.json() if r.status_code == 200 else None
+
+    return legacy, new
+
+
+class BattleFuzzer:
+    """Run scenarios through both simulators in batches and compare outcomes."""
+
+    def __init__(self, simulate_legacy: Simulator, simulate_new: Simulator, *,
+                 workers: int = 16, batch_size: int = 256):
+        self.simulators = {"legacy": simulate_legacy, "new": simulate_new}
+        self.workers = workers
+        self.batch_size = batch_size
+
+    def _run_one(self, side: str, scenario: dict) -> dict | None:
+        try:
+            data = self.simulators[side](scenario)
+        except Exception:
+            return None
+        return outcome(scenario, data) if data is not None else None
+
+    def run(self, scenarios: list[dict], *, alpha: float = 0.01) -> dict:
+        start = time.monotonic()
+        results: dict[str, list[tuple[dict, dict]]] = {"legacy": [], "new": []}
+        errors = Counter()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="battle") as pool:
+            for lo in range(0, len(scenarios), self.batch_size):
+                batch = scenarios[lo:lo + self.batch_size]
+                futures = [
+                    (side, s, pool.submit(self._run_one, side, s))
+                    for s in batch for side in self.simulators
+                ]
+                for side, s, f in futures:
+                    out = f.result()
+                    if out is None:
+                        errors[side] += 1
+                    else:
+                        results[side].append((s, out))
+        report = summarize(results, alpha=alpha)
+        report["scenarios"] = len(scenarios)
+        report["errors"] = dict(errors)
+        report["seconds"] = round(time.monotonic() - start, 3)
+        return report
+
+
+def _overall(outs: list[dict]) -> dict:
+    n = len(outs)
+    if not n:
+        return {"n": 0}
+    winners = Counter(o["winner"] for o in outs)
+    summary = {"n": n, **{f"{w}_rate": winners[w] / n for w in OUTCOMES}}
+    for k in DISTRIBUTIONS:
+        summary[f"{k}_mean"] = sum(o[k] for o in outs) / n
+    return summary
+
+
+def summarize(results: dict[str, list[tuple[dict, dict]]], *, alpha: float = 0.01) -> dict:
+    """Per-side outcome summary plus per-bucket divergence tests."""
+    buckets: dict[str, dict[str, list[dict]]] = defaultdict(lambda: {"legacy": [], "new": []})
+    for side, pairs in results.items():
+        for scenario, out in pairs:
+            buckets[power_bucket(scenario)][side].append(out)
+
+    tested = {}
+    for key in sorted(buckets, key=float):
+        legacy, new = buckets[key]["legacy"], buckets[key]["new"]
+        entry = {"n": {"legacy": len(legacy), "new": len(new)}}
+        if min(len(legacy), len(new)) >= MIN_BUCKET_SAMPLES:
+            entry["tests"] = {
+                "winner": chi_square(Counter(o["winner"] for o in legacy),
+                                     Counter(o["winner"] for o in new)),
+                **{k: ks_2samp([o[k] for o in legacy], [o[k] for o in new]) for k in DISTRIBUTIONS},
+            }
+        tested[key] = entry
+
+    n_tests = sum(len(b.get("tests", {})) for b in tested.values())
+    threshold = alpha / n_tests if n_tests else alpha
+    flagged = [
+        {"bucket": key, "metric": metric, **test}
+        for key, b in tested.items()
+        for metric, test in b.get("tests", {}).items()
+        if test["p"] < threshold
+    ]
+    return {
+        "overall": {side: _overall([o for _, o in pairs]) for side, pairs in results.items()},
+        "buckets": tested,
+        "alpha": alpha,
+        "threshold": threshold,
+        "tests": n_tests,
+        "flagged": flagged,
+        "diverged": bool(flagged),
+    }
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--count", type=int, default=2000)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--workers", type=int, default=16)
+    ap.add_argument("--batch", type=int, default=256)
+    ap.add_argument("--alpha", type=float, default=0.01)
+    ap.add_argument("--out", default=None, help="write the JSON report here")
+    args = ap.parse_args(argv)
+
+    from conftest import LEGACY_BASE, NEW_BASE
+
+    fuzzer = BattleFuzzer(*http_simulators(LEGACY_BASE, NEW_BASE),
+                          workers=args.workers, batch_size=args.batch)
+    report = fuzzer.run(generate_scenarios(args.count, seed=args.seed), alpha=args.alpha)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    for flag in report["flagged"]:
+        print(f"DIVERGED bucket {flag['bucket']} {flag['metric']}: p={flag['p']:.2e}", file=sys.stderr)
+    return 1 if report["diverged"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
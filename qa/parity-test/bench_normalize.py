@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: fused ``normalize_payload`` vs the multi-pass pipeline.
+
+Builds a legacy-style cached-map payload (Korean keys, PHP string numbers)
+from ``data/maps/che.json`` scaled up by ``--scale``, then times the old
+``normalize_keys → coerce_types → structural_shape`` sequence against one
+``normalize_payload`` call.
+
+    python bench_normalize.py --scale 40 --repeat 5
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import timeit
+
+from comparison import (
+    FIELD_MAP_EN_KR,
+    FIELD_MAP_KR_EN,
+    normalize_keys,
+    normalize_payload,
+    structural_shape,
+)
+
+MAP_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "..", "..", "backend", "shared", "src", "main", "resources", "data", "maps", "che.json",
+)
+
+
+def _regex_coerce_types(obj):
+    """The pre-fusion ``coerce_types`` (two uncompiled regex calls per string)."""
+    if isinstance(obj, str):
+        if re.fullmatch(r"-?\d+", obj):
+            return int(obj)
+        if re.fullmatch(r"-?\d+\.\d+", obj):
+            return float(obj)
+        if obj.lower() in ("true", "false"):
+            return obj.lower() == "true"
+        return obj
+    if isinstance(obj, dict):
+        return {k: _regex_coerce_types(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_regex_coerce_types(item) for item in obj]
+    return obj
+
+
+def _load_cities() -> list[dict]:
+    try:
+        with open(MAP_PATH, encoding="utf-8") as f:
+            return json.load(f)["cities"]
+    except FileNotFoundError:
+        return [
+            {"id": i, "name": f"city{i}", "level": 1 + i % 8, "region": 1 + i % 8,
+             "population": 100000 + i, "agriculture": 5000, "commerce": 5000,
+             "security": 5000, "defence": 5000, "wall": 5000, "x": i, "y": i,
+             "connections": [i + 1]}
+            for i in range(1, 95)
+        ]
+
+
+def build_legacy_map(scale: int, seed: int = 7) -> dict:
+    """Legacy-shaped map payload: Korean keys, numbers as strings."""
+    rnd = random.Random(seed)
+    cities = _load_cities()
+    kr = FIELD_MAP_EN_KR
+    city_rows = []
+    general_rows = []
+    for copy in range(scale):
+        for c in cities:
+            cid = copy * 1000 + c["id"]
+            city_rows.append({
+                kr["cityId"]: str(cid),
+                kr["cityName"]: c["name"],
+                "level": str(c["level"]),
+                "region": str(c["region"]),
+                kr["nationId"]: str(rnd.randint(0, 12)),
+                kr["population"]: str(c["population"]),
+                kr["trust"]: f"{rnd.uniform(40, 100):.1f}",
+                kr["agriculture"]: str(c["agriculture"]),
+                kr["commerce"]: str(c["commerce"]),
+                kr["security"]: str(c["security"]),
+                kr["defence"]: str(c["defence"]),
+                kr["wall"]: str(c["wall"]),
+                "x": str(c["x"]), "y": str(c["y"]),
+                "supply": rnd.choice(["true", "false"]),
+                "connections": [str(n) for n in c["connections"]],
+            })
+            for g in range(3):
+                general_rows.append({
+                    kr["generalId"]: str(cid * 10 + g),
+                    kr["name"]: f"장수{cid}_{g}",
+                    kr["cityId"]: str(cid),
+                    kr["leadership"]: str(rnd.randint(10, 100)),
+                    kr["strength"]: str(rnd.randint(10, 100)),
+                    kr["intelligence"]: str(rnd.randint(10, 100)),
+                    kr["crew"]: str(rnd.randint(0, 10000)),
+                    kr["gold"]: str(rnd.randint(0, 10000)),
+                    kr["rice"]: str(rnd.randint(0, 10000)),
+                })
+    return {
+        "result": "true",
+        kr["year"]: "190", kr["month"]: "1",
+        "cityList": city_rows,
+        "generalList": general_rows,
+    }
+
+
+def multi_pass(payload):
+    data = _regex_coerce_types(normalize_keys(payload, FIELD_MAP_KR_EN))
+    return data, structural_shape(data)
+
+
+def fused(payload):
+    return normalize_payload(payload, FIELD_MAP_KR_EN)
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--scale", type=int, default=40, help="copies of the che map (default 40)")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args(argv)
+
+    payload = build_legacy_map(args.scale)
+    leaves = len(payload["cityList"]) * 20 + len(payload["generalList"]) * 9
+    print(f"payload: {len(payload['cityList'])} cities, "
+          f"{len(payload['generalList'])} generals (~{leaves} leaves)")
+
+    if multi_pass(payload) != fused(payload):
+        print("MISMATCH: fused output differs from the multi-pass pipeline", file=sys.stderr)
+        return 1
+
+    old = min(timeit.repeat(lambda: multi_pass(payload), number=1, repeat=args.repeat))
+    new = min(timeit.repeat(lambda: fused(payload), number=1, repeat=args.repeat))
+    print(f"multi-pass : {old * 1000:8.1f} ms")
+    print(f"fused      : {new * 1000:8.1f} ms")
+    print(f"speedup    : {old / new:8.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
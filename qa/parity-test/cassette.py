@@ -0,0 +1,210 @@
+"""
+Record / replay of parity HTTP traffic.
+
+A cassette is a directory of gzip'd JSON-lines files, one per stack and xdist
+worker (``legacy-gw0.jsonl.gz`` …).  Each line is one exchange:
+
+    {"key": <sha1 of stack+method+path+body>, "status": 200,
+     "headers": {...}, "body": "<text>" | "b64": "<base64>"}
+
+Run-specific strings in request bodies (the ``parity_<run>`` account names)
+are replaced by fixed placeholders before hashing, so a recording replays
+under any run id and worker count.
+
+Requests are addressed by content, not by order, so a replay run may execute
+a different subset of tests than the recording did.  When the same request was
+recorded several times (e.g. fetching the command table before and after a
+reservation) replay serves the recorded responses in order and then keeps
+returning the last one.
+
+Modes (``PARITY_CASSETTE_MODE``):
+  - ``off``     (default) plain network traffic
+  - ``record``  hit the real stacks and write every exchange to the cassette
+  - ``replay``  never touch the network; unknown requests raise CassetteMiss
+"""
+from __future__ import annotations
+
+import base64
+import glob
+import gzip
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+MODES = ("off", "record", "replay")
+
+# Only headers that influence how a test reads the body are kept.
+_KEPT_HEADERS = ("Content-Type", "Content-Encoding")
+
+
+class CassetteMiss(requests.ConnectionError):
+    """Replay mode received a request that was never recorded."""
+
+
+def request_key(
+    stack: str, method: str, url: str, body: bytes | str | None,
+    volatile: dict[str, str] | None = None,
+) -> str:
+    """Content address of a request.
+
+    Scheme and host are dropped so a cassette recorded inside the compose
+    network replays against any base URL; auth headers are ignored because
+    tokens differ between runs.  Each ``volatile`` key found in the body is
+    replaced by its placeholder first (longest key first).
+    """
+    parts = urlsplit(url)
+    target = parts.path + (f"?{parts.query}" if parts.query else "")
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    if body and volatile:
+        for value in sorted(volatile, key=len, reverse=True):
+            body = body.replace(value.encode("utf-8"), volatile[value].encode("utf-8"))
+    h = hashlib.sha1()
+    for chunk in (stack.encode(), method.upper().encode(), target.encode(), body or b""):
+        h.update(chunk)
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class Cassette:
+    """Thread-safe store of recorded exchanges for one run."""
+
+    def __init__(
+        self, directory: str, mode: str, worker: str = "master",
+        volatile: dict[str, str] | None = None,
+    ):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode {mode!r}; expected one of {MODES}")
+        self.directory = directory
+        self.mode = mode
+        self.worker = worker
+        self.volatile = dict(volatile or {})
+        self._lock = threading.Lock()
+        self._entries: dict[str, list[dict]] = defaultdict(list)
+        self._served: dict[str, int] = defaultdict(int)
+        self._files: dict[str, gzip.GzipFile] = {}
+        if mode == "replay":
+            self._load()
+        elif mode == "record":
+            os.makedirs(directory, exist_ok=True)
+
+    # ── replay ───────────────────────────────────────────────────────────────
+    def _load(self):
+        paths = sorted(glob.glob(os.path.join(self.directory, "*.jsonl.gz")))
+        if not paths:
+            raise FileNotFoundError(f"No cassette files in {self.directory}")
+        for path in paths:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self._entries[entry["key"]].append(entry)
+
+    def lookup(self, key: str) -> dict | None:
+        with self._lock:
+            recorded = self._entries.get(key)
+            if not recorded:
+                return None
+            idx = min(self._served[key], len(recorded) - 1)
+            self._served[key] += 1
+            return recorded[idx]
+
+    # ── record ───────────────────────────────────────────────────────────────
+    def record(self, stack: str, key: str, response: requests.Response):
+        entry = {
+            "key": key,
+            "method": response.request.method,
+            "url": response.request.path_url,
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": {h: response.headers[h] for h in _KEPT_HEADERS if h in response.headers},
+        }
+        content = response.content
+        try:
+            entry["body"] = content.decode("utf-8")
+        except UnicodeDecodeError:
+            entry["b64"] = base64.b64encode(content).decode("ascii")
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._lock:
+            f = self._files.get(stack)
+            if f is None:
+                path = os.path.join(self.directory, f"{stack}-{self.worker}.jsonl.gz")
+                f = self._files[stack] = gzip.open(path, "wt", encoding="utf-8")
+            f.write(line)
+            self._entries[key].append(entry)
+
+    def close(self):
+        with self._lock:
+            for f in self._files.values():
+                f.close()
+            self._files.clear()
+
+
+def build_response(entry: dict, request: requests.PreparedRequest) -> requests.Response:
+    """Materialise a recorded entry as a ``requests.Response``."""
+    resp = requests.Response()
+    resp.status_code = entry["status"]
+    resp.reason = entry.get("reason") or ""
+    resp.headers = CaseInsensitiveDict(entry.get("headers") or {})
+    if "b64" in entry:
+        resp._content = base64.b64decode(entry["b64"])
+    else:
+        resp._content = entry.get("body", "").encode("utf-8")
+    # The body is already in memory: ``stream=True`` callers iterate over it
+    # and ``close()`` has no connection to release.
+    resp._content_consumed = True
+    resp.raw = io.BytesIO(resp._content)
+    resp.encoding = get_encoding_from_headers(resp.headers) or "utf-8"
+    resp.url = request.url
+    resp.request = request
+    return resp
+
+
+class CassetteAdapter(HTTPAdapter):
+    """Transport adapter that records to / replays from a Cassette."""
+
+    def __init__(self, cassette: Cassette, stack: str):
+        super().__init__()
+        self.cassette = cassette
+        self.stack = stack
+
+    def send(self, request, **kwargs):
+        key = request_key(self.stack, request.method, request.url, request.body, self.cassette.volatile)
+        if self.cassette.mode == "replay":
+            entry = self.cassette.lookup(key)
+            if entry is None:
+                raise CassetteMiss(
+                    f"{self.stack} {request.method} {request.path_url} not in cassette "
+                    f"{self.cassette.directory}",
+                    request=request,
+                )
+            return build_response(entry, request)
+
+        response = super().send(request, **kwargs)
+        if self.cassette.mode == "record":
+            self.cassette.record(self.stack, key, response)
+        return response
+
+
+def install(session: requests.Session, cassette: Cassette | None, stack: str):
+    """Mount the cassette adapter on ``session`` (no-op when mode is off)."""
+    if cassette is None or cassette.mode == "off":
+        return
+    adapter = CassetteAdapter(cassette, stack)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+
+def clear(directory: str):
+    """Remove cassette files so a new recording starts from nothing."""
+    for path in glob.glob(os.path.join(directory, "*.jsonl.gz")):
+        os.remove(path)
@@ -0,0 +1,345 @@
+"""
+Columnar cached-map parity — city ownership and stats as aligned per-column
+arrays indexed by map city ID.
+
+Each source (a ``Global/GetCachedMap`` or ``/api/public/cached-map`` payload,
+a ``city`` table, the ``data/maps/<code>.json`` reference) becomes a
+``MapFrame``: one sorted ``array('q')`` of city IDs and one ``array('d')`` per
+column, NaN where the source does not carry the value.  Two frames are
+aligned once by a merge of their ID arrays, every column is gathered into
+that order, and each column is then compared in a single pass with its own
+tolerance — no per-city dict walking, so a few thousand cities take a few
+milliseconds.
+
+Rows are keyed by the map's city ID: when a reference map is given, a row's
+city *name* is resolved through it (the new stack's ``city.id`` is a
+per-world serial, not the map ID).  Nation names are interned into a shared
+``Interner`` so ownership compares as numbers too.
+
+    ref = load_reference("che")
+    legacy = payload_frame(lr.json(), ref)
+    new = payload_frame(nr.json(), ref)
+    report = compare_frames(legacy, new, tolerances={"population": 100})
+    report["columns"]["nationName"]  # → {"compared", "mismatched", "sample", ...}
+"""
+from __future__ import annotations
+
+import json
+import math
+import os
+from array import array
+from dataclasses import dataclass, field
+from typing import Any
+
+from comparison import FIELD_MAP_KR_EN, normalize_payload
+from schema import api_field
+
+MAP_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "..", "..", "backend", "shared", "src", "main", "resources", "data", "maps",
+)
+NAN = math.nan
+NEUTRAL = "중립"
+SAMPLE_LIMIT = 5
+
+NUMERIC_COLUMNS = (
+    "nationId", "level", "region", "population", "agriculture", "commerce",
+    "security", "defence", "wall", "x", "y",
+)
+# Interned strings: compared for equality only.
+CATEGORICAL_COLUMNS = ("nationName",)
+COLUMNS = NUMERIC_COLUMNS + CATEGORICAL_COLUMNS
+# Map geometry and layout never change during a game.
+STATIC_COLUMNS = ("level", "region", "x", "y")
+
+# Positional ``cityList`` / ``nationList`` rows of the legacy map API
+# (sammo ``GetMap``): [city, level, state, nation, region, supply] and
+# [nation, name, color, capital].
+LEGACY_CITY_ROW = ("cityId", "level", "state", "nationId", "region", "supply")
+LEGACY_NATION_ROW = ("nationId", "nationName", "color", "capital")
+
+# Payload keys that mean the same column.
+_ALIASES = {
+    "id": "cityId", "city": "cityId", "name": "cityName", "nation": "nationId",
+    "pop": "population", "agri": "agriculture", "comm": "commerce", "secu": "security",
+    "def": "defence",
+}
+
+
+class Interner:
+    """String ↔ float code, shared by every frame that is compared together."""
+
+    def __init__(self):
+        self.codes: dict[str, float] = {}
+        self.strings: list[str] = []
+
+    def code(self, value: str | None) -> float:
+        if value is None:
+            return NAN
+        c = self.codes.get(value)
+        if c is None:
+            c = self.codes[value] = float(len(self.strings))
+            self.strings.append(value)
+        return c
+
+    def string(self, code: float) -> str | None:
+        return None if math.isnan(code) else self.strings[int(code)]
+
+
+NAMES = Interner()
+
+
+@dataclass
+class MapFrame:
+    """City IDs (ascending) and one NaN-padded float column per field."""
+
+    ids: array
+    columns: dict[str, array]
+    names: dict[int, str] = field(default_factory=dict)
+    interner: Interner = NAMES
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def present(self) -> set[str]:
+        """Columns with at least one value."""
+        return {c for c, col in self.columns.items() if any(v == v for v in col)}
+
+    def join(self, other: "MapFrame") -> "MapFrame":
+        """This frame's cities with ``other``'s columns filled in where this one has NaN."""
+        index = {cid: i for i, cid in enumerate(other.ids)}
+        pos = [index.get(cid) for cid in self.ids]
+        columns = {}
+        for name in COLUMNS:
+            mine, theirs = self.columns[name], other.columns[name]
+            columns[name] = array("d", (
+                v if v == v or p is None else theirs[p] for v, p in zip(mine, pos)
+            ))
+        return MapFrame(self.ids, columns, self.names, self.interner)
+
+
+def _frame(rows: dict[int, dict[str, Any]], names: dict[int, str], interner: Interner) -> MapFrame:
+    ids = array("q", sorted(rows))
+    columns = {}
+    for name in NUMERIC_COLUMNS:
+        columns[name] = array("d", (_number(rows[cid].get(name)) for cid in ids))
+    for name in CATEGORICAL_COLUMNS:
+        columns[name] = array("d", (interner.code(rows[cid].get(name)) for cid in ids))
+    return MapFrame(ids, columns, names, interner)
+
+
+def _number(value: Any) -> float:
+    if value is None or isinstance(value, bool):
+        return NAN
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return NAN
+
+
+# ── Sources ──────────────────────────────────────────────────────────────────
+def load_reference(map_code: str = "che", map_dir: str = MAP_DIR, *,
+                   data: dict | None = None, interner: Interner = NAMES) -> MapFrame:
+    """Frame of ``data/maps/<map_code>.json`` (or an already-loaded ``data``)."""
+    if data is None:
+        with open(os.path.join(map_dir, f"{map_code}.json"), encoding="utf-8") as f:
+            data = json.load(f)
+    rows, names = {}, {}
+    for c in data["cities"]:
+        rows[int(c["id"])] = c
+        names[int(c["id"])] = c["name"]
+    return _frame(rows, names, interner)
+
+
+def reference_for(map_code: str, fetch=None, map_dir: str = MAP_DIR,
+                  interner: Interner = NAMES) -> MapFrame | None:
+    """Reference frame from ``map_dir``, else from ``fetch(map_code)`` (e.g. the
+    new stack's ``/api/maps/{code}``; the runner image has no backend tree)."""
+    try:
+        return load_reference(map_code, map_dir, interner=interner)
+    except FileNotFoundError:
+        if fetch is None:
+            return None
+    try:
+        data = fetch(map_code)
+    except Exception:
+        return None
+    if not isinstance(data, dict) or not data.get("cities"):
+        return None
+    return load_reference(data=data, interner=interner)
+
+
+def _find(payload: Any, *keys: str) -> Any:
+    """First of ``keys`` found at the top level or one wrapper (``data``/``result``) down."""
+    for scope in (payload, *(payload.get(k) for k in ("data", "result") if isinstance(payload, dict))):
+        if isinstance(scope, dict):
+            for k in keys:
+                if scope.get(k) is not None:
+                    return scope[k]
+    return None
+
+
+def _rows(items: list, layout: tuple[str, ...]) -> list[dict]:
+    out = []
+    for item in items or ():
+        if isinstance(item, (list, tuple)):
+            out.append(dict(zip(layout, item)))
+        elif isinstance(item, dict):
+            out.append({_ALIASES.get(k, k): v for k, v in item.items()})
+    return out
+
+
+def payload_frame(payload: Any, reference: MapFrame | None = None,
+                  interner: Interner | None = None) -> MapFrame:
+    """Frame of a cached-map payload from either stack.
+
+    Accepts object rows (``cities`` — the new stack, or Korean-keyed legacy
+    rows) and the legacy positional ``cityList`` / ``nationList`` rows.
+    Cities whose name the reference map does not know keep their own ID.
+    """
+    interner = interner or (reference.interner if reference is not None else NAMES)
+    data, _ = normalize_payload(payload, FIELD_MAP_KR_EN, with_shape=False)
+    cities = _rows(_find(data, "cities", "cityList"), LEGACY_CITY_ROW)
+    nations = {
+        int(n["nationId"]): n.get("nationName")
+        for n in _rows(_find(data, "nations", "nationList"), LEGACY_NATION_ROW)
+        if _number(n.get("nationId")) == _number(n.get("nationId"))
+    }
+    by_name = {name: cid for cid, name in reference.names.items()} if reference is not None else {}
+    rows, names = {}, {}
+    for c in cities:
+        name = c.get("cityName")
+        cid = by_name.get(name)
+        if cid is None:
+            raw = _number(c.get("cityId"))
+            if raw != raw:
+                continue
+            cid = int(raw)
+        if c.get("nationName") is None and "nationId" in c:
+            nid = _number(c["nationId"])
+            if nid == 0:
+                c["nationName"] = NEUTRAL
+            elif nid == nid and int(nid) in nations:
+                c["nationName"] = nations[int(nid)]
+        rows[cid] = c
+        if name is not None:
+            names[cid] = name
+    return _frame(rows, names, interner)
+
+
+def db_frame(rows: dict[int, tuple], columns: list[str], *, new_table: str = "city",
+             reference: MapFrame | None = None, interner: Interner = NAMES) -> MapFrame:
+    """Frame of ``snapshot.read_table`` output (new-stack column names).
+
+    New-stack IDs are per-world serials; when ``name`` is among the columns
+    and a reference is given, rows are keyed by the map ID of their name.
+    """
+    fields = [api_field(new_table, c) for c in columns]
+    name_at = columns.index("name") if "name" in columns else None
+    by_name = {name: cid for cid, name in reference.names.items()} if reference is not None else {}
+    out, names = {}, {}
+    for rid, values in rows.items():
+        name = values[name_at] if name_at is not None else None
+        cid = by_name.get(name, rid)
+        out[cid] = dict(zip(fields, values))
+        if name is not None:
+            names[cid] = name
+    return _frame(out, names, interner)
+
+
+# ── Comparison ───────────────────────────────────────────────────────────────
+def _align(a: array, b: array) -> tuple[list[int], list[int], list[int], list[int], list[int]]:
+    """Merge two ascending ID arrays → (ids, idx_a, idx_b, only_a, only_b)."""
+    ids, ia, ib, only_a, only_b = [], [], [], [], []
+    i = j = 0
+    na, nb = len(a), len(b)
+    while i < na and j < nb:
+        x, y = a[i], b[j]
+        if x == y:
+            ids.append(x)
+            ia.append(i)
+            ib.append(j)
+            i += 1
+            j += 1
+        elif x < y:
+            only_a.append(x)
+            i += 1
+        else:
+            only_b.append(y)
+            j += 1
+    only_a.extend(a[i:])
+    only_b.extend(b[j:])
+    return ids, ia, ib, only_a, only_b
+
+
+def compare_frames(
+    a: MapFrame,
+    b: MapFrame,
+    *,
+    columns: tuple[str, ...] | None = None,
+    tolerances: dict[str, float] | None = None,
+    sample_limit: int = SAMPLE_LIMIT,
+) -> dict:
+    """Per-column drift between two frames over their common cities.
+
+    Only columns present in both frames are compared (others are listed
+    under ``skipped_columns``).  A city with a value on one side only counts
+    as ``missing``, not as a mismatch.  Returns::
+
+        {"cities": {"left", "right", "matched", "left_only", "right_only"},
+         "columns": {col: {"compared", "mismatched", "missing", "tolerance",
+                           "max_abs_diff", "mean_abs_diff", "sample"}},
+         "skipped_columns": [...], "equal"}
+    """
+    tolerances = tolerances or {}
+    ids, ia, ib, only_a, only_b = _align(a.ids, b.ids)
+    wanted = columns or COLUMNS
+    both = a.present() & b.present()
+    report_cols = {}
+    for name in wanted:
+        if name not in both:
+            continue
+        ca, cb = a.columns[name], b.columns[name]
+        va = array("d", (ca[i] for i in ia))
+        vb = array("d", (cb[j] for j in ib))
+        categorical = name in CATEGORICAL_COLUMNS
+        tol = 0.0 if categorical else float(tolerances.get(name, 0.0))
+        # NaN != NaN: one comparison separates "both present" from the rest.
+        diffs = [abs(x - y) for x, y in zip(va, vb)]
+        present = [d == d for d in diffs]
+        missing = sum(1 for x, y, p in zip(va, vb, present) if not p and (x == x or y == y))
+        bad = [k for k, d in enumerate(diffs) if d == d and d > tol]
+        compared = sum(present)
+        stats = {
+            "compared": compared,
+            "mismatched": len(bad),
+            "missing": missing,
+            "tolerance": tol,
+            "sample": [
+                {"cityId": ids[k], "name": a.names.get(ids[k]) or b.names.get(ids[k]),
+                 "left": _decode(a, name, va[k]), "right": _decode(b, name, vb[k])}
+                for k in bad[:sample_limit]
+            ],
+        }
+        if not categorical:
+            real = [d for d in diffs if d == d]
+            stats["max_abs_diff"] = max(real, default=0.0)
+            stats["mean_abs_diff"] = sum(real) / len(real) if real else 0.0
+        report_cols[name] = stats
+    return {
+        "cities": {
+            "left": len(a), "right": len(b), "matched": len(ids),
+            "left_only": only_a[:sample_limit * 4], "right_only": only_b[:sample_limit * 4],
+        },
+        "columns": report_cols,
+        "skipped_columns": [c for c in wanted if c not in both],
+        "equal": not only_a and not only_b and all(c["mismatched"] == 0 for c in report_cols.values()),
+    }
+
+
+def _decode(frame: MapFrame, column: str, value: float) -> Any:
+    if value != value:
+        return None
+    if column in CATEGORICAL_COLUMNS:
+        return frame.interner.string(value)
+    return int(value) if value.is_integer() else value
@@ -0,0 +1,36 @@
+"""
+Game commands exercised by the parity suites.
+
+``COMMAND_MAP`` pairs each legacy command code with its reservation endpoint on
+both stacks; test_03 reserves every entry, ``npc_decisions`` buckets NPC
+choices by its keys and ``loadgen`` draws its command mix from it.
+
+    cmd = COMMAND_MAP["che_징병"]
+    new.post(cmd["new_path"].format(gid=1), {"action": cmd["new_action"], "turnIndex": 0})
+"""
+from __future__ import annotations
+
+# legacy Korean command code → both stacks' reservation endpoints
+COMMAND_MAP = {
+    # Domestic commands (내정)
+    "che_정비훈련": {"legacy_path": "Command/ReserveCommand", "legacy_code": "che_정비훈련",
+                    "new_path": "/api/generals/{gid}/commands", "new_action": "TRAIN"},
+    "che_정비사기": {"legacy_path": "Command/ReserveCommand", "legacy_code": "che_정비사기",
+                    "new_path": "/api/generals/{gid}/commands", "new_action": "BOOST_MORALE"},
+    "che_징병":    {"legacy_path": "Command/ReserveCommand", "legacy_code": "che_징병",
+                    "new_path": "/api/generals/{gid}/commands", "new_action": "RECRUIT"},
+    # Domestic development
+    "che_상업투자": {"legacy_path": "Command/ReserveCommand", "legacy_code": "che_상업투자",
+                    "new_path": "/api/generals/{gid}/commands", "new_action": "DEVELOP_COMMERCE"},
+    "che_농업투자": {"legacy_path": "Command/ReserveCommand", "legacy_code": "che_농업투자",
+                    "new_path": "/api/generals/{gid}/commands", "new_action": "DEVELOP_AGRICULTURE"},
+    "che_치안강화": {"legacy_path": "Command/ReserveCommand", "legacy_code": "che_치안강화",
+                    "new_path": "/api/generals/{gid}/commands", "new_action": "IMPROVE_SECURITY"},
+    "che_수비강화": {"legacy_path": "Command/ReserveCommand", "legacy_code": "che_수비강화",
+                    "new_path": "/api/generals/{gid}/commands", "new_action": "IMPROVE_DEFENCE"},
+    "che_성벽보수": {"legacy_path": "Command/ReserveCommand", "legacy_code": "che_성벽보수",
+                    "new_path": "/api/generals/{gid}/commands", "new_action": "REPAIR_WALL"},
+    # War
+    "che_출병":    {"legacy_path": "Command/ReserveCommand", "legacy_code": "che_출병",
+                    "new_path": "/api/generals/{gid}/commands", "new_action": "MARCH"},
+}
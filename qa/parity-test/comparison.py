@@ -8,10 +8,16 @@ Handles the known differences between legacy (PHP/MariaDB) and new (Kotlin/Postg
 """
 from __future__ import annotations
 
+import json
+import os
 import re
+from collections import Counter
 from typing import Any
 from deepdiff import DeepDiff
 
+import profiling
+from shapes import SHAPES, diff_shapes, shape_signature
+
 
 # ── Korean ↔ English field mapping ───────────────────────────────────────────
 FIELD_MAP_KR_EN = {
@@ -74,37 +80,83 @@ RNG_DEPENDENT_FIELDS = {
     "trust", "민심",
 }
 
+# Shared hidden seed for both stacks (see lite_drbg.py).  When set, both
+# engines draw the same SHA-512 stream and RNG-dependent fields are compared
+# exactly instead of being ignored.
+RNG_SEED = os.environ.get("PARITY_RNG_SEED") or None
+RNG_IGNORE_FIELDS = frozenset() if RNG_SEED else frozenset(RNG_DEPENDENT_FIELDS)
+
+# Identity keys used to pair list elements regardless of order, most specific
+# first (a general row also carries nationId/cityId).
+LIST_MATCH_KEYS = (
+    FIELD_MAP_KR_EN["장수번호"],  # generalId
+    FIELD_MAP_KR_EN["도시번호"],  # cityId
+    FIELD_MAP_KR_EN["국번"],      # nationId
+    "id",
+)
+
+# "native" (default), "deepdiff", or "crosscheck" (run both, report agreement)
+DIFF_ENGINE = os.environ.get("PARITY_DIFF_ENGINE", "native")
+
 
 def normalize_keys(obj: Any, mapping: dict[str, str] | None = None) -> Any:
     """Recursively rename keys using a mapping dict."""
     if mapping is None:
         mapping = FIELD_MAP_KR_EN
+    with profiling.span("normalize"):
+        return _rename_keys(obj, mapping)
+
+
+def _rename_keys(obj: Any, mapping: dict[str, str]) -> Any:
     if isinstance(obj, dict):
-        return {mapping.get(k, k): normalize_keys(v, mapping) for k, v in obj.items()}
+        return {mapping.get(k, k): _rename_keys(v, mapping) for k, v in obj.items()}
     if isinstance(obj, list):
-        return [normalize_keys(item, mapping) for item in obj]
+        return [_rename_keys(item, mapping) for item in obj]
     return obj
 
 
+def _coerce_scalar(value: str) -> Any:
+    """Coerce one PHP string leaf: ``-?\\d+`` → int, ``-?\\d+\\.\\d+`` → float, true/false → bool.
+
+    Uses ``str.isdecimal`` (the same Unicode ``Nd`` class as regex ``\\d``)
+    instead of per-leaf regex matching.
+    """
+    digits = value[1:] if value[:1] == "-" else value
+    if digits.isdecimal():
+        return int(value)
+    whole, dot, frac = digits.partition(".")
+    if dot and whole.isdecimal() and frac.isdecimal():
+        return float(value)
+    lowered = value.lower()
+    if lowered == "true":
+        return True
+    if lowered == "false":
+        return False
+    return value
+
+
 def coerce_types(obj: Any) -> Any:
     """PHP returns many numbers as strings; coerce to match Kotlin types."""
+    with profiling.span("coerce"):
+        return _coerce(obj)
+
+
+def _coerce(obj: Any) -> Any:
     if isinstance(obj, str):
-        if re.fullmatch(r"-?\d+", obj):
-            return int(obj)
-        if re.fullmatch(r"-?\d+\.\d+", obj):
-            return float(obj)
-        if obj.lower() in ("true", "false"):
-            return obj.lower() == "true"
-        return obj
+        return _coerce_scalar(obj)
     if isinstance(obj, dict):
-        return {k: coerce_types(v) for k, v in obj.items()}
+        return {k: _coerce(v) for k, v in obj.items()}
     if isinstance(obj, list):
-        return [coerce_types(item) for item in obj]
+        return [_coerce(item) for item in obj]
     return obj
 
 
 def structural_shape(obj: Any) -> Any:
-    """Replace leaf values with their type name — for structural comparison."""
+    """Replace leaf values with their type name, sampling ``obj[0]`` of lists.
+
+    Kept for readable dumps and the normalizer benchmark; parity checks
+    compare ``shapes.shape_signature`` instead, which covers every element.
+    """
     if isinstance(obj, dict):
         return {k: structural_shape(v) for k, v in sorted(obj.items())}
     if isinstance(obj, list):
@@ -114,6 +166,229 @@ def structural_shape(obj: Any) -> Any:
     return type(obj).__name__
 
 
+@profiling.timed("normalize")
+def normalize_payload(
+    obj: Any,
+    mapping: dict[str, str] | None = None,
+    *,
+    coerce: bool = True,
+    with_shape: bool = True,
+) -> tuple[Any, Any]:
+    """Fused ``normalize_keys`` + ``coerce_types`` + ``structural_shape``.
+
+    Walks the payload once with an explicit stack (no recursion limit) and
+    returns ``(normalized, shape)``.  ``mapping`` renames dict keys (``None``
+    leaves them as-is); the shape is identical to calling ``structural_shape``
+    on the normalized value, and is only built for the subtrees it samples.
+    With ``with_shape=False`` no shape is built and ``None`` is returned in
+    its place (``compare_responses`` uses ``shapes.shape_signature`` instead).
+    """
+    rename = mapping.get if mapping else None
+    scalar = _coerce_scalar if coerce else None
+
+    if isinstance(obj, dict):
+        root = ({}, {} if with_shape else None)
+    elif isinstance(obj, list):
+        root = ([None] * len(obj), [] if with_shape else None)
+    else:
+        value = scalar(obj) if scalar and type(obj) is str else obj
+        return value, type(value).__name__ if with_shape else None
+
+    # Frames: (source, output container, shape container or None)
+    stack = [(obj, root[0], root[1])]
+    push = stack.append
+    while stack:
+        src, out, shape = stack.pop()
+        if isinstance(src, dict):
+            pending = {}
+            for k, v in src.items():
+                if rename is not None:
+                    k = rename(k, k)
+                if isinstance(v, dict):
+                    made = ({}, {} if shape is not None else None)
+                elif isinstance(v, list):
+                    made = ([None] * len(v), [] if shape is not None else None)
+                else:
+                    out[k] = scalar(v) if scalar and type(v) is str else v
+                    if pending:
+                        pending.pop(k, None)
+                    continue
+                out[k] = made[0]
+                pending[k] = (v, made)
+            if shape is None:
+                for v, made in pending.values():
+                    push((v, made[0], None))
+                continue
+            for k in sorted(out):
+                child = pending.get(k)
+                if child is None:
+                    shape[k] = type(out[k]).__name__
+                else:
+                    v, made = child
+                    shape[k] = made[1]
+                    push((v, made[0], made[1]))
+        else:
+            first_shape = None
+            for i, v in enumerate(src):
+                if isinstance(v, dict):
+                    child = {}
+                elif isinstance(v, list):
+                    child = [None] * len(v)
+                else:
+                    out[i] = scalar(v) if scalar and type(v) is str else v
+                    continue
+                out[i] = child
+                if i == 0 and shape is not None:
+                    first_shape = {} if type(child) is dict else []
+                    push((v, child, first_shape))
+                else:
+                    push((v, child, None))
+            if shape is not None:
+                if not out:
+                    shape.append("<empty_list>")
+                    continue
+                if first_shape is None:
+                    first_shape = type(out[0]).__name__
+                shape.extend((first_shape, f"...({len(out)} items)"))
+    return root[0], root[1]
+
+
+def _path_item(path: str, key: Any) -> str:
+    return f"{path}[{key!r}]"
+
+
+def _match_key(left: list, right: list, match_keys: tuple[str, ...]) -> str | None:
+    """First identity key present, unique and hashable in every element of both lists."""
+    if not left or not right or type(left[0]) is not dict or type(right[0]) is not dict:
+        return None
+    for key in match_keys:
+        ok = True
+        for items in (left, right):
+            seen = set()
+            for item in items:
+                if type(item) is not dict or key not in item:
+                    ok = False
+                    break
+                ident = item[key]
+                if not isinstance(ident, (int, str)) or ident in seen:
+                    ok = False
+                    break
+                seen.add(ident)
+            if not ok:
+                break
+        if ok:
+            return key
+    return None
+
+
+def _fingerprint(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+
+
+@profiling.timed("diff")
+def diff_payloads(
+    legacy_data: Any,
+    new_data: Any,
+    *,
+    ignore_fields: set[str] | frozenset[str] = frozenset(),
+    significant_digits: int = 2,
+    match_keys: tuple[str, ...] = LIST_MATCH_KEYS,
+) -> dict:
+    """Order-insensitive diff of two normalized payloads.
+
+    Purpose-built replacement for ``DeepDiff(ignore_order=True,
+    significant_digits=…)``: lists of dicts are paired by the first of
+    ``match_keys`` that identifies every element, other lists fall back to
+    multiset matching.  Keys in ``ignore_fields`` are skipped at any depth by
+    name.  Returns DeepDiff-style categories (``values_changed``,
+    ``type_changes``, ``dictionary_item_added``/``removed``,
+    ``iterable_item_added``/``removed``); empty dict when equal.
+    """
+    result: dict[str, Any] = {}
+
+    def add(category: str, path: str, detail: Any = None):
+        if category.startswith("dictionary_item"):
+            result.setdefault(category, []).append(path)
+        else:
+            result.setdefault(category, {})[path] = detail
+
+    stack = [("root", legacy_data, new_data)]
+    while stack:
+        path, a, b = stack.pop()
+        ta, tb = type(a), type(b)
+        if ta is dict and tb is dict:
+            for k, av in a.items():
+                if k in ignore_fields:
+                    continue
+                if k in b:
+                    stack.append((_path_item(path, k), av, b[k]))
+                else:
+                    add("dictionary_item_removed", _path_item(path, k))
+            for k in b.keys() - a.keys():
+                if k not in ignore_fields:
+                    add("dictionary_item_added", _path_item(path, k))
+        elif ta is list and tb is list:
+            key = _match_key(a, b, match_keys)
+            if key is not None:
+                b_index = {item[key]: j for j, item in enumerate(b)}
+                matched = set()
+                for i, item in enumerate(a):
+                    j = b_index.get(item[key])
+                    if j is None:
+                        add("iterable_item_removed", f"{path}[{i}]", item)
+                    else:
+                        matched.add(j)
+                        stack.append((f"{path}[{i}]", item, b[j]))
+                for j, item in enumerate(b):
+                    if j not in matched:
+                        add("iterable_item_added", f"{path}[{j}]", item)
+            elif all(type(x) not in (dict, list) for x in a) and all(type(x) not in (dict, list) for x in b):
+                def bucket(x):
+                    return f"{x:.{significant_digits}f}" if type(x) is float else (type(x).__name__, x)
+                ca = Counter(bucket(x) for x in a)
+                cb = Counter(bucket(x) for x in b)
+                if ca != cb:
+                    extra_a, extra_b = ca - cb, cb - ca
+                    for i, x in enumerate(a):
+                        if extra_a.get(bucket(x), 0) > 0:
+                            extra_a[bucket(x)] -= 1
+                            add("iterable_item_removed", f"{path}[{i}]", x)
+                    for j, x in enumerate(b):
+                        if extra_b.get(bucket(x), 0) > 0:
+                            extra_b[bucket(x)] -= 1
+                            add("iterable_item_added", f"{path}[{j}]", x)
+            else:
+                # Pair identical elements first, then the leftovers in order.
+                pool: dict[str, list[int]] = {}
+                for j, item in enumerate(b):
+                    pool.setdefault(_fingerprint(item), []).append(j)
+                left_a = []
+                used = set()
+                for i, item in enumerate(a):
+                    js = pool.get(_fingerprint(item))
+                    if js:
+                        used.add(js.pop())
+                    else:
+                        left_a.append(i)
+                left_b = [j for j in range(len(b)) if j not in used]
+                for i, j in zip(left_a, left_b):
+                    stack.append((f"{path}[{i}]", a[i], b[j]))
+                for i in left_a[len(left_b):]:
+                    add("iterable_item_removed", f"{path}[{i}]", a[i])
+                for j in left_b[len(left_a):]:
+                    add("iterable_item_added", f"{path}[{j}]", b[j])
+        elif ta is not tb:
+            add("type_changes", path, {
+                "old_type": ta, "new_type": tb, "old_value": a, "new_value": b,
+            })
+        elif ta is float:
+            if f"{a:.{significant_digits}f}" != f"{b:.{significant_digits}f}":
+                add("values_changed", path, {"new_value": b, "old_value": a})
+        elif a != b:
+            add("values_changed", path, {"new_value": b, "old_value": a})
+    return result
+
+
 def compare_responses(
     legacy_data: Any,
     new_data: Any,
@@ -121,42 +396,81 @@ def compare_responses(
     structural_only: bool = False,
     ignore_fields: set[str] | None = None,
     normalize: bool = True,
+    engine: str | None = None,
 ) -> dict:
     """
     Compare legacy and new API responses.
 
+    ``engine`` selects the value diff: ``"native"`` (``diff_payloads``),
+    ``"deepdiff"``, or ``"crosscheck"`` which runs both, returns the DeepDiff
+    result and adds ``native_diff`` / ``engines_agree``.  Defaults to
+    ``PARITY_DIFF_ENGINE`` (``native``).
+
+    ``ignore_fields`` defaults to ``RNG_IGNORE_FIELDS``: RNG-dependent fields
+    are skipped unless both stacks share ``PARITY_RNG_SEED``.  Pass an empty
+    set to compare every field.
+
     Returns dict with:
       - equal: bool
-      - diff: DeepDiff result (if not equal)
-      - structural_match: bool  (shape comparison ignoring values)
+      - diff: diff categories (if not equal)
+      - structural_match: bool  (shape comparison ignoring values, see shapes.py)
+      - shape_mismatches: exact paths where the shapes differ (empty if they match)
+      - legacy_shape / new_shape: rendered shapes, only when they differ
     """
     if normalize:
-        legacy_data = coerce_types(normalize_keys(legacy_data))
-        new_data = coerce_types(new_data)
-
-    exclude_paths = set()
-    if ignore_fields:
-        # Build regex patterns for fields to ignore at any depth
-        exclude_regex = [re.compile(rf".*\['{f}'\]") for f in ignore_fields]
-    else:
-        exclude_regex = []
+        legacy_data, _ = normalize_payload(legacy_data, FIELD_MAP_KR_EN, with_shape=False)
+        new_data, _ = normalize_payload(new_data, with_shape=False)
 
-    # Structural comparison
-    legacy_shape = structural_shape(legacy_data)
-    new_shape = structural_shape(new_data)
-    structural_match = legacy_shape == new_shape
+    # Structural comparison: equal root signatures <=> equal shapes.
+    legacy_sig = shape_signature(legacy_data)
+    new_sig = shape_signature(new_data)
+    structural_match = legacy_sig == new_sig
+    shape_info = {
+        "shape_mismatches": [] if structural_match else diff_shapes(legacy_sig, new_sig),
+        "legacy_shape": None if structural_match else SHAPES.render(legacy_sig),
+        "new_shape": None if structural_match else SHAPES.render(new_sig),
+    }
 
     if structural_only:
         return {
             "equal": structural_match,
             "structural_match": structural_match,
-            "legacy_shape": legacy_shape,
-            "new_shape": new_shape,
+            **shape_info,
             "diff": None,
         }
 
     # Value comparison
-    diff = DeepDiff(
+    if ignore_fields is None:
+        ignore_fields = RNG_IGNORE_FIELDS
+    engine = engine or DIFF_ENGINE
+    if engine == "native":
+        diff = diff_payloads(legacy_data, new_data, ignore_fields=ignore_fields or frozenset())
+    elif engine in ("deepdiff", "crosscheck"):
+        diff = _deepdiff(legacy_data, new_data, ignore_fields)
+    else:
+        raise ValueError(f"Unknown diff engine {engine!r}")
+
+    result = {
+        "equal": not bool(diff),
+        "structural_match": structural_match,
+        "shape_mismatches": shape_info["shape_mismatches"],
+        "diff": diff if diff else None,
+    }
+    if engine == "crosscheck":
+        native = diff_payloads(legacy_data, new_data, ignore_fields=ignore_fields or frozenset())
+        result["native_diff"] = native or None
+        result["engines_agree"] = bool(native) == bool(diff)
+    return result
+
+
+@profiling.timed("diff")
+def _deepdiff(legacy_data: Any, new_data: Any, ignore_fields: set[str] | None) -> DeepDiff:
+    if ignore_fields:
+        # Build regex patterns for fields to ignore at any depth
+        exclude_regex = [re.compile(rf".*\['{re.escape(f)}'\]") for f in ignore_fields]
+    else:
+        exclude_regex = []
+    return DeepDiff(
         legacy_data,
         new_data,
         ignore_order=True,
@@ -164,12 +478,6 @@ def compare_responses(
         significant_digits=2,
     )
 
-    return {
-        "equal": not bool(diff),
-        "structural_match": structural_match,
-        "diff": diff if diff else None,
-    }
-
 
 def format_report(results: list[dict]) -> str:
     """Format a list of test results into a human-readable report."""
@@ -1,41 +1,68 @@
 """Shared fixtures for parity tests."""
+import math
 import os
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
 import pytest
 import requests
 import pymysql
 import psycopg2
 
+import baseline
+import cassette as cassette_mod
+import db
+import impact
+import profiling
+import timing
+from comparison import RNG_SEED
+from lite_drbg import seed_new_world
+from schema import SchemaRegistry, load_schema
+
 # ── Environment ──────────────────────────────────────────────────────────────
 LEGACY_BASE = os.environ.get("LEGACY_BASE_URL", "http://legacy-app")
 NEW_BASE = os.environ.get("NEW_BASE_URL", "http://new-gateway:8080")
+CASSETTE_MODE = os.environ.get("PARITY_CASSETTE_MODE", "off")
+CASSETTE_DIR = os.environ.get("PARITY_CASSETTE_DIR", "/results/cassette")
+SELECTION_FILE = os.environ.get("PARITY_SELECTION") or None
 
 
 # ── HTTP Sessions ────────────────────────────────────────────────────────────
 class LegacyClient:
     """Wrapper around the legacy PHP API (api.php?path=…)."""
 
-    def __init__(self, base: str):
+    def __init__(self, base: str, cassette: cassette_mod.Cassette | None = None):
         self.base = base.rstrip("/")
-        self.session = requests.Session()
+        self.session = timing.TimedSession("legacy")
+        cassette_mod.install(self.session, cassette, "legacy")
 
-    def call(self, path: str, data: dict | None = None, method: str = "POST") -> requests.Response:
+    def call(
+        self, path: str, data: dict | None = None, method: str = "POST", stream: bool = False
+    ) -> requests.Response:
         url = f"{self.base}/api.php?path={path}"
         if method == "GET":
-            return self.session.get(url, timeout=30)
-        return self.session.post(url, json=data or {}, timeout=30)
+            return self.session.get(url, timeout=30, stream=stream)
+        return self.session.post(url, json=data or {}, timeout=30, stream=stream)
 
-    def get(self, path: str, params: dict | None = None) -> requests.Response:
+    def get(self, path: str, params: dict | None = None, stream: bool = False) -> requests.Response:
         url = f"{self.base}/api.php?path={path}"
-        return self.session.get(url, params=params, timeout=30)
+        return self.session.get(url, params=params, timeout=30, stream=stream)
+
+    def login(self, login_id: str, password: str):
+        r = self.call("Global/Login", {"loginID": login_id, "loginPW": password})
+        r.raise_for_status()
+        return r
 
 
 class NewClient:
     """Wrapper around the new Kotlin/Spring API."""
 
-    def __init__(self, base: str):
+    def __init__(self, base: str, cassette: cassette_mod.Cassette | None = None):
         self.base = base.rstrip("/")
-        self.session = requests.Session()
+        self.session = timing.TimedSession("new")
         self.token: str | None = None
+        cassette_mod.install(self.session, cassette, "new")
 
     def _headers(self) -> dict:
         h = {"Content-Type": "application/json"}
@@ -43,16 +70,21 @@ class NewClient:
             h["Authorization"] = f"Bearer {self.token}"
         return h
 
-    def post(self, path: str, data: dict | None = None) -> requests.Response:
+    def post(self, path: str, data: dict | None = None, stream: bool = False) -> requests.Response:
         return self.session.post(
-            f"{self.base}{path}", json=data or {}, headers=self._headers(), timeout=30
+            f"{self.base}{path}", json=data or {}, headers=self._headers(), timeout=30,
+            stream=stream,
         )
 
-    def get(self, path: str, params: dict | None = None) -> requests.Response:
+    def get(self, path: str, params: dict | None = None, stream: bool = False) -> requests.Response:
         return self.session.get(
-            f"{self.base}{path}", params=params, headers=self._headers(), timeout=30
+            f"{self.base}{path}", params=params, headers=self._headers(), timeout=30,
+            stream=stream,
         )
 
+    def delete(self, path: str) -> requests.Response:
+        return self.session.delete(f"{self.base}{path}", headers=self._headers(), timeout=30)
+
     def login(self, login_id: str, password: str):
         r = self.post("/api/auth/login", {"loginId": login_id, "password": password})
         r.raise_for_status()
@@ -60,40 +92,483 @@ class NewClient:
         return r
 
 
+class PairedClient:
+    """Sends the legacy and new halves of a parity check concurrently.
+
+    Each stack keeps its own ``requests.Session`` and only one request is in
+    flight per session at a time, so the sessions are never shared between
+    threads.  Wall-clock time per check is that of the slower stack instead of
+    the sum of both.
+    """
+
+    def __init__(self, legacy: LegacyClient, new: NewClient):
+        self.legacy = legacy
+        self.new = new
+        self._pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="parity")
+
+    def request(
+        self,
+        legacy_fn: Callable[[], requests.Response],
+        new_fn: Callable[[], requests.Response],
+    ) -> tuple[requests.Response, requests.Response]:
+        """Run two zero-arg request callables at once; returns (legacy, new)."""
+        with profiling.span("http"):
+            lf = self._pool.submit(legacy_fn)
+            nf = self._pool.submit(new_fn)
+            lr, nr = lf.result(), nf.result()
+        timing.RECORDER.pair(lr, nr)
+        return lr, nr
+
+    def post(
+        self,
+        legacy_path: str,
+        legacy_data: dict | None,
+        new_path: str,
+        new_data: dict | None,
+    ) -> tuple[requests.Response, requests.Response]:
+        """``legacy.call`` + ``new.post`` in parallel."""
+        return self.request(
+            lambda: self.legacy.call(legacy_path, legacy_data),
+            lambda: self.new.post(new_path, new_data),
+        )
+
+    def get(
+        self,
+        legacy_path: str,
+        new_path: str,
+        legacy_params: dict | None = None,
+        new_params: dict | None = None,
+        stream: bool = False,
+    ) -> tuple[requests.Response, requests.Response]:
+        """``legacy.get`` + ``new.get`` in parallel.
+
+        With ``stream=True`` only headers are read; pass the pair to
+        ``streaming.compare_streams`` to consume the bodies incrementally.
+        """
+        return self.request(
+            lambda: self.legacy.get(legacy_path, legacy_params, stream=stream),
+            lambda: self.new.get(new_path, new_params, stream=stream),
+        )
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+
+
+def run_id() -> str:
+    """Identifier shared by every xdist worker of one run (or the pid when serial).
+
+    Tests that create remote state (e.g. the auth user) derive names from this
+    so all workers agree on them.
+    """
+    return os.environ.get("PYTEST_XDIST_TESTRUNUID", "")[:8] or f"{os.getpid():x}"
+
+
+def worker_id() -> str:
+    """xdist worker name (``gw0``, ``gw1`` …) or ``master`` when not sharded."""
+    return os.environ.get("PYTEST_XDIST_WORKER", "master")
+
+
+SESSION_PASS = "TestPass123!"
+
+
+def session_user() -> str:
+    """Account the session ``legacy`` / ``new`` clients are logged in as.
+
+    One per worker, so no suite depends on test_01 having run on the same
+    worker (or at all, under change-impact selection).
+    """
+    return f"parity_{run_id()}_{worker_id()}"
+
+
+def cassette_volatile() -> dict[str, str]:
+    """Run-specific account names and the placeholders cassette keys use for them."""
+    return {session_user(): "parity_<session>", f"parity_{run_id()}": "parity_<run>"}
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--changed-since", metavar="REF", default=None,
+        help="run only the parity tests affected by `git diff REF` (see impact.py)",
+    )
+    parser.addoption(
+        "--parity-profile", metavar="MODE", choices=profiling.MODES, default=None,
+        help="per-test phase profiling: off, spans, cprofile or folded (overrides PARITY_PROFILE)",
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    """Deselect parity tests the change-impact selection does not need."""
+    ref = config.getoption("changed_since")
+    if ref:
+        selection = impact.select_since(ref)
+    elif SELECTION_FILE:
+        selection = impact.read_selection(SELECTION_FILE)
+    else:
+        return
+    kept = [item for item in items if selection.keeps(item.nodeid)]
+    if len(kept) < len(items):
+        config.hook.pytest_deselected(items=[item for item in items if not selection.keeps(item.nodeid)])
+        items[:] = kept
+
+
+def pytest_configure(config):
+    # Only the xdist controller (or a serial run) wipes the previous recording;
+    # workers start after this and each append to their own files.
+    if CASSETTE_MODE == "record" and not hasattr(config, "workerinput"):
+        cassette_mod.clear(CASSETTE_DIR)
+    if config.pluginmanager.hasplugin("xdist"):
+        config.pluginmanager.register(_TimingXdist(), "parity-timing-xdist")
+    if getattr(config.option, "json_report", False):
+        config.pluginmanager.register(_TimingJsonReport(), "parity-timing-json-report")
+    _configure_profile(config)
+    _configure_reset(config)
+
+
+# ── Per-endpoint timing ──────────────────────────────────────────────────────
+# Workers hand their timing aggregates to the controller through xdist's
+# ``workeroutput``; the controller (or a serial run) owns timing.RECORDER's
+# merged view, adds it to report.json and prints the slowest pairs.
+class _TimingXdist:
+    @pytest.hookimpl(trylast=True)
+    def pytest_sessionfinish(self, session):
+        workeroutput = getattr(session.config, "workeroutput", None)
+        if workeroutput is not None:
+            workeroutput["parity_timing"] = timing.RECORDER.to_json()
+
+    def pytest_testnodedown(self, node, error):
+        data = getattr(node, "workeroutput", {}).get("parity_timing")
+        if data:
+            timing.RECORDER.merge_json(data)
+
+
+class _TimingJsonReport:
+    def pytest_json_modifyreport(self, json_report):
+        json_report["timing"] = timing.RECORDER.report()
+
+
+# ── Phase profiling ──────────────────────────────────────────────────────────
+# See profiling.py.  Each test is bracketed from setup to teardown; workers
+# hand their breakdowns over like the timing aggregates, and the controller
+# trims the capture files to the run-wide slowest tests.
+_PROFILE_CAPTURES: list[str] = []
+
+
+class _Profiling:
+    def __init__(self, captures: profiling.SlowestCaptures | None):
+        self.captures = captures
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_protocol(self, item, nextitem):
+        capture = self.captures.begin() if self.captures else None
+        profiling.PROFILER.start(item.nodeid)
+        yield
+        result = profiling.PROFILER.stop()
+        if capture is not None:
+            self.captures.end(capture, item.nodeid, result["total"])
+
+    @pytest.hookimpl(trylast=True)
+    def pytest_sessionfinish(self, session):
+        workeroutput = getattr(session.config, "workeroutput", None)
+        if workeroutput is not None:
+            workeroutput["parity_profile"] = profiling.PROFILER.to_json()
+        elif self.captures:
+            _PROFILE_CAPTURES[:] = profiling.prune(
+                self.captures.directory, profiling.PROFILER.slowest(self.captures.top), self.captures.mode)
+
+    @pytest.hookimpl(optionalhook=True)
+    def pytest_testnodedown(self, node, error):
+        data = getattr(node, "workeroutput", {}).get("parity_profile")
+        if data:
+            profiling.PROFILER.merge_json(data)
+
+
+class _ProfileJsonReport:
+    def pytest_json_modifyreport(self, json_report):
+        json_report["profile"] = profiling.PROFILER.report()
+
+
+def _configure_profile(config):
+    mode = config.getoption("parity_profile") or profiling.MODE
+    if mode not in profiling.MODES:
+        raise pytest.UsageError(f"PARITY_PROFILE must be one of {profiling.MODES}, not {mode!r}")
+    profiling.configure(mode)
+    if not profiling.PROFILER.enabled:
+        return
+    captures = None
+    if profiling.MODE in profiling.SUFFIXES:
+        captures = profiling.SlowestCaptures(profiling.MODE)
+        if not hasattr(config, "workerinput"):
+            profiling.clear(captures.directory)
+    config.pluginmanager.register(_Profiling(captures), "parity-profile")
+    if getattr(config.option, "json_report", False):
+        config.pluginmanager.register(_ProfileJsonReport(), "parity-profile-json-report")
+
+
+def pytest_unconfigure(config):
+    LEGACY_POOL.close()
+    NEW_POOL.close()
+    if _ISOLATED:
+        RESET.cleanup(_ISOLATED)
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    if hasattr(config, "workerinput"):
+        return
+    report = timing.RECORDER.report()
+    if report["pairs"]:
+        terminalreporter.section("parity timing (new vs legacy, slowest first)")
+        for line in timing.format_pairs(report):
+            terminalreporter.write_line(line)
+    if profiling.PROFILER.tests:
+        terminalreporter.section(f"parity profile ({profiling.MODE}, slowest tests)")
+        for line in profiling.format_slowest(profiling.PROFILER.report()):
+            terminalreporter.write_line(line)
+        if _PROFILE_CAPTURES:
+            terminalreporter.write_line(
+                f"{len(_PROFILE_CAPTURES)} captures in {os.path.dirname(_PROFILE_CAPTURES[0])}")
+    if RESET.timings:
+        terminalreporter.section(f"parity DB reset ({RESET.mode})")
+        for line in RESET.summary():
+            terminalreporter.write_line(line)
+
+
 @pytest.fixture(scope="session")
-def legacy() -> LegacyClient:
-    return LegacyClient(LEGACY_BASE)
+def cassette():
+    if CASSETTE_MODE == "off":
+        yield None
+        return
+    c = cassette_mod.Cassette(CASSETTE_DIR, CASSETTE_MODE, worker_id(), cassette_volatile())
+    yield c
+    c.close()
+
+
+def session_legacy(cassette: cassette_mod.Cassette | None = None, base: str = LEGACY_BASE) -> LegacyClient:
+    """Legacy client holding the session cookie of ``session_user()``."""
+    client = LegacyClient(base, cassette)
+    user = session_user()
+    # Already-registered accounts just fail here and log in below.
+    client.call("Global/Join", {"loginID": user, "loginPW": SESSION_PASS, "nickName": user})
+    client.login(user, SESSION_PASS)
+    return client
+
+
+def session_new(cassette: cassette_mod.Cassette | None = None, base: str = NEW_BASE) -> NewClient:
+    """New-stack client holding the JWT of ``session_user()``."""
+    client = NewClient(base, cassette)
+    user = session_user()
+    client.post("/api/auth/register", {"loginId": user, "password": SESSION_PASS, "displayName": user})
+    client.login(user, SESSION_PASS)
+    return client
 
 
 @pytest.fixture(scope="session")
-def new() -> NewClient:
-    return NewClient(NEW_BASE)
+def legacy(cassette) -> LegacyClient:
+    return session_legacy(cassette)
 
 
-# ── Database connections ─────────────────────────────────────────────────────
 @pytest.fixture(scope="session")
-def legacy_db():
-    conn = pymysql.connect(
-        host=os.environ.get("LEGACY_DB_HOST", "legacy-mariadb"),
-        port=int(os.environ.get("LEGACY_DB_PORT", 3306)),
-        user=os.environ.get("LEGACY_DB_USER", "root"),
-        password=os.environ.get("LEGACY_DB_PASSWORD", "rootpw"),
-        database=os.environ.get("LEGACY_DB_NAME", "sammo"),
-        cursorclass=pymysql.cursors.DictCursor,
-    )
-    yield conn
-    conn.close()
+def new(cassette) -> NewClient:
+    return session_new(cassette)
 
 
 @pytest.fixture(scope="session")
-def new_db():
+def paired(legacy, new):
+    client = PairedClient(legacy, new)
+    yield client
+    client.close()
+
+
+# ── Database connections ─────────────────────────────────────────────────────
+def _skip_db_on_replay():
+    if CASSETTE_MODE == "replay":
+        pytest.skip("DB state is not part of the cassette (replay mode)")
+
+
+LEGACY_DB_HOST = os.environ.get("LEGACY_DB_HOST", "legacy-mariadb")
+LEGACY_DB_PORT = int(os.environ.get("LEGACY_DB_PORT", 3306))
+LEGACY_DB_NAME = os.environ.get("LEGACY_DB_NAME", "sammo")
+NEW_DB_HOST = os.environ.get("NEW_DB_HOST", "new-postgres")
+NEW_DB_PORT = int(os.environ.get("NEW_DB_PORT", 5432))
+NEW_DB_NAME = os.environ.get("NEW_DB_NAME", "opensam")
+LEGACY_DB_LOGIN = {
+    "host": LEGACY_DB_HOST,
+    "port": LEGACY_DB_PORT,
+    "user": os.environ.get("LEGACY_DB_USER", "root"),
+    "password": os.environ.get("LEGACY_DB_PASSWORD", "rootpw"),
+}
+NEW_DB_LOGIN = {
+    "host": NEW_DB_HOST,
+    "port": NEW_DB_PORT,
+    "user": os.environ.get("NEW_DB_USER", "opensam"),
+    "password": os.environ.get("NEW_DB_PASSWORD", "opensam123"),
+}
+# Databases the DB fixtures use; PARITY_DB_RESET=worker points them at the
+# worker's clones.
+DB_NAMES = {"legacy": LEGACY_DB_NAME, "new": NEW_DB_NAME}
+# Statements run in a ``db`` profiling span (see profiling.py).
+_LEGACY_CURSOR = profiling.timed_cursor(pymysql.cursors.DictCursor)
+_NEW_CURSOR = profiling.timed_cursor(psycopg2.extensions.cursor)
+
+
+def connect_legacy_db(timeout: float | None = None):
+    """pymysql DictCursor connection to the legacy MariaDB."""
+    return pymysql.connect(
+        **LEGACY_DB_LOGIN,
+        database=DB_NAMES["legacy"],
+        cursorclass=_LEGACY_CURSOR,
+        connect_timeout=timeout or 10,
+    )
+
+
+def connect_new_db(timeout: float | None = None, *, dbname: str | None = None):
+    """Autocommit psycopg2 connection to the new stack's database."""
     conn = psycopg2.connect(
-        host=os.environ.get("NEW_DB_HOST", "new-postgres"),
-        port=int(os.environ.get("NEW_DB_PORT", 5432)),
-        user=os.environ.get("NEW_DB_USER", "opensam"),
-        password=os.environ.get("NEW_DB_PASSWORD", "opensam123"),
-        dbname=os.environ.get("NEW_DB_NAME", "opensam"),
+        **NEW_DB_LOGIN,
+        dbname=dbname or DB_NAMES["new"],
+        cursor_factory=_NEW_CURSOR,
+        # libpq takes whole seconds and treats anything below 2 as 2.
+        connect_timeout=max(2, math.ceil(timeout or 10)),
     )
     conn.autocommit = True
-    yield conn
-    conn.close()
+    return conn
+
+
+def _reset_new(conn):
+    if conn.closed:
+        raise psycopg2.InterfaceError("connection closed")
+
+
+# One pool per process (= per xdist worker); nothing connects until a test
+# asks for a DB, and an unreachable server is probed once, not per test.
+LEGACY_POOL = db.Pool(
+    "legacy", connect_legacy_db, host=LEGACY_DB_HOST, port=LEGACY_DB_PORT,
+    # Ends the REPEATABLE READ snapshot so the next test sees fresh rows.
+    reset=lambda conn: conn.rollback(),
+)
+NEW_POOL = db.Pool("new", connect_new_db, host=NEW_DB_HOST, port=NEW_DB_PORT, reset=_reset_new)
+
+
+def _require(pool: db.Pool) -> None:
+    _skip_db_on_replay()
+    error = pool.probe()
+    if error:
+        pytest.skip(error)
+
+
+@pytest.fixture
+def legacy_db():
+    _require(LEGACY_POOL)
+    with LEGACY_POOL.connection() as conn:
+        yield conn
+
+
+@pytest.fixture
+def new_db():
+    _require(NEW_POOL)
+    with NEW_POOL.connection() as conn:
+        yield conn
+
+
+# ── Baseline reset ───────────────────────────────────────────────────────────
+# See baseline.py.  The controller (or a serial run) takes the baseline before
+# any worker starts; ``suite`` restores it before each stack-facing test file,
+# ``worker`` gives each process its own clones for the DB fixtures.
+RESET = baseline.WorldReset("off")
+_ISOLATED: dict[str, str] = {}
+STACK_FIXTURES = {"legacy", "new", "paired", "legacy_db", "new_db", "schema", "rng_seed"}
+_reset_module = None
+
+
+def _reachable(host: str, port: int) -> bool:
+    try:
+        socket.create_connection((host, port), timeout=db.PROBE_TIMEOUT).close()
+        return True
+    except OSError:
+        return False
+
+
+def _connect_legacy_admin():
+    # Tuple rows and no default database: the baseline copies across schemas.
+    return pymysql.connect(**LEGACY_DB_LOGIN, connect_timeout=10)
+
+
+def _configure_reset(config):
+    global RESET
+    if baseline.MODE == "off" or CASSETTE_MODE == "replay":
+        return
+    is_worker = hasattr(config, "workerinput")
+    distributed = getattr(config.option, "dist", "no") != "no"
+    if baseline.MODE == "suite" and not is_worker and distributed \
+            and (getattr(config.option, "numprocesses", 0) or 0) > 1:
+        raise pytest.UsageError("PARITY_DB_RESET=suite needs a serial run (-n 0 or -n 1); "
+                                "use PARITY_DB_RESET=worker with several workers")
+    RESET = baseline.WorldReset(
+        baseline.MODE,
+        legacy=baseline.MariaDbBaseline(
+            _connect_legacy_admin, LEGACY_DB_NAME,
+            dump_path=baseline.LEGACY_DUMP, login=LEGACY_DB_LOGIN,
+        ) if _reachable(LEGACY_DB_HOST, LEGACY_DB_PORT) else None,
+        new=baseline.PostgresBaseline(
+            lambda: connect_new_db(dbname="postgres"), NEW_DB_NAME,
+        ) if _reachable(NEW_DB_HOST, NEW_DB_PORT) else None,
+    )
+    if not RESET.enabled:
+        return
+    if not is_worker:
+        RESET.prepare()
+    if RESET.mode == "worker" and (is_worker or not distributed):
+        _ISOLATED.update(RESET.isolate(worker_id()))
+        DB_NAMES.update(_ISOLATED)
+
+
+def pytest_runtest_setup(item):
+    """``suite`` mode: restore the shared worlds before each stack-facing file."""
+    global _reset_module
+    if RESET.mode != "suite" or not RESET.enabled or item.module is _reset_module:
+        return
+    if STACK_FIXTURES.isdisjoint(item.fixturenames):
+        return
+    _reset_module = item.module
+    # Restoring drops the new database; pooled sessions to it are dead.
+    LEGACY_POOL.close()
+    NEW_POOL.close()
+    RESET.restore()
+    if RNG_SEED and "new" in RESET.sides:
+        # The seed is written after the baseline was taken.
+        with NEW_POOL.connection() as conn:
+            seed_new_world(conn, RNG_SEED)
+
+
+@pytest.fixture(scope="session")
+def schema() -> SchemaRegistry:
+    """Both schemas, introspected once per worker (disk-cached by schema version).
+
+    A side whose database is unreachable is ``None``; skips only when both are.
+    """
+    _skip_db_on_replay()
+    sides = {}
+    for stack, pool, host, port in (
+        ("legacy", LEGACY_POOL, LEGACY_DB_HOST, LEGACY_DB_PORT),
+        ("new", NEW_POOL, NEW_DB_HOST, NEW_DB_PORT),
+    ):
+        name = DB_NAMES[stack]
+        if pool.probe() is None:
+            with pool.connection() as conn:
+                sides[stack] = load_schema(conn, stack, identity=f"{host}:{port}/{name}")
+    if not sides:
+        pytest.skip(f"{LEGACY_POOL.probe()}; {NEW_POOL.probe()}")
+    return SchemaRegistry(sides.get("legacy"), sides.get("new"))
+
+
+@pytest.fixture(scope="session")
+def rng_seed() -> str | None:
+    """``PARITY_RNG_SEED`` written into the new stack's ``world_state.config``.
+
+    The legacy container picks the same seed up at start (entrypoint.sh), so
+    both engines draw identical LiteHashDRBG streams.  ``None`` when unset.
+    """
+    _require(NEW_POOL)
+    if RNG_SEED:
+        with NEW_POOL.connection() as conn:
+            seed_new_world(conn, RNG_SEED)
+    return RNG_SEED
@@ -0,0 +1,172 @@
+"""
+Lazily-opened, probed connection pools for the parity databases, plus the
+parameterized queries the suites share.
+
+A ``Pool`` opens nothing until a test first asks for a connection.  The first
+request probes the server once — a TCP connect bounded by
+``PARITY_DB_PROBE_TIMEOUT`` (default 0.5 s), then a real login — and caches the
+outcome, so when a stack is down every DB test skips immediately with the same
+reason instead of each one waiting out a driver connect timeout.
+
+Pools are per process, i.e. one per xdist worker, and thread-safe: each test
+borrows its own connection and returns it afterwards, so workers (and threads
+inside a test) never share a connection.
+
+    pool = Pool("legacy", connect_legacy, host="legacy-mariadb", port=3306, reset=rollback)
+    if pool.probe():
+        ...  # unreachable, reason string
+    with pool.connection() as conn:
+        fetchone(conn, LEGACY_GENERAL_CREW, (1,))
+"""
+from __future__ import annotations
+
+import os
+import socket
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable
+
+from snapshot import SCHEMA_MAP
+
+PROBE_TIMEOUT = float(os.environ.get("PARITY_DB_PROBE_TIMEOUT", "0.5"))
+POOL_SIZE = int(os.environ.get("PARITY_DB_POOL_SIZE", "4"))
+ACQUIRE_TIMEOUT = 60.0
+
+
+class PoolUnavailable(RuntimeError):
+    """The database failed its probe (or no slot freed up in time)."""
+
+
+class Pool:
+    """Bounded LIFO pool of DB-API connections, opened on demand.
+
+    ``connect(timeout)`` opens one connection; ``reset(conn)`` runs when a
+    connection is handed back (e.g. ``rollback`` so a REPEATABLE READ snapshot
+    does not outlive the test) — if it raises, the connection is discarded.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        connect: Callable[[float], Any],
+        *,
+        host: str,
+        port: int,
+        size: int = POOL_SIZE,
+        probe_timeout: float = PROBE_TIMEOUT,
+        reset: Callable[[Any], None] | None = None,
+    ):
+        self.name = name
+        self.host = host
+        self.port = port
+        self.size = size
+        self.probe_timeout = probe_timeout
+        self._connect = connect
+        self._reset = reset
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle: list = []
+        self._probed = False
+        self._error: str | None = None
+        self.opened = 0
+
+    def probe(self) -> str | None:
+        """``None`` if the database is reachable, else why not.  Runs once."""
+        with self._lock:
+            if not self._probed:
+                try:
+                    socket.create_connection((self.host, self.port), timeout=self.probe_timeout).close()
+                    self._idle.append(self._open())
+                except Exception as e:
+                    self._error = f"{self.name} DB unreachable at {self.host}:{self.port}: {e}"
+                self._probed = True
+            return self._error
+
+    def _open(self):
+        conn = self._connect(self.probe_timeout)
+        self.opened += 1
+        return conn
+
+    def acquire(self, timeout: float = ACQUIRE_TIMEOUT):
+        error = self.probe()
+        if error:
+            raise PoolUnavailable(error)
+        if not self._slots.acquire(timeout=timeout):
+            raise PoolUnavailable(f"{self.name} DB pool exhausted ({self.size} connections busy)")
+        try:
+            with self._lock:
+                if self._idle:
+                    return self._idle.pop()
+            return self._open()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn) -> None:
+        try:
+            if self._reset is not None:
+                self._reset(conn)
+        except Exception:
+            _close_quietly(conn)
+        else:
+            with self._lock:
+                self._idle.append(conn)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            _close_quietly(conn)
+
+
+def _close_quietly(conn) -> None:
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+def _execute(cur, sql: str, params: tuple | None):
+    # No params → no %-interpolation, so literal ``%`` in SQL stays as-is.
+    if params is None:
+        cur.execute(sql)
+    else:
+        cur.execute(sql, params)
+
+
+def fetchone(conn, sql: str, params: tuple | None = None):
+    with conn.cursor() as cur:
+        _execute(cur, sql, params)
+        return cur.fetchone()
+
+
+def fetchall(conn, sql: str, params: tuple | None = None) -> list:
+    with conn.cursor() as cur:
+        _execute(cur, sql, params)
+        return cur.fetchall()
+
+
+# ── Shared queries ───────────────────────────────────────────────────────────
+# pymysql and psycopg2 both use the ``%s`` paramstyle.  Legacy rows come back
+# as dicts (DictCursor), new rows as tuples.
+LEGACY_GENERAL_CREW = "SELECT crew FROM general WHERE no = %s LIMIT 1"
+LEGACY_GAME_ENV = "SELECT year, month, turn FROM game_env LIMIT 1"
+LEGACY_NPC_COUNT = "SELECT COUNT(*) AS cnt FROM general WHERE npc > 0 AND turntime IS NOT NULL"
+
+# New-stack names come from SCHEMA_MAP so they track the Flyway migrations;
+# world_state has no legacy twin there (one row per world, no turn counter).
+_GENERAL = SCHEMA_MAP["general"]
+NEW_GENERAL_CREW = (f"SELECT {_GENERAL.columns['crew']} FROM {_GENERAL.new_table} "
+                    f"WHERE {_GENERAL.new_key} = %s LIMIT 1")
+NEW_WORLD_TURN = "SELECT current_year, current_month FROM world_state WHERE id = %s LIMIT 1"
+NEW_NPC_COUNT = f"SELECT COUNT(*) FROM {_GENERAL.new_table} WHERE {_GENERAL.columns['npc']} > 0"
@@ -0,0 +1,909 @@
+#!/usr/bin/env python3
+"""
+Realtime fan-out harness for the new stack's WebSocket / STOMP push.
+
+game-app's ``WebSocketConfig`` runs Spring's simple broker behind the SockJS
+endpoint ``/ws`` (raw WebSocket at ``/ws/websocket``, served by game-app, not
+the gateway).  ``GameEventService`` pushes turn advances to
+``/topic/world/{id}/turn``, ``RealtimeService`` command results to
+``/topic/general/{id}``.  This harness opens a growing number of concurrent
+STOMP subscribers on one destination — each CONNECT carrying a logged-in
+user's ``Authorization: Bearer`` token — fires a series of events and
+records, per subscriber count,
+
+  - delivery latency: trigger → frame received, per subscriber and event
+  - spread: first delivery of an event → each later one (fan-out skew)
+  - completion: trigger → last delivery of an event, and the delivery rate
+  - dropped (never delivered within ``--timeout``), duplicate and unexpected
+    messages, lost connections and connect failures
+
+in HDR-style histograms (``timing.Histogram``).  Triggers:
+
+  - ``message`` — a publisher connection SENDs to
+    ``/topic/parity/fanout/<run>``; the simple broker relays client SENDs
+    to ``/topic`` itself, so this isolates the broker and the sockets.
+  - ``turn``    — one real turn per event (``world_state`` rewound a tick,
+    ``/internal/turn/resume``, ``POST /api/turns/run``, as in
+    ``turn_bench.py``); latency includes turn processing.  Events run one at
+    a time.
+
+Before each step a probe is published to the destination until every
+subscriber has received one, so subscriptions are live before timing starts
+(the simple broker does not confirm SUBSCRIBE).  Anything else subscribed to
+the world's turn topic sees the probes too.
+
+``--stand-in`` runs an in-process broker speaking the same protocol (plus a
+``POST /api/turns/run`` that pushes a turn), so the harness runs without the
+stack.  No WebSocket library is needed: the RFC 6455 and STOMP 1.2 framing
+is implemented here on asyncio streams.
+
+    python fanout.py --subscribers 250,1000,4000 --events 20 --accounts 50 --out /results/fanout.json
+    python fanout.py --trigger turn --world 1 --subscribers 500,2000 --events 5
+    python fanout.py --stand-in --subscribers 100,500,1000 --events 20   # offline
+
+Each subscriber holds a socket (two with ``--stand-in``); the soft open-file
+limit is raised to the hard limit at start.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import itertools
+import json
+import os
+import random
+import ssl
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+from urllib.parse import urlsplit
+
+from timing import Histogram
+
+WS_PATH = "/ws/websocket"
+STOMP_PROTOCOLS = ("v12.stomp", "v11.stomp", "v10.stomp")
+DEFAULT_STEPS = (100, 500, 1000, 2000)
+DEFAULT_EVENTS = 20
+DEFAULT_TIMEOUT = 10.0
+PROBE_INTERVAL = 0.25
+
+_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+OP_CONT, OP_TEXT, OP_BINARY, OP_CLOSE, OP_PING, OP_PONG = 0x0, 0x1, 0x2, 0x8, 0x9, 0xA
+
+
+# ── WebSocket (RFC 6455) ─────────────────────────────────────────────────────
+def _mask(data: bytes, key: bytes) -> bytes:
+    n = len(data)
+    if not n:
+        return data
+    # One big-integer XOR instead of a per-byte loop.
+    pad = (key * (n // 4 + 1))[:n]
+    return (int.from_bytes(data, "little") ^ int.from_bytes(pad, "little")).to_bytes(n, "little")
+
+
+def encode_frame(opcode: int, payload: bytes, *, mask: bool) -> bytes:
+    """One final frame; clients must mask, servers must not."""
+    head = bytearray([0x80 | opcode])
+    bit = 0x80 if mask else 0
+    n = len(payload)
+    if n < 126:
+        head.append(bit | n)
+    elif n < 1 << 16:
+        head.append(bit | 126)
+        head += n.to_bytes(2, "big")
+    else:
+        head.append(bit | 127)
+        head += n.to_bytes(8, "big")
+    if mask:
+        key = os.urandom(4)
+        head += key
+        payload = _mask(payload, key)
+    return bytes(head) + payload
+
+
+async def read_frame(reader: asyncio.StreamReader) -> tuple[bool, int, bytes]:
+    """``(fin, opcode, payload)`` of the next frame, unmasked."""
+    b0, b1 = await reader.readexactly(2)
+    n = b1 & 0x7F
+    if n == 126:
+        n = int.from_bytes(await reader.readexactly(2), "big")
+    elif n == 127:
+        n = int.from_bytes(await reader.readexactly(8), "big")
+    key = await reader.readexactly(4) if b1 & 0x80 else None
+    payload = await reader.readexactly(n)
+    return bool(b0 & 0x80), b0 & 0x0F, _mask(payload, key) if key else payload
+
+
+def accept_key(key: str) -> str:
+    return base64.b64encode(hashlib.sha1((key + _GUID).encode()).digest()).decode()
+
+
+def _parse_head(head: bytes) -> tuple[str, dict[str, str]]:
+    """First line and lower-cased headers of an HTTP/1.1 message head."""
+    lines = head.decode("latin-1").split("\r\n")
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(":")
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+    return lines[0], headers
+
+
+class WebSocket:
+    """Text-message WebSocket over asyncio streams (either end)."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, *,
+                 client: bool, subprotocol: str | None = None):
+        self.reader = reader
+        self.writer = writer
+        self.client = client
+        self.subprotocol = subprotocol
+        self.closed = False
+
+    def write_text(self, text: str) -> None:
+        """Queue a text message without waiting for the socket (see ``drain``)."""
+        if not self.closed:
+            self.writer.write(encode_frame(OP_TEXT, text.encode(), mask=self.client))
+
+    async def drain(self) -> None:
+        await self.writer.drain()
+
+    async def send(self, text: str) -> None:
+        self.write_text(text)
+        await self.drain()
+
+    async def recv(self) -> str | None:
+        """Next text message, or ``None`` once the connection is closed."""
+        parts: list[bytes] = []
+        while not self.closed:
+            try:
+                fin, opcode, payload = await read_frame(self.reader)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                self.closed = True
+                return None
+            if opcode == OP_PING:
+                self.writer.write(encode_frame(OP_PONG, payload, mask=self.client))
+            elif opcode == OP_CLOSE:
+                await self.close(payload[:2] or b"\x03\xe8")
+                return None
+            elif opcode in (OP_TEXT, OP_BINARY, OP_CONT):
+                parts.append(payload)
+                if fin:
+                    return b"".join(parts).decode()
+        return None
+
+    async def close(self, code: bytes = b"\x03\xe8") -> None:
+        if self.closed and self.writer.is_closing():
+            return
+        self.closed = True
+        try:
+            self.writer.write(encode_frame(OP_CLOSE, code, mask=self.client))
+            self.writer.close()
+            await self.writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass
+
+
+async def ws_connect(url: str, *, headers: dict[str, str] | None = None,
+                     subprotocols: tuple[str, ...] = STOMP_PROTOCOLS,
+                     timeout: float = DEFAULT_TIMEOUT) -> WebSocket:
+    """Open a client WebSocket to ``ws://`` / ``wss://`` ``url``."""
+    parts = urlsplit(url)
+    secure = parts.scheme == "wss"
+    port = parts.port or (443 if secure else 80)
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(
+        parts.hostname, port, ssl=ssl.create_default_context() if secure else None), timeout)
+    key = base64.b64encode(os.urandom(16)).decode()
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+    lines = [
+        f"GET {path} HTTP/1.1", f"Host: {parts.netloc}", "Upgrade: websocket",
+        "Connection: Upgrade", f"Sec-WebSocket-Key: {key}", "Sec-WebSocket-Version: 13",
+    ]
+    if subprotocols:
+        lines.append(f"Sec-WebSocket-Protocol: {', '.join(subprotocols)}")
+    lines += [f"{k}: {v}" for k, v in (headers or {}).items()]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode())
+    try:
+        status, reply = _parse_head(await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout))
+    except BaseException:
+        writer.close()
+        raise
+    if status.split(" ")[1:2] != ["101"] or reply.get("sec-websocket-accept") != accept_key(key):
+        writer.close()
+        raise ConnectionError(f"WebSocket handshake with {url} failed: {status}")
+    return WebSocket(reader, writer, client=True, subprotocol=reply.get("sec-websocket-protocol"))
+
+
+# ── STOMP 1.2 ────────────────────────────────────────────────────────────────
+_ESCAPES = {"\\": "\\\\", "\r": "\\r", "\n": "\\n", ":": "\\c"}
+_UNESCAPES = {v: k for k, v in _ESCAPES.items()}
+
+
+def _escape(value: str) -> str:
+    return "".join(_ESCAPES.get(c, c) for c in value)
+
+
+def _unescape(value: str) -> str:
+    if "\\" not in value:
+        return value
+    out, i = [], 0
+    while i < len(value):
+        pair = value[i:i + 2]
+        if pair in _UNESCAPES:
+            out.append(_UNESCAPES[pair])
+            i += 2
+        else:
+            out.append(value[i])
+            i += 1
+    return "".join(out)
+
+
+@dataclass
+class StompFrame:
+    command: str
+    headers: dict[str, str] = field(default_factory=dict)
+    body: str = ""
+
+
+def encode_stomp(command: str, headers: dict[str, Any] | None = None, body: str = "") -> str:
+    # CONNECT / CONNECTED headers are never escaped (STOMP 1.2 §Value Encoding).
+    esc = (lambda v: v) if command in ("CONNECT", "CONNECTED") else _escape
+    lines = [command] + [f"{esc(str(k))}:{esc(str(v))}" for k, v in (headers or {}).items()]
+    return "\n".join(lines) + "\n\n" + body + "\0"
+
+
+class StompDecoder:
+    """Splits WebSocket text into STOMP frames; heart-beat EOLs are dropped.
+
+    Frames are NUL-terminated, so a frame split across messages (or several
+    frames in one) is handled.  Bodies with a NUL need ``content-length``,
+    which the JSON payloads here never do.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+
+    def feed(self, text: str) -> list[StompFrame]:
+        self._buffer += text
+        frames = []
+        while "\0" in self._buffer:
+            raw, _, self._buffer = self._buffer.partition("\0")
+            raw = raw.lstrip("\r\n")
+            if not raw:
+                continue
+            head, _, body = raw.partition("\n\n")
+            lines = head.replace("\r\n", "\n").split("\n")
+            command = lines[0]
+            raw_values = command in ("CONNECT", "CONNECTED")
+            headers: dict[str, str] = {}
+            for line in lines[1:]:
+                name, _, value = line.partition(":")
+                if not raw_values:
+                    name, value = _unescape(name), _unescape(value)
+                headers.setdefault(name, value)     # the first occurrence wins
+            frames.append(StompFrame(command, headers, body))
+        return frames
+
+
+class StompError(RuntimeError):
+    pass
+
+
+class StompClient:
+    """STOMP session over one ``WebSocket``."""
+
+    def __init__(self, ws: WebSocket):
+        self.ws = ws
+        self._decoder = StompDecoder()
+        self._pending: list[StompFrame] = []
+        self._ids = itertools.count()
+
+    @classmethod
+    async def connect(cls, url: str, *, token: str | None = None,
+                      timeout: float = DEFAULT_TIMEOUT) -> "StompClient":
+        ws = await ws_connect(url, timeout=timeout)
+        client = cls(ws)
+        headers = {"accept-version": "1.2,1.1,1.0", "host": urlsplit(url).hostname or "localhost",
+                   "heart-beat": "0,0"}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        try:
+            await ws.send(encode_stomp("CONNECT", headers))
+            frame = await asyncio.wait_for(client.recv(), timeout)
+        except BaseException:
+            await ws.close()
+            raise
+        if frame is None or frame.command != "CONNECTED":
+            await ws.close()
+            message = frame.headers.get("message") if frame else "connection closed"
+            raise StompError(f"STOMP CONNECT refused: {message}")
+        return client
+
+    async def recv(self) -> StompFrame | None:
+        """Next frame, or ``None`` once the connection is closed."""
+        while not self._pending:
+            text = await self.ws.recv()
+            if text is None:
+                return None
+            self._pending.extend(self._decoder.feed(text))
+        return self._pending.pop(0)
+
+    async def subscribe(self, destination: str) -> str:
+        sub_id = f"sub-{next(self._ids)}"
+        await self.ws.send(encode_stomp("SUBSCRIBE", {"id": sub_id, "destination": destination, "ack": "auto"}))
+        return sub_id
+
+    async def send(self, destination: str, body: str, content_type: str = "application/json") -> None:
+        await self.ws.send(encode_stomp("SEND", {"destination": destination, "content-type": content_type}, body))
+
+    async def close(self) -> None:
+        if not self.ws.closed:
+            try:
+                await self.ws.send(encode_stomp("DISCONNECT"))
+            except (ConnectionError, OSError):
+                pass
+        await self.ws.close()
+
+
+# ── Stand-in broker ──────────────────────────────────────────────────────────
+class StandInBroker:
+    """In-process stand-in for game-app's STOMP endpoint and turn trigger.
+
+    Serves ``/ws/websocket`` like Spring's simple broker (CONNECT, SUBSCRIBE,
+    UNSUBSCRIBE, SEND relayed to every subscriber of the destination,
+    DISCONNECT) and ``POST /api/turns/run``, which pushes the next
+    ``{"year", "month"}`` to ``/topic/world/{world_id}/turn``.  CONNECT
+    without a Bearer token is refused when ``require_auth``; ``drop_rate`` of
+    deliveries are silently skipped so drop accounting can be exercised.
+    Runs its own event loop on a background thread.
+    """
+
+    def __init__(self, *, world_id: int = 1, require_auth: bool = True,
+                 drop_rate: float = 0.0, seed: int = 0):
+        self.world_id = world_id
+        self.require_auth = require_auth
+        self.drop_rate = drop_rate
+        self.turn = 0
+        self.published = 0
+        self.dropped = 0
+        self._rnd = random.Random(seed)
+        self._subs: dict[str, dict[tuple[int, str], WebSocket]] = defaultdict(dict)
+        self._sessions: set[WebSocket] = set()
+        self._ids = itertools.count(1)
+        self._loop = asyncio.new_event_loop()
+        self._server: asyncio.AbstractServer | None = None
+        self._thread = threading.Thread(target=self._loop.run_forever, name="stand-in-broker", daemon=True)
+
+    @property
+    def port(self) -> int:
+        return self._server.sockets[0].getsockname()[1]
+
+    @property
+    def url(self) -> str:
+        return f"ws://127.0.0.1:{self.port}{WS_PATH}"
+
+    @property
+    def base(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "StandInBroker":
+        self._thread.start()
+        self._server = asyncio.run_coroutine_threadsafe(
+            asyncio.start_server(self._handle, "127.0.0.1", 0, backlog=4096), self._loop).result()
+        return self
+
+    def __exit__(self, *exc):
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    async def _shutdown(self):
+        self._server.close()
+        await asyncio.gather(*(ws.close() for ws in list(self._sessions)), return_exceptions=True)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request, headers = _parse_head(await reader.readuntil(b"\r\n\r\n"))
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            writer.close()
+            return
+        method, _, rest = request.partition(" ")
+        path = rest.split(" ")[0]
+        if path == WS_PATH and headers.get("upgrade", "").lower() == "websocket":
+            offered = [p.strip() for p in headers.get("sec-websocket-protocol", "").split(",")]
+            chosen = next((p for p in STOMP_PROTOCOLS if p in offered), None)
+            lines = ["HTTP/1.1 101 Switching Protocols", "Upgrade: websocket", "Connection: Upgrade",
+                     f"Sec-WebSocket-Accept: {accept_key(headers.get('sec-websocket-key', ''))}"]
+            if chosen:
+                lines.append(f"Sec-WebSocket-Protocol: {chosen}")
+            writer.write(("\r\n".join(lines) + "\r\n\r\n").encode())
+            await self._session(WebSocket(reader, writer, client=False, subprotocol=chosen))
+            return
+        length = int(headers.get("content-length") or 0)
+        if length:
+            await reader.readexactly(length)
+        if method == "POST" and path == "/api/turns/run":
+            self.turn += 1
+            year, month = divmod(self.turn, 12)
+            await self._broadcast(f"/topic/world/{self.world_id}/turn",
+                                  json.dumps({"year": 184 + year, "month": month + 1}))
+            status, body = "200 OK", b'{"ok":true}'
+        else:
+            status, body = "404 Not Found", b""
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def _session(self, ws: WebSocket):
+        conn_id = next(self._ids)
+        decoder = StompDecoder()
+        mine: dict[str, str] = {}
+        self._sessions.add(ws)
+        try:
+            while (text := await ws.recv()) is not None:
+                for frame in decoder.feed(text):
+                    if not await self._frame(ws, conn_id, mine, frame):
+                        return
+        finally:
+            for sub_id, destination in mine.items():
+                self._subs[destination].pop((conn_id, sub_id), None)
+            self._sessions.discard(ws)
+            await ws.close()
+
+    async def _frame(self, ws: WebSocket, conn_id: int, mine: dict[str, str], frame: StompFrame) -> bool:
+        """Handle one client frame; False ends the session."""
+        h = frame.headers
+        if frame.command in ("CONNECT", "STOMP"):
+            if self.require_auth and not h.get("Authorization", "").startswith("Bearer "):
+                await ws.send(encode_stomp("ERROR", {"message": "unauthenticated"}))
+                return False
+            await ws.send(encode_stomp("CONNECTED", {"version": "1.2", "heart-beat": "0,0"}))
+        elif frame.command == "SUBSCRIBE":
+            mine[h["id"]] = h["destination"]
+            self._subs[h["destination"]][(conn_id, h["id"])] = ws
+        elif frame.command == "UNSUBSCRIBE":
+            destination = mine.pop(h.get("id", ""), None)
+            if destination:
+                self._subs[destination].pop((conn_id, h["id"]), None)
+        elif frame.command == "SEND":
+            await self._broadcast(h.get("destination", ""), frame.body,
+                                  h.get("content-type", "application/json"))
+        elif frame.command == "DISCONNECT":
+            if "receipt" in h:
+                await ws.send(encode_stomp("RECEIPT", {"receipt-id": h["receipt"]}))
+            return False
+        if "receipt" in h:
+            await ws.send(encode_stomp("RECEIPT", {"receipt-id": h["receipt"]}))
+        return True
+
+    async def _broadcast(self, destination: str, body: str, content_type: str = "application/json"):
+        self.published += 1
+        message_id = f"m-{self.published}"
+        targets = list(self._subs.get(destination, {}).items())
+        for (_, sub_id), ws in targets:
+            if self.drop_rate and self._rnd.random() < self.drop_rate:
+                self.dropped += 1
+                continue
+            ws.write_text(encode_stomp("MESSAGE", {
+                "destination": destination, "subscription": sub_id,
+                "message-id": message_id, "content-type": content_type,
+            }, body))
+        await asyncio.gather(*(ws.drain() for _, ws in targets), return_exceptions=True)
+
+
+# ── Triggers ─────────────────────────────────────────────────────────────────
+Publish = Callable[[str, str], Awaitable[None]]
+
+
+class MessageTrigger:
+    """Events are SENDs from the harness's publisher connection."""
+
+    sequential = False
+
+    def __init__(self, run_id: str, destination: str | None = None):
+        self.run_id = run_id
+        self.destination = destination or f"/topic/parity/fanout/{run_id}"
+
+    def reset(self) -> None:
+        pass
+
+    async def prepare(self, seq: int) -> None:
+        pass
+
+    async def fire(self, seq: int, publish: Publish) -> None:
+        await publish(self.destination, json.dumps({"run": self.run_id, "seq": seq}))
+
+    def index(self, data: Any, fired: int) -> int | None:
+        if isinstance(data, dict) and data.get("run") == self.run_id and isinstance(data.get("seq"), int):
+            return data["seq"]
+        return None
+
+    async def close(self) -> None:
+        pass
+
+
+class TurnTrigger:
+    """Events are turns of ``world_id``; ``run`` triggers one (blocking).
+
+    ``prepare`` (make the turn due, resume the daemon) runs before the clock
+    starts, ``finish`` (pause) after the last step.  Turn messages carry
+    only ``{year, month}``, so the n-th new month seen is event n.
+    """
+
+    sequential = True
+
+    def __init__(self, world_id: int, run: Callable[[], Any], *,
+                 prepare: Callable[[], Any] | None = None, finish: Callable[[], Any] | None = None):
+        self.destination = f"/topic/world/{world_id}/turn"
+        self._run = run
+        self._prepare = prepare
+        self._finish = finish
+        self._months: dict[tuple, int] = {}
+
+    def reset(self) -> None:
+        self._months = {}
+
+    async def prepare(self, seq: int) -> None:
+        if self._prepare:
+            await asyncio.get_running_loop().run_in_executor(None, self._prepare)
+
+    async def fire(self, seq: int, publish: Publish) -> None:
+        await asyncio.get_running_loop().run_in_executor(None, self._run)
+
+    def index(self, data: Any, fired: int) -> int | None:
+        if not isinstance(data, dict) or "month" not in data:
+            return None
+        key = (data.get("year"), data.get("month"))
+        if key not in self._months:
+            if len(self._months) >= fired:
+                return None             # a turn nobody here triggered
+            self._months[key] = len(self._months)
+        return self._months[key]
+
+    async def close(self) -> None:
+        if self._finish:
+            await asyncio.get_running_loop().run_in_executor(None, self._finish)
+
+
+# ── Harness ──────────────────────────────────────────────────────────────────
+@dataclass
+class Subscriber:
+    client: StompClient
+    ready: bool = False
+    alive: bool = True
+    counted: bool = False       # ready when the current step started
+    seen: set = field(default_factory=set)
+    task: asyncio.Task | None = None
+
+
+class FanoutHarness:
+    """Grows a subscriber pool on one destination and times each event's fan-out.
+
+    ``tokens`` are dealt to subscribers round-robin (``None`` = no
+    Authorization header); the publisher uses the first.
+    """
+
+    def __init__(self, url: str, trigger: MessageTrigger | TurnTrigger, *,
+                 tokens: list[str | None] | None = None, timeout: float = DEFAULT_TIMEOUT,
+                 connect_concurrency: int = 200):
+        self.url = url
+        self.trigger = trigger
+        self.destination = trigger.destination
+        self.tokens = tokens or [None]
+        self.timeout = timeout
+        self.connect_concurrency = connect_concurrency
+        self.run_id = uuid.uuid4().hex[:12]
+        self.subscribers: list[Subscriber] = []
+        self.connect_errors: Counter = Counter()
+        self.connect_hist = Histogram()
+        self.publisher: StompClient | None = None
+        self._reset_step(0)
+
+    def _reset_step(self, ready: int):
+        self._ready_count = ready
+        self._fired: dict[int, float] = {}
+        self._times: dict[int, list[float]] = defaultdict(list)
+        self._done: dict[int, asyncio.Event] = {}
+        self._duplicates = 0
+        self._unexpected = 0
+
+    # ── connections ──
+    async def _open_one(self, i: int, sem: asyncio.Semaphore):
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                client = await StompClient.connect(self.url, token=self.tokens[i % len(self.tokens)],
+                                                   timeout=self.timeout)
+                await client.subscribe(self.destination)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, StompError) as e:
+                self.connect_errors[type(e).__name__] += 1
+                return
+            self.connect_hist.record(int((time.perf_counter() - t0) * 1e6))
+        sub = Subscriber(client)
+        sub.task = asyncio.create_task(self._listen(sub))
+        self.subscribers.append(sub)
+
+    async def grow(self, n: int) -> None:
+        """Open subscribers until ``n`` have been attempted in total."""
+        attempted = len(self.subscribers) + sum(self.connect_errors.values())
+        sem = asyncio.Semaphore(self.connect_concurrency)
+        await asyncio.gather(*(self._open_one(i, sem) for i in range(attempted, n)))
+
+    async def _publish(self, destination: str, body: str) -> None:
+        if self.publisher is None or self.publisher.ws.closed:
+            self.publisher = await StompClient.connect(self.url, token=self.tokens[0], timeout=self.timeout)
+        await self.publisher.send(destination, body)
+
+    async def _listen(self, sub: Subscriber):
+        try:
+            while (frame := await sub.client.recv()) is not None:
+                if frame.command == "MESSAGE":
+                    self._deliver(sub, frame.body)
+                elif frame.command == "ERROR":
+                    break
+        finally:
+            sub.alive = False
+
+    def _deliver(self, sub: Subscriber, body: str):
+        t = time.perf_counter()
+        try:
+            data = json.loads(body)
+        except ValueError:
+            self._unexpected += 1
+            return
+        if isinstance(data, dict) and data.get("probe") == self.run_id:
+            sub.ready = True
+            return
+        if not sub.counted:
+            return
+        seq = self.trigger.index(data, len(self._fired))
+        if seq is None or seq not in self._fired:
+            self._unexpected += 1
+            return
+        if seq in sub.seen:
+            self._duplicates += 1
+            return
+        sub.seen.add(seq)
+        times = self._times[seq]
+        times.append(t)
+        if len(times) >= self._ready_count:
+            self._done[seq].set()
+
+    async def _await_ready(self) -> None:
+        """Probe until every live subscriber has a working subscription."""
+        deadline = time.perf_counter() + self.timeout
+        while any(s.alive and not s.ready for s in self.subscribers) and time.perf_counter() < deadline:
+            await self._publish(self.destination, json.dumps({"probe": self.run_id}))
+            await asyncio.sleep(PROBE_INTERVAL)
+
+    # ── measurement ──
+    async def step(self, events: int, interval: float) -> dict:
+        await self._await_ready()
+        ready = [s for s in self.subscribers if s.alive and s.ready]
+        for s in self.subscribers:
+            s.counted = s.alive and s.ready
+            s.seen.clear()
+        self._reset_step(len(ready))
+        self.trigger.reset()
+        start = time.perf_counter()
+        for seq in range(events):
+            delay = start + seq * interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await self.trigger.prepare(seq)
+            self._done[seq] = asyncio.Event()
+            if not ready:
+                self._done[seq].set()
+            self._fired[seq] = time.perf_counter()
+            await self.trigger.fire(seq, self._publish)
+            if self.trigger.sequential:
+                await self._wait(self._done[seq].wait())
+        await self._wait(asyncio.gather(*(e.wait() for e in self._done.values())))
+        return self.report(events, len(ready))
+
+    async def _wait(self, aw) -> None:
+        try:
+            await asyncio.wait_for(aw, self.timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def report(self, events: int, ready: int) -> dict:
+        latency, spread, completion = Histogram(), Histogram(), Histogram()
+        delivered = 0
+        window = 0.0
+        for seq, fired in self._fired.items():
+            times = self._times.get(seq, [])
+            delivered += len(times)
+            if not times:
+                continue
+            first, last = min(times), max(times)
+            for t in times:
+                latency.record(max(0, int((t - fired) * 1e6)))
+                spread.record(int((t - first) * 1e6))
+            completion.record(max(0, int((last - fired) * 1e6)))
+            window += last - fired
+        expected = ready * events
+        return {
+            "subscribers": len(self.subscribers) + sum(self.connect_errors.values()),
+            "connected": len(self.subscribers),
+            "connect_errors": dict(self.connect_errors),
+            "ready": ready,
+            "lost": sum(1 for s in self.subscribers if not s.alive),
+            "events": events,
+            "expected": expected,
+            "delivered": delivered,
+            "dropped": expected - delivered,
+            "drop_rate": round((expected - delivered) / expected, 6) if expected else 0.0,
+            "duplicates": self._duplicates,
+            "unexpected": self._unexpected,
+            "deliveries_per_s": round(delivered / window, 1) if window else None,
+            "latency_ms": latency.summary(1000),
+            "spread_ms": spread.summary(1000),
+            "completion_ms": completion.summary(1000),
+            "distribution_ms": latency.percentile_distribution(1000),
+        }
+
+    async def run(self, steps: list[int], *, events: int = DEFAULT_EVENTS, interval: float = 0.2) -> dict:
+        """One step per subscriber count (ascending; the pool only grows)."""
+        start = time.perf_counter()
+        results = []
+        try:
+            for n in sorted(steps):
+                await self.grow(n)
+                results.append(await self.step(events, interval))
+                results[-1]["connect_ms"] = self.connect_hist.summary(1000)
+        finally:
+            await self.close()
+        return {
+            "url": self.url,
+            "trigger": "turn" if self.trigger.sequential else "message",
+            "destination": self.destination,
+            "events": events,
+            "interval": interval,
+            "seconds": round(time.perf_counter() - start, 3),
+            "steps": results,
+        }
+
+    async def close(self) -> None:
+        await self.trigger.close()
+        clients = [s.client for s in self.subscribers] + ([self.publisher] if self.publisher else [])
+        await asyncio.gather(*(c.close() for c in clients), return_exceptions=True)
+        for s in self.subscribers:
+            if s.task:
+                s.task.cancel()
+        await asyncio.gather(*(s.task for s in self.subscribers if s.task), return_exceptions=True)
+
+
+# ── CLI ──────────────────────────────────────────────────────────────────────
+def ws_url(http_base: str) -> str:
+    """``/ws/websocket`` on the host of an ``http(s)://`` base URL."""
+    parts = urlsplit(http_base)
+    scheme = "wss" if parts.scheme == "https" else "ws"
+    return f"{scheme}://{parts.netloc}{WS_PATH}"
+
+
+def _raise_fd_limit() -> None:
+    try:
+        import resource
+    except ImportError:
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft != hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def _login_tokens(base: str, count: int, *, login_prefix: str, password: str, register: bool) -> list[str]:
+    from loadgen import login_user
+
+    with ThreadPoolExecutor(max_workers=min(32, count), thread_name_prefix="login") as executor:
+        clients = list(executor.map(
+            lambda i: login_user(base, f"{login_prefix}{i:04d}", password, register), range(count)))
+    return [c.token for c in clients]
+
+
+def _stack_trigger(args, admin, game_base: str):
+    if args.trigger == "message":
+        return MessageTrigger(uuid.uuid4().hex[:12])
+    from conftest import NewClient, connect_new_db
+    from turn_bench import make_due
+
+    game = NewClient(game_base)
+    conn = connect_new_db()
+
+    def finish():
+        try:
+            game.post("/internal/turn/pause").raise_for_status()
+        finally:
+            conn.close()
+
+    def prepare():
+        make_due(conn, args.world)
+        game.post("/internal/turn/resume").raise_for_status()
+
+    return TurnTrigger(args.world, lambda: admin.post("/api/turns/run").raise_for_status(),
+                       prepare=prepare, finish=finish)
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", default=None, help="STOMP WebSocket URL (default: game-app's /ws/websocket)")
+    ap.add_argument("--game-base", default=os.environ.get("NEW_GAME_BASE_URL"),
+                    help="game-app base URL (default: gateway route table)")
+    ap.add_argument("--world", type=int, default=1)
+    ap.add_argument("--trigger", choices=("message", "turn"), default="message")
+    ap.add_argument("--subscribers", default=",".join(map(str, DEFAULT_STEPS)),
+                    help="comma-separated subscriber counts, one step each")
+    ap.add_argument("--events", type=int, default=DEFAULT_EVENTS, help="events per step")
+    ap.add_argument("--interval", type=float, default=0.2, help="seconds between message events")
+    ap.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                    help="seconds to wait for deliveries (and connects)")
+    ap.add_argument("--connect-concurrency", type=int, default=200)
+    ap.add_argument("--accounts", type=int, default=20, help="logged-in users whose tokens subscribers share")
+    ap.add_argument("--login-prefix", default="fanout")
+    ap.add_argument("--password", default="fanout123")
+    ap.add_argument("--register", action="store_true", help="register the accounts first")
+    ap.add_argument("--admin-login", default=os.environ.get("ADMIN_LOGIN_ID"))
+    ap.add_argument("--admin-password", default=os.environ.get("ADMIN_PASSWORD"))
+    ap.add_argument("--stand-in", action="store_true", help="run against an in-process stand-in broker")
+    ap.add_argument("--drop-rate", type=float, default=0.0, help="stand-in only: share of deliveries dropped")
+    ap.add_argument("--out", default=None, help="write the JSON report here")
+    args = ap.parse_args(argv)
+    steps = [int(s) for s in args.subscribers.split(",") if s]
+
+    _raise_fd_limit()
+    if args.stand_in:
+        with StandInBroker(world_id=args.world, drop_rate=args.drop_rate) as broker:
+            import requests
+
+            trigger = (MessageTrigger(uuid.uuid4().hex[:12]) if args.trigger == "message" else
+                       TurnTrigger(args.world, lambda: requests.post(f"{broker.base}/api/turns/run",
+                                                                     timeout=30).raise_for_status()))
+            tokens = [f"stand-in-{i}" for i in range(args.accounts)]
+            harness = FanoutHarness(broker.url, trigger, tokens=tokens, timeout=args.timeout,
+                                    connect_concurrency=args.connect_concurrency)
+            report = asyncio.run(harness.run(steps, events=args.events, interval=args.interval))
+            report["stand_in"] = {"published": broker.published, "dropped": broker.dropped}
+    else:
+        from conftest import NEW_BASE, NewClient
+        from turn_bench import game_base_url
+
+        admin = NewClient(NEW_BASE)
+        if args.admin_login:
+            admin.login(args.admin_login, args.admin_password)
+        game_base = args.game_base or game_base_url(admin, args.world)
+        tokens = _login_tokens(NEW_BASE, args.accounts, login_prefix=args.login_prefix,
+                               password=args.password, register=args.register)
+        harness = FanoutHarness(args.url or ws_url(game_base), _stack_trigger(args, admin, game_base),
+                                tokens=tokens, timeout=args.timeout,
+                                connect_concurrency=args.connect_concurrency)
+        report = asyncio.run(harness.run(steps, events=args.events, interval=args.interval))
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    for step in report["steps"]:
+        lat = step["latency_ms"]
+        print(f"{step['connected']:>6}/{step['subscribers']} subscribers: p50={lat['p50']}ms "
+              f"p99={lat['p99']}ms max={lat['max']}ms dropped={step['dropped']} "
+              f"({step['drop_rate']:.2%}) {step['deliveries_per_s']}/s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
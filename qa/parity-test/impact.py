@@ -0,0 +1,535 @@
+#!/usr/bin/env python3
+"""
+Change-impact selection for the parity suites.
+
+Maps a git diff to the parity tests it can affect, through two indexes built
+from source on every run (a few hundred milliseconds):
+
+  - **tests → endpoints**: each ``tests/test_0*.py`` test is walked with
+    ``ast`` — its own string literals, the module constants it reads, the
+    same-module / helper-module functions it calls and its class's autouse
+    fixtures — and every ``/api/...`` path or legacy ``Group/Action`` path
+    found is recorded.  Tests taking ``legacy_db`` / ``new_db`` / ``schema``
+    are also marked as reading the databases.
+  - **endpoints → sources**: ``@RequestMapping`` / ``@GetMapping`` … on the
+    backend's controllers give each route's file; a Kotlin reference graph
+    (imports, same-package names, and supertype → implementor edges for
+    Spring injection) gives every file the controllers that reach it.
+    Gateway controllers win over game-app ones, as in Spring; anything else
+    under ``/api/**`` goes through the gateway's catch-all proxy.
+
+A changed controller or anything a controller reaches selects the tests
+whose endpoints resolve to that controller (an endpoint no controller serves
+is charged to every game-app controller, since any of them could start
+serving it).  Changes the index cannot attribute — build files, resources
+and migrations, gateway filters, scheduler-only engine code, conftest —
+select everything; docs and the frontend select nothing.
+
+    python impact.py origin/main                    # node IDs, one per line
+    python impact.py origin/main --explain          # ... with reasons on stderr
+    python impact.py origin/main --out /results/selection.txt
+    pytest tests/ --changed-since origin/main       # same, inside pytest
+
+The selection file holds node IDs, or ``*`` for a full run; conftest reads it
+from ``PARITY_SELECTION`` so CI can compute it on the host (where the git
+checkout is) and hand it to the runner container.
+"""
+from __future__ import annotations
+
+import argparse
+import ast
+import fnmatch
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.abspath(os.path.join(HERE, "..", ".."))
+TESTS_DIR = os.path.join(HERE, "tests")
+PARITY_TESTS = "test_0*.py"
+FULL = "*"
+
+# Backend apps in Spring resolution order: the gateway's own controllers
+# first, the game-app behind its catch-all proxy.
+APPS = (
+    ("gateway", "backend/gateway-app/src/main/kotlin"),
+    ("game", "backend/game-app/src/main/kotlin"),
+    ("shared", "backend/shared/src/main/kotlin"),
+)
+DB_FIXTURES = {"legacy_db", "new_db", "schema"}
+# Packages whose changes reach the tests through the databases, not routes.
+DB_PACKAGES = ("/entity/", "/repository/", "/bootstrap/")
+
+# (glob, action) — first match wins; "full", "ignore", or a handler name.
+PATH_RULES = (
+    ("qa/parity-test/tests/test_0*.py", "test_file"),
+    ("qa/parity-test/tests/*", "ignore"),        # offline unit tests
+    ("qa/parity-test/conftest.py", "full"),
+    ("qa/parity-test/*.py", "helper"),
+    ("qa/parity-test/*", "full"),                # Dockerfile, requirements
+    ("qa/docker-compose.parity.yml", "full"),
+    ("qa/setup-legacy-docker/*", "full"),
+    ("qa/*", "ignore"),
+    ("backend/*/src/test/*", "ignore"),
+    ("backend/*/src/main/kotlin/*.kt", "kotlin"),
+    ("backend/*", "full"),                       # resources, migrations, gradle
+    ("legacy/*/API/*/*.php", "legacy_api"),
+    ("legacy/*", "full"),
+)
+
+NEW_ENDPOINT = re.compile(r"^/api/[^\s]*$")
+LEGACY_ENDPOINT = re.compile(r"^[A-Z][A-Za-z]+/[A-Z][A-Za-z]+$")
+
+
+# ── Endpoint patterns ────────────────────────────────────────────────────────
+def _segments(path: str) -> list[str]:
+    return [s for s in path.split("?")[0].split("/") if s]
+
+
+def _is_var(segment: str) -> bool:
+    return segment.startswith("{") and segment.endswith("}")
+
+
+def path_matches(route: str, endpoint: str) -> bool:
+    """Spring route pattern vs. a test endpoint (whose ``{}`` are wildcards too)."""
+    r, e = _segments(route), _segments(endpoint)
+    for i, seg in enumerate(r):
+        if seg == "**":
+            return True
+        if i >= len(e):
+            return False
+        if not (_is_var(seg) or _is_var(e[i]) or seg == e[i]):
+            return False
+    return len(r) == len(e)
+
+
+# ── Backend index ────────────────────────────────────────────────────────────
+@dataclass(frozen=True)
+class Route:
+    method: str
+    pattern: str
+    file: str
+    app: str
+
+
+_PACKAGE = re.compile(r"^package\s+([\w.]+)", re.M)
+_IMPORT = re.compile(r"^import\s+([\w.]+?)(\.\*)?(?:\s+as\s+(\w+))?\s*$", re.M)
+_TYPE_DECL = re.compile(r"\b(?:class|interface|object|typealias)\s+([A-Za-z_]\w*)")
+_TOP_DECL = re.compile(
+    r"^(?:(?:internal|public|inline|suspend|operator|infix|const)\s+)*"
+    r"(?:fun\s+(?:<[^>]*>\s*)?(?:[\w.<>?]+\.)?|val\s+|var\s+)([A-Za-z_]\w*)",
+    re.M,
+)
+_IDENT = re.compile(r"\b[A-Za-z_]\w*\b")
+# Strings and comments, so names mentioned in KDoc or log messages are not
+# taken for references.
+_NOISE = re.compile(r'"""[\s\S]*?"""|"(?:\\.|[^"\\\n])*"|//[^\n]*|/\*[\s\S]*?\*/')
+_CAP_IDENT = re.compile(r"\b[A-Z]\w*\b")
+_MAPPING = re.compile(r"@(Get|Post|Put|Delete|Patch|Request)Mapping\b(?:\(\s*(?:value\s*=\s*|path\s*=\s*)?\[?\s*\"([^\"]*)\")?")
+_CLASS_LINE = re.compile(r"^(?:\w+\s+)*class\s+\w+", re.M)
+_CONTROLLER = re.compile(r"^@(?:Rest)?Controller\b", re.M)
+
+
+def _supertypes(text: str, start: int) -> list[str]:
+    """Capitalised names after the ``:`` of the class header starting at ``start``."""
+    depth = 0
+    colon = None
+    for i in range(start, min(len(text), start + 4000)):
+        ch = text[i]
+        if ch in "(<[":
+            depth += 1
+        elif ch in ")>]":
+            depth -= 1
+        elif depth == 0 and ch == "{":
+            break
+        elif depth == 0 and ch == ":" and colon is None:
+            colon = i
+        elif depth == 0 and ch == "\n" and colon is not None and not text[colon:i].rstrip().endswith((",", ":")):
+            break
+    else:
+        i = min(len(text), start + 4000)
+    if colon is None:
+        return []
+    return _CAP_IDENT.findall(text[colon:i])
+
+
+@dataclass
+class BackendIndex:
+    root: str
+    routes: list[Route] = field(default_factory=list)
+    controllers: set[str] = field(default_factory=set)
+    app_of: dict[str, str] = field(default_factory=dict)
+    # reverse reference graph: file → files that use it
+    used_by: dict[str, set[str]] = field(default_factory=lambda: defaultdict(set))
+
+    def reaching_controllers(self, path: str) -> set[str]:
+        """Controllers that (transitively) use ``path``; includes itself."""
+        seen, stack = {path}, [path]
+        while stack:
+            for user in self.used_by.get(stack.pop(), ()):
+                if user not in seen:
+                    seen.add(user)
+                    stack.append(user)
+        return seen & self.controllers
+
+    def resolve(self, endpoint: str) -> set[str]:
+        """Controller files an HTTP request to ``endpoint`` can reach."""
+        gateway = [r for r in self.routes if r.app == "gateway" and "**" not in r.pattern
+                   and path_matches(r.pattern, endpoint)]
+        if gateway:
+            return {r.file for r in gateway}
+        proxy = {r.file for r in self.routes if r.app == "gateway" and path_matches(r.pattern, endpoint)}
+        game = {r.file for r in self.routes if r.app == "game" and path_matches(r.pattern, endpoint)}
+        if not game:
+            game = {c for c in self.controllers if self.app_of[c] == "game"}
+        return proxy | game
+
+
+def scan_backend(root: str = REPO_ROOT) -> BackendIndex:
+    index = BackendIndex(root)
+    files: dict[str, str] = {}
+    for app, rel in APPS:
+        base = os.path.join(root, rel)
+        for dirpath, _, names in os.walk(base):
+            for name in names:
+                if name.endswith(".kt"):
+                    path = os.path.relpath(os.path.join(dirpath, name), root)
+                    with open(os.path.join(root, path), encoding="utf-8") as f:
+                        files[path] = f.read()
+                    index.app_of[path] = app
+
+    package_of: dict[str, str] = {}
+    declared: dict[str, set[str]] = defaultdict(set)       # FQN → files
+    by_package: dict[str, dict[str, set[str]]] = defaultdict(lambda: defaultdict(set))
+    code = {path: _NOISE.sub(" ", text) for path, text in files.items()}
+    for path, text in code.items():
+        m = _PACKAGE.search(text)
+        package = m.group(1) if m else ""
+        package_of[path] = package
+        for name in set(_TYPE_DECL.findall(text)) | set(_TOP_DECL.findall(text)):
+            declared[f"{package}.{name}"].add(path)
+            by_package[package][name].add(path)
+
+    for path, text in code.items():
+        package = package_of[path]
+        names: dict[str, set[str]] = defaultdict(set)
+        for name, paths in by_package[package].items():
+            names[name] |= paths
+        for fqn, star, alias in _IMPORT.findall(text):
+            if star:
+                for name, paths in by_package.get(fqn, {}).items():
+                    names[name] |= paths
+            elif fqn in declared:
+                names[alias or fqn.rsplit(".", 1)[-1]] |= declared[fqn]
+        for ident in set(_IDENT.findall(text)):
+            for used in names.get(ident, ()):
+                if used != path:
+                    index.used_by[used].add(path)
+        # Callers of an interface / base class reach its implementations.
+        for m in _TYPE_DECL.finditer(text):
+            for sup in _supertypes(text, m.end()):
+                for base_file in names.get(sup, ()):
+                    if base_file != path:
+                        index.used_by[path].add(base_file)
+
+        annotation = _CONTROLLER.search(files[path])
+        if annotation:
+            index.controllers.add(path)
+            text = files[path]
+            # Class-level mapping sits between the annotation and ``class``.
+            cls = _CLASS_LINE.search(text, annotation.end())
+            split = cls.start() if cls else annotation.end()
+            prefix = ""
+            for m in _MAPPING.finditer(text, annotation.start(), split):
+                if m.group(1) == "Request":
+                    prefix = m.group(2) or ""
+            for m in _MAPPING.finditer(text, split):
+                method = "ANY" if m.group(1) == "Request" else m.group(1).upper()
+                pattern = "/" + "/".join(_segments(prefix) + _segments(m.group(2) or ""))
+                index.routes.append(Route(method, pattern, path, index.app_of[path]))
+    return index
+
+
+# ── Test index ───────────────────────────────────────────────────────────────
+@dataclass
+class IndexedTest:
+    nodeid: str
+    file: str
+    endpoints: set[str] = field(default_factory=set)
+    reads_db: bool = False
+
+
+def _render(node: ast.AST) -> str | None:
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    if isinstance(node, ast.JoinedStr):
+        return "".join(v.value if isinstance(v, ast.Constant) else "{}" for v in node.values)
+    return None
+
+
+def _endpoint(text: str) -> str | None:
+    if NEW_ENDPOINT.match(text) or LEGACY_ENDPOINT.match(text):
+        return text
+    return None
+
+
+class _Module:
+    """One parsed Python module of the parity suite and its local imports."""
+
+    _cache: dict[str, "_Module | None"] = {}
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, encoding="utf-8") as f:
+            self.tree = ast.parse(f.read(), path)
+        self.functions: dict[str, ast.AST] = {}
+        self.classes: dict[str, dict[str, ast.AST]] = {}
+        self.constants: dict[str, ast.AST] = {}
+        self.imported: dict[str, tuple[str, str | None]] = {}   # local name → (module, attr)
+        for node in self.tree.body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                self.functions[node.name] = node
+            elif isinstance(node, ast.ClassDef):
+                self.classes[node.name] = {
+                    n.name: n for n in node.body if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))
+                }
+            elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+                targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+                for t in targets:
+                    if isinstance(t, ast.Name) and node.value is not None:
+                        self.constants[t.id] = node.value
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                for alias in node.names:
+                    self.imported[alias.asname or alias.name] = (node.module, alias.name)
+            elif isinstance(node, ast.Import):
+                for alias in node.names:
+                    self.imported[alias.asname or alias.name] = (alias.name, None)
+
+    @classmethod
+    def load(cls, name: str) -> "_Module | None":
+        """A module of the parity suite by import name (``None`` if external)."""
+        if name not in cls._cache:
+            path = os.path.join(HERE, *name.split(".")) + ".py"
+            cls._cache[name] = cls(path) if os.path.exists(path) else None
+        return cls._cache[name]
+
+    def local_imports(self) -> set[str]:
+        return {mod for mod, _ in self.imported.values() if self.load(mod) is not None}
+
+
+def _strings(module: _Module, node: ast.AST, cls: str | None, seen: set) -> set[str]:
+    """Endpoint strings used by ``node``, following local calls and constants."""
+    key = (module.path, id(node))
+    if key in seen:
+        return set()
+    seen.add(key)
+    found: set[str] = set()
+    for sub in ast.walk(node):
+        text = _render(sub)
+        if text is not None:
+            ep = _endpoint(text)
+            if ep:
+                found.add(ep)
+            continue
+        if isinstance(sub, ast.Name) and sub.id in module.constants:
+            found |= _strings(module, module.constants[sub.id], None, seen)
+        elif isinstance(sub, ast.Name) and sub.id in module.functions:
+            found |= _strings(module, module.functions[sub.id], None, seen)
+        elif isinstance(sub, ast.Name) and sub.id in module.imported:
+            mod, attr = module.imported[sub.id]
+            other = _Module.load(mod)
+            if other and attr:
+                target = other.functions.get(attr) or other.constants.get(attr)
+                if target is not None:
+                    found |= _strings(other, target, None, seen)
+        elif isinstance(sub, ast.Attribute) and isinstance(sub.value, ast.Name):
+            if sub.value.id == "self" and cls and sub.attr in module.classes[cls]:
+                found |= _strings(module, module.classes[cls][sub.attr], cls, seen)
+            elif sub.value.id in module.imported:
+                other = _Module.load(module.imported[sub.value.id][0])
+                target = other and (other.functions.get(sub.attr) or other.constants.get(sub.attr))
+                if target is not None:
+                    found |= _strings(other, target, None, seen)
+    return found
+
+
+def _is_autouse(fn: ast.AST) -> bool:
+    for dec in getattr(fn, "decorator_list", ()):
+        if isinstance(dec, ast.Call) and any(
+            k.arg == "autouse" and isinstance(k.value, ast.Constant) and k.value.value for k in dec.keywords
+        ):
+            return True
+    return False
+
+
+def _params(fn: ast.AST) -> set[str]:
+    return {a.arg for a in fn.args.args}
+
+
+def scan_tests(tests_dir: str = TESTS_DIR) -> list[IndexedTest]:
+    tests = []
+    for name in sorted(os.listdir(tests_dir)):
+        if not fnmatch.fnmatch(name, PARITY_TESTS):
+            continue
+        module = _Module.load(f"tests.{name[:-3]}")
+        rel = f"tests/{name}"
+        autouse = [f for f in module.functions.values() if _is_autouse(f)]
+        groups = [(None, module.functions)] + list(module.classes.items())
+        for cls, members in groups:
+            setup = autouse + [f for f in members.values() if cls and _is_autouse(f)]
+            for fname, fn in members.items():
+                if not fname.startswith("test"):
+                    continue
+                info = IndexedTest(f"{rel}::{cls}::{fname}" if cls else f"{rel}::{fname}", rel)
+                for node in [fn] + setup:
+                    info.endpoints |= _strings(module, node, cls, set())
+                    info.reads_db |= bool(DB_FIXTURES & _params(node))
+                for dec in fn.decorator_list:    # skipif / parametrize arguments
+                    info.endpoints |= _strings(module, dec, cls, set())
+                tests.append(info)
+    return tests
+
+
+def import_closure(name: str) -> set[str]:
+    """Local modules ``name`` imports, transitively (including itself)."""
+    seen, stack = {name}, [name]
+    while stack:
+        module = _Module.load(stack.pop())
+        for dep in module.local_imports() if module else ():
+            if dep not in seen:
+                seen.add(dep)
+                stack.append(dep)
+    return seen
+
+
+# ── Selection ────────────────────────────────────────────────────────────────
+@dataclass
+class Selection:
+    full: bool = False
+    tests: dict[str, list[str]] = field(default_factory=lambda: defaultdict(list))
+    reasons: list[str] = field(default_factory=list)
+
+    def nodeids(self) -> list[str]:
+        return [FULL] if self.full else sorted(self.tests)
+
+    def keeps(self, nodeid: str) -> bool:
+        """Whether a collected item (possibly parametrized) is selected."""
+        if self.full or not fnmatch.fnmatch(os.path.basename(nodeid.split("::")[0]), PARITY_TESTS):
+            return True
+        return nodeid.split("[")[0] in self.tests
+
+
+def _rule(path: str) -> str:
+    for pattern, action in PATH_RULES:
+        if fnmatch.fnmatch(path, pattern):
+            return action
+    return "ignore"
+
+
+def select(changed: list[str], *, backend: BackendIndex | None = None,
+           tests: list[IndexedTest] | None = None) -> Selection:
+    """Parity tests affected by ``changed`` (repo-relative paths)."""
+    sel = Selection()
+    tests = tests if tests is not None else scan_tests()
+    backend_needed = any(_rule(p) == "kotlin" for p in changed)
+    if backend_needed and backend is None:
+        backend = scan_backend()
+    resolved: dict[str, set[str]] = {}
+
+    def add(info: IndexedTest, reason: str):
+        sel.tests[info.nodeid].append(reason)
+
+    for path in changed:
+        action = _rule(path)
+        if action == "ignore":
+            continue
+        if action == "full":
+            sel.full = True
+            sel.reasons.append(f"{path}: not attributable, running everything")
+        elif action == "test_file":
+            for t in tests:
+                if t.file == os.path.relpath(path, "qa/parity-test"):
+                    add(t, f"{path}: test file changed")
+        elif action == "helper":
+            module = os.path.splitext(os.path.basename(path))[0]
+            for t in tests:
+                if module in import_closure(t.file[:-3].replace("/", ".")):
+                    add(t, f"{path}: imported by the test module")
+        elif action == "legacy_api":
+            endpoint = "/".join(path[:-4].split("/")[-2:])
+            for t in tests:
+                if endpoint in t.endpoints:
+                    add(t, f"{path}: serves {endpoint}")
+        elif action == "kotlin":
+            if path not in backend.app_of:
+                continue                 # deleted file: its users changed too
+            controllers = backend.reaching_controllers(path)
+            db_change = any(p in path for p in DB_PACKAGES)
+            if not controllers and not db_change:
+                sel.full = True
+                sel.reasons.append(f"{path}: reaches no controller, running everything")
+                continue
+            for t in tests:
+                hits = set()
+                for ep in t.endpoints:
+                    if ep.startswith("/"):
+                        if ep not in resolved:
+                            resolved[ep] = backend.resolve(ep)
+                        if resolved[ep] & controllers:
+                            hits.add(ep)
+                if hits:
+                    add(t, f"{path}: behind {', '.join(sorted(hits))}")
+                elif db_change and t.reads_db:
+                    add(t, f"{path}: persisted state read by the test")
+    return sel
+
+
+def changed_files(base: str, *, root: str = REPO_ROOT) -> list[str]:
+    """Paths changed between ``base`` and the working tree (committed or not)."""
+    out = subprocess.run(
+        ["git", "diff", "--name-only", base], cwd=root, check=True, capture_output=True, text=True,
+    ).stdout
+    return [line for line in out.splitlines() if line]
+
+
+def select_since(base: str) -> Selection:
+    return select(changed_files(base))
+
+
+def read_selection(path: str) -> Selection:
+    with open(path, encoding="utf-8") as f:
+        ids = [line.strip() for line in f if line.strip()]
+    sel = Selection(full=FULL in ids)
+    for nodeid in ids:
+        if nodeid != FULL:
+            sel.tests[nodeid].append(f"listed in {path}")
+    return sel
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("base", help="git ref to diff the working tree against, e.g. origin/main")
+    parser.add_argument("--out", help="write the selection here instead of stdout")
+    parser.add_argument("--explain", action="store_true", help="print why each test was selected")
+    args = parser.parse_args(argv)
+
+    sel = select_since(args.base)
+    lines = "\n".join(sel.nodeids())
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(lines + "\n" if lines else "")
+    else:
+        print(lines)
+    if args.explain:
+        for reason in sel.reasons:
+            print(reason, file=sys.stderr)
+        for nodeid, why in sorted(sel.tests.items()):
+            print(f"{nodeid}\n    " + "\n    ".join(why), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
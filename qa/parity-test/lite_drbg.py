@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Pure-Python port of the engine's ``LiteHashDRBG`` / ``DeterministicRng``.
+
+Produces the same byte stream as ``com.opensam.engine.LiteHashDRBG`` (and the
+legacy PHP ``LiteHashDRBG``) for the same seed: block ``i`` is
+``SHA-512(seed_utf8 || int32_le(i))``.  Integer and float draws follow the
+Kotlin bit-masking / rejection rules exactly, so the parity suite can predict
+and compare RNG-dependent values instead of excluding them.
+
+Hashing is buffered ``REFILL_BLOCKS`` blocks at a time from a pre-hashed seed
+prefix, and ``legacy_ints`` / ``floats`` draw whole batches in one loop, which
+keeps millions of draws cheap.
+
+    rng = deterministic_rng("world-seed", "GeneralTurn", 190, 1, 42)
+    rng.next_legacy_int(99)
+    rng.legacy_ints(99, 1_000_000)
+
+    python lite_drbg.py --count 1000000   # draws/sec, scalar vs batched
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import struct
+import sys
+import time
+from typing import Any
+
+BUFFER_BYTE_SIZE = 64
+MAX_RNG_SUPPORT_BIT = 53
+MAX_INT = (1 << MAX_RNG_SUPPORT_BIT) - 1
+INT32_MAX = 2**31 - 1
+
+# SHA-512 blocks hashed per refill (4 KiB).
+REFILL_BLOCKS = 64
+
+_STATE = struct.Struct("<i")
+
+
+class LiteHashDRBG:
+    """SHA-512 counter-mode DRBG, byte-compatible with the Kotlin engine.
+
+    ``state_idx`` / ``buffer_idx`` have the Kotlin meaning: the next block
+    index to hash and the read offset into the current block.
+    """
+
+    def __init__(self, seed: str, state_idx: int = 0, buffer_idx: int = 0, *,
+                 refill_blocks: int = REFILL_BLOCKS):
+        if buffer_idx < 0:
+            raise ValueError(f"bufferIdx {buffer_idx} < 0")
+        if buffer_idx >= BUFFER_BYTE_SIZE:
+            raise ValueError(f"bufferIdx {buffer_idx} >= {BUFFER_BYTE_SIZE}")
+        if state_idx < 0:
+            raise ValueError(f"stateIdx {state_idx} < 0")
+        self.seed = seed
+        self._prefix = hashlib.sha512(seed.encode("utf-8"))
+        self._refill_blocks = max(1, refill_blocks)
+        self._next_block = state_idx
+        self._offset = state_idx * BUFFER_BYTE_SIZE  # absolute offset of _buf[0]
+        self._buf = b""
+        self._pos = 0
+        self._fill(BUFFER_BYTE_SIZE)
+        self._pos = buffer_idx
+
+    # ── Buffering ────────────────────────────────────────────────────────────
+    def _fill(self, need: int):
+        """Make at least ``need`` unread bytes available."""
+        tail = self._buf[self._pos:]
+        missing = need - len(tail)
+        blocks = max(self._refill_blocks, -(-missing // BUFFER_BYTE_SIZE))
+        prefix, pack = self._prefix, _STATE.pack
+        start = self._next_block
+        chunks = [tail]
+        for idx in range(start, start + blocks):
+            h = prefix.copy()
+            h.update(pack(idx))
+            chunks.append(h.digest())
+        self._next_block = start + blocks
+        self._offset += self._pos
+        self._buf = b"".join(chunks)
+        self._pos = 0
+
+    @property
+    def state(self) -> tuple[int, int]:
+        """``(stateIdx, bufferIdx)`` as the Kotlin instance would report them."""
+        consumed = self._offset + self._pos
+        return consumed // BUFFER_BYTE_SIZE + 1, consumed % BUFFER_BYTE_SIZE
+
+    def next_bytes(self, size: int) -> bytes:
+        if size <= 0:
+            raise ValueError(f"{size} <= 0")
+        if self._pos + size > len(self._buf):
+            self._fill(size)
+        pos = self._pos
+        self._pos = pos + size
+        return self._buf[pos:pos + size]
+
+    def _next_int_bits(self, bits: int) -> int:
+        n = (bits + 7) >> 3
+        if self._pos + n > len(self._buf):
+            self._fill(n)
+        pos = self._pos
+        self._pos = pos + n
+        return int.from_bytes(self._buf[pos:pos + n], "little") & ((1 << bits) - 1)
+
+    # ── Draws ────────────────────────────────────────────────────────────────
+    def next_bits_bytes(self, bits: int) -> bytes:
+        value = self._next_int_bits(bits)
+        return value.to_bytes((bits + 7) >> 3, "little")
+
+    def next_legacy_int(self, max_value: int | None = None) -> int:
+        """Uniform integer in ``[0, max_value]`` (``[max_value, 0]`` if negative)."""
+        if max_value is None or max_value == MAX_INT:
+            return self._next_int_bits(MAX_RNG_SUPPORT_BIT)
+        if max_value > MAX_INT:
+            raise ValueError("Over Max Int")
+        if max_value == 0:
+            return 0
+        if max_value < 0:
+            return -self.next_legacy_int(-max_value)
+        bits = max_value.bit_length()
+        n = self._next_int_bits(bits)
+        while n > max_value:
+            n = self._next_int_bits(bits)
+        return n
+
+    def next_float1(self) -> float:
+        """Uniform float in ``[0, 1]`` (inclusive, as in the engine)."""
+        top = 1 << MAX_RNG_SUPPORT_BIT
+        while True:
+            n = self._next_int_bits(MAX_RNG_SUPPORT_BIT + 1)
+            if n <= top:
+                return n / top
+
+    def next_bits(self, bit_count: int) -> int:
+        """Kotlin ``nextBits``: unsigned draw reinterpreted as a signed Int."""
+        if bit_count == 0:
+            return 0
+        if not 1 <= bit_count <= 32:
+            raise ValueError(f"bitCount must be in 0..32, but was {bit_count}")
+        n = self._next_int_bits(bit_count)
+        return n - (1 << 32) if n >= 1 << 31 else n
+
+    def next_int(self, a: int | None = None, b: int | None = None) -> int:
+        """``next_int()``, ``next_int(until)`` or ``next_int(from, until)``."""
+        if a is None:
+            return self.next_legacy_int(INT32_MAX)
+        if b is None:
+            if a <= 0:
+                raise ValueError("until must be positive")
+            return self.next_legacy_int(a - 1)
+        if a >= b:
+            raise ValueError("from must be less than until")
+        return self.next_legacy_int(b - a - 1) + a
+
+    def next_double(self) -> float:
+        return self.next_float1()
+
+    def next_long(self) -> int:
+        return self.next_legacy_int(MAX_INT)
+
+    def next_boolean(self) -> bool:
+        return self._next_int_bits(1) != 0
+
+    # ── Batched draws ────────────────────────────────────────────────────────
+    def _accepted(self, bits: int, limit: int, count: int) -> list[int]:
+        """``count`` draws of ``bits`` bits, rejecting values above ``limit``.
+
+        Consumes exactly the bytes the scalar rejection loop would, so scalar
+        and batched calls can be interleaved freely.
+        """
+        n = (bits + 7) >> 3
+        mask = (1 << bits) - 1
+        out: list[int] = []
+        while len(out) < count:
+            # Acceptance is > 1/2, so twice the remaining bytes usually suffices.
+            want = (count - len(out)) * n * 2
+            if self._pos + want > len(self._buf):
+                self._fill(want)
+            buf, pos = self._buf, self._pos
+            end = pos + (len(buf) - pos) // n * n
+            if n == 1:
+                draws = [b & mask for b in buf[pos:end]]
+            else:
+                from_bytes = int.from_bytes
+                draws = [from_bytes(buf[i:i + n], "little") & mask for i in range(pos, end, n)]
+            need = count - len(out)
+            for i, v in enumerate(draws):
+                if v <= limit:
+                    out.append(v)
+                    need -= 1
+                    if not need:
+                        self._pos = pos + (i + 1) * n
+                        return out
+            self._pos = end
+        return out
+
+    def legacy_ints(self, max_value: int, count: int) -> list[int]:
+        """``[next_legacy_int(max_value) for _ in range(count)]``, batched."""
+        if max_value is None or max_value == MAX_INT or max_value <= 0:
+            return [self.next_legacy_int(max_value) for _ in range(count)]
+        if max_value > MAX_INT:
+            raise ValueError("Over Max Int")
+        return self._accepted(max_value.bit_length(), max_value, count)
+
+    def floats(self, count: int) -> list[float]:
+        """``[next_float1() for _ in range(count)]``, batched."""
+        top = 1 << MAX_RNG_SUPPORT_BIT
+        scale = float(top)
+        return [v / scale for v in self._accepted(MAX_RNG_SUPPORT_BIT + 1, top, count)]
+
+
+def _tag(value: Any) -> str:
+    """Kotlin ``toString()`` for the tag types the engine passes."""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def deterministic_rng(hidden_seed: str, *tags: Any) -> LiteHashDRBG:
+    """Python twin of ``DeterministicRng.create(hiddenSeed, *tags)``."""
+    return LiteHashDRBG("|".join([hidden_seed, *map(_tag, tags)]))
+
+
+# ── Seeding both stacks ──────────────────────────────────────────────────────
+def seed_new_world(conn, hidden_seed: str, world_id: int | None = None) -> int:
+    """Write ``config.hiddenSeed`` on the new stack's ``world_state`` row(s).
+
+    Every engine RNG is ``DeterministicRng.create(world.config["hiddenSeed"], …)``,
+    so this pins the whole new-stack stream.  Returns the rows updated.
+    """
+    sql = "UPDATE world_state SET config = jsonb_set(config, '{hiddenSeed}', to_jsonb(%s::text))"
+    params: tuple = (hidden_seed,)
+    if world_id is not None:
+        sql += " WHERE id = %s"
+        params += (world_id,)
+    with conn.cursor() as cur:
+        cur.execute(sql, params)
+        return cur.rowcount
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--count", type=int, default=1_000_000)
+    ap.add_argument("--max", type=int, default=99)
+    args = ap.parse_args(argv)
+
+    scalar = LiteHashDRBG("bench")
+    batched = LiteHashDRBG("bench")
+    t0 = time.perf_counter()
+    a = [scalar.next_legacy_int(args.max) for _ in range(args.count)]
+    t1 = time.perf_counter()
+    b = batched.legacy_ints(args.max, args.count)
+    t2 = time.perf_counter()
+    if a != b or scalar.state != batched.state:
+        print("MISMATCH: batched draws differ from scalar draws", file=sys.stderr)
+        return 1
+    print(f"scalar  : {args.count / (t1 - t0) / 1e6:6.2f} M draws/s")
+    print(f"batched : {args.count / (t2 - t1) / 1e6:6.2f} M draws/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""
+Virtual-user load generator for the new stack's command endpoints.
+
+Keeps a pool of logged-in ``NewClient`` virtual users (one per general by
+default, i.e. ``defaultMaxGeneral`` = 600) and replays a command mix built
+from ``commands.COMMAND_MAP`` against
+
+  - ``GET  /api/generals/{gid}/turns``   (players looking at their queue)
+  - ``POST /api/generals/{gid}/turns``   (reserving 1–``MAX_RESERVE`` turns)
+
+at a fixed target rate.  Scheduling is open-loop: request ``i`` is due at
+``start + i / rate`` whether or not earlier requests have returned, and its
+latency is measured from that due time, so a stalled server shows up as
+latency instead of silently lowering the offered load (coordinated omission).
+``service`` histograms hold the time from actual send to response.
+
+Latencies are kept in HDR-style log-linear histograms (``timing.Histogram``)
+and reported per endpoint as p50/p95/p99/max plus error rates.
+
+    python loadgen.py --vus 600 --rate 300 --duration 60 --out /results/loadgen.json
+    python loadgen.py --stub --vus 50 --rate 200 --duration 5   # offline
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+from commands import COMMAND_MAP
+from timing import Histogram
+
+# Turns a general can hold in its queue (GeneralTurn.turnIdx 0..11).
+MAX_TURN_IDX = 12
+MAX_RESERVE = 3
+DEFAULT_GENERALS = 600
+
+TURNS_PATH = "/api/generals/{gid}/turns"
+ENDPOINTS = (f"GET {TURNS_PATH}", f"POST {TURNS_PATH}")
+
+# Share of operations that are reservations (the rest read the queue back).
+RESERVE_SHARE = 0.5
+
+# Relative weight of each COMMAND_MAP entry in a reservation: domestic
+# development and training dominate real turns, marches are rarer.
+COMMAND_WEIGHTS = {
+    "che_정비훈련": 3, "che_정비사기": 2, "che_징병": 3,
+    "che_상업투자": 5, "che_농업투자": 5, "che_치안강화": 3,
+    "che_수비강화": 2, "che_성벽보수": 2, "che_출병": 1,
+}
+
+# CommandRegistry name for each COMMAND_MAP key whose name differs from the
+# legacy code minus its ``che_`` prefix.
+NEW_ACTION_CODES = {
+    "che_정비훈련": "훈련",
+    "che_정비사기": "사기진작",
+    "che_농업투자": "농지개간",
+}
+
+
+def command_mix(command_map: dict | None = None) -> list[tuple[str, int]]:
+    """``[(action_code, weight)]`` for the new stack, from ``COMMAND_MAP``."""
+    if command_map is None:
+        command_map = COMMAND_MAP
+    return [
+        (NEW_ACTION_CODES.get(key, cmd["legacy_code"].removeprefix("che_")),
+         COMMAND_WEIGHTS.get(key, 1))
+        for key, cmd in command_map.items()
+    ]
+
+
+# ── Virtual users ────────────────────────────────────────────────────────────
+@dataclass
+class VirtualUser:
+    """One logged-in client and the generals it acts for."""
+    client: Any
+    general_ids: list[int]
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+def login_user(base: str, login_id: str, password: str, register: bool = False):
+    """Logged-in ``NewClient`` for ``login_id``, registering it first if asked."""
+    from conftest import NewClient
+
+    client = NewClient(base)
+    if register:
+        # Already-registered accounts just fail here and log in below.
+        client.post("/api/auth/register", {
+            "loginId": login_id, "password": password, "displayName": login_id,
+        })
+    client.login(login_id, password)
+    return client
+
+
+def list_general_ids(client, world_id: int, limit: int = DEFAULT_GENERALS) -> list[int]:
+    """Up to ``limit`` general ids of ``world_id`` (GET /api/worlds/{id}/generals)."""
+    r = client.get(f"/api/worlds/{world_id}/generals")
+    r.raise_for_status()
+    ids = sorted(g["id"] for g in r.json() if g.get("id") is not None)
+    return ids[:limit]
+
+
+async def open_pool(base: str, vus: int, general_ids: list[int], *,
+                    login_prefix: str, password: str, register: bool = False,
+                    executor: ThreadPoolExecutor | None = None) -> list[VirtualUser]:
+    """Log ``vus`` users in concurrently and deal ``general_ids`` out round-robin."""
+    if not general_ids:
+        raise ValueError("no generals to drive")
+    vus = max(1, min(vus, len(general_ids)))
+    loop = asyncio.get_running_loop()
+    clients = await asyncio.gather(*(
+        loop.run_in_executor(executor, login_user, base, f"{login_prefix}{i:04d}", password, register)
+        for i in range(vus)
+    ))
+    return [VirtualUser(c, general_ids[i::vus]) for i, c in enumerate(clients)]
+
+
+# ── Load generation ──────────────────────────────────────────────────────────
+@dataclass
+class Operation:
+    endpoint: str
+    general_id: int
+    body: dict | None = None
+
+
+class LoadGenerator:
+    """Open-loop request scheduler over a pool of virtual users."""
+
+    def __init__(self, users: list[VirtualUser], *, rate: float, duration: float,
+                 mix: list[tuple[str, int]] | None = None, reserve_share: float = RESERVE_SHARE,
+                 max_in_flight: int = 128, seed: int = 0):
+        if not users:
+            raise ValueError("empty virtual-user pool")
+        if rate <= 0 or duration <= 0:
+            raise ValueError("rate and duration must be positive")
+        self.users = users
+        self.rate = rate
+        self.duration = duration
+        self.mix = mix or command_mix()
+        self.reserve_share = reserve_share
+        self.max_in_flight = max_in_flight
+        self.rnd = random.Random(seed)
+        self.latency = {e: Histogram() for e in ENDPOINTS}
+        self.service = {e: Histogram() for e in ENDPOINTS}
+        self.errors: dict[str, Counter] = {e: Counter() for e in ENDPOINTS}
+
+    def next_operation(self, user: VirtualUser) -> Operation:
+        gid = self.rnd.choice(user.general_ids)
+        if self.rnd.random() >= self.reserve_share:
+            return Operation(ENDPOINTS[0], gid)
+        codes, weights = zip(*self.mix)
+        n = self.rnd.randint(1, MAX_RESERVE)
+        start = self.rnd.randrange(MAX_TURN_IDX - n + 1)
+        turns = [
+            {"turnIdx": start + i, "actionCode": code, "arg": {}}
+            for i, code in enumerate(self.rnd.choices(codes, weights, k=n))
+        ]
+        return Operation(ENDPOINTS[1], gid, {"turns": turns})
+
+    @staticmethod
+    def _send(user: VirtualUser, op: Operation) -> tuple[int | None, str | None, int]:
+        """Blocking request; returns (status, error kind, service time in µs).
+
+        Sessions are not thread-safe, so one request per user is in flight.
+        """
+        path = TURNS_PATH.format(gid=op.general_id)
+        with user.lock:
+            t0 = time.perf_counter_ns()
+            try:
+                if op.body is None:
+                    r = user.client.get(path)
+                else:
+                    r = user.client.post(path, op.body)
+                status, error = r.status_code, None if r.status_code < 400 else f"HTTP {r.status_code}"
+            except Exception as e:
+                status, error = None, type(e).__name__
+            return status, error, (time.perf_counter_ns() - t0) // 1000
+
+    async def _fire(self, due: float, user: VirtualUser, op: Operation,
+                    executor: ThreadPoolExecutor, sem: asyncio.Semaphore):
+        loop = asyncio.get_running_loop()
+        async with sem:
+            _, error, service_us = await loop.run_in_executor(executor, self._send, user, op)
+        self.latency[op.endpoint].record(max(0, int((time.perf_counter() - due) * 1e6)))
+        self.service[op.endpoint].record(service_us)
+        if error:
+            self.errors[op.endpoint][error] += 1
+
+    async def run(self) -> dict:
+        total = max(1, int(self.rate * self.duration))
+        sem = asyncio.Semaphore(self.max_in_flight)
+        tasks = []
+        with ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="vu") as executor:
+            start = time.perf_counter()
+            for i in range(total):
+                due = start + i / self.rate
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                user = self.users[i % len(self.users)]
+                tasks.append(asyncio.create_task(
+                    self._fire(due, user, self.next_operation(user), executor, sem)))
+            await asyncio.gather(*tasks)
+            elapsed = time.perf_counter() - start
+        return self.report(total, elapsed)
+
+    def report(self, total: int, elapsed: float) -> dict:
+        endpoints = {}
+        overall = Histogram()
+        error_count = 0
+        for e in ENDPOINTS:
+            hist = self.latency[e]
+            errors = sum(self.errors[e].values())
+            error_count += errors
+            overall.merge(hist)
+            endpoints[e] = {
+                "requests": hist.total,
+                "errors": dict(self.errors[e]),
+                "error_rate": round(errors / hist.total, 6) if hist.total else 0.0,
+                "latency_ms": hist.summary(1000),
+                "service_ms": self.service[e].summary(1000),
+                "distribution_ms": hist.percentile_distribution(1000),
+            }
+        return {
+            "virtual_users": len(self.users),
+            "generals": sum(len(u.general_ids) for u in self.users),
+            "target_rate": self.rate,
+            "achieved_rate": round(total / elapsed, 2) if elapsed else None,
+            "seconds": round(elapsed, 3),
+            "requests": total,
+            "error_rate": round(error_count / total, 6),
+            "latency_ms": overall.summary(1000),
+            "endpoints": endpoints,
+        }
+
+
+# ── Offline stub ─────────────────────────────────────────────────────────────
+class _StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Hundreds of virtual users connect at once; the default backlog of 5
+    # makes the kernel reset most of them.
+    request_queue_size = 1024
+
+
+class StubServer:
+    """In-process stand-in for the auth / generals / turns endpoints.
+
+    ``delay`` seconds are slept per request and ``error_rate`` of turn
+    requests answer 500, so latency and error accounting can be exercised
+    without the real stack.
+    """
+
+    def __init__(self, generals: int = DEFAULT_GENERALS, *, world_id: int = 1,
+                 delay: float = 0.0, error_rate: float = 0.0, seed: int = 0):
+        self.generals = list(range(1, generals + 1))
+        self.world_id = world_id
+        self.delay = delay
+        self.error_rate = error_rate
+        self.turns: dict[int, list[dict]] = {}
+        self.hits: Counter = Counter()
+        self._rnd = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = _StubHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "StubServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        stub = self
+        turns_re = re.compile(r"^/api/generals/(\d+)/turns$")
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, status: int, payload: Any = None):
+                body = json.dumps(payload).encode() if payload is not None else b""
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _body(self) -> dict:
+                n = int(self.headers.get("Content-Length") or 0)
+                return json.loads(self.rfile.read(n) or b"{}")
+
+            def _authorized(self) -> bool:
+                return (self.headers.get("Authorization") or "").startswith("Bearer stub-")
+
+            def _turns(self, method: str):
+                m = turns_re.match(self.path)
+                if not m:
+                    return False
+                stub.hits[f"{method} {TURNS_PATH}"] += 1
+                if stub.delay:
+                    time.sleep(stub.delay)
+                gid = int(m.group(1))
+                # Always drain the body so keep-alive connections stay in sync.
+                body = self._body() if method == "POST" else None
+                with stub._lock:
+                    fail = stub._rnd.random() < stub.error_rate
+                if not self._authorized():
+                    self._reply(401)
+                elif fail:
+                    self._reply(500, {"error": "injected"})
+                elif method == "GET":
+                    self._reply(200, stub.turns.get(gid, []))
+                else:
+                    saved = [dict(t, generalId=gid) for t in body.get("turns", [])]
+                    with stub._lock:
+                        stub.turns[gid] = saved
+                    self._reply(201, saved)
+                return True
+
+            def do_GET(self):
+                if self._turns("GET"):
+                    return
+                if self.path == f"/api/worlds/{stub.world_id}/generals":
+                    self._reply(200, [{"id": g, "worldId": stub.world_id} for g in stub.generals])
+                else:
+                    self._reply(404)
+
+            def do_POST(self):
+                if self._turns("POST"):
+                    return
+                if self.path == "/api/auth/register":
+                    self._reply(201, {"loginId": self._body().get("loginId")})
+                elif self.path == "/api/auth/login":
+                    self._reply(200, {"token": f"stub-{self._body().get('loginId')}"})
+                else:
+                    self._reply(404)
+
+        return Handler
+
+
+# ── CLI ──────────────────────────────────────────────────────────────────────
+async def _main(args, base: str) -> dict:
+    from conftest import NewClient
+
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=args.max_in_flight, thread_name_prefix="login")
+    try:
+        lister = NewClient(base)
+        if args.admin_login:
+            await loop.run_in_executor(executor, lister.login, args.admin_login, args.admin_password)
+        general_ids = await loop.run_in_executor(executor, list_general_ids, lister, args.world, args.generals)
+        users = await open_pool(base, args.vus, general_ids, login_prefix=args.login_prefix,
+                                password=args.password, register=args.register, executor=executor)
+    finally:
+        executor.shutdown()
+    gen = LoadGenerator(users, rate=args.rate, duration=args.duration,
+                        max_in_flight=args.max_in_flight, seed=args.seed)
+    return await gen.run()
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--base", default=None, help="new stack base URL (default: NEW_BASE_URL)")
+    ap.add_argument("--world", type=int, default=1)
+    ap.add_argument("--generals", type=int, default=DEFAULT_GENERALS)
+    ap.add_argument("--vus", type=int, default=DEFAULT_GENERALS, help="virtual users (logged-in sessions)")
+    ap.add_argument("--rate", type=float, default=100.0, help="target requests per second")
+    ap.add_argument("--duration", type=float, default=30.0, help="seconds of load")
+    ap.add_argument("--max-in-flight", type=int, default=128)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--login-prefix", default="loadgen")
+    ap.add_argument("--password", default="loadgen123")
+    ap.add_argument("--register", action="store_true", help="register the virtual-user accounts first")
+    ap.add_argument("--admin-login", default=os.environ.get("ADMIN_LOGIN_ID"))
+    ap.add_argument("--admin-password", default=os.environ.get("ADMIN_PASSWORD"))
+    ap.add_argument("--stub", action="store_true", help="run against an in-process stub server")
+    ap.add_argument("--out", default=None, help="write the JSON report here")
+    args = ap.parse_args(argv)
+
+    if args.stub:
+        with StubServer(args.generals, world_id=args.world) as stub:
+            report = asyncio.run(_main(args, stub.base))
+    else:
+        from conftest import NEW_BASE
+        report = asyncio.run(_main(args, args.base or NEW_BASE))
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    for endpoint, stats in report["endpoints"].items():
+        lat = stats["latency_ms"]
+        print(f"{endpoint}: n={stats['requests']} p50={lat['p50']}ms p95={lat['p95']}ms "
+              f"p99={lat['p99']}ms errors={stats['error_rate']:.2%}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
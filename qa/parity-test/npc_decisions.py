@@ -0,0 +1,238 @@
+"""
+NPC AI decision-distribution parity.
+
+GeneralAI / NationAI pick commands at random weighted by world state, so two
+faithful implementations only agree *in distribution*.  ``DecisionSampler``
+reads every NPC's reserved commands straight from ``general_turn`` /
+``nation_turn`` on both stacks — one server-side ``GROUP BY`` per stack and
+kind, however many NPCs there are — and accumulates per-nation frequency
+vectors over fixed command categories.  Sampling after each of N advanced
+turns grows the counts until the chi-square test of homogeneity has power;
+``summarize`` flags nations whose mix differs beyond a Bonferroni-corrected
+``alpha`` *and* a minimum Jensen–Shannon divergence, so a large sample does
+not turn a negligible shift into a failure.
+
+    sampler = DecisionSampler(legacy_conn, new_conn)
+    sampler.sample()
+    for _ in range(20):
+        driver.step()
+        sampler.sample()
+    report = sampler.summarize()
+"""
+from __future__ import annotations
+
+import math
+from array import array
+from collections import Counter
+
+from battle_fuzz import MIN_BUCKET_SAMPLES, chi_square
+from citymap import NEUTRAL
+from commands import COMMAND_MAP
+from loadgen import NEW_ACTION_CODES
+from snapshot import _placeholder, open_rows
+
+KINDS = ("general", "nation")
+REST = "휴식"
+OTHER = "기타"
+# Jensen–Shannon divergence (bits) below which a significant difference is
+# treated as noise.
+MIN_DIVERGENCE = 0.02
+
+# ``(nation name, action, count)`` for NPC-held turn slots ``< horizon``.
+# Legacy stores the full ``che_`` class name in ``action``; the new stack the
+# CommandRegistry name in ``action_code`` (V1__core_tables.sql).  Nation
+# turns belong to an office, so they are attributed to NPC officers only.
+QUERIES = {
+    ("legacy", "general"): (
+        "SELECT n.name, t.action, COUNT(*) FROM general_turn t "
+        "JOIN general g ON g.no = t.general_id "
+        "LEFT JOIN nation n ON n.nation = g.nation "
+        "WHERE g.npc >= {ph} AND t.turn_idx < {ph} GROUP BY n.name, t.action",
+        ("npc", "horizon"),
+    ),
+    ("legacy", "nation"): (
+        "SELECT n.name, t.action, COUNT(*) FROM nation_turn t "
+        "JOIN nation n ON n.nation = t.nation_id "
+        "JOIN general g ON g.nation = t.nation_id AND g.officer_level = t.officer_level "
+        "WHERE g.npc >= {ph} AND t.turn_idx < {ph} GROUP BY n.name, t.action",
+        ("npc", "horizon"),
+    ),
+    ("new", "general"): (
+        "SELECT n.name, t.action_code, COUNT(*) FROM general_turn t "
+        "JOIN general g ON g.id = t.general_id "
+        "LEFT JOIN nation n ON n.id = g.nation_id "
+        "WHERE g.world_id = {ph} AND g.npc_state >= {ph} AND t.turn_idx < {ph} "
+        "GROUP BY n.name, t.action_code",
+        ("world", "npc", "horizon"),
+    ),
+    ("new", "nation"): (
+        "SELECT n.name, t.action_code, COUNT(*) FROM nation_turn t "
+        "JOIN nation n ON n.id = t.nation_id "
+        "JOIN general g ON g.nation_id = t.nation_id AND g.officer_level = t.officer_level "
+        "WHERE n.world_id = {ph} AND g.npc_state >= {ph} AND t.turn_idx < {ph} "
+        "GROUP BY n.name, t.action_code",
+        ("world", "npc", "horizon"),
+    ),
+}
+
+
+def general_categories(command_map: dict | None = None) -> tuple[str, ...]:
+    """COMMAND_MAP keys, then rest, then everything else."""
+    return (*(command_map or COMMAND_MAP), REST, OTHER)
+
+
+def command_name(code: str) -> str:
+    """Either stack's action code → the new CommandRegistry name."""
+    return NEW_ACTION_CODES.get(code, code.removeprefix("che_"))
+
+
+def categorize(code: str | None, categories: tuple[str, ...]) -> str:
+    """Map a legacy or new general action code onto one of ``categories``."""
+    if not code:
+        return REST
+    if code in categories:
+        return code
+    name = command_name(code)
+    for key in categories:
+        if command_name(key) == name:
+            return key
+    return OTHER
+
+
+def js_divergence(a, b) -> float:
+    """Jensen–Shannon divergence (bits, 0..1) between two count vectors."""
+    ta, tb = sum(a), sum(b)
+    if not ta or not tb:
+        return 0.0
+    total = 0.0
+    for x, y in zip(a, b):
+        p, q = x / ta, y / tb
+        m = (p + q) / 2
+        if p:
+            total += p * math.log2(p / m)
+        if q:
+            total += q * math.log2(q / m)
+    return total / 2
+
+
+class DecisionSampler:
+    """Accumulate per-nation NPC command histograms from both stacks' DBs.
+
+    General turns are bucketed into ``general_categories()``; nation
+    commands have no COMMAND_MAP entry, so their categories are the
+    normalised command names seen so far (vectors grow as new ones appear).
+    """
+
+    def __init__(
+        self,
+        legacy_db,
+        new_db,
+        *,
+        world_id: int = 1,
+        horizon: int = 1,
+        npc_min: int = 2,
+        categories: tuple[str, ...] | None = None,
+    ):
+        self.dbs = {"legacy": legacy_db, "new": new_db}
+        self.params = {"world": world_id, "horizon": horizon, "npc": npc_min}
+        self.categories = {"general": list(categories or general_categories()), "nation": []}
+        self._index = {kind: {c: i for i, c in enumerate(cats)} for kind, cats in self.categories.items()}
+        # counts[kind][side][nation] → array('q') aligned with categories[kind]
+        self.counts: dict[str, dict[str, dict[str, array]]] = {
+            kind: {side: {} for side in self.dbs} for kind in KINDS
+        }
+        self.samples = 0
+
+    def _slot(self, kind: str, code: str | None) -> int:
+        if kind == "general":
+            category = categorize(code, tuple(self.categories["general"]))
+        else:
+            category = command_name(code) if code else REST
+        index = self._index[kind]
+        if category not in index:
+            index[category] = len(self.categories[kind])
+            self.categories[kind].append(category)
+            for per_side in self.counts[kind].values():
+                for vec in per_side.values():
+                    vec.append(0)
+        return index[category]
+
+    def read(self, side: str, kind: str) -> list[tuple[str, str | None, int]]:
+        """One grouped query: ``[(nation, action_code, count), ...]``."""
+        conn = self.dbs[side]
+        conn.commit()  # leave any REPEATABLE READ snapshot from the last turn
+        sql, names = QUERIES[(side, kind)]
+        with open_rows(conn, sql.format(ph=_placeholder(conn)),
+                       tuple(self.params[n] for n in names)) as (_, rows):
+            return [(name or NEUTRAL, code, int(n)) for name, code, n in rows]
+
+    def sample(self) -> dict[str, dict[str, int]]:
+        """Add the currently reserved NPC commands; returns rows read per side/kind."""
+        read = {side: {} for side in self.dbs}
+        for side in self.dbs:
+            for kind in KINDS:
+                rows = self.read(side, kind)
+                per_nation = self.counts[kind][side]
+                for nation, code, n in rows:
+                    slot = self._slot(kind, code)
+                    vec = per_nation.get(nation)
+                    if vec is None:
+                        vec = per_nation[nation] = array("q", bytes(8 * len(self.categories[kind])))
+                    vec[slot] += n
+                read[side][kind] = sum(n for _, _, n in rows)
+        self.samples += 1
+        return read
+
+    def vector(self, kind: str, side: str, nation: str | None = None) -> array:
+        """Count vector for one nation, or summed over all nations."""
+        size = len(self.categories[kind])
+        per_nation = self.counts[kind][side]
+        if nation is not None:
+            return per_nation.get(nation, array("q", bytes(8 * size)))
+        total = array("q", bytes(8 * size))
+        for vec in per_nation.values():
+            for i, n in enumerate(vec):
+                total[i] += n
+        return total
+
+    def _test(self, kind: str, nation: str | None) -> dict:
+        cats = self.categories[kind]
+        legacy, new = self.vector(kind, "legacy", nation), self.vector(kind, "new", nation)
+        entry = {
+            "n": {"legacy": sum(legacy), "new": sum(new)},
+            "counts": {
+                "legacy": dict(zip(cats, legacy)),
+                "new": dict(zip(cats, new)),
+            },
+        }
+        if min(entry["n"].values()) >= MIN_BUCKET_SAMPLES:
+            entry["test"] = {
+                **chi_square(Counter(entry["counts"]["legacy"]), Counter(entry["counts"]["new"])),
+                "divergence": js_divergence(legacy, new),
+            }
+        return entry
+
+    def summarize(self, *, alpha: float = 0.01, min_divergence: float = MIN_DIVERGENCE) -> dict:
+        """Pooled and per-nation homogeneity tests for each kind."""
+        report: dict = {"samples": self.samples, "alpha": alpha, "min_divergence": min_divergence}
+        entries = []
+        for kind in KINDS:
+            nations = sorted(set(self.counts[kind]["legacy"]) | set(self.counts[kind]["new"]))
+            report[kind] = {
+                "categories": list(self.categories[kind]),
+                "overall": self._test(kind, None),
+                "nations": {nation: self._test(kind, nation) for nation in nations},
+            }
+            entries.append((kind, None, report[kind]["overall"]))
+            entries.extend((kind, n, e) for n, e in report[kind]["nations"].items())
+
+        n_tests = sum("test" in e for _, _, e in entries)
+        threshold = alpha / n_tests if n_tests else alpha
+        flagged = [
+            {"kind": kind, "nation": nation, **e["test"]}
+            for kind, nation, e in entries
+            if "test" in e and e["test"]["p"] < threshold and e["test"]["divergence"] >= min_divergence
+        ]
+        report.update({"tests": n_tests, "threshold": threshold,
+                       "flagged": flagged, "diverged": bool(flagged)})
+        return report
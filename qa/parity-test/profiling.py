@@ -0,0 +1,405 @@
+"""
+Phase-level profiling of each parity test.
+
+The clients, the DB fixtures' cursors and ``comparison`` open a ``span`` for
+each unit of work, so every test gets a breakdown of where its wall time
+went:
+
+  - ``http``      — requests, body download included (``PairedClient`` counts
+    its two concurrent halves once, as the time the test waits for both)
+  - ``json``      — ``Response.json()`` decodes
+  - ``db``        — cursor ``execute`` / ``executemany`` (both drivers buffer
+    the result set there)
+  - ``normalize`` — ``normalize_keys`` and ``normalize_payload`` (which fuses
+    key renaming with PHP type coercion into one walk)
+  - ``coerce``    — standalone ``coerce_types``
+  - ``shape``     — ``shape_signature``
+  - ``diff``      — ``diff_payloads`` / DeepDiff
+  - ``other``     — the rest (fixtures, sleeps, turn settling, assertions)
+
+Spans record self time — a span opened inside another is subtracted from
+its parent — and only on the thread running the test, so the phases of one
+test never add up to more than its wall time.  A test is timed from setup to
+teardown; session fixtures are charged to the first test that uses them.
+
+Profiling is opt-in: ``PARITY_PROFILE`` (or pytest's ``--parity-profile``,
+which takes precedence) selects the mode:
+
+  - ``off``      — no spans are recorded (default).
+  - ``spans``    — per-test breakdowns only.
+  - ``cprofile`` — also run ``cProfile`` over every test and keep
+    ``<PARITY_PROFILE_DIR>/<test>.prof`` for the ``PARITY_PROFILE_TOP``
+    slowest (``python -m pstats``, snakeviz).
+  - ``folded``   — also sample the test thread's stack every
+    ``PARITY_PROFILE_INTERVAL`` seconds and keep collapsed stacks
+    (``<test>.folded``, one ``frame;frame;… count`` line per stack) for the
+    slowest tests — input for ``flamegraph.pl`` or speedscope.  Samples are
+    wall clock, so time blocked on the network shows up.
+
+conftest merges xdist workers, adds the result to ``report.json`` under
+``"profile"`` and prints the slowest tests' breakdowns.
+
+    with profiling.span("diff"):
+        diff = diff_payloads(a, b)
+"""
+from __future__ import annotations
+
+import cProfile
+import functools
+import hashlib
+import heapq
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+PHASES = ("http", "json", "db", "normalize", "coerce", "shape", "diff")
+MODES = ("off", "spans", "cprofile", "folded")
+MODE = os.environ.get("PARITY_PROFILE", "off")
+TOP = int(os.environ.get("PARITY_PROFILE_TOP", 10))
+PROFILE_DIR = os.environ.get("PARITY_PROFILE_DIR", "/results/profile")
+SAMPLE_INTERVAL = float(os.environ.get("PARITY_PROFILE_INTERVAL", 0.005))
+SUFFIXES = {"cprofile": ".prof", "folded": ".folded"}
+
+_UNSAFE = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+# ── Spans ────────────────────────────────────────────────────────────────────
+class _Span:
+    __slots__ = ("profiler", "phase", "start", "child")
+
+    def __init__(self, profiler: "PhaseProfiler", phase: str):
+        self.profiler = profiler
+        self.phase = phase
+
+    def __enter__(self):
+        self.child = 0.0
+        self.profiler._stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        prof = self.profiler
+        prof._stack.pop()
+        if prof._stack:
+            prof._stack[-1].child += elapsed
+        phases = prof._phases
+        if phases is not None:
+            entry = phases.get(self.phase)
+            if entry is None:
+                entry = phases[self.phase] = [0.0, 0]
+            entry[0] += elapsed - self.child
+            entry[1] += 1
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL = _NullSpan()
+
+
+class PhaseProfiler:
+    """Per-test phase totals for one process.
+
+    ``start(nodeid)`` / ``stop()`` bracket a test on the calling thread;
+    ``span(phase)`` is a no-op on any other thread or between tests.
+    ``tests`` maps node id → breakdown (see ``breakdown``).
+    """
+
+    def __init__(self, mode: str = MODE):
+        if mode not in MODES:
+            raise ValueError(f"PARITY_PROFILE must be one of {MODES}, not {mode!r}")
+        self.mode = mode
+        self.tests: dict[str, dict] = {}
+        self._nodeid: str | None = None
+        self._thread: int | None = None
+        self._phases: dict[str, list] | None = None
+        self._stack: list[_Span] = []
+        self._start = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def span(self, phase: str):
+        if self._phases is None or threading.get_ident() != self._thread:
+            return _NULL
+        return _Span(self, phase)
+
+    def start(self, nodeid: str) -> None:
+        if not self.enabled:
+            return
+        self._nodeid = nodeid
+        self._thread = threading.get_ident()
+        self._phases = {}
+        self._stack.clear()
+        self._start = time.perf_counter()
+
+    def stop(self) -> dict | None:
+        """End the current test; returns (and keeps) its breakdown."""
+        if self._phases is None:
+            return None
+        total = time.perf_counter() - self._start
+        phases, self._phases = self._phases, None
+        self._stack.clear()
+        result = breakdown(total, phases)
+        self.tests[self._nodeid] = result
+        return result
+
+    def clear(self) -> None:
+        self.tests.clear()
+
+    # xdist workers hand ``to_json()`` to the controller.
+    def to_json(self) -> dict:
+        return self.tests
+
+    def merge_json(self, data: dict) -> None:
+        self.tests.update(data)
+
+    def slowest(self, n: int = TOP) -> list[str]:
+        return heapq.nlargest(n, self.tests, key=lambda nodeid: self.tests[nodeid]["total"])
+
+    def report(self, top: int = TOP) -> dict:
+        """``report.json`` block: run-wide phase totals, every test, slowest first."""
+        totals = {phase: 0.0 for phase in (*PHASES, "other")}
+        for test in self.tests.values():
+            for phase, entry in test["phases"].items():
+                totals[phase] = totals.get(phase, 0.0) + entry["seconds"]
+            totals["other"] += test["other"]
+        return {
+            "mode": self.mode,
+            "totals": {phase: round(s, 6) for phase, s in totals.items()},
+            "slowest": self.slowest(top),
+            "tests": self.tests,
+        }
+
+
+def breakdown(total: float, phases: dict[str, list]) -> dict:
+    """``{"total", "phases": {phase: {"seconds", "count"}}, "other"}`` in seconds."""
+    attributed = sum(seconds for seconds, _ in phases.values())
+    return {
+        "total": round(total, 6),
+        "phases": {phase: {"seconds": round(seconds, 6), "count": count}
+                   for phase, (seconds, count) in sorted(phases.items())},
+        # Clock granularity can push the sum a hair past the total.
+        "other": round(max(0.0, total - attributed), 6),
+    }
+
+
+PROFILER = PhaseProfiler(MODE if MODE in MODES else "off")
+
+
+def configure(mode: str) -> PhaseProfiler:
+    """Switch the run to ``mode`` before any test starts (``--parity-profile``)."""
+    global MODE, PROFILER
+    PROFILER = PhaseProfiler(mode)
+    MODE = mode
+    return PROFILER
+
+
+def span(phase: str):
+    """Time ``phase`` for the running test (a no-op when none is running)."""
+    return PROFILER.span(phase)
+
+
+def timed(phase: str):
+    """Decorator: every call of the function is a ``phase`` span."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def timed_fn(*args, **kwargs):
+            with PROFILER.span(phase):
+                return fn(*args, **kwargs)
+        return timed_fn
+    return wrap
+
+
+def timed_cursor(base: type) -> type:
+    """Subclass of a DB-API cursor class whose statements run in a ``db`` span.
+
+    For ``pymysql.connect(cursorclass=…)`` and
+    ``psycopg2.connect(cursor_factory=…)``.
+    """
+    class TimedCursor(base):
+        def execute(self, *args, **kwargs):
+            with span("db"):
+                return super().execute(*args, **kwargs)
+
+        def executemany(self, *args, **kwargs):
+            with span("db"):
+                return super().executemany(*args, **kwargs)
+
+    TimedCursor.__name__ = TimedCursor.__qualname__ = f"Timed{base.__name__}"
+    return TimedCursor
+
+
+def format_slowest(report: dict, limit: int = TOP) -> list[str]:
+    """Terminal lines: the slowest tests with their largest phases."""
+    lines = []
+    for nodeid in report["slowest"][:limit]:
+        test = report["tests"][nodeid]
+        parts = [(e["seconds"], p) for p, e in test["phases"].items()] + [(test["other"], "other")]
+        shown = "  ".join(f"{p} {s:.2f}" for s, p in sorted(parts, reverse=True)[:4] if s >= 0.005)
+        lines.append(f"{test['total']:8.2f}s  {shown:<44}  {nodeid}")
+    return lines
+
+
+# ── Captures of the slowest tests ────────────────────────────────────────────
+class CProfileCapture:
+    """Deterministic profile of the test thread, written as a pstats file."""
+
+    suffix = SUFFIXES["cprofile"]
+
+    def __init__(self):
+        self._profile = cProfile.Profile()
+
+    def start(self) -> None:
+        self._profile.enable()
+
+    def stop(self) -> None:
+        self._profile.disable()
+
+    def write(self, path: str) -> None:
+        self._profile.dump_stats(path)
+
+
+class StackSampler:
+    """Samples one thread's stack on a timer and counts collapsed stacks.
+
+    Frames are rendered ``module:function`` (``<file>:function`` outside a
+    module) root first, the format ``flamegraph.pl`` and speedscope read.
+    """
+
+    suffix = SUFFIXES["folded"]
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL, thread: int | None = None):
+        self.interval = interval
+        self.thread = thread
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._sampler: threading.Thread | None = None
+
+    def start(self) -> None:
+        self.thread = self.thread or threading.get_ident()
+        self._stop.clear()
+        self._sampler = threading.Thread(target=self._run, name="parity-profile", daemon=True)
+        self._sampler.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread)
+            if frame is not None:
+                self.stacks[collapse(frame)] += 1
+
+    def write(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as out:
+            for stack, count in self.stacks.most_common():
+                out.write(f"{stack} {count}\n")
+
+
+def collapse(frame) -> str:
+    """``root;…;leaf`` for ``frame`` and its callers."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        module = frame.f_globals.get("__name__") or os.path.basename(code.co_filename)
+        names.append(f"{module}:{code.co_name}".replace(";", ":").replace(" ", "_"))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def capture_file(nodeid: str, suffix: str) -> str:
+    """File name for ``nodeid``'s capture: readable, filesystem-safe and unique."""
+    digest = hashlib.sha1(nodeid.encode()).hexdigest()[:8]
+    return f"{_UNSAFE.sub('_', nodeid)[-100:].strip('_')}-{digest}{suffix}"
+
+
+class SlowestCaptures:
+    """Keeps the capture files of the ``top`` slowest tests in ``directory``.
+
+    Every test is captured; a capture is written only while it ranks among
+    the slowest seen so far, and the file it displaces is deleted.
+    """
+
+    def __init__(self, mode: str, directory: str = PROFILE_DIR, top: int = TOP,
+                 interval: float = SAMPLE_INTERVAL):
+        if mode not in SUFFIXES:
+            raise ValueError(f"no capture for PARITY_PROFILE={mode!r}")
+        self.mode = mode
+        self.directory = directory
+        self.top = top
+        self.interval = interval
+        self._kept: list[tuple[float, str]] = []   # min-heap of (seconds, path)
+
+    def begin(self):
+        capture = CProfileCapture() if self.mode == "cprofile" else StackSampler(self.interval)
+        capture.start()
+        return capture
+
+    def end(self, capture, nodeid: str, seconds: float) -> str | None:
+        """Stop ``capture``; returns the path written, if it ranks."""
+        capture.stop()
+        if self.top <= 0 or (len(self._kept) >= self.top and seconds <= self._kept[0][0]):
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, capture_file(nodeid, capture.suffix))
+        capture.write(path)
+        heapq.heappush(self._kept, (seconds, path))
+        if len(self._kept) > self.top:
+            _, evicted = heapq.heappop(self._kept)
+            _remove(evicted)
+        return path
+
+
+def prune(directory: str, keep: list[str], mode: str) -> list[str]:
+    """Delete captures in ``directory`` except those of ``keep``; returns the kept paths.
+
+    Each xdist worker keeps its own slowest tests; the controller calls this
+    with the run-wide slowest once the workers' breakdowns are merged.
+    """
+    suffix = SUFFIXES[mode]
+    wanted = {capture_file(nodeid, suffix) for nodeid in keep}
+    kept = []
+    if not os.path.isdir(directory):
+        return kept
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(suffix):
+            continue
+        path = os.path.join(directory, name)
+        if name in wanted:
+            kept.append(path)
+        else:
+            _remove(path)
+    return kept
+
+
+def clear(directory: str) -> None:
+    """Remove captures of a previous run."""
+    if not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        if name.endswith(tuple(SUFFIXES.values())):
+            _remove(os.path.join(directory, name))
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
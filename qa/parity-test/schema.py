@@ -0,0 +1,409 @@
+"""
+Schema registry — both databases' tables and columns, introspected in bulk
+once per session, and the complete legacy → new table/column mapping.
+
+Each side is read with a single ``information_schema.columns`` query (or
+``pragma_table_info`` on sqlite) and cached on disk under
+``PARITY_SCHEMA_CACHE_DIR`` keyed by the schema version: the latest Flyway
+migration on the new stack, the table count / newest ``CREATE_TIME`` on the
+legacy MariaDB (or ``PARITY_LEGACY_SCHEMA_VERSION`` when set).  A run against
+an unchanged schema only issues the version query.
+
+Columns pair up, per table, in this order:
+
+  1. explicit mappings — ``snapshot.SCHEMA_MAP`` and ``COLUMN_RENAMES``
+  2. identical names
+  3. names equal once underscores are dropped (``crewtype`` / ``crew_type``)
+  4. a unique ``_id`` / ``_code`` / ``_state`` suffix on the new side
+     (``weapon`` / ``weapon_code``)
+
+Every pair also carries its API field name and, where ``FIELD_MAP_KR_EN``
+has one, the Korean label, so DB rows and API payloads share one vocabulary.
+
+    schema = SchemaRegistry(load_schema(legacy_db, "legacy"), load_schema(new_db, "new"))
+    city = schema.table("city")
+    city.projection()   # → (["city", "name", "pop", ...], ["id", "name", "pop", ...])
+    city.broken         # explicit mappings naming a column one side lacks
+    diff_table(legacy_db, new_db, city.table_map(), schema=schema)
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass, replace
+from typing import Any
+
+from comparison import FIELD_MAP_EN_KR
+from snapshot import SCHEMA_MAP, TableMap, _driver
+
+CACHE_DIR = os.environ.get("PARITY_SCHEMA_CACHE_DIR", "/results/schema")
+CACHE_FORMAT = 1
+
+# Legacy table → new table where the names differ; same-named tables pair up
+# on their own.
+TABLE_RENAMES = {
+    "game_env": "world_state",
+    "emperior": "emperor",
+    "hall": "hall_of_fame",
+    "comment": "board_comment",
+    "ng_games": "game_history",
+    "ng_history": "yearbook_history",
+    "ng_old_generals": "old_general",
+    "ng_old_nations": "old_nation",
+    "ng_auction": "auction",
+    "ng_auction_bid": "auction_bid",
+    "ng_betting": "betting",
+    "ng_diplomacy": "diplomacy",
+}
+
+# legacy table → {legacy column: new column}, on top of SCHEMA_MAP, for
+# renames the name-matching rules cannot find.
+COLUMN_RENAMES: dict[str, dict[str, str]] = {
+    "game_env": {"year": "current_year", "month": "current_month"},
+    "general": {"recent_war": "recent_war_time"},
+}
+
+# New-stack column → API field where the API spells it out.
+DB_FIELD_NAMES = {
+    "pop": "population",
+    "agri": "agriculture",
+    "comm": "commerce",
+    "secu": "security",
+    "def": "defence",
+    "train": "training",
+    "atmos": "morale",
+    "intel": "intelligence",
+    "current_year": "year",
+    "current_month": "month",
+}
+ID_FIELDS = {"general": "generalId", "city": "cityId", "nation": "nationId"}
+MATCH_SUFFIXES = ("_id", "_code", "_state")
+
+_COLUMNS_SQL = {
+    "pymysql": (
+        "SELECT table_name AS t, column_name AS c, data_type AS d FROM information_schema.columns "
+        "WHERE table_schema = DATABASE() ORDER BY table_name, ordinal_position"
+    ),
+    "psycopg2": (
+        "SELECT table_name, column_name, data_type FROM information_schema.columns "
+        "WHERE table_schema = 'public' ORDER BY table_name, ordinal_position"
+    ),
+    "sqlite3": (
+        "SELECT m.name, p.name, p.type FROM sqlite_master m JOIN pragma_table_info(m.name) p "
+        "WHERE m.type = 'table' ORDER BY m.name, p.cid"
+    ),
+}
+_VERSION_SQL = {
+    "pymysql": (
+        "SELECT COUNT(*) AS n, MAX(create_time) AS t FROM information_schema.tables "
+        "WHERE table_schema = DATABASE()"
+    ),
+    "psycopg2": (
+        "SELECT version FROM flyway_schema_history WHERE success "
+        "ORDER BY installed_rank DESC LIMIT 1"
+    ),
+    "sqlite3": "PRAGMA schema_version",
+}
+
+
+# ── Introspection ────────────────────────────────────────────────────────────
+@dataclass
+class Schema:
+    """One database's tables → ``{column: data_type}`` in ordinal order."""
+
+    stack: str
+    version: str | None
+    tables: dict[str, dict[str, str]]
+
+    def columns(self, table: str) -> list[str]:
+        return list(self.tables.get(table, ()))
+
+    def has(self, table: str, column: str | None = None) -> bool:
+        cols = self.tables.get(table)
+        return cols is not None and (column is None or column in cols)
+
+    def to_json(self) -> dict:
+        return {"format": CACHE_FORMAT, "stack": self.stack, "version": self.version,
+                "tables": self.tables}
+
+    @classmethod
+    def from_json(cls, data: dict) -> "Schema":
+        if data.get("format") != CACHE_FORMAT:
+            raise ValueError(f"schema cache format {data.get('format')} != {CACHE_FORMAT}")
+        return cls(data["stack"], data["version"], data["tables"])
+
+
+def _rows(cur) -> list[tuple]:
+    return [tuple(r.values()) if isinstance(r, dict) else tuple(r) for r in cur.fetchall()]
+
+
+def _query(conn, sql: str) -> list[tuple]:
+    cur = conn.cursor()
+    try:
+        cur.execute(sql)
+        return _rows(cur)
+    finally:
+        cur.close()
+
+
+def introspect(conn) -> dict[str, dict[str, str]]:
+    """Every table's columns and types in one round trip."""
+    tables: dict[str, dict[str, str]] = {}
+    for table, column, data_type in _query(conn, _COLUMNS_SQL[_driver(conn)]):
+        tables.setdefault(table, {})[column] = str(data_type).lower()
+    return tables
+
+
+def schema_version(conn) -> str | None:
+    """Cheap token that changes whenever the schema does; ``None`` if unknown."""
+    driver = _driver(conn)
+    if driver == "pymysql" and os.environ.get("PARITY_LEGACY_SCHEMA_VERSION"):
+        return f"env:{os.environ['PARITY_LEGACY_SCHEMA_VERSION']}"
+    try:
+        rows = _query(conn, _VERSION_SQL[driver])
+    except Exception:
+        # e.g. no flyway_schema_history yet; leave the transaction usable.
+        if driver != "sqlite3" and not getattr(conn, "autocommit", True):
+            conn.rollback()
+        return None
+    if not rows or rows[0][0] is None:
+        return None
+    return f"{driver}:" + "@".join(str(v) for v in rows[0])
+
+
+def _cache_path(cache_dir: str, stack: str, identity: str, version: str) -> str:
+    digest = hashlib.sha1(f"{stack}\0{identity}\0{version}".encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, f"{stack}-{digest}.json")
+
+
+def load_schema(conn, stack: str, *, identity: str = "", cache_dir: str | None = CACHE_DIR) -> Schema:
+    """``Schema`` for ``conn``, from the on-disk cache when the version matches.
+
+    ``identity`` (host/port/database) keeps caches of different servers
+    apart.  Without a version token, or with ``cache_dir=None``, the schema is
+    always introspected and nothing is written.
+    """
+    version = schema_version(conn)
+    path = _cache_path(cache_dir, stack, identity, version) if cache_dir and version else None
+    if path:
+        try:
+            with open(path, encoding="utf-8") as f:
+                return Schema.from_json(json.load(f))
+        except (OSError, ValueError, KeyError):
+            pass
+    schema = Schema(stack, version, introspect(conn))
+    if path:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(schema.to_json(), f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except OSError:
+            pass  # read-only results dir: the cache is only an optimization
+    return schema
+
+
+# ── Mapping ──────────────────────────────────────────────────────────────────
+def _camel(name: str) -> str:
+    head, *rest = name.split("_")
+    return head + "".join(p[:1].upper() + p[1:] for p in rest)
+
+
+def api_field(new_table: str, new_column: str) -> str:
+    """API field name for a new-stack column (``nation_id`` → ``nationId``)."""
+    if new_column == "id" and new_table in ID_FIELDS:
+        return ID_FIELDS[new_table]
+    return DB_FIELD_NAMES.get(new_column) or _camel(new_column)
+
+
+@dataclass(frozen=True)
+class ColumnMapping:
+    legacy: str
+    new: str
+    # API field name (the English side of FIELD_MAP_KR_EN) and Korean label.
+    field: str
+    label: str | None
+
+
+@dataclass(frozen=True)
+class TableMapping:
+    """Complete column pairing for one legacy table and its new counterpart."""
+
+    legacy_table: str
+    new_table: str
+    columns: tuple[ColumnMapping, ...]
+    # Columns with no counterpart (empty when that side was not introspected).
+    legacy_only: tuple[str, ...]
+    new_only: tuple[str, ...]
+    # Explicit mappings whose column is missing on one side: legacy → new.
+    broken: tuple[tuple[str, str], ...]
+
+    def projection(self) -> tuple[list[str], list[str]]:
+        """Parallel legacy / new column lists for SELECTs on both sides."""
+        return [c.legacy for c in self.columns], [c.new for c in self.columns]
+
+    def legacy_to_new(self) -> dict[str, str]:
+        return {c.legacy: c.new for c in self.columns}
+
+    def field_map(self) -> dict[str, str]:
+        """Legacy column → API field, the DB-level counterpart of FIELD_MAP_KR_EN."""
+        return {c.legacy: c.field for c in self.columns}
+
+    def table_map(self) -> TableMap:
+        """``snapshot.TableMap`` projecting every mapped column (keys excluded)."""
+        base = SCHEMA_MAP.get(self.legacy_table)
+        by_new = {c.new: c.legacy for c in self.columns}
+        if base is not None:
+            legacy_key, new_key = base.legacy_key, base.new_key
+        elif "id" in by_new:
+            legacy_key, new_key = by_new["id"], "id"
+        else:
+            raise ValueError(f"{self.legacy_table}: no column maps to the new-stack id")
+        columns = {c.legacy: c.new for c in self.columns if c.new != new_key}
+        if base is not None:
+            return replace(base, columns=columns)
+        return TableMap(legacy_table=self.legacy_table, new_table=self.new_table,
+                        legacy_key=legacy_key, new_key=new_key, columns=columns,
+                        new_world_column="world_id" if "world_id" in self.new_only else None)
+
+
+def _squash(name: str) -> str:
+    return name.replace("_", "").lower()
+
+
+def _explicit(legacy_table: str) -> dict[str, str]:
+    out: dict[str, str] = {}
+    base = SCHEMA_MAP.get(legacy_table)
+    if base is not None:
+        out[base.legacy_key] = base.new_key
+        out.update(base.columns)
+    out.update(COLUMN_RENAMES.get(legacy_table, {}))
+    return out
+
+
+def match_columns(
+    legacy_table: str, new_table: str, legacy_cols: list[str] | None, new_cols: list[str] | None
+) -> TableMapping:
+    """Pair ``legacy_cols`` with ``new_cols``; ``None`` = side not introspected."""
+    explicit = _explicit(legacy_table)
+    pairs: dict[str, str] = {}
+    broken = []
+    for lc, nc in explicit.items():
+        if (legacy_cols is None or lc in legacy_cols) and (new_cols is None or nc in new_cols):
+            pairs[lc] = nc
+        else:
+            broken.append((lc, nc))
+
+    if legacy_cols is not None and new_cols is not None:
+        free = [c for c in new_cols if c not in set(pairs.values())]
+        exact = set(free)
+        squashed: dict[str, list[str]] = {}
+        for c in free:
+            squashed.setdefault(_squash(c), []).append(c)
+        claimed = set()
+        for lc in legacy_cols:
+            if lc in pairs:
+                continue
+            if lc in exact and lc not in claimed:
+                nc = lc
+            else:
+                hits = [c for c in squashed.get(_squash(lc), ()) if c not in claimed]
+                if len(hits) != 1:
+                    hits = [c for c in free if c not in claimed
+                            and any(c == lc + s for s in MATCH_SUFFIXES)]
+                if len(hits) != 1:
+                    continue
+                nc = hits[0]
+            pairs[lc] = nc
+            claimed.add(nc)
+
+    order = legacy_cols if legacy_cols is not None else list(explicit)
+    columns = []
+    for lc in order:
+        nc = pairs.get(lc)
+        if nc is None:
+            continue
+        field = api_field(new_table, nc)
+        columns.append(ColumnMapping(lc, nc, field, FIELD_MAP_EN_KR.get(field)))
+    mapped_new = set(pairs.values())
+    return TableMapping(
+        legacy_table=legacy_table,
+        new_table=new_table,
+        columns=tuple(columns),
+        legacy_only=tuple(c for c in legacy_cols or () if c not in pairs),
+        new_only=tuple(c for c in new_cols or () if c not in mapped_new),
+        broken=tuple(broken),
+    )
+
+
+class SchemaRegistry:
+    """Legacy ↔ new tables and columns; either side may be ``None`` (unreachable)."""
+
+    def __init__(self, legacy: Schema | None, new: Schema | None):
+        self.legacy = legacy
+        self.new = new
+        self._tables: dict[str, TableMapping] = {}
+
+    @staticmethod
+    def new_table(legacy_table: str) -> str:
+        return TABLE_RENAMES.get(legacy_table, legacy_table)
+
+    def side(self, stack: str) -> Schema | None:
+        return self.legacy if stack == "legacy" else self.new
+
+    def present(self, legacy_table: str) -> tuple[bool, bool]:
+        """Whether the legacy table / its new counterpart exist (False if unknown)."""
+        return (self.legacy is not None and self.legacy.has(legacy_table),
+                self.new is not None and self.new.has(self.new_table(legacy_table)))
+
+    def table(self, legacy_table: str) -> TableMapping:
+        mapping = self._tables.get(legacy_table)
+        if mapping is None:
+            new_table = self.new_table(legacy_table)
+            mapping = self._tables[legacy_table] = match_columns(
+                legacy_table, new_table,
+                self.legacy.columns(legacy_table) if self.legacy is not None else None,
+                self.new.columns(new_table) if self.new is not None else None,
+            )
+        return mapping
+
+    def tables(self) -> dict[str, TableMapping]:
+        """Mapping for every legacy table whose counterpart exists on the new side."""
+        if self.legacy is None or self.new is None:
+            return {}
+        return {t: self.table(t) for t in sorted(self.legacy.tables)
+                if self.new.has(self.new_table(t))}
+
+    def unmatched(self) -> dict[str, list[str]]:
+        """Tables without a counterpart on the other side."""
+        if self.legacy is None or self.new is None:
+            return {"legacy": [], "new": []}
+        matched_new = {self.new_table(t) for t in self.legacy.tables}
+        return {
+            "legacy": sorted(t for t in self.legacy.tables if not self.new.has(self.new_table(t))),
+            "new": sorted(t for t in self.new.tables
+                          if t not in matched_new and t != "flyway_schema_history"),
+        }
+
+    def columns(self, stack: str, table: str) -> set[str] | None:
+        """Introspected column names of ``table`` on ``stack``, ``None`` if unknown."""
+        side = self.side(stack)
+        if side is None or not side.has(table):
+            return None
+        return set(side.columns(table))
+
+    def report(self) -> dict[str, Any]:
+        return {
+            "versions": {"legacy": self.legacy and self.legacy.version,
+                         "new": self.new and self.new.version},
+            "unmatched_tables": self.unmatched(),
+            "tables": {
+                t: {"new_table": m.new_table, "mapped": len(m.columns),
+                    "legacy_only": list(m.legacy_only), "new_only": list(m.new_only),
+                    "broken": [list(b) for b in m.broken]}
+                for t, m in self.tables().items()
+            },
+        }
+
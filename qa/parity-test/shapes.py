@@ -0,0 +1,199 @@
+"""
+Merkle-hashed structural signatures for parity payloads.
+
+Every subtree's *shape* is reduced bottom-up to a 16-byte BLAKE2b signature:
+
+  - scalar  ``("s", type_name)``
+  - dict    ``("d", ((key, child_sig), ...))``  keys sorted
+  - list    ``("l", (element_sig, ...))``       distinct element shapes, sorted
+
+A list's shape is the *set* of its element shapes, so a list whose elements
+disagree (``[{"id": 1}, {"id": "x"}]``) gets a different signature from a
+homogeneous one — unlike ``comparison.structural_shape``, which only samples
+``obj[0]``.  List lengths are a value, not a shape; an empty list is its own
+shape.
+
+Nodes are interned in a ``ShapeTable``: a node already seen (e.g. the shape
+of one general repeated 600 times, or across requests) is looked up instead
+of rehashed, and no per-payload nested shape object is built.  Two payloads
+are structurally equal iff their root signatures are equal; ``diff_shapes``
+walks both node graphs from the roots and descends only into children whose
+signatures differ, so its cost is bounded by the size of the *shapes*, not
+the payloads.
+
+    sig_a, sig_b = shape_signature(a), shape_signature(b)
+    if sig_a != sig_b:
+        for m in diff_shapes(sig_a, sig_b):
+            print(m["path"], m["kind"], m["legacy"], m["new"])
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+from itertools import repeat
+from typing import Any
+
+import profiling
+
+SIG_SIZE = 16
+MAX_MISMATCHES = 100
+
+
+def _digest(node: tuple) -> bytes:
+    kind, body = node
+    h = hashlib.blake2b(kind.encode(), digest_size=SIG_SIZE)
+    if kind == "s":
+        h.update(body.encode())
+    elif kind == "d":
+        for key, sig in body:
+            k = key.encode()
+            h.update(len(k).to_bytes(4, "little"))
+            h.update(k)
+            h.update(sig)
+    else:
+        for sig in body:
+            h.update(sig)
+    return h.digest()
+
+
+class ShapeTable:
+    """Interned shape nodes: ``node -> signature`` and ``signature -> node``.
+
+    Signatures depend only on structure, so tables built in different
+    processes agree; a table only serves as a memo and as the node store that
+    ``diff_shapes`` / ``render`` read from.
+    """
+
+    def __init__(self):
+        self._sigs: dict[tuple, bytes] = {}
+        self.nodes: dict[bytes, tuple] = {}
+        self._scalars: dict[type, bytes] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def _intern(self, node: tuple) -> bytes:
+        sig = self._sigs.get(node)
+        if sig is None:
+            sig = _digest(node)
+            with self._lock:
+                self._sigs[node] = sig
+                self.nodes[sig] = node
+        return sig
+
+    def _scalar(self, t: type) -> bytes:
+        sig = self._scalars.get(t)
+        if sig is None:
+            sig = self._scalars[t] = self._intern(("s", t.__name__))
+        return sig
+
+    def signature(self, obj: Any) -> bytes:
+        """Root signature of ``obj`` (iterative post-order, no recursion limit)."""
+        t = type(obj)
+        if t is not dict and t is not list:
+            return self._scalar(t)
+        scalar = self._scalar
+        # Frame: [container, (key, child) iterator, [(key, child_sig), ...]]
+        stack = [[obj, _children(obj), []]]
+        while True:
+            frame = stack[-1]
+            acc = frame[2]
+            for key, child in frame[1]:
+                ct = type(child)
+                if ct is dict or ct is list:
+                    acc.append((key, None))
+                    stack.append([child, _children(child), []])
+                    break
+                acc.append((key, scalar(ct)))
+            else:
+                stack.pop()
+                if type(frame[0]) is dict:
+                    node = ("d", tuple(sorted((str(k), s) for k, s in acc)))
+                else:
+                    node = ("l", tuple(sorted({s for _, s in acc})))
+                sig = self._intern(node)
+                if not stack:
+                    return sig
+                parent = stack[-1][2]
+                parent[-1] = (parent[-1][0], sig)
+
+    def render(self, sig: bytes, *, max_depth: int = 12) -> Any:
+        """Readable shape: type names for leaves, one entry per list element shape."""
+        kind, body = self.nodes[sig]
+        if kind == "s":
+            return body
+        if max_depth <= 0:
+            return "…"
+        if kind == "d":
+            return {k: self.render(s, max_depth=max_depth - 1) for k, s in body}
+        if not body:
+            return ["<empty_list>"]
+        return [self.render(s, max_depth=max_depth - 1) for s in body]
+
+
+def _children(obj):
+    return iter(obj.items()) if type(obj) is dict else zip(repeat(None), obj)
+
+
+SHAPES = ShapeTable()
+
+
+def shape_signature(obj: Any, table: ShapeTable | None = None) -> bytes:
+    """Structural signature of ``obj`` in ``table`` (the shared ``SHAPES`` by default)."""
+    with profiling.span("shape"):
+        return (table if table is not None else SHAPES).signature(obj)
+
+
+def diff_shapes(
+    legacy_sig: bytes,
+    new_sig: bytes,
+    table: ShapeTable | None = None,
+    *,
+    path: str = "root",
+    limit: int = MAX_MISMATCHES,
+) -> list[dict]:
+    """Exact paths where two shapes disagree.
+
+    Each mismatch is ``{"path", "kind", "legacy", "new"}`` with ``kind`` one
+    of ``type`` (different node kinds or scalar types), ``missing_in_new`` /
+    ``missing_in_legacy`` (dict keys) or ``list_elements`` (element shapes that
+    could not be paired one-to-one).  List elements are addressed as ``[*]``.
+    """
+    table = table if table is not None else SHAPES
+    nodes = table.nodes
+    out: list[dict] = []
+    stack = [(path, legacy_sig, new_sig)]
+    while stack and len(out) < limit:
+        p, a, b = stack.pop()
+        if a == b:
+            continue
+        (ka, ba), (kb, bb) = nodes[a], nodes[b]
+        if ka != kb or ka == "s":
+            out.append({"path": p, "kind": "type", "legacy": table.render(a), "new": table.render(b)})
+        elif ka == "d":
+            da, db = dict(ba), dict(bb)
+            for k in sorted(da.keys() | db.keys(), reverse=True):
+                sa, sb = da.get(k), db.get(k)
+                child = f"{p}[{k!r}]"
+                if sb is None:
+                    out.append({"path": child, "kind": "missing_in_new",
+                                "legacy": table.render(sa), "new": None})
+                elif sa is None:
+                    out.append({"path": child, "kind": "missing_in_legacy",
+                                "legacy": None, "new": table.render(sb)})
+                elif sa != sb:
+                    stack.append((child, sa, sb))
+        else:
+            common = set(ba) & set(bb)
+            la = [s for s in ba if s not in common]
+            lb = [s for s in bb if s not in common]
+            if len(la) == 1 and len(lb) == 1:
+                stack.append((f"{p}[*]", la[0], lb[0]))
+            else:
+                out.append({
+                    "path": f"{p}[*]", "kind": "list_elements",
+                    "legacy": [table.render(s) for s in la] or (["<empty_list>"] if not ba else []),
+                    "new": [table.render(s) for s in lb] or (["<empty_list>"] if not bb else []),
+                })
+    return out
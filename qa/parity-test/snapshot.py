@@ -0,0 +1,471 @@
+"""
+Bulk DB snapshot differ — legacy MariaDB vs new PostgreSQL world state.
+
+Pulls whole tables through server-side cursors in ``fetchmany`` batches,
+ordered by primary key, and walks both result sets in a single streaming
+merge-join.  Columns are projected through ``SCHEMA_MAP`` so every comparison
+uses the same legacy → new naming.  Works with pymysql, psycopg2 and sqlite3
+connections (the latter for offline tests).
+
+    diff = diff_table(legacy_db, new_db, SCHEMA_MAP["city"])
+    diff["columns"]["agri"]  # → {"compared", "mismatched", "max_abs_diff", ...}
+
+The new stack's ``id`` columns are serials assigned in insert order (the
+scenario loader also inserts ``general_ex`` rows), not the legacy IDs.  Pass
+``join_ids`` (name → shared ID, e.g. city name → map ID from
+``citymap.reference_for``) and rows are joined by name instead, like
+``citymap.db_frame``; ``translate`` maps the new stack's foreign-key serials
+(``nation_id``, ``city_id`` …) to the same shared IDs.  ``diff_world`` sets
+both up, taking the shared IDs from the legacy tables where none are given.
+"""
+from __future__ import annotations
+
+import itertools
+import sys
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Iterable, Iterator
+
+from comparison import RNG_SEED
+
+BATCH_SIZE = 2000
+SAMPLE_LIMIT = 5
+
+
+@dataclass(frozen=True)
+class TableMap:
+    """How one legacy table lines up with its new-stack counterpart."""
+
+    legacy_table: str
+    new_table: str
+    legacy_key: str
+    new_key: str
+    # legacy column → new column (the key is handled separately)
+    columns: dict[str, str]
+    # New-stack tables hold every world; rows are filtered by this column.
+    new_world_column: str | None = "world_id"
+    # Columns whose values are RNG-dependent; counted but never flagged.
+    rng_columns: frozenset[str] = field(default_factory=frozenset)
+    # New-stack column that ``diff_table``'s ``join_ids`` maps to the shared
+    # ID when the new key is not it (city: name → map city ID).
+    join_column: str | None = None
+    # New-stack column → SCHEMA_MAP table whose serial IDs it holds, or None
+    # when there is no shared ID to translate it to.
+    references: dict[str, str | None] = field(default_factory=dict)
+
+
+# Legacy names follow the sammo schema; new names follow
+# backend/game-app/src/main/resources/db/migration (V1 + later ALTERs).
+SCHEMA_MAP: dict[str, TableMap] = {
+    "general": TableMap(
+        legacy_table="general", new_table="general", legacy_key="no", new_key="id",
+        columns={
+            "name": "name", "nation": "nation_id", "city": "city_id", "troop": "troop_id",
+            "npc": "npc_state", "affinity": "affinity",
+            "leadership": "leadership", "strength": "strength", "intel": "intel",
+            "injury": "injury", "experience": "experience", "dedication": "dedication",
+            "officer_level": "officer_level", "gold": "gold", "rice": "rice",
+            "crew": "crew", "crewtype": "crew_type", "train": "train", "atmos": "atmos",
+            "age": "age", "belong": "belong", "betray": "betray", "killturn": "kill_turn",
+            "dex1": "dex_1", "dex2": "dex_2", "dex3": "dex_3", "dex4": "dex_4", "dex5": "dex_5",
+        },
+        rng_columns=frozenset({"gold", "rice", "crew", "train", "atmos", "experience", "dedication"}),
+        join_column="name",
+        # troop_id is a troop-table serial; legacy stores the leader's general no.
+        references={"nation_id": "nation", "city_id": "city", "troop_id": None},
+    ),
+    "city": TableMap(
+        legacy_table="city", new_table="city", legacy_key="city", new_key="id",
+        columns={
+            "name": "name", "level": "level", "nation": "nation_id",
+            "supply": "supply_state", "front": "front_state",
+            "pop": "pop", "pop_max": "pop_max", "agri": "agri", "agri_max": "agri_max",
+            "comm": "comm", "comm_max": "comm_max", "secu": "secu", "secu_max": "secu_max",
+            "trust": "trust", "trade": "trade", "dead": "dead",
+            "def": "def", "def_max": "def_max", "wall": "wall", "wall_max": "wall_max",
+            "region": "region", "term": "term",
+        },
+        rng_columns=frozenset({"pop", "trust", "trade", "dead"}),
+        join_column="name",
+        references={"nation_id": "nation"},
+    ),
+    "nation": TableMap(
+        legacy_table="nation", new_table="nation", legacy_key="nation", new_key="id",
+        columns={
+            "name": "name", "color": "color", "capital": "capital_city_id",
+            "gold": "gold", "rice": "rice", "bill": "bill", "rate": "rate",
+            "tech": "tech", "power": "power", "level": "level", "type": "type_code",
+        },
+        rng_columns=frozenset({"gold", "rice", "power"}),
+        join_column="name",
+        references={"capital_city_id": "city"},
+    ),
+}
+
+
+# ── Driver plumbing ──────────────────────────────────────────────────────────
+def _driver(conn) -> str:
+    return type(conn).__module__.split(".")[0]
+
+
+def _placeholder(conn) -> str:
+    return "?" if sys.modules[_driver(conn)].paramstyle == "qmark" else "%s"
+
+
+def _quote(conn, ident: str) -> str:
+    return f"`{ident}`" if _driver(conn) == "pymysql" else f'"{ident}"'
+
+
+_cursor_ids = itertools.count()
+
+
+@contextmanager
+def open_rows(conn, sql: str, params: tuple = (), batch_size: int = BATCH_SIZE):
+    """Run ``sql`` on a server-side cursor; yields ``(column_names, row_iterator)``.
+
+    Rows arrive in ``fetchmany(batch_size)`` batches so neither client holds
+    a whole table.  psycopg2 uses a named (``withhold`` under autocommit)
+    cursor, pymysql an unbuffered ``SSCursor``; sqlite3 cursors are already
+    lazy.
+    """
+    driver = _driver(conn)
+    if driver == "psycopg2":
+        cur = conn.cursor(name=f"parity_snapshot_{next(_cursor_ids)}", withhold=conn.autocommit)
+        cur.itersize = batch_size
+    elif driver == "pymysql":
+        import pymysql.cursors
+
+        cur = conn.cursor(pymysql.cursors.SSCursor)
+    else:
+        cur = conn.cursor()
+    try:
+        cur.execute(sql, params)
+        # Named psycopg2 cursors expose description only after the first fetch.
+        first = cur.fetchmany(batch_size)
+        columns = [d[0] for d in cur.description]
+
+        def rows() -> Iterator[tuple]:
+            batch = first
+            while batch:
+                yield from batch
+                batch = cur.fetchmany(batch_size)
+
+        yield columns, rows()
+    finally:
+        cur.close()
+
+
+def _select(conn, table: str, key: str, columns: list[str], world_column: str | None) -> str:
+    q = lambda c: _quote(conn, c)  # noqa: E731
+    sql = f"SELECT {', '.join(q(c) for c in [key, *columns])} FROM {q(table)}"
+    if world_column:
+        sql += f" WHERE {q(world_column)} = {_placeholder(conn)}"
+    return sql + f" ORDER BY {q(key)}"
+
+
+def table_columns(conn, table: str, schema=None, side: str = "") -> set[str]:
+    """Column names of ``table`` via an empty SELECT (works on every driver).
+
+    With a ``schema.SchemaRegistry`` the session's introspected columns are
+    used instead and no query is issued.
+    """
+    if schema is not None:
+        known = schema.columns(side, table)
+        if known is not None:
+            return known
+    with open_rows(conn, f"SELECT * FROM {_quote(conn, table)} WHERE 1 = 0") as (columns, _):
+        return set(columns)
+
+
+def read_table(
+    conn, table_map: TableMap, side: str, *, world_id: int = 1, batch_size: int = BATCH_SIZE,
+    schema=None,
+) -> tuple[list[str], dict[int, tuple]]:
+    """Load one side of ``table_map`` keyed by ID, with new-stack column names.
+
+    ``side`` is ``"legacy"`` or ``"new"``.  Mapped columns missing from the
+    table are left out; the returned column list says which ones are present.
+    """
+    table = table_map.legacy_table if side == "legacy" else table_map.new_table
+    have = table_columns(conn, table, schema, side)
+    if side == "legacy":
+        pairs = [(lc, nc) for lc, nc in table_map.columns.items() if lc in have]
+        sql = _select(conn, table_map.legacy_table, table_map.legacy_key, [lc for lc, _ in pairs], None)
+        params: tuple = ()
+    else:
+        pairs = [(nc, nc) for nc in table_map.columns.values() if nc in have]
+        world_column = table_map.new_world_column if table_map.new_world_column in have else None
+        sql = _select(conn, table_map.new_table, table_map.new_key, [nc for nc, _ in pairs], world_column)
+        params = (world_id,) if world_column else ()
+    rows = {}
+    with open_rows(conn, sql, params, batch_size) as (_, it):
+        for row in it:
+            rows[int(row[0])] = tuple(row[1:])
+    return [nc for _, nc in pairs], rows
+
+
+# ── Comparison ───────────────────────────────────────────────────────────────
+def _number(value: Any) -> float | None:
+    try:
+        return float(value)  # int, float, Decimal, numeric strings
+    except (TypeError, ValueError):
+        return None
+
+
+def values_equal(a: Any, b: Any, tolerance: float = 0.0) -> tuple[bool, float | None]:
+    """Returns (equal, absolute numeric difference or None)."""
+    if a is None or b is None:
+        return a is b, None
+    na, nb = _number(a), _number(b)
+    if na is not None and nb is not None:
+        delta = abs(na - nb)
+        return delta <= tolerance, delta
+    return str(a).strip() == str(b).strip(), None
+
+
+def _rekey(rows: Iterator[tuple], at: int, ids: dict[Any, int], side: int) -> Iterator[tuple]:
+    """Rows keyed by ``(0, ids[row[at]])``, in key order.
+
+    Rows whose join value is unknown are keyed ``(side, own key)`` and sort
+    after the joined ones, so the two stacks' leftovers never meet.  Holds
+    the whole table; only meant for world-sized tables (cities, nations, a
+    few thousand generals).
+    """
+    rekeyed = [((0, ids[row[at]]) if row[at] in ids else (side, int(row[0])), *row[1:]) for row in rows]
+    rekeyed.sort(key=lambda row: row[0])
+    return iter(rekeyed)
+
+
+def _translate(rows: Iterator[tuple], at: dict[int, dict[int, int]]) -> Iterator[tuple]:
+    """Rows with the values at each index mapped through ``at[index]``."""
+    for row in rows:
+        row = list(row)
+        for i, ids in at.items():
+            if row[i] is not None:
+                row[i] = ids.get(int(row[i]), row[i])
+        yield tuple(row)
+
+
+def unique_ids(pairs: Iterable[tuple[Any, Any]]) -> dict[Any, int]:
+    """Join value → key for ``(key, join value)`` pairs.
+
+    Values that occur more than once are left out, so those rows keep their
+    own keys instead of colliding.
+    """
+    ids: dict[Any, int] = {}
+    seen = set()
+    for key, value in pairs:
+        if value in seen:
+            ids.pop(value, None)
+        else:
+            seen.add(value)
+            ids[value] = int(key)
+    return ids
+
+
+def legacy_ids(legacy_conn, table_map: TableMap, *, schema=None, batch_size: int = BATCH_SIZE) -> dict[Any, int]:
+    """``join_ids`` taken from the legacy table: join column → legacy key."""
+    by_new = {nc: lc for lc, nc in table_map.columns.items()}
+    column = by_new.get(table_map.join_column)
+    if column is None or column not in table_columns(legacy_conn, table_map.legacy_table, schema, "legacy"):
+        return {}
+    sql = _select(legacy_conn, table_map.legacy_table, table_map.legacy_key, [column], None)
+    with open_rows(legacy_conn, sql, (), batch_size) as (_, rows):
+        return unique_ids(rows)
+
+
+def new_ids(
+    new_conn, table_map: TableMap, join_ids: dict[Any, int], *, world_id: int = 1, schema=None,
+    batch_size: int = BATCH_SIZE,
+) -> dict[int, int]:
+    """New-stack key → shared ID, through ``table_map.join_column``."""
+    have = table_columns(new_conn, table_map.new_table, schema, "new")
+    if table_map.join_column not in have:
+        return {}
+    world_column = table_map.new_world_column if table_map.new_world_column in have else None
+    sql = _select(new_conn, table_map.new_table, table_map.new_key, [table_map.join_column], world_column)
+    with open_rows(new_conn, sql, (world_id,) if world_column else (), batch_size) as (_, rows):
+        return {int(key): join_ids[name] for key, name in rows if name in join_ids}
+
+
+def _new_column_stats() -> dict:
+    return {"compared": 0, "mismatched": 0, "max_abs_diff": 0.0, "sum_abs_diff": 0.0, "sample": []}
+
+
+def diff_table(
+    legacy_conn,
+    new_conn,
+    table_map: TableMap,
+    *,
+    world_id: int = 1,
+    tolerance: float = 0.0,
+    ignore_columns: set[str] | None = None,
+    batch_size: int = BATCH_SIZE,
+    exact_rng: bool = RNG_SEED is not None,
+    schema=None,
+    join_ids: dict[Any, int] | None = None,
+    translate: dict[str, dict[int, int]] | None = None,
+) -> dict:
+    """Stream-join one legacy/new table pair by ID and report per-column drift.
+
+    RNG-dependent columns only count towards ``equal`` with ``exact_rng``
+    (default: when both stacks share ``PARITY_RNG_SEED``).
+
+    With ``join_ids`` and a ``table_map.join_column`` present on both sides,
+    rows of both stacks are keyed by ``join_ids[row[join_column]]`` instead
+    (``join`` in the report names the column used).  ``translate`` maps new
+    column → {new-stack ID: shared ID} for foreign keys such as ``nation_id``
+    (``translated`` in the report lists the columns it applied to).
+
+    Columns missing on either side are reported under ``missing_columns`` and
+    left out of the projection instead of failing the whole table.  Returns::
+
+        {"table", "join", "translated", "legacy_rows", "new_rows", "matched",
+         "legacy_only", "new_only", "legacy_only_sample", "new_only_sample",
+         "missing_columns": {"legacy": [...], "new": [...]},
+         "columns": {new_col: {"compared", "mismatched", "max_abs_diff",
+                               "mean_abs_diff", "rng", "sample"}},
+         "equal"}
+    """
+    ignore = ignore_columns or set()
+    legacy_have = table_columns(legacy_conn, table_map.legacy_table, schema, "legacy")
+    new_have = table_columns(new_conn, table_map.new_table, schema, "new")
+    pairs = [
+        (lc, nc) for lc, nc in table_map.columns.items()
+        if nc not in ignore and lc in legacy_have and nc in new_have
+    ]
+    missing = {
+        "legacy": sorted(lc for lc in table_map.columns if lc not in legacy_have),
+        "new": sorted(nc for nc in table_map.columns.values() if nc not in new_have),
+    }
+
+    legacy_sql = _select(legacy_conn, table_map.legacy_table, table_map.legacy_key,
+                            [lc for lc, _ in pairs], None)
+    world_column = table_map.new_world_column if table_map.new_world_column in new_have else None
+    new_sql = _select(new_conn, table_map.new_table, table_map.new_key,
+                         [nc for _, nc in pairs], world_column)
+    new_params = (world_id,) if world_column else ()
+
+    stats = {nc: _new_column_stats() for _, nc in pairs}
+    projected = [nc for _, nc in pairs]
+    join_at = None
+    if join_ids is not None and table_map.join_column in projected:
+        join_at = projected.index(table_map.join_column) + 1
+
+    translate_at = {projected.index(nc) + 1: ids for nc, ids in (translate or {}).items() if nc in projected}
+
+    report = {
+        "table": table_map.new_table,
+        "join": table_map.join_column if join_at else table_map.new_key,
+        "translated": sorted(projected[i - 1] for i in translate_at),
+        "legacy_rows": 0, "new_rows": 0, "matched": 0,
+        "legacy_only": 0, "new_only": 0,
+        "legacy_only_sample": [], "new_only_sample": [],
+        "missing_columns": missing,
+    }
+
+    def sample(bucket: list, item):
+        if len(bucket) < SAMPLE_LIMIT:
+            bucket.append(item)
+
+    sentinel = object()
+    with open_rows(legacy_conn, legacy_sql, (), batch_size) as (_, legacy_rows), \
+            open_rows(new_conn, new_sql, new_params, batch_size) as (_, new_rows):
+        if translate_at:
+            new_rows = _translate(new_rows, translate_at)
+        if join_at:
+            legacy_rows = _rekey(legacy_rows, join_at, join_ids, 1)
+            new_rows = _rekey(new_rows, join_at, join_ids, 2)
+        else:
+            legacy_rows = (((0, int(row[0])), *row[1:]) for row in legacy_rows)
+            new_rows = (((0, int(row[0])), *row[1:]) for row in new_rows)
+        lrow = next(legacy_rows, sentinel)
+        nrow = next(new_rows, sentinel)
+        while lrow is not sentinel or nrow is not sentinel:
+            lkey = lrow[0] if lrow is not sentinel else None
+            nkey = nrow[0] if nrow is not sentinel else None
+            if nkey is None or (lkey is not None and lkey < nkey):
+                report["legacy_rows"] += 1
+                report["legacy_only"] += 1
+                sample(report["legacy_only_sample"], lkey[1])
+                lrow = next(legacy_rows, sentinel)
+                continue
+            if lkey is None or nkey < lkey:
+                report["new_rows"] += 1
+                report["new_only"] += 1
+                sample(report["new_only_sample"], nkey[1])
+                nrow = next(new_rows, sentinel)
+                continue
+            report["legacy_rows"] += 1
+            report["new_rows"] += 1
+            report["matched"] += 1
+            for i, (_, nc) in enumerate(pairs, start=1):
+                s = stats[nc]
+                s["compared"] += 1
+                equal, delta = values_equal(lrow[i], nrow[i], tolerance)
+                if delta is not None:
+                    s["sum_abs_diff"] += delta
+                    if delta > s["max_abs_diff"]:
+                        s["max_abs_diff"] = delta
+                if not equal:
+                    s["mismatched"] += 1
+                    sample(s["sample"], {"id": lkey[1], "legacy": lrow[i], "new": nrow[i]})
+            lrow = next(legacy_rows, sentinel)
+            nrow = next(new_rows, sentinel)
+
+    rng = table_map.rng_columns
+    columns = {}
+    for lc, nc in pairs:
+        s = stats[nc]
+        columns[nc] = {
+            "compared": s["compared"],
+            "mismatched": s["mismatched"],
+            "max_abs_diff": s["max_abs_diff"],
+            "mean_abs_diff": s["sum_abs_diff"] / s["compared"] if s["compared"] else 0.0,
+            "rng": nc in rng or lc in rng,
+            "sample": s["sample"],
+        }
+    report["columns"] = columns
+    report["equal"] = (
+        report["legacy_only"] == 0
+        and report["new_only"] == 0
+        and all(c["mismatched"] == 0 for c in columns.values() if exact_rng or not c["rng"])
+    )
+    return report
+
+
+def diff_world(
+    legacy_conn, new_conn, tables: list[str] | None = None, *, schema=None,
+    join_ids: dict[str, dict[Any, int]] | None = None, **kwargs
+) -> dict[str, dict]:
+    """``diff_table`` for every entry of ``SCHEMA_MAP`` (or the named subset).
+
+    With a ``schema.SchemaRegistry`` each table projects every column the
+    registry pairs up, not only the hand-listed ``SCHEMA_MAP`` ones.
+    ``join_ids`` holds each table's ``diff_table`` ``join_ids`` by name;
+    tables without an entry are joined through the legacy names
+    (``legacy_ids``).  Foreign keys are translated through the referenced
+    tables' ``new_ids``, and reference columns with no shared ID are ignored.
+    """
+    tables = list(tables or SCHEMA_MAP)
+    maps = {name: schema.table(name).table_map() if schema is not None else SCHEMA_MAP[name] for name in tables}
+    referenced = {ref for tm in maps.values() for ref in tm.references.values() if ref is not None}
+    join_ids = dict(join_ids or {})
+    shared: dict[str, dict[int, int]] = {}
+    for name in [*tables, *sorted(referenced - set(tables))]:
+        tm = maps.get(name, SCHEMA_MAP[name])
+        if tm.join_column is None:
+            continue
+        if name not in join_ids:
+            join_ids[name] = legacy_ids(legacy_conn, tm, schema=schema)
+        shared[name] = new_ids(new_conn, tm, join_ids[name], world_id=kwargs.get("world_id", 1), schema=schema)
+
+    ignore = set(kwargs.pop("ignore_columns", None) or ())
+    report = {}
+    for name, tm in maps.items():
+        translate = {nc: shared[ref] for nc, ref in tm.references.items() if ref in shared}
+        report[name] = diff_table(
+            legacy_conn, new_conn, tm, schema=schema, join_ids=join_ids.get(name), translate=translate,
+            ignore_columns=ignore | {nc for nc in tm.references if nc not in translate}, **kwargs,
+        )
+    return report
@@ -0,0 +1,466 @@
+"""
+Streaming comparison for large parity payloads.
+
+Instead of ``response.json()`` on both sides, bytes are fed from
+``response.iter_content`` through an incremental JSON tokenizer that yields
+events, which are turned into ``(path, value)`` leaves and compared as they
+arrive.  Memory stays proportional to how far the two streams are out of step,
+not to the payload size.
+
+Value mode
+    Elements of arrays of objects are buffered one at a time, paired by the
+    same identity keys as ``comparison.LIST_MATCH_KEYS`` (falling back to the
+    element index) and diffed with ``comparison.diff_payloads``.  Other leaves
+    are paired by path.  Scalar arrays are compared positionally.
+
+Structural mode (``structural_only=True``)
+    Every leaf is reduced to ``(pattern, type)`` where the pattern replaces
+    array indices with ``*``.  Reading stops at the first pattern whose type
+    differs between the stacks.  Unlike ``structural_shape`` this inspects
+    every list element, not just the first.
+"""
+from __future__ import annotations
+
+import codecs
+import json
+import re
+from itertools import zip_longest
+from typing import Any, Iterable, Iterator
+
+from comparison import FIELD_MAP_KR_EN, LIST_MATCH_KEYS, RNG_IGNORE_FIELDS, _coerce_scalar, diff_payloads
+
+CHUNK_SIZE = 64 * 1024
+
+_NUMBER = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][-+]?\d+)?")
+_NUMBER_CHARS = re.compile(r"[-+0-9.eE]*")
+_WS = re.compile(r"[ \t\n\r]*")
+_LITERALS = {"true": True, "false": False, "null": None}
+_scanstring = json.decoder.scanstring
+
+
+
+class _Marker(str):
+    """Empty-container leaf; compared by identity so JSON strings never collide."""
+
+
+# Markers for empty containers so structure survives flattening.
+EMPTY_MAP = _Marker("<empty_map>")
+EMPTY_LIST = _Marker("<empty_list>")
+
+
+class _NeedMore(Exception):
+    pass
+
+
+def iter_events(chunks: Iterable[bytes]) -> Iterator[tuple[str, Any]]:
+    """Incremental JSON tokenizer.
+
+    Yields ``(event, value)`` with events ``start_map``, ``key``, ``end_map``,
+    ``start_array``, ``end_array`` and ``value``.  Raises ``ValueError`` on
+    malformed input.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buf = ""
+    pos = 0
+    # Per open container: True for a map, False for an array.
+    containers: list[bool] = []
+    expect_key = False
+
+    def token(final: bool) -> tuple[str, Any, int]:
+        nonlocal expect_key
+        ch = buf[pos]
+        if ch == "{":
+            containers.append(True)
+            expect_key = True
+            return "start_map", None, pos + 1
+        if ch == "[":
+            containers.append(False)
+            return "start_array", None, pos + 1
+        if ch in "}]":
+            if not containers or containers[-1] != (ch == "}"):
+                raise ValueError(f"Unexpected {ch!r} at offset {pos}")
+            containers.pop()
+            expect_key = False
+            return ("end_map" if ch == "}" else "end_array"), None, pos + 1
+        if ch == ",":
+            expect_key = bool(containers) and containers[-1]
+            return "", None, pos + 1
+        if ch == ":":
+            return "", None, pos + 1
+        if ch == '"':
+            try:
+                s, end = _scanstring(buf, pos + 1, True)
+            except json.JSONDecodeError:
+                if final:
+                    raise ValueError(f"Unterminated string at offset {pos}")
+                raise _NeedMore
+            if expect_key:
+                expect_key = False
+                return "key", s, end
+            return "value", s, end
+        if not final and _NUMBER_CHARS.match(buf, pos).end() == len(buf):
+            raise _NeedMore  # a number may continue in the next chunk
+        m = _NUMBER.match(buf, pos)
+        if m:
+            end = m.end()
+            text = m.group()
+            is_float = "." in text or "e" in text or "E" in text
+            return "value", float(text) if is_float else int(text), end
+        for word, value in _LITERALS.items():
+            if buf.startswith(word, pos):
+                return "value", value, pos + len(word)
+            if not final and word.startswith(buf[pos:]):
+                raise _NeedMore
+        raise ValueError(f"Unexpected {ch!r} at offset {pos}")
+
+    def drain(final: bool) -> Iterator[tuple[str, Any]]:
+        nonlocal pos
+        while True:
+            pos = _WS.match(buf, pos).end()
+            if pos >= len(buf):
+                return
+            try:
+                event, value, end = token(final)
+            except _NeedMore:
+                return
+            pos = end
+            if event:
+                yield event, value
+
+    for chunk in chunks:
+        if not chunk:
+            continue
+        buf = buf[pos:] + decoder.decode(chunk)
+        pos = 0
+        yield from drain(False)
+    buf = buf[pos:] + decoder.decode(b"", final=True)
+    pos = 0
+    yield from drain(True)
+    if containers:
+        raise ValueError("Truncated JSON document")
+
+
+def iter_leaves(
+    events: Iterable[tuple[str, Any]],
+    mapping: dict[str, str] | None = None,
+    *,
+    coerce: bool = True,
+) -> Iterator[tuple[tuple, Any]]:
+    """Flatten tokenizer events into ``(path, value)`` leaves.
+
+    Keys are renamed through ``mapping`` and PHP string leaves coerced the
+    same way as ``comparison.normalize_payload``.  Empty containers are
+    reported as ``EMPTY_MAP`` / ``EMPTY_LIST`` leaves.
+    """
+    path: list = []
+    # Per open container: [is_map, next_index, has_children]
+    frames: list[list] = []
+    rename = mapping.get if mapping else None
+
+    def enter_child():
+        if frames:
+            frame = frames[-1]
+            frame[2] = True
+            if not frame[0]:
+                path.append(frame[1])
+                frame[1] += 1
+
+    def leave_child():
+        if frames and not frames[-1][0]:
+            path.pop()
+
+    for event, value in events:
+        if event == "key":
+            path.append(rename(value, value) if rename else value)
+        elif event == "value":
+            enter_child()
+            if coerce and type(value) is str:
+                value = _coerce_scalar(value)
+            yield tuple(path), value
+            leave_child()
+            if frames and frames[-1][0]:
+                path.pop()
+        elif event in ("start_map", "start_array"):
+            enter_child()
+            frames.append([event == "start_map", 0, False])
+        else:
+            is_map, _, has_children = frames.pop()
+            if not has_children:
+                yield tuple(path), EMPTY_MAP if is_map else EMPTY_LIST
+            leave_child()
+            if frames and frames[-1][0]:
+                path.pop()
+
+
+def _pattern(path: tuple) -> tuple:
+    return tuple("*" if type(p) is int else p for p in path)
+
+
+def _format_path(path: tuple) -> str:
+    return "root" + "".join("[*]" if p == "*" else f"[{p!r}]" for p in path)
+
+
+def _leaf_type(value: Any) -> str:
+    if value is EMPTY_MAP or value is EMPTY_LIST:
+        return value
+    return type(value).__name__
+
+
+def _compare_structure(legacy: Iterator, new: Iterator, ignore_fields) -> dict:
+    seen: tuple[dict, dict] = ({}, {})
+    counts = [0, 0]
+    mismatches: list[tuple[tuple, dict]] = []
+    for pair in zip_longest(legacy, new):
+        for side, item in enumerate(pair):
+            if item is None:
+                continue
+            path, value = item
+            if ignore_fields and any(p in ignore_fields for p in path):
+                continue
+            counts[side] += 1
+            pattern = _pattern(path)
+            kind = _leaf_type(value)
+            mine, other = seen[side], seen[1 - side]
+            if pattern in mine:
+                if mine[pattern] == kind:
+                    continue
+                # Heterogeneous elements within one stack count as divergence
+                # too — structural_shape would have hidden them.
+                stack = "legacy" if side == 0 else "new"
+                mismatches.append((pattern, {"mixed_in": stack, "types": [mine[pattern], kind]}))
+            else:
+                mine[pattern] = kind
+                if pattern in other and other[pattern] != kind:
+                    legacy_type, new_type = (kind, other[pattern]) if side == 0 else (other[pattern], kind)
+                    mismatches.append((pattern, {"old_type": legacy_type, "new_type": new_type}))
+            if mismatches:
+                return {
+                    "equal": False,
+                    "structural_match": False,
+                    "diff": {"type_changes": {_format_path(p): d for p, d in mismatches}},
+                    "leaves": {"legacy": counts[0], "new": counts[1]},
+                    "stopped_early": True,
+                }
+
+    only_legacy = sorted(_format_path(p) for p in seen[0].keys() - seen[1].keys())
+    only_new = sorted(_format_path(p) for p in seen[1].keys() - seen[0].keys())
+    diff = {}
+    if only_legacy:
+        diff["dictionary_item_removed"] = only_legacy
+    if only_new:
+        diff["dictionary_item_added"] = only_new
+    return {
+        "equal": not diff,
+        "structural_match": not diff,
+        "diff": diff or None,
+        "leaves": {"legacy": counts[0], "new": counts[1]},
+        "stopped_early": False,
+    }
+
+
+def _units(leaves: Iterator[tuple[tuple, Any]], match_keys: tuple[str, ...]) -> Iterator[tuple]:
+    """Group leaves into comparison units.
+
+    Yields ``("leaf", path, value)`` or ``("record", list_path, ident, element)``
+    where ``element`` is a rebuilt array-of-objects element and ``ident`` is
+    its identity key value (or its index).
+    """
+    current: list | None = None  # [list_path, index, leaves]
+
+    def flush():
+        list_path, index, items = current
+        element = _rebuild(items)
+        ident = ("index", index)
+        if type(element) is dict:
+            for key in match_keys:
+                value = element.get(key)
+                if isinstance(value, (int, str)):
+                    ident = (key, value)
+                    break
+        return ("record", list_path, ident, element)
+
+    for path, value in leaves:
+        if current is not None:
+            prefix = current[0]
+            n = len(prefix)
+            if path[:n] == prefix and len(path) > n and path[n] == current[1]:
+                current[2].append((path[n + 1:], value))
+                continue
+            yield flush()
+            current = None
+        # Start a record when this leaf sits inside an object that is an array element.
+        for i in range(len(path) - 1):
+            if type(path[i]) is int and type(path[i + 1]) is not int:
+                current = [path[:i], path[i], [(path[i + 1:], value)]]
+                break
+        else:
+            yield ("leaf", path, value)
+    if current is not None:
+        yield flush()
+
+
+def _rebuild(items: list[tuple[tuple, Any]]) -> Any:
+    """Rebuild a small JSON value from relative ``(path, value)`` leaves."""
+    if len(items) == 1 and not items[0][0]:
+        value = items[0][1]
+        return {} if value is EMPTY_MAP else [] if value is EMPTY_LIST else value
+    root: Any = {} if type(items[0][0][0]) is not int else []
+    for path, value in items:
+        if value is EMPTY_MAP:
+            value = {}
+        elif value is EMPTY_LIST:
+            value = []
+        node = root
+        for i, key in enumerate(path):
+            last = i == len(path) - 1
+            nxt = None if last else ([] if type(path[i + 1]) is int else {})
+            if type(node) is list:
+                while len(node) <= key:
+                    node.append(None)
+                if last:
+                    node[key] = value
+                elif node[key] is None:
+                    node[key] = nxt
+                node = node[key]
+            else:
+                if last:
+                    node[key] = value
+                else:
+                    node = node.setdefault(key, nxt)
+    return root
+
+
+def _compare_values(legacy: Iterator, new: Iterator, ignore_fields, match_keys) -> dict:
+    pending: tuple[dict, dict] = ({}, {})
+    counts = [0, 0]
+    diff: dict[str, Any] = {}
+
+    def merge(sub: dict, prefix: str):
+        # diff_payloads paths start with "root"; re-root them at ``prefix``.
+        for category, entries in sub.items():
+            if isinstance(entries, list):
+                diff.setdefault(category, []).extend(prefix + p[4:] for p in entries)
+            else:
+                bucket = diff.setdefault(category, {})
+                for p, detail in entries.items():
+                    bucket[prefix + p[4:]] = detail
+
+    for pair in zip_longest(_units(legacy, match_keys), _units(new, match_keys)):
+        for side, unit in enumerate(pair):
+            if unit is None:
+                continue
+            if unit[0] == "leaf":
+                _, path, value = unit
+                if ignore_fields and any(p in ignore_fields for p in path):
+                    continue
+                key = ("leaf", path)
+                label = _format_path(path)
+                payload = value
+            else:
+                _, list_path, ident, payload = unit
+                if ignore_fields and any(p in ignore_fields for p in list_path):
+                    continue
+                key = ("record", list_path, ident)
+                by, value = ident
+                label = _format_path(list_path) + (f"[{value}]" if by == "index" else f"[{by}={value!r}]")
+            counts[side] += 1
+            other = pending[1 - side]
+            if key in other:
+                theirs, _ = other.pop(key)
+                a, b = (payload, theirs) if side == 0 else (theirs, payload)
+                merge(diff_payloads(
+                    a, b, ignore_fields=ignore_fields or frozenset(), match_keys=match_keys,
+                ), label)
+            else:
+                pending[side][key] = (payload, label)
+    for side, verb in ((0, "removed"), (1, "added")):
+        for key, (payload, label) in pending[side].items():
+            if key[0] == "leaf" and key[1] and type(key[1][-1]) is str:
+                diff.setdefault(f"dictionary_item_{verb}", []).append(label)
+            else:
+                diff.setdefault(f"iterable_item_{verb}", {})[label] = payload
+    return {
+        "equal": not diff,
+        "structural_match": None,
+        "diff": diff or None,
+        "leaves": {"legacy": counts[0], "new": counts[1]},
+        "stopped_early": False,
+    }
+
+
+def compare_chunks(
+    legacy_chunks: Iterable[bytes],
+    new_chunks: Iterable[bytes],
+    *,
+    structural_only: bool = False,
+    ignore_fields: set[str] | None = None,
+    normalize: bool = True,
+    match_keys: tuple[str, ...] = LIST_MATCH_KEYS,
+) -> dict:
+    """Streaming counterpart of ``comparison.compare_responses`` over raw byte chunks.
+
+    Returns ``equal`` / ``structural_match`` / ``diff`` like
+    ``compare_responses`` plus ``leaves`` (per-stack leaf counts actually
+    read) and ``stopped_early``.  Value mode skips ``RNG_IGNORE_FIELDS`` unless
+    ``ignore_fields`` is given, as ``compare_responses`` does.
+    """
+    legacy = iter_leaves(iter_events(legacy_chunks), FIELD_MAP_KR_EN if normalize else None,
+                         coerce=normalize)
+    new = iter_leaves(iter_events(new_chunks), coerce=normalize)
+    if structural_only:
+        return _compare_structure(legacy, new, ignore_fields)
+    if ignore_fields is None:
+        ignore_fields = RNG_IGNORE_FIELDS
+    return _compare_values(legacy, new, ignore_fields, match_keys)
+
+
+def build_value(events: Iterable[tuple[str, Any]]) -> Any:
+    """The JSON value described by ``iter_events`` output (no coercion or renaming)."""
+    # Per open container: [container, pending map key]
+    stack: list[list] = []
+    result = None
+    for event, value in events:
+        if event == "key":
+            stack[-1][1] = value
+            continue
+        if event in ("start_map", "start_array"):
+            stack.append([{} if event == "start_map" else [], None])
+            continue
+        if event != "value":
+            value = stack.pop()[0]
+        if not stack:
+            result = value
+        elif type(stack[-1][0]) is list:
+            stack[-1][0].append(value)
+        else:
+            stack[-1][0][stack[-1][1]] = value
+    return result
+
+
+def read_json(response) -> Any:
+    """``response.json()`` decoded chunk by chunk from ``iter_content``.
+
+    For payloads that must be held whole (e.g. to build a ``citymap`` frame)
+    but whose raw text need not be: only the decoded value stays in memory.
+    The response is closed afterwards.
+    """
+    try:
+        return build_value(iter_events(response.iter_content(CHUNK_SIZE)))
+    finally:
+        response.close()
+
+
+def compare_streams(legacy_response, new_response, **kwargs) -> dict:
+    """``compare_chunks`` over two ``requests`` responses, ideally opened with
+    ``stream=True``.  Both responses are closed afterwards, so an early
+    structural stop also stops the download.
+    """
+    try:
+        return compare_chunks(
+            legacy_response.iter_content(CHUNK_SIZE),
+            new_response.iter_content(CHUNK_SIZE),
+            **kwargs,
+        )
+    finally:
+        legacy_response.close()
+        new_response.close()
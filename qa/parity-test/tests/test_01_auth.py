@@ -10,31 +10,32 @@ We compare:
   - Duplicate registration: both reject
 """
 import pytest
-import uuid
 from comparison import compare_responses
+from conftest import run_id
 
-TEST_USER = f"parity_{uuid.uuid4().hex[:8]}"
+# Derived from the run id so every xdist worker agrees on the same user.
+TEST_USER = f"parity_{run_id()}"
 TEST_PASS = "TestPass123!"
 TEST_NICK = "테스트장수"
 
 
 class TestRegister:
-    def test_register_both_succeed(self, legacy, new):
+    def test_register_both_succeed(self, paired):
         """Register the same user on both systems and compare structure."""
         # Legacy — uses its own session-based registration
         # Legacy register path guessed from common sammo patterns
-        lr = legacy.call("Global/Join", {
-            "loginID": TEST_USER,
-            "loginPW": TEST_PASS,
-            "nickName": TEST_NICK,
-        })
-
-        # New stack
-        nr = new.post("/api/auth/register", {
-            "loginId": TEST_USER,
-            "password": TEST_PASS,
-            "displayName": TEST_NICK,
-        })
+        lr, nr = paired.post(
+            "Global/Join", {
+                "loginID": TEST_USER,
+                "loginPW": TEST_PASS,
+                "nickName": TEST_NICK,
+            },
+            "/api/auth/register", {
+                "loginId": TEST_USER,
+                "password": TEST_PASS,
+                "displayName": TEST_NICK,
+            },
+        )
 
         # Both should succeed (2xx)
         assert lr.status_code in (200, 201), f"Legacy register failed: {lr.status_code} {lr.text[:200]}"
@@ -57,18 +58,20 @@ class TestRegister:
         assert legacy_ok, f"Legacy register did not succeed: {legacy_data}"
         assert new_ok, f"New register did not succeed: {new_data}"
 
-    def test_duplicate_register_rejected(self, legacy, new):
+    def test_duplicate_register_rejected(self, paired):
         """Both systems should reject duplicate registrations."""
-        lr = legacy.call("Global/Join", {
-            "loginID": TEST_USER,
-            "loginPW": TEST_PASS,
-            "nickName": TEST_NICK + "2",
-        })
-        nr = new.post("/api/auth/register", {
-            "loginId": TEST_USER,
-            "password": TEST_PASS,
-            "displayName": TEST_NICK + "2",
-        })
+        lr, nr = paired.post(
+            "Global/Join", {
+                "loginID": TEST_USER,
+                "loginPW": TEST_PASS,
+                "nickName": TEST_NICK + "2",
+            },
+            "/api/auth/register", {
+                "loginId": TEST_USER,
+                "password": TEST_PASS,
+                "displayName": TEST_NICK + "2",
+            },
+        )
 
         # Both should fail (4xx or result=false)
         legacy_data = lr.json()
@@ -83,33 +86,24 @@ class TestRegister:
 
 
 class TestLogin:
-    def test_login_both_succeed(self, legacy, new):
+    def test_login_both_succeed(self, paired):
         """Login with the previously registered user on both systems."""
-        lr = legacy.call("Global/Login", {
-            "loginID": TEST_USER,
-            "loginPW": TEST_PASS,
-        })
-        nr = new.post("/api/auth/login", {
-            "loginId": TEST_USER,
-            "password": TEST_PASS,
-        })
+        lr, nr = paired.post(
+            "Global/Login", {"loginID": TEST_USER, "loginPW": TEST_PASS},
+            "/api/auth/login", {"loginId": TEST_USER, "password": TEST_PASS},
+        )
 
         assert lr.status_code == 200, f"Legacy login failed: {lr.status_code}"
         assert nr.status_code == 200, f"New login failed: {nr.status_code}"
+        new_data = nr.json()
+        assert "token" in new_data or "accessToken" in new_data, f"New login returned no token: {new_data}"
 
-        # Save token for subsequent tests
-        new.login(TEST_USER, TEST_PASS)
-
-    def test_bad_password_rejected(self, legacy, new):
+    def test_bad_password_rejected(self, paired):
         """Both systems reject wrong passwords."""
-        lr = legacy.call("Global/Login", {
-            "loginID": TEST_USER,
-            "loginPW": "WRONG_PASSWORD",
-        })
-        nr = new.post("/api/auth/login", {
-            "loginId": TEST_USER,
-            "password": "WRONG_PASSWORD",
-        })
+        lr, nr = paired.post(
+            "Global/Login", {"loginID": TEST_USER, "loginPW": "WRONG_PASSWORD"},
+            "/api/auth/login", {"loginId": TEST_USER, "password": "WRONG_PASSWORD"},
+        )
 
         legacy_data = lr.json()
         legacy_rejected = (
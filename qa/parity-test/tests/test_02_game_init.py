@@ -12,10 +12,9 @@ from comparison import compare_responses, RNG_DEPENDENT_FIELDS
 
 
 class TestScenarios:
-    def test_scenario_list_structure(self, legacy, new):
+    def test_scenario_list_structure(self, paired):
         """Both systems should return a scenario list with matching structure."""
-        lr = legacy.get("Global/GetConst")
-        nr = new.get("/api/scenarios")
+        lr, nr = paired.get("Global/GetConst", "/api/scenarios")
 
         assert lr.status_code == 200, f"Legacy GetConst failed: {lr.status_code}"
         assert nr.status_code == 200, f"New scenarios failed: {nr.status_code}"
@@ -38,12 +37,10 @@ class TestScenarios:
 class TestWorldState:
     """After world creation, compare global state."""
 
-    def test_nation_list_structure(self, legacy, new):
+    def test_nation_list_structure(self, paired):
         """Nation lists should have same structural shape."""
-        lr = legacy.get("Global/GetNationList")
-
         # New: we need a worldId — try world 1
-        nr = new.get("/api/worlds/1/nations")
+        lr, nr = paired.get("Global/GetNationList", "/api/worlds/1/nations")
 
         if lr.status_code != 200 or nr.status_code != 200:
             pytest.skip("World not initialised yet on one or both stacks")
@@ -62,10 +59,9 @@ class TestWorldState:
             f"  New shape:    {cmp['new_shape']}"
         )
 
-    def test_general_list_structure(self, legacy, new):
+    def test_general_list_structure(self, paired):
         """General lists should have same structural shape."""
-        lr = legacy.get("Global/GeneralList")
-        nr = new.get("/api/worlds/1/front-info")
+        lr, nr = paired.get("Global/GeneralList", "/api/worlds/1/front-info")
 
         if lr.status_code != 200 or nr.status_code != 200:
             pytest.skip("World not initialised on one or both stacks")
@@ -79,10 +75,9 @@ class TestWorldState:
         assert legacy_data, "Legacy returned empty general list"
         assert new_data, "New returned empty front info"
 
-    def test_city_list_structure(self, legacy, new):
+    def test_city_list_structure(self, paired):
         """City data should have same structural shape."""
-        lr = legacy.get("Global/GetMap")
-        nr = new.get("/api/worlds/1/cities")
+        lr, nr = paired.get("Global/GetMap", "/api/worlds/1/cities")
 
         if lr.status_code != 200 or nr.status_code != 200:
             pytest.skip("World not initialised on one or both stacks")
@@ -103,10 +98,9 @@ class TestWorldState:
                         f"  New keys:    {sorted(new_data[0].keys()) if isinstance(new_data[0], dict) else 'N/A'}"
                     )
 
-    def test_diplomacy_structure(self, legacy, new):
+    def test_diplomacy_structure(self, paired):
         """Diplomacy relations should have same structural shape."""
-        lr = legacy.get("Global/GetDiplomacy")
-        nr = new.get("/api/worlds/1/diplomacy")
+        lr, nr = paired.get("Global/GetDiplomacy", "/api/worlds/1/diplomacy")
 
         if lr.status_code != 200 or nr.status_code != 200:
             pytest.skip("World not initialised on one or both stacks")
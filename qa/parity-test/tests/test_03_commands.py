@@ -5,43 +5,20 @@ Compares command execution results between legacy and new stack.
 Both systems should accept commands and return structurally equivalent results.
 """
 import pytest
+import db
+from commands import COMMAND_MAP
 from comparison import compare_responses, RNG_DEPENDENT_FIELDS
 
 
-# Command mapping: legacy Korean command codes → new English API
-COMMAND_MAP = {
-    # Domestic commands (내정)
-    "che_정비훈련": {"legacy_path": "Command/ReserveCommand", "legacy_code": "che_정비훈련",
-                    "new_path": "/api/generals/{gid}/commands", "new_action": "TRAIN"},
-    "che_정비사기": {"legacy_path": "Command/ReserveCommand", "legacy_code": "che_정비사기",
-                    "new_path": "/api/generals/{gid}/commands", "new_action": "BOOST_MORALE"},
-    "che_징병":    {"legacy_path": "Command/ReserveCommand", "legacy_code": "che_징병",
-                    "new_path": "/api/generals/{gid}/commands", "new_action": "RECRUIT"},
-    # Domestic development
-    "che_상업투자": {"legacy_path": "Command/ReserveCommand", "legacy_code": "che_상업투자",
-                    "new_path": "/api/generals/{gid}/commands", "new_action": "DEVELOP_COMMERCE"},
-    "che_농업투자": {"legacy_path": "Command/ReserveCommand", "legacy_code": "che_농업투자",
-                    "new_path": "/api/generals/{gid}/commands", "new_action": "DEVELOP_AGRICULTURE"},
-    "che_치안강화": {"legacy_path": "Command/ReserveCommand", "legacy_code": "che_치안강화",
-                    "new_path": "/api/generals/{gid}/commands", "new_action": "IMPROVE_SECURITY"},
-    "che_수비강화": {"legacy_path": "Command/ReserveCommand", "legacy_code": "che_수비강화",
-                    "new_path": "/api/generals/{gid}/commands", "new_action": "IMPROVE_DEFENCE"},
-    "che_성벽보수": {"legacy_path": "Command/ReserveCommand", "legacy_code": "che_성벽보수",
-                    "new_path": "/api/generals/{gid}/commands", "new_action": "REPAIR_WALL"},
-    # War
-    "che_출병":    {"legacy_path": "Command/ReserveCommand", "legacy_code": "che_출병",
-                    "new_path": "/api/generals/{gid}/commands", "new_action": "MARCH"},
-}
-
-
 class TestCommandReservation:
     """Test that command reservation works on both systems."""
 
     @pytest.fixture(autouse=True)
-    def _setup(self, legacy, new):
+    def _setup(self, legacy, new, paired):
         """Ensure both systems have a logged-in user with a general."""
         self.legacy = legacy
         self.new = new
+        self.paired = paired
         # These tests require an active general — skip if world not ready
         lr = legacy.get("General/GetCommandTable")
         if lr.status_code != 200:
@@ -55,17 +32,17 @@ class TestCommandReservation:
         """Reserve a command on both systems and compare result structure."""
         cmd = COMMAND_MAP[cmd_key]
 
-        # Legacy: reserve command
-        lr = self.legacy.call(cmd["legacy_path"], {
-            "command": cmd["legacy_code"],
-            "turn": 0,  # next available turn
-        })
-
-        # New: reserve command (general ID 1 as placeholder)
-        nr = self.new.post(cmd["new_path"].format(gid=1), {
-            "action": cmd["new_action"],
-            "turnIndex": 0,
-        })
+        # Legacy: reserve command / New: reserve command (general ID 1 as placeholder)
+        lr, nr = self.paired.post(
+            cmd["legacy_path"], {
+                "command": cmd["legacy_code"],
+                "turn": 0,  # next available turn
+            },
+            cmd["new_path"].format(gid=1), {
+                "action": cmd["new_action"],
+                "turnIndex": 0,
+            },
+        )
 
         # Both should return a result object
         if lr.status_code != 200 and nr.status_code != 200:
@@ -88,8 +65,7 @@ class TestCommandReservation:
 
     def test_get_command_table(self):
         """Command table retrieval should return equivalent structures."""
-        lr = self.legacy.get("General/GetCommandTable")
-        nr = self.new.get("/api/generals/1/turns")
+        lr, nr = self.paired.get("General/GetCommandTable", "/api/generals/1/turns")
 
         if lr.status_code != 200 or nr.status_code != 200:
             pytest.skip("Command table not available")
@@ -116,24 +92,20 @@ class TestCommandExecution:
         """After recruiting, both systems should increase crew count."""
         # Get crew before
         try:
-            with legacy_db.cursor() as cur:
-                cur.execute("SELECT crew FROM general WHERE no=1 LIMIT 1")
-                row = cur.fetchone()
-                if not row:
-                    pytest.skip("No general in legacy DB")
-                legacy_crew_before = int(row["crew"])
+            row = db.fetchone(legacy_db, db.LEGACY_GENERAL_CREW, (1,))
         except Exception:
-            pytest.skip("Legacy DB not accessible or no general table")
+            pytest.skip("Legacy DB has no general table")
+        if not row:
+            pytest.skip("No general in legacy DB")
+        legacy_crew_before = int(row["crew"])
 
         try:
-            with new_db.cursor() as cur:
-                cur.execute("SELECT crew FROM generals WHERE id=1 LIMIT 1")
-                row = cur.fetchone()
-                if not row:
-                    pytest.skip("No general in new DB")
-                new_crew_before = row[0]
+            row = db.fetchone(new_db, db.NEW_GENERAL_CREW, (1,))
         except Exception:
-            pytest.skip("New DB not accessible or no generals table")
+            pytest.skip("New DB has no generals table")
+        if not row:
+            pytest.skip("No general in new DB")
+        new_crew_before = row[0]
 
         # Execute recruit on both (via turn advance or direct)
         # This is a structural test — we verify the DB schema supports crew tracking
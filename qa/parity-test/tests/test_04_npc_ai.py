@@ -3,19 +3,29 @@ Parity Test — NPC AI decision logic.
 
 Both systems should make structurally similar decisions for NPC generals.
 We compare:
-  - NPC command choices (not exact values, but category: domestic vs war vs diplomacy)
+  - NPC command mixes per nation — chi-square homogeneity over the
+    COMMAND_MAP categories (see npc_decisions.py), sampled once or across
+    PARITY_NPC_TURNS advanced turns
   - NPC policy settings structure
 """
+import os
+
 import pytest
+import db
 from comparison import compare_responses
+from npc_decisions import DecisionSampler
+from turns import TurnDriver, http_advancers
+
+NPC_TURNS = int(os.environ.get("PARITY_NPC_TURNS", "0"))
+ADMIN_LOGIN_ID = os.environ.get("ADMIN_LOGIN_ID", "admin")
+ADMIN_PASSWORD = os.environ.get("ADMIN_PASSWORD", "testadmin123")
 
 
 class TestNpcPolicy:
-    def test_npc_policy_structure(self, legacy, new):
+    def test_npc_policy_structure(self, paired):
         """NPC policy settings should have matching structure."""
         # Legacy stores NPC policy in nation settings
-        lr = legacy.get("Global/GetNationList")
-        nr = new.get("/api/nations/1/npc-policy")
+        lr, nr = paired.get("Global/GetNationList", "/api/nations/1/npc-policy")
 
         if lr.status_code != 200 or nr.status_code != 200:
             pytest.skip("NPC policy not available")
@@ -35,23 +45,13 @@ class TestNpcDecisions:
     def test_npc_generals_have_commands(self, legacy_db, new_db):
         """Both DBs should have NPC generals with assigned commands."""
         try:
-            with legacy_db.cursor() as cur:
-                cur.execute("""
-                    SELECT COUNT(*) as cnt FROM general
-                    WHERE npc > 0 AND turntime IS NOT NULL
-                """)
-                legacy_npc_count = cur.fetchone()["cnt"]
+            legacy_npc_count = db.fetchone(legacy_db, db.LEGACY_NPC_COUNT)["cnt"]
         except Exception:
             pytest.skip("Legacy DB schema doesn't match expected structure")
 
         try:
-            with new_db.cursor() as cur:
-                cur.execute("""
-                    SELECT COUNT(*) as cnt FROM generals
-                    WHERE npc_type IS NOT NULL AND npc_type != 'NONE'
-                """)
-                row = cur.fetchone()
-                new_npc_count = row[0] if row else 0
+            row = db.fetchone(new_db, db.NEW_NPC_COUNT)
+            new_npc_count = row[0] if row else 0
         except Exception:
             pytest.skip("New DB schema doesn't match expected structure")
 
@@ -66,47 +66,31 @@ class TestNpcDecisions:
                 f"NPC general count mismatch: legacy={legacy_npc_count}, new={new_npc_count}"
             )
 
-    def test_npc_command_categories(self, legacy_db, new_db):
-        """NPC commands should fall into similar categories on both systems."""
-        # Categorize legacy commands
-        try:
-            with legacy_db.cursor() as cur:
-                cur.execute("""
-                    SELECT DISTINCT LEFT(turn0, 10) as cmd_prefix
-                    FROM general WHERE npc > 0 LIMIT 50
-                """)
-                legacy_cmds = {r["cmd_prefix"] for r in cur.fetchall() if r["cmd_prefix"]}
-        except Exception:
-            legacy_cmds = set()
-
+    def test_npc_decision_distribution(self, legacy, new, legacy_db, new_db, rng_seed):
+        """NPC command mixes per nation should be drawn from the same distribution."""
+        sampler = DecisionSampler(legacy_db, new_db)
         try:
-            with new_db.cursor() as cur:
-                cur.execute("""
-                    SELECT DISTINCT action FROM general_turns
-                    WHERE general_id IN (SELECT id FROM generals WHERE npc_type IS NOT NULL AND npc_type != 'NONE')
-                    LIMIT 50
-                """)
-                new_cmds = {r[0] for r in cur.fetchall() if r[0]}
-        except Exception:
-            new_cmds = set()
-
-        if not legacy_cmds and not new_cmds:
-            pytest.skip("No NPC commands found in either DB")
-
-        # Map command categories
-        domestic_kr = {"che_농업투자", "che_상업투자", "che_치안강화", "che_수비강화", "che_성벽보수"}
-        military_kr = {"che_징병", "che_정비훈련", "che_정비사기", "che_출병"}
-        domestic_en = {"DEVELOP_AGRICULTURE", "DEVELOP_COMMERCE", "IMPROVE_SECURITY", "IMPROVE_DEFENCE", "REPAIR_WALL"}
-        military_en = {"RECRUIT", "TRAIN", "BOOST_MORALE", "MARCH"}
-
-        legacy_has_domestic = bool(legacy_cmds & domestic_kr)
-        legacy_has_military = bool(legacy_cmds & military_kr)
-        new_has_domestic = bool(new_cmds & domestic_en)
-        new_has_military = bool(new_cmds & military_en)
-
-        # Both should have similar command categories
-        if legacy_cmds and new_cmds:
-            assert legacy_has_domestic == new_has_domestic, \
-                f"Domestic command parity: legacy={legacy_has_domestic}, new={new_has_domestic}"
-            assert legacy_has_military == new_has_military, \
-                f"Military command parity: legacy={legacy_has_military}, new={new_has_military}"
+            sampler.sample()
+        except Exception as e:
+            pytest.skip(f"NPC turn tables not readable on one or both stacks: {e}")
+
+        if NPC_TURNS > 0:
+            new.login(ADMIN_LOGIN_ID, ADMIN_PASSWORD)
+            driver = TurnDriver(legacy_db, new_db, *http_advancers(legacy, new))
+            try:
+                for _ in range(NPC_TURNS):
+                    driver.step()
+                    sampler.sample()
+            except TimeoutError as e:
+                pytest.skip(f"Turn engine did not advance: {e}")
+
+        report = sampler.summarize()
+        n = report["general"]["overall"]["n"]
+        if not n["legacy"] or not n["new"]:
+            pytest.skip(f"No reserved NPC commands on one or both stacks: {n}")
+        if not report["tests"]:
+            pytest.skip(f"Too few NPC commands to test ({n}); set PARITY_NPC_TURNS")
+
+        assert not report["diverged"], (
+            f"NPC decision mix diverges (threshold p<{report['threshold']:.2g}): {report['flagged']}"
+        )
@@ -5,12 +5,19 @@ Both systems have a battle simulator. We compare:
   - Response structure (attacker/defender results, rounds, winner)
   - Battle phases (not exact damage values — RNG-dependent)
 """
+import json
+import os
+
 import pytest
+from battle_fuzz import BattleFuzzer, generate_scenarios, http_simulators
 from comparison import compare_responses
+from conftest import CASSETTE_MODE, LEGACY_BASE, NEW_BASE, run_id
+
+FUZZ_COUNT = int(os.environ.get("PARITY_BATTLE_FUZZ", "0"))
 
 
 class TestBattleSimulation:
-    def test_battle_simulate_structure(self, legacy, new):
+    def test_battle_simulate_structure(self, paired):
         """Battle simulation should return structurally equivalent results."""
         # Minimal battle request
         battle_params = {
@@ -18,11 +25,10 @@ class TestBattleSimulation:
             "defenderId": 2,
         }
 
-        lr = legacy.call("Global/BattleSimulate", {
-            "attacker": 1,
-            "defender": 2,
-        })
-        nr = new.post("/api/battle/simulate", battle_params)
+        lr, nr = paired.post(
+            "Global/BattleSimulate", {"attacker": 1, "defender": 2},
+            "/api/battle/simulate", battle_params,
+        )
 
         if lr.status_code != 200 and nr.status_code != 200:
             pytest.skip("Battle simulation not available on either stack")
@@ -45,16 +51,12 @@ class TestBattleSimulation:
                     f"New battle response missing expected fields. Got: {sorted(new_keys)}"
                 )
 
-    def test_battle_result_has_rounds(self, legacy, new):
+    def test_battle_result_has_rounds(self, paired):
         """Battle results should include round-by-round or summary data."""
-        lr = legacy.call("Global/BattleSimulate", {
-            "attacker": 1,
-            "defender": 2,
-        })
-        nr = new.post("/api/battle/simulate", {
-            "attackerId": 1,
-            "defenderId": 2,
-        })
+        lr, nr = paired.post(
+            "Global/BattleSimulate", {"attacker": 1, "defender": 2},
+            "/api/battle/simulate", {"attackerId": 1, "defenderId": 2},
+        )
 
         if lr.status_code != 200 or nr.status_code != 200:
             pytest.skip("Battle sim not available")
@@ -78,16 +80,12 @@ class TestBattleSimulation:
             f"Battle round data parity: legacy_has_rounds={legacy_has_seq}, new_has_rounds={new_has_seq}"
         )
 
-    def test_battle_invalid_generals(self, legacy, new):
+    def test_battle_invalid_generals(self, paired):
         """Both systems should handle invalid general IDs gracefully."""
-        lr = legacy.call("Global/BattleSimulate", {
-            "attacker": 999999,
-            "defender": 999998,
-        })
-        nr = new.post("/api/battle/simulate", {
-            "attackerId": 999999,
-            "defenderId": 999998,
-        })
+        lr, nr = paired.post(
+            "Global/BattleSimulate", {"attacker": 999999, "defender": 999998},
+            "/api/battle/simulate", {"attackerId": 999999, "defenderId": 999998},
+        )
 
         # Both should return error (4xx or result=false)
         legacy_error = lr.status_code >= 400 or (
@@ -98,3 +96,22 @@ class TestBattleSimulation:
         assert legacy_error == new_error, (
             f"Invalid battle parity: legacy_error={legacy_error}, new_error={new_error}"
         )
+
+
+@pytest.mark.skipif(FUZZ_COUNT <= 0, reason="set PARITY_BATTLE_FUZZ to run the battle fuzzer")
+class TestBattleFuzz:
+    """Outcome distributions over many generated match-ups."""
+
+    def test_outcome_distributions_match(self):
+        if CASSETTE_MODE == "replay":
+            pytest.skip("Battle fuzzer talks to the stacks directly (replay mode)")
+        fuzzer = BattleFuzzer(*http_simulators(LEGACY_BASE, NEW_BASE))
+        report = fuzzer.run(generate_scenarios(FUZZ_COUNT))
+
+        os.makedirs("/results", exist_ok=True)
+        with open(f"/results/battle_fuzz-{run_id()}.json", "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+        if report["overall"]["legacy"]["n"] == 0 or report["overall"]["new"]["n"] == 0:
+            pytest.skip(f"Battle simulation not available: errors={report['errors']}")
+        assert not report["diverged"], f"Battle outcome distributions diverge: {report['flagged']}"
@@ -7,9 +7,30 @@ Compares world state before and after turn advancement:
   - City stats change (population, commerce, etc.)
   - History records are created
 """
+import os
+
 import pytest
 import time
+import db
+from citymap import STATIC_COLUMNS, compare_frames, db_frame, payload_frame, reference_for
 from comparison import compare_responses
+from conftest import run_id
+from snapshot import diff_world, read_table
+from streaming import compare_streams, read_json
+from turns import TurnDriver, http_advancers
+
+SOAK_TURNS = int(os.environ.get("PARITY_SOAK_TURNS", "0"))
+ADMIN_LOGIN_ID = os.environ.get("ADMIN_LOGIN_ID", "admin")
+ADMIN_PASSWORD = os.environ.get("ADMIN_PASSWORD", "testadmin123")
+# Legacy column names; the schema registry maps them onto the new tables.
+CORE_GENERAL_COLUMNS = ("leadership", "strength", "intel", "crew", "gold", "rice")
+CORE_CITY_COLUMNS = ("pop", "agri", "comm", "secu", "trust", "def", "wall")
+
+
+def _map_reference(new, new_data):
+    """Reference frame for the new stack's map code (local file or /api/maps)."""
+    code = (new_data.get("mapCode") if isinstance(new_data, dict) else None) or "che"
+    return reference_for(code, lambda c: new.get(f"/api/maps/{c}").json())
 
 
 class TestTurnState:
@@ -17,25 +38,21 @@ class TestTurnState:
 
     def _get_legacy_turn(self, legacy_db):
         try:
-            with legacy_db.cursor() as cur:
-                cur.execute("SELECT year, month, turn FROM game_env LIMIT 1")
-                return cur.fetchone()
+            return db.fetchone(legacy_db, db.LEGACY_GAME_ENV)
         except Exception:
             return None
 
     def _get_new_turn(self, new_db):
         try:
-            with new_db.cursor() as cur:
-                cur.execute("SELECT year, month, turn FROM world_state WHERE world_id=1 LIMIT 1")
-                row = cur.fetchone()
-                if row:
-                    return {"year": row[0], "month": row[1], "turn": row[2]}
-                return None
+            row = db.fetchone(new_db, db.NEW_WORLD_TURN, (1,))
+            if row:
+                return {"year": row[0], "month": row[1]}
+            return None
         except Exception:
             return None
 
     def test_turn_counter_structure(self, legacy_db, new_db):
-        """Both systems track year/month/turn."""
+        """Both systems track the game year and month."""
         lt = self._get_legacy_turn(legacy_db)
         nt = self._get_new_turn(new_db)
 
@@ -47,101 +64,32 @@ class TestTurnState:
         if nt is not None:
             assert "year" in nt, f"New missing turn fields: {nt}"
 
-    def test_general_stats_exist(self, legacy_db, new_db):
-        """Both DBs should have general stat columns for tracking state changes."""
-        expected_legacy_cols = {"leadership", "strength", "intel", "crew", "gold", "rice"}
-        expected_new_cols = {"leadership", "strength", "intelligence", "crew", "gold", "rice"}
-
-        try:
-            with legacy_db.cursor() as cur:
-                cur.execute("DESCRIBE general")
-                legacy_cols = {r["Field"] for r in cur.fetchall()}
-        except Exception:
-            legacy_cols = set()
-
-        try:
-            with new_db.cursor() as cur:
-                cur.execute("""
-                    SELECT column_name FROM information_schema.columns
-                    WHERE table_name='generals'
-                """)
-                new_cols = {r[0] for r in cur.fetchall()}
-        except Exception:
-            new_cols = set()
-
-        if not legacy_cols and not new_cols:
-            pytest.skip("No general tables in either DB")
-
-        # Check that core stat fields exist
-        if legacy_cols:
-            # Legacy uses Korean or abbreviated field names — check for crew-like fields
-            has_stats = bool(legacy_cols & {"crew", "leadership", "strength", "gold", "rice",
-                                           "병사수", "통솔", "무력", "금", "쌀"})
-            assert has_stats, f"Legacy missing stat columns. Got: {sorted(legacy_cols)[:20]}"
-
-        if new_cols:
-            found = new_cols & expected_new_cols
-            assert len(found) >= 3, f"New missing stat columns. Got: {sorted(new_cols)[:20]}"
-
-    def test_city_stats_exist(self, legacy_db, new_db):
-        """Both DBs should have city stat columns."""
-        try:
-            with legacy_db.cursor() as cur:
-                cur.execute("DESCRIBE city")
-                legacy_cols = {r["Field"] for r in cur.fetchall()}
-        except Exception:
-            legacy_cols = set()
-
-        try:
-            with new_db.cursor() as cur:
-                cur.execute("""
-                    SELECT column_name FROM information_schema.columns
-                    WHERE table_name='cities'
-                """)
-                new_cols = {r[0] for r in cur.fetchall()}
-        except Exception:
-            new_cols = set()
-
-        if not legacy_cols and not new_cols:
-            pytest.skip("No city tables in either DB")
-
-        if legacy_cols:
-            has_city_stats = bool(legacy_cols & {"pop", "trust", "agri", "comm", "secu", "def", "wall",
-                                                  "population", "인구", "민심", "농업", "상업"})
-            assert has_city_stats, f"Legacy missing city stat columns. Got: {sorted(legacy_cols)[:20]}"
-
-        if new_cols:
-            has_city_stats = bool(new_cols & {"population", "trust", "agriculture", "commerce",
-                                               "security", "defence", "wall"})
-            assert has_city_stats, f"New missing city stat columns. Got: {sorted(new_cols)[:20]}"
+    def test_general_stats_exist(self, schema):
+        """Core general stat columns exist and pair up between the schemas."""
+        self._assert_mapped(schema, "general", CORE_GENERAL_COLUMNS)
+
+    def test_city_stats_exist(self, schema):
+        """Core city stat columns exist and pair up between the schemas."""
+        self._assert_mapped(schema, "city", CORE_CITY_COLUMNS)
+
+    @staticmethod
+    def _assert_mapped(schema, table, core):
+        if not any(schema.present(table)):
+            pytest.skip(f"No {table} tables in either DB")
+        mapping = schema.table(table)
+        mapped = set(mapping.legacy_to_new())
+        missing = [c for c in core if c not in mapped]
+        assert not missing, (
+            f"{table}: core columns not mapped legacy→new: {missing} "
+            f"(legacy-only {list(mapping.legacy_only)[:20]}, new-only {list(mapping.new_only)[:20]})"
+        )
 
-    def test_history_table_exists(self, legacy_db, new_db):
+    def test_history_table_exists(self, schema):
         """Both systems should have a history/log table."""
-        try:
-            with legacy_db.cursor() as cur:
-                cur.execute("SHOW TABLES LIKE '%history%'")
-                legacy_has = cur.fetchone() is not None
-                if not legacy_has:
-                    cur.execute("SHOW TABLES LIKE '%log%'")
-                    legacy_has = cur.fetchone() is not None
-        except Exception:
-            legacy_has = False
-
-        try:
-            with new_db.cursor() as cur:
-                cur.execute("""
-                    SELECT table_name FROM information_schema.tables
-                    WHERE table_schema='public' AND table_name LIKE '%histor%'
-                """)
-                new_has = cur.fetchone() is not None
-                if not new_has:
-                    cur.execute("""
-                        SELECT table_name FROM information_schema.tables
-                        WHERE table_schema='public' AND table_name LIKE '%log%'
-                    """)
-                    new_has = cur.fetchone() is not None
-        except Exception:
-            new_has = False
+        def has_history(side, patterns):
+            return side is not None and any(p in t for t in side.tables for p in patterns)
+        legacy_has = has_history(schema.legacy, ("history", "log"))
+        new_has = has_history(schema.new, ("histor", "log"))
 
         if not legacy_has and not new_has:
             pytest.skip("No history tables in either DB")
@@ -150,14 +98,77 @@ class TestTurnState:
             f"History table parity: legacy={legacy_has}, new={new_has}"
         )
 
+    def test_world_snapshot_parity(self, legacy_db, new_db, rng_seed, schema, new):
+        """Whole general/city/nation tables joined in one pass each.
+
+        The new stack's IDs are serials in insert order, so rows are joined
+        by name: cities through the map data, generals and nations through
+        the legacy names.  Foreign keys are translated the same way.
+        """
+        ref = _map_reference(new, None)
+        join_ids = {"city": {name: cid for cid, name in ref.names.items()}} if ref is not None else None
+        try:
+            report = diff_world(legacy_db, new_db, schema=schema, join_ids=join_ids)
+        except Exception:
+            pytest.skip("Snapshot tables not available in one or both DBs")
+
+        city = report["city"]
+        if city["legacy_rows"] == 0 or city["new_rows"] == 0:
+            pytest.skip("No cities in one or both DBs (world not started)")
+        if city["join"] != "name":
+            pytest.skip("No map data or city names to align city rows by")
+
+        # Same scenario map → static city attributes must agree row for row.
+        drift = {
+            col: stats["sample"] for col, stats in city["columns"].items()
+            if col in ("name", "level", "region") and stats["mismatched"]
+        }
+        assert not drift, f"Static city columns drift between stacks: {drift}"
+
+        if rng_seed:
+            # Shared seed → RNG-dependent columns must match exactly as well.
+            rng_drift = {
+                f"{name}.{col}": stats["sample"]
+                for name, table in report.items()
+                for col, stats in table["columns"].items()
+                if stats["rng"] and stats["mismatched"]
+            }
+            assert not rng_drift, f"RNG columns drift under PARITY_RNG_SEED: {rng_drift}"
+
+
+@pytest.mark.skipif(SOAK_TURNS <= 0, reason="set PARITY_SOAK_TURNS to run the turn-advance soak")
+class TestTurnAdvance:
+    """Advance both stacks N turns and find the first divergent turn."""
+
+    def test_turn_advance_parity(self, legacy, new, legacy_db, new_db, rng_seed):
+        new.login(ADMIN_LOGIN_ID, ADMIN_PASSWORD)
+        advance_legacy, advance_new = http_advancers(legacy, new)
+        os.makedirs("/results", exist_ok=True)
+        ref = _map_reference(new, None)
+        driver = TurnDriver(
+            legacy_db, new_db, advance_legacy, advance_new,
+            join_ids={"city": {name: cid for cid, name in ref.names.items()}} if ref is not None else None,
+            log_path=f"/results/turns-{run_id()}.jsonl.gz",
+        )
+        try:
+            report = driver.run(SOAK_TURNS)
+        except TimeoutError as e:
+            pytest.skip(f"Turn engine did not advance: {e}")
+
+        first = report["first_divergence"]
+        detail = report["turns"][first - 1]["comparison"] if first else None
+        assert first is None, f"Stacks diverge from turn {first}: {detail}"
+
 
 class TestWorldApi:
     """Compare world-state API endpoints."""
 
-    def test_history_endpoint(self, legacy, new):
-        """Both systems should have a history/record endpoint."""
-        lr = legacy.get("Global/GetCurrentHistory")
-        nr = new.get("/api/worlds/1/history")
+    def test_history_endpoint(self, paired):
+        """Both systems should have a history/record endpoint of the same structure."""
+        lr, nr = paired.get("Global/GetCurrentHistory", "/api/worlds/1/history", stream=True)
+        if lr.status_code != 200 or nr.status_code != 200:
+            lr.close()
+            nr.close()
 
         if lr.status_code != 200 and nr.status_code != 200:
             pytest.skip("History not available on either stack")
@@ -170,16 +181,68 @@ class TestWorldApi:
             assert lr.status_code == 200, \
                 f"New has history but legacy doesn't (status={lr.status_code})"
 
-    def test_map_endpoint(self, legacy, new):
-        """Both systems should serve map data."""
-        lr = legacy.get("Global/GetCachedMap")
-        nr = new.get("/api/public/cached-map")
+        # History grows every turn: compared as it streams in, and the
+        # download stops at the first type divergence.
+        cmp = compare_streams(lr, nr, structural_only=True)
+        if not cmp["structural_match"]:
+            pytest.xfail(f"History structure differs (expected due to field naming): {cmp['diff']}")
+
+    def test_map_endpoint(self, paired, new):
+        """Both cached maps place the same cities and owners, matching the map data."""
+        lr, nr = paired.get("Global/GetCachedMap", "/api/public/cached-map", stream=True)
+        if lr.status_code != 200 or nr.status_code != 200:
+            lr.close()
+            nr.close()
 
         if lr.status_code != 200 and nr.status_code != 200:
             pytest.skip("Map not available on either stack")
 
         if lr.status_code == 200 and nr.status_code == 200:
-            legacy_data = lr.json()
-            new_data = nr.json()
+            # The stacks lay the map out differently (positional rows vs
+            # objects), so it is compared as citymap frames rather than by
+            # compare_streams; the bodies are still decoded from the stream.
+            legacy_data = read_json(lr)
+            new_data = read_json(nr)
             assert legacy_data is not None, "Legacy returned null map"
             assert new_data is not None, "New returned null map"
+
+            ref = _map_reference(new, new_data)
+            legacy_frame = payload_frame(legacy_data, ref)
+            new_frame = payload_frame(new_data, ref)
+            if not len(legacy_frame) or not len(new_frame):
+                pytest.skip("Cached map has no cities on one stack (world not started)")
+
+            report = compare_frames(legacy_frame, new_frame)
+            cities = report["cities"]
+            assert not cities["left_only"] and not cities["right_only"], (
+                f"City sets differ: legacy-only {cities['left_only']}, new-only {cities['right_only']}"
+            )
+            drift = {c: s["sample"] for c, s in report["columns"].items() if s["mismatched"]}
+            assert not drift, f"Cached map drift between stacks: {drift}"
+
+            if ref is not None:
+                for side, frame in (("legacy", legacy_frame), ("new", new_frame)):
+                    static = compare_frames(ref, frame, columns=STATIC_COLUMNS)
+                    bad = {c: s["sample"] for c, s in static["columns"].items() if s["mismatched"]}
+                    assert not bad, f"{side} cached map disagrees with the map data: {bad}"
+
+    def test_map_city_stats_parity(self, legacy_db, new_db, schema, rng_seed):
+        """City ownership and stats, column by column, aligned by map city ID."""
+        table_map = schema.table("city").table_map()
+        try:
+            legacy_cols, legacy_rows = read_table(legacy_db, table_map, "legacy", schema=schema)
+            new_cols, new_rows = read_table(new_db, table_map, "new", schema=schema)
+        except Exception:
+            pytest.skip("City tables not available in one or both DBs")
+        if not legacy_rows or not new_rows:
+            pytest.skip("No cities in one or both DBs (world not started)")
+
+        ref = reference_for("che")
+        report = compare_frames(db_frame(legacy_rows, legacy_cols, reference=ref),
+                                db_frame(new_rows, new_cols, reference=ref))
+        assert report["cities"]["matched"], "No city IDs line up between the stacks"
+        # Layout always; ownership and stats only when both stacks share a seed.
+        checked = set(report["columns"]) if rng_seed else set(STATIC_COLUMNS)
+        drift = {c: s["sample"] for c, s in report["columns"].items()
+                 if c in checked and s["mismatched"]}
+        assert not drift, f"City columns drift between stacks: {drift}"
@@ -0,0 +1,174 @@
+"""
+Offline tests for the baseline snapshot / restore — the DDL each backend is
+sent (against a recording fake connection), the dump variant's client
+invocation and the WorldReset modes.
+"""
+import pytest
+
+from baseline import MARKER_TABLE, MariaDbBaseline, PostgresBaseline, WorldReset
+
+
+class FakeServer:
+    """Records statements; answers the few catalogue queries the module issues."""
+
+    def __init__(self, databases=None):
+        self.databases = databases or {}   # name → [table, ...]
+        self.log: list[str] = []
+
+    def connect(self):
+        return FakeConn(self)
+
+
+class FakeConn:
+    def __init__(self, server):
+        self.server = server
+        self.committed = False
+
+    def cursor(self):
+        return FakeCursor(self.server)
+
+    def commit(self):
+        self.committed = True
+
+    def close(self):
+        pass
+
+
+class FakeCursor:
+    def __init__(self, server):
+        self.server = server
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.server.log.append(sql)
+        if "FROM pg_database" in sql:
+            self._rows = [(1,)] if params[0] in self.server.databases else []
+        elif "information_schema.tables" in sql:
+            self._rows = [(t,) for t in self.server.databases.get(params[0], [])]
+        elif sql.startswith("CREATE DATABASE"):
+            self.server.databases.setdefault(sql.split('"')[1] if '"' in sql else sql.split("`")[1], [])
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def fetchall(self):
+        return self._rows
+
+
+def _ddl(server):
+    return [s for s in server.log if not s.startswith("SELECT")]
+
+
+def test_postgres_capture_locks_out_source_and_seals_template():
+    server = FakeServer({"opensam": []})
+    pg = PostgresBaseline(server.connect, "opensam")
+    assert pg.capture() is True
+    assert _ddl(server) == [
+        'ALTER DATABASE "opensam" WITH ALLOW_CONNECTIONS false',
+        'CREATE DATABASE "opensam_baseline" TEMPLATE "opensam"',
+        'ALTER DATABASE "opensam" WITH ALLOW_CONNECTIONS true',
+        'ALTER DATABASE "opensam_baseline" WITH IS_TEMPLATE true ALLOW_CONNECTIONS false',
+    ]
+    assert any("pg_terminate_backend" in s for s in server.log)
+
+    # Existing baseline is reused unless refreshed.
+    server.log.clear()
+    assert pg.capture() is False and _ddl(server) == []
+    assert pg.capture(refresh=True) is True
+    assert _ddl(server)[:2] == ['ALTER DATABASE "opensam_baseline" WITH IS_TEMPLATE false',
+                                'DROP DATABASE "opensam_baseline"']
+
+
+def test_postgres_restore_and_clone():
+    server = FakeServer({"opensam": [], "opensam_baseline": []})
+    pg = PostgresBaseline(server.connect, "opensam")
+    pg.restore()
+    pg.restore("opensam_gw1")
+    pg.drop("opensam_gw1")
+    assert server.log == [
+        'DROP DATABASE IF EXISTS "opensam" WITH (FORCE)',
+        'CREATE DATABASE "opensam" TEMPLATE "opensam_baseline"',
+        'DROP DATABASE IF EXISTS "opensam_gw1" WITH (FORCE)',
+        'CREATE DATABASE "opensam_gw1" TEMPLATE "opensam_baseline"',
+        'DROP DATABASE IF EXISTS "opensam_gw1" WITH (FORCE)',
+    ]
+
+
+def test_unsafe_names_rejected():
+    with pytest.raises(ValueError):
+        PostgresBaseline(FakeServer().connect, 'opensam"; DROP')
+    pg = PostgresBaseline(FakeServer().connect, "opensam")
+    with pytest.raises(ValueError):
+        pg.restore("x y")
+
+
+def test_mariadb_table_copy():
+    server = FakeServer({"sammo": ["city", "general"]})
+    maria = MariaDbBaseline(server.connect, "sammo")
+    assert maria.exists() is False
+    assert maria.capture() is True
+    ddl = _ddl(server)
+    assert ddl[0] == "DROP DATABASE IF EXISTS `sammo_baseline`"
+    assert "CREATE TABLE `sammo_baseline`.`general` LIKE `sammo`.`general`" in ddl
+    assert "INSERT INTO `sammo_baseline`.`city` SELECT * FROM `sammo`.`city`" in ddl
+    assert ddl[-2].startswith(f"CREATE TABLE `sammo_baseline`.`{MARKER_TABLE}`")
+
+    # Restore: tables created after the baseline are dropped, the marker is
+    # not copied back.
+    server.databases["sammo_baseline"] = ["city", "general", MARKER_TABLE]
+    server.databases["sammo"] = ["city", "general", "scratch"]
+    server.log.clear()
+    maria.restore()
+    ddl = _ddl(server)
+    assert "DROP TABLE `sammo`.`scratch`" in ddl
+    assert "INSERT INTO `sammo`.`general` SELECT * FROM `sammo_baseline`.`general`" in ddl
+    assert not any(MARKER_TABLE in s for s in ddl)
+    assert maria.exists() is True
+
+
+def test_mariadb_dump_variant(tmp_path):
+    calls = []
+
+    def run(argv, **kw):
+        calls.append((argv, kw))
+        if "stdout" in kw:
+            kw["stdout"].write(b"-- dump\n")
+
+    dump = tmp_path / "legacy.sql"
+    server = FakeServer({"sammo": ["general"]})
+    maria = MariaDbBaseline(server.connect, "sammo", dump_path=str(dump), run=run,
+                            login={"host": "legacy-mariadb", "port": 3306, "user": "root", "password": "pw"})
+    assert maria.capture() is True and dump.read_bytes() == b"-- dump\n"
+    assert maria.capture() is False
+    maria.restore("sammo_gw0")
+
+    (dump_argv, dump_kw), (load_argv, load_kw) = calls
+    assert dump_argv[0] == "mysqldump" and "--single-transaction" in dump_argv and dump_argv[-1] == "sammo"
+    assert load_argv[0] == "mysql" and load_argv[-1] == "sammo_gw0"
+    assert "--host=legacy-mariadb" in load_argv
+    assert not any("pw" in a for a in dump_argv + load_argv)
+    assert dump_kw["env"]["MYSQL_PWD"] == "pw" and load_kw["check"]
+    assert "CREATE DATABASE IF NOT EXISTS `sammo_gw0`" in server.log
+
+
+def test_world_reset_modes():
+    pg_server, maria_server = FakeServer({"opensam": []}), FakeServer({"sammo": ["general"]})
+    reset = WorldReset("worker", legacy=MariaDbBaseline(maria_server.connect, "sammo"),
+                       new=PostgresBaseline(pg_server.connect, "opensam"))
+    assert reset.prepare() == {"legacy": True, "new": True}
+    assert reset.isolate("gw2") == {"legacy": "sammo_gw2", "new": "opensam_gw2"}
+    assert 'CREATE DATABASE "opensam_gw2" TEMPLATE "opensam_baseline"' in pg_server.log
+    reset.cleanup({"new": "opensam_gw2"})
+    assert pg_server.log[-1] == 'DROP DATABASE IF EXISTS "opensam_gw2" WITH (FORCE)'
+    assert [line.split()[:2] for line in reset.summary()] == [
+        ["legacy", "capture"], ["legacy", "clone"], ["new", "capture"], ["new", "clone"]]
+
+    assert not WorldReset("suite").enabled           # no reachable side
+    with pytest.raises(ValueError):
+        WorldReset("always")
@@ -0,0 +1,103 @@
+"""
+Offline checks — battle fuzzer scenario generation, outcome parsing and
+divergence statistics, driven by in-process fake simulators.
+"""
+import math
+import random
+from collections import Counter
+
+import pytest
+
+from battle_fuzz import (
+    BattleFuzzer,
+    chi_square,
+    generate_scenarios,
+    ks_2samp,
+    load_crew_types,
+    load_general_pool,
+    outcome,
+    power_bucket,
+)
+
+
+def test_scenarios_are_reproducible_and_drawn_from_pools():
+    pool = load_general_pool()
+    assert len(pool) > 100
+    crew_types = load_crew_types()
+    assert 1000 not in crew_types and 1100 in crew_types  # walls excluded
+    a = generate_scenarios(50, seed=3, pool=pool, crew_types=crew_types)
+    assert a == generate_scenarios(50, seed=3, pool=pool, crew_types=crew_types)
+    names = {g.name for g in pool}
+    for s in a:
+        assert s["attacker"]["name"].split("#")[0] in names
+        assert s["attacker"]["crewType"] in crew_types
+    assert len({s["attacker"]["name"] for s in a}) == 50
+
+
+def test_outcome_parses_new_and_legacy_shapes():
+    s = {"attacker": {"crew": 3000}, "defender": {"crew": 2000}}
+    new = {"winner": "방어측 우세", "attackerRemaining": 1200, "defenderRemaining": 1500, "rounds": 6}
+    assert outcome(s, new) == {"winner": "defender", "rounds": 6,
+                               "attacker_casualties": 1800, "defender_casualties": 500}
+    legacy = {"result": "true", "attackerWon": "true", "phase": "4",
+              "attackerCrew": "2900", "defenderCrew": "-5"}
+    assert outcome(s, legacy) == {"winner": "attacker", "rounds": 4,
+                                  "attacker_casualties": 100, "defender_casualties": 2000}
+    assert outcome(s, {"result": "false", "reason": "no"}) is None
+
+
+def test_statistics_match_reference_values():
+    # 2x2 table: chi2 = 8.0 with 1 dof → p ≈ 0.00468
+    r = chi_square(Counter(a=60, b=40), Counter(a=40, b=60))
+    assert r["df"] == 1
+    assert r["statistic"] == pytest.approx(8.0)
+    assert r["p"] == pytest.approx(0.004678, rel=1e-3)
+    assert chi_square(Counter(a=10), Counter(a=7))["p"] == 1.0
+    # 3 categories (2 dof): p = exp(-chi2 / 2)
+    r = chi_square(Counter(a=30, b=30, c=40), Counter(a=40, b=30, c=30))
+    assert r["df"] == 2
+    assert r["p"] == pytest.approx(math.exp(-r["statistic"] / 2))
+
+    rnd = random.Random(1)
+    same = ks_2samp([rnd.gauss(0, 1) for _ in range(500)], [rnd.gauss(0, 1) for _ in range(500)])
+    shifted = ks_2samp([rnd.gauss(0, 1) for _ in range(500)], [rnd.gauss(0.5, 1) for _ in range(500)])
+    assert same["p"] > 0.01
+    assert shifted["p"] < 1e-6
+    assert ks_2samp([1, 2, 3], [1, 2, 3]) == {"statistic": 0.0, "p": 1.0}
+
+
+def _fake_simulator(bias: float):
+    def simulate(s):
+        rnd = random.Random(s["attacker"]["name"])
+        up = 0.5 + 0.1 * float(power_bucket(s)) + bias
+        won = rnd.random() < up
+        att, dfn = s["attacker"]["crew"], s["defender"]["crew"]
+        return {
+            "winner": "공격측 승리" if won else "방어측 승리",
+            "rounds": rnd.randint(3, 10),
+            "attackerRemaining": int(att * rnd.random()),
+            "defenderRemaining": 0 if won else int(dfn * rnd.random()),
+        }
+    return simulate
+
+
+def test_fuzzer_flags_only_real_divergence():
+    scenarios = generate_scenarios(1500, seed=9)
+    same = BattleFuzzer(_fake_simulator(0), _fake_simulator(0), workers=8, batch_size=200)
+    report = same.run(scenarios)
+    assert report["errors"] == {}
+    assert report["overall"]["legacy"] == report["overall"]["new"]
+    assert not report["diverged"] and report["tests"] > 0
+
+    biased = BattleFuzzer(_fake_simulator(0), _fake_simulator(0.35), workers=8, batch_size=200)
+    report = biased.run(scenarios)
+    assert report["diverged"]
+    assert {f["metric"] for f in report["flagged"]} >= {"winner"}
+
+
+def test_simulator_failures_are_counted():
+    def broken(s):
+        raise ConnectionError("down")
+    report = BattleFuzzer(_fake_simulator(0), broken, workers=2).run(generate_scenarios(10))
+    assert report["errors"] == {"new": 10}
+    assert report["overall"]["new"] == {"n": 0}
@@ -0,0 +1,163 @@
+"""
+Offline checks — cassette record/replay round trip.
+
+Records a few exchanges against a throwaway local HTTP server, shuts the
+server down and verifies the same client calls replay without network.
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import cassette as cassette_mod
+from conftest import LegacyClient, NewClient
+from streaming import compare_streams, read_json
+
+
+class _Handler(BaseHTTPRequestHandler):
+    counter = 0
+
+    def _reply(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length).decode() if length else ""
+        type(self).counter += 1
+        payload = json.dumps({"path": self.path, "echo": body, "n": type(self).counter})
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.end_headers()
+        self.wfile.write(payload.encode())
+
+    do_GET = _reply
+    do_POST = _reply
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    _Handler.counter = 0
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    t = threading.Thread(target=srv.serve_forever, daemon=True)
+    t.start()
+    yield f"http://127.0.0.1:{srv.server_address[1]}"
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_record_then_replay(server, tmp_path):
+    rec = cassette_mod.Cassette(str(tmp_path), "record")
+    legacy = LegacyClient(server, rec)
+    new = NewClient(server, rec)
+    recorded = [
+        legacy.call("Global/Join", {"loginID": "a"}).json(),
+        new.get("/api/scenarios").json(),
+        new.get("/api/scenarios").json(),
+    ]
+    rec.close()
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "legacy-master.jsonl.gz", "new-master.jsonl.gz",
+    ]
+
+    play = cassette_mod.Cassette(str(tmp_path), "replay")
+    # A different base URL proves nothing reaches the network.
+    legacy = LegacyClient("http://unreachable.invalid", play)
+    new = NewClient("http://unreachable.invalid", play)
+    replayed = [
+        legacy.call("Global/Join", {"loginID": "a"}).json(),
+        new.get("/api/scenarios").json(),
+        new.get("/api/scenarios").json(),
+        new.get("/api/scenarios").json(),  # past the recording → last response
+    ]
+    assert replayed[:3] == recorded
+    assert replayed[3] == recorded[2]
+
+    with pytest.raises(cassette_mod.CassetteMiss):
+        legacy.call("Global/Join", {"loginID": "other"})
+
+
+def test_streamed_requests_replay(server, tmp_path):
+    rec = cassette_mod.Cassette(str(tmp_path), "record")
+    legacy, new = LegacyClient(server, rec), NewClient(server, rec)
+    recorded = read_json(new.get("/api/worlds/1/history", stream=True))
+    legacy.call("Global/GetHistory", stream=True).close()
+    rec.close()
+
+    play = cassette_mod.Cassette(str(tmp_path), "replay")
+    legacy = LegacyClient("http://unreachable.invalid", play)
+    new = NewClient("http://unreachable.invalid", play)
+    assert read_json(new.get("/api/worlds/1/history", stream=True)) == recorded
+    result = compare_streams(legacy.call("Global/GetHistory", stream=True),
+                             new.get("/api/worlds/1/history", stream=True), structural_only=True)
+    assert result["equal"], result
+
+
+def test_replay_requires_recording(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        cassette_mod.Cassette(str(tmp_path), "replay")
+
+
+class _AuthHandler(BaseHTTPRequestHandler):
+    """Both stacks' register / login endpoints, remembering accounts."""
+    accounts: dict = {}
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        path = self.path.split("path=")[-1]
+        user = body.get("loginID") or body.get("loginId")
+        password = body.get("loginPW") or body.get("password")
+        status, payload = 200, {"result": True}
+        if path in ("Global/Join", "/api/auth/register"):
+            if (path, user) in self.accounts:
+                status, payload = 409, {"result": False}
+            self.accounts.setdefault((path, user), password)
+        elif self.accounts.get((path.replace("Login", "Join").replace("login", "register"), user)) != password:
+            status, payload = 401, {"result": False}
+        if status < 400 and path.startswith("/api"):
+            payload = {"token": f"jwt-{user}"}
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(json.dumps(payload).encode())
+
+    def log_message(self, *args):
+        pass
+
+
+def _run_auth_suite(monkeypatch, base, cassette, run):
+    """Session logins plus every test_01 check, as run ``run`` on worker gw<n>."""
+    import conftest
+    from tests import test_01_auth
+
+    monkeypatch.setenv("PYTEST_XDIST_TESTRUNUID", run)
+    monkeypatch.setenv("PYTEST_XDIST_WORKER", f"gw{len(run) % 4}")
+    monkeypatch.setattr(test_01_auth, "TEST_USER", f"parity_{conftest.run_id()}")
+    cassette.volatile.update(conftest.cassette_volatile())
+    paired = conftest.PairedClient(conftest.session_legacy(cassette, base), conftest.session_new(cassette, base))
+    try:
+        test_01_auth.TestRegister().test_register_both_succeed(paired)
+        test_01_auth.TestRegister().test_duplicate_register_rejected(paired)
+        test_01_auth.TestLogin().test_login_both_succeed(paired)
+        test_01_auth.TestLogin().test_bad_password_rejected(paired)
+        return paired.new.token
+    finally:
+        paired.close()
+
+
+def test_auth_suite_replays_under_another_run_id(monkeypatch, tmp_path):
+    _AuthHandler.accounts = {}
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _AuthHandler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    try:
+        rec = cassette_mod.Cassette(str(tmp_path), "record")
+        token = _run_auth_suite(monkeypatch, f"http://127.0.0.1:{srv.server_address[1]}", rec, "1111aaaa")
+        rec.close()
+    finally:
+        srv.shutdown()
+        srv.server_close()
+    assert token == "jwt-parity_1111aaaa_gw0"
+
+    play = cassette_mod.Cassette(str(tmp_path), "replay")
+    # Another run id and worker: the bodies differ, the keys do not.
+    assert _run_auth_suite(monkeypatch, "http://unreachable.invalid", play, "22bb") == token
@@ -0,0 +1,131 @@
+"""
+Offline tests for the columnar cached-map comparator — payload parsing on
+both stacks' layouts, ID alignment by city name and per-column tolerances.
+"""
+import math
+
+import pytest
+
+from citymap import (
+    COLUMNS, Interner, compare_frames, db_frame, load_reference, payload_frame, reference_for,
+)
+
+MAP = {"cities": [
+    {"id": 1, "name": "업", "level": 8, "region": 1, "population": 620500, "agriculture": 12500,
+     "commerce": 11300, "security": 10000, "defence": 11700, "wall": 12200, "x": 345, "y": 130},
+    {"id": 2, "name": "허창", "level": 8, "region": 2, "population": 600000, "agriculture": 12000,
+     "commerce": 11000, "security": 9000, "defence": 11000, "wall": 12000, "x": 300, "y": 200},
+    {"id": 3, "name": "낙양", "level": 8, "region": 2, "population": 700000, "agriculture": 13000,
+     "commerce": 12000, "security": 11000, "defence": 12000, "wall": 13000, "x": 280, "y": 160},
+]}
+
+
+@pytest.fixture
+def ref():
+    return load_reference(data=MAP, interner=Interner())
+
+
+def _new_payload(owner_of_3="위"):
+    # New stack: object rows, per-world serial IDs, owner by name.
+    return {"available": True, "mapCode": "che", "cities": [
+        {"id": 101, "name": "업", "x": 345, "y": 130, "nationName": "위", "nationColor": "#f00"},
+        {"id": 102, "name": "허창", "x": 300, "y": 200, "nationName": "중립", "nationColor": "#444"},
+        {"id": 103, "name": "낙양", "x": 280, "y": 160, "nationName": owner_of_3, "nationColor": "#f00"},
+    ]}
+
+
+def _legacy_payload():
+    # Legacy: positional rows, PHP string numbers, owner by nation ID.
+    return {"result": True,
+            "cityList": [["1", "8", "0", "1", "1", "1"], ["2", "8", "0", "0", "2", "1"],
+                         ["3", "8", "0", "1", "2", "1"]],
+            "nationList": [["1", "위", "#f00", "1"]]}
+
+
+def test_reference_columns(ref):
+    assert list(ref.ids) == [1, 2, 3]
+    assert ref.columns["x"].tolist() == [345, 300, 280]
+    assert math.isnan(ref.columns["nationId"][0])
+    assert ref.present() == set(COLUMNS) - {"nationId", "nationName"}
+
+
+def test_new_ids_resolved_by_name(ref):
+    frame = payload_frame(_new_payload(), ref)
+    assert list(frame.ids) == [1, 2, 3]
+    assert frame.present() == {"x", "y", "nationName"}
+
+
+def test_stacks_agree(ref):
+    legacy = payload_frame(_legacy_payload(), ref)
+    new = payload_frame(_new_payload(), ref)
+    assert legacy.present() == {"nationId", "nationName", "level", "region"}
+    report = compare_frames(legacy, new)
+    assert report["equal"]
+    assert report["cities"]["matched"] == 3
+    assert report["columns"]["nationName"]["compared"] == 3
+    assert set(report["skipped_columns"]) == set(COLUMNS) - {"nationName"}
+
+
+def test_owner_mismatch_sampled(ref):
+    report = compare_frames(payload_frame(_legacy_payload(), ref),
+                            payload_frame(_new_payload(owner_of_3="촉"), ref))
+    owner = report["columns"]["nationName"]
+    assert owner["mismatched"] == 1
+    assert owner["sample"] == [{"cityId": 3, "name": "낙양", "left": "위", "right": "촉"}]
+    assert not report["equal"]
+
+
+def test_static_columns_against_reference(ref):
+    moved = _new_payload()
+    moved["cities"][1]["y"] = 201
+    report = compare_frames(ref, payload_frame(moved, ref), columns=("x", "y"))
+    assert report["columns"]["x"]["mismatched"] == 0
+    assert report["columns"]["y"]["sample"][0]["cityId"] == 2
+    assert report["columns"]["y"]["max_abs_diff"] == 1
+
+
+def test_tolerances_and_missing(ref):
+    interner = ref.interner
+    cols = ["name", "level", "pop", "agri", "nation_id"]
+    a = db_frame({1: ("업", 8, 1000, 50, 1), 2: ("허창", 8, 2000, 60, 0), 3: ("낙양", 8, None, 70, 1)},
+                 cols, reference=ref, interner=interner)
+    b = db_frame({11: ("업", 8, 1040, 50, 1), 12: ("허창", 8, 2200, 61, 0), 13: ("낙양", 8, 3000, 70, 1)},
+                 cols, reference=ref, interner=interner)
+    report = compare_frames(a, b, tolerances={"population": 50, "agriculture": 1})
+    pop = report["columns"]["population"]
+    assert (pop["compared"], pop["mismatched"], pop["missing"]) == (2, 1, 1)
+    assert pop["max_abs_diff"] == 200 and pop["mean_abs_diff"] == 120
+    assert report["columns"]["agriculture"]["mismatched"] == 0
+    assert report["columns"]["nationId"]["mismatched"] == 0
+
+
+def test_unaligned_ids_reported(ref):
+    new = _new_payload()
+    new["cities"].append({"id": 104, "name": "신도시", "x": 1, "y": 1, "nationName": "위"})
+    del new["cities"][0]
+    report = compare_frames(payload_frame(_legacy_payload(), ref), payload_frame(new, ref))
+    assert report["cities"]["left_only"] == [1]
+    assert report["cities"]["right_only"] == [104]
+    assert not report["equal"]
+
+
+def test_join_fills_missing_columns(ref):
+    new = payload_frame(_new_payload(), ref).join(ref)
+    assert new.columns["population"].tolist() == [620500, 600000, 700000]
+    assert new.columns["x"].tolist() == [345, 300, 280]
+
+
+def test_reference_falls_back_to_fetch(tmp_path):
+    assert reference_for("none", map_dir=str(tmp_path)) is None
+    frame = reference_for("che", lambda code: MAP, map_dir=str(tmp_path))
+    assert list(frame.ids) == [1, 2, 3]
+    assert reference_for("che", lambda code: {"error": "x"}, map_dir=str(tmp_path)) is None
+
+
+def test_che_map_loads():
+    ref = reference_for("che")
+    if ref is None:
+        pytest.skip("backend map data not in this tree")
+    assert len(ref) > 90
+    report = compare_frames(ref, ref)
+    assert report["equal"] and report["columns"]["population"]["compared"] == len(ref)
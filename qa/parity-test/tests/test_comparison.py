@@ -0,0 +1,138 @@
+"""
+Offline checks — comparison engine.
+
+These do not touch either stack; they pin the behaviour of ``comparison.py``
+so optimisations cannot silently change what a parity run reports.
+"""
+import random
+
+import pytest
+
+import comparison
+from comparison import (
+    FIELD_MAP_KR_EN,
+    RNG_DEPENDENT_FIELDS,
+    coerce_types,
+    compare_responses,
+    diff_payloads,
+    normalize_keys,
+    normalize_payload,
+    structural_shape,
+)
+
+_LEAVES = [
+    "12", "-3", "1.5", "-2.25", "true", "FALSE", "abc", "", "-", "1.", ".5",
+    "٣", "²", "1e5", " 1", 5, 2.5, None, True,
+]
+
+
+def _random_payload(rnd: random.Random, depth: int = 0):
+    keys = list(FIELD_MAP_KR_EN) + ["a", "b", "cityId", "nationId"]
+    r = rnd.random()
+    if depth > 4 or r < 0.4:
+        return rnd.choice(_LEAVES)
+    if r < 0.7:
+        return {rnd.choice(keys): _random_payload(rnd, depth + 1) for _ in range(rnd.randint(0, 5))}
+    return [_random_payload(rnd, depth + 1) for _ in range(rnd.randint(0, 4))]
+
+
+class TestNormalizePayload:
+    @pytest.mark.parametrize("seed", range(5))
+    def test_matches_multi_pass_pipeline(self, seed):
+        rnd = random.Random(seed)
+        for _ in range(400):
+            payload = _random_payload(rnd)
+            expected = coerce_types(normalize_keys(payload, FIELD_MAP_KR_EN))
+            value, shape = normalize_payload(payload, FIELD_MAP_KR_EN)
+            assert value == expected
+            assert repr(value) == repr(expected)  # int vs float vs bool preserved
+            assert shape == structural_shape(expected)
+
+            value, shape = normalize_payload(payload)
+            assert value == coerce_types(payload)
+            assert shape == structural_shape(value)
+
+    def test_without_coercion_is_a_copy(self):
+        payload = {"통솔": "80", "list": [{"a": "1"}]}
+        value, _ = normalize_payload(payload, coerce=False)
+        assert value == payload
+        assert value["list"][0] is not payload["list"][0]
+
+    def test_no_recursion_limit(self):
+        deep = root = []
+        for _ in range(20_000):
+            child = []
+            deep.append(child)
+            deep = child
+        value, shape = normalize_payload(root)
+        for _ in range(20_000):
+            value = value[0]
+        assert value == []
+
+
+class TestDiffPayloads:
+    def _world(self):
+        return {
+            "cities": [
+                {"cityId": i, "name": f"c{i}", "level": 5, "population": 1000 * i, "trust": 50.0}
+                for i in range(1, 30)
+            ],
+            "tags": ["a", "b", "b"],
+        }
+
+    def test_keyed_lists_ignore_order(self):
+        legacy = self._world()
+        new = self._world()
+        new["cities"].reverse()
+        new["tags"] = ["b", "a", "b"]
+        assert diff_payloads(legacy, new) == {}
+
+    def test_reports_changed_field_by_match_key(self):
+        legacy = self._world()
+        new = self._world()
+        new["cities"].reverse()
+        new["cities"][0]["level"] = 6  # cityId 29
+        assert diff_payloads(legacy, new) == {
+            "values_changed": {"root['cities'][28]['level']": {"new_value": 6, "old_value": 5}},
+        }
+
+    def test_ignored_fields_and_tolerance(self):
+        legacy = self._world()
+        new = self._world()
+        new["cities"][3]["population"] += 7
+        new["cities"][4]["trust"] = 50.001
+        assert diff_payloads(legacy, new, ignore_fields=RNG_DEPENDENT_FIELDS) == {}
+        assert "values_changed" in diff_payloads(legacy, new)
+
+    @pytest.mark.parametrize("seeded", [False, True])
+    def test_compare_responses_ignores_rng_fields_unless_seeded(self, monkeypatch, seeded):
+        monkeypatch.setattr(comparison, "RNG_IGNORE_FIELDS", frozenset() if seeded else RNG_DEPENDENT_FIELDS)
+        legacy = self._world()
+        new = self._world()
+        new["cities"][3]["population"] += 7
+        assert compare_responses(legacy, new)["equal"] is not seeded
+        assert not compare_responses(legacy, new, ignore_fields=set())["equal"]
+
+    def test_added_removed_and_type_changes(self):
+        legacy = {"a": 1, "gone": 1, "list": [{"id": 1}, {"id": 2}]}
+        new = {"a": 1.0, "extra": 1, "list": [{"id": 2}, {"id": 3}]}
+        diff = diff_payloads(legacy, new)
+        assert diff["dictionary_item_removed"] == ["root['gone']"]
+        assert diff["dictionary_item_added"] == ["root['extra']"]
+        assert list(diff["type_changes"]) == ["root['a']"]
+        assert diff["iterable_item_removed"] == {"root['list'][0]": {"id": 1}}
+        assert diff["iterable_item_added"] == {"root['list'][1]": {"id": 3}}
+
+    @pytest.mark.parametrize("mutate", [
+        lambda w: None,
+        lambda w: w["cities"][2].update(level=9),
+        lambda w: w["cities"].pop(),
+        lambda w: w["tags"].append("c"),
+    ])
+    def test_crosscheck_agrees_with_deepdiff(self, mutate):
+        legacy = self._world()
+        new = self._world()
+        new["cities"].reverse()
+        mutate(new)
+        result = compare_responses(legacy, new, normalize=False, engine="crosscheck")
+        assert result["engines_agree"]
@@ -0,0 +1,173 @@
+"""
+Offline tests for the lazy DB pools — probing against a closed port and a
+local listener, connection reuse, the size bound and reset-on-release — and
+for the shared new-stack queries against the tables the migrations create.
+"""
+import os
+import re
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+import pytest
+
+import db
+
+
+@pytest.fixture
+def listener():
+    """A TCP port that accepts connections (the probe only needs the handshake)."""
+    with closing(socket.socket()) as s:
+        s.bind(("127.0.0.1", 0))
+        s.listen(16)
+        yield s.getsockname()[1]
+
+
+def _closed_port() -> int:
+    with closing(socket.socket()) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _sqlite_pool(port, **kw) -> tuple[db.Pool, list]:
+    opened = []
+
+    def connect(timeout):
+        conn = sqlite3.connect(":memory:", check_same_thread=False)
+        opened.append(conn)
+        return conn
+    return db.Pool("test", connect, host="127.0.0.1", port=port, **kw), opened
+
+
+def test_nothing_opens_until_first_use(listener):
+    pool, opened = _sqlite_pool(listener)
+    assert opened == []
+    assert pool.probe() is None
+    # The probe's login is kept as the first pooled connection.
+    assert len(opened) == 1
+    with pool.connection() as conn:
+        assert conn is opened[0]
+    assert pool.opened == 1
+
+
+def test_unreachable_fails_fast_and_is_cached():
+    pool, opened = _sqlite_pool(_closed_port(), probe_timeout=0.5)
+    t0 = time.perf_counter()
+    error = pool.probe()
+    for _ in range(100):
+        assert pool.probe() == error
+        with pytest.raises(db.PoolUnavailable):
+            pool.acquire()
+    assert time.perf_counter() - t0 < 1.0
+    assert error.startswith("test DB unreachable at 127.0.0.1:")
+    assert opened == []
+
+
+def test_login_failure_is_reported_by_probe(listener):
+    def connect(timeout):
+        raise RuntimeError("access denied")
+    pool = db.Pool("test", connect, host="127.0.0.1", port=listener)
+    assert "access denied" in pool.probe()
+
+
+def test_threads_get_distinct_connections_within_bound(listener):
+    pool, opened = _sqlite_pool(listener, size=3)
+    lock = threading.Lock()
+    busy, peak, seen = set(), [0], set()
+
+    def work():
+        for _ in range(20):
+            with pool.connection() as conn:
+                with lock:
+                    assert id(conn) not in busy
+                    busy.add(id(conn))
+                    seen.add(id(conn))
+                    peak[0] = max(peak[0], len(busy))
+                time.sleep(0.001)
+                with lock:
+                    busy.discard(id(conn))
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert peak[0] <= 3
+    assert len(opened) == len(seen) <= 3
+
+
+def test_failed_reset_discards_connection(listener):
+    def reset(conn):
+        raise sqlite3.OperationalError("server has gone away")
+    pool, opened = _sqlite_pool(listener, reset=reset)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        assert second is not first
+    assert len(opened) == 2
+    with pytest.raises(sqlite3.ProgrammingError):
+        first.execute("SELECT 1")
+
+
+def test_exhausted_pool_times_out(listener):
+    pool, _ = _sqlite_pool(listener, size=1)
+    conn = pool.acquire()
+    with pytest.raises(db.PoolUnavailable, match="exhausted"):
+        pool.acquire(timeout=0.05)
+    pool.release(conn)
+    pool.release(pool.acquire(timeout=0.05))
+
+
+def test_shared_query_helpers():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE t (id INTEGER, v TEXT)")
+    conn.executemany("INSERT INTO t VALUES (?, ?)", [(1, "a"), (2, "b")])
+
+    class Wrapped:
+        # sqlite3 cursors are not context managers; pymysql/psycopg2 ones are.
+        def cursor(self):
+            return closing(conn.cursor())
+    assert db.fetchone(Wrapped(), "SELECT v FROM t WHERE id = ?", (2,)) == ("b",)
+    assert db.fetchall(Wrapped(), "SELECT id FROM t ORDER BY id") == [(1,), (2,)]
+
+
+MIGRATIONS = os.path.join(os.path.dirname(__file__), "..", "..", "..", "backend", "game-app",
+                          "src", "main", "resources", "db", "migration")
+
+
+def _migrated_columns(table: str) -> list[str]:
+    """Column names of ``table`` after every Flyway migration, in version order."""
+    files = sorted(os.listdir(MIGRATIONS), key=lambda f: int(re.match(r"V(\d+)__", f).group(1)))
+    columns: list[str] = []
+    for name in files:
+        with open(os.path.join(MIGRATIONS, name), encoding="utf-8") as f:
+            sql = f.read()
+        create = re.search(rf"CREATE TABLE (?:IF NOT EXISTS )?{table} \((.*?)\n\);", sql, re.S)
+        if create:
+            columns = [line.split()[0] for line in create.group(1).splitlines()
+                       if line.strip() and line.split()[0].isidentifier()
+                       and line.split()[0].upper() not in ("CHECK", "CONSTRAINT", "PRIMARY", "UNIQUE", "FOREIGN")]
+        for alter in re.finditer(rf"ALTER TABLE {table}\s+ADD COLUMN (?:IF NOT EXISTS )?(\w+)", sql):
+            columns.append(alter.group(1))
+    return columns
+
+
+def test_new_queries_run_against_the_migrated_schema():
+    conn = sqlite3.connect(":memory:")
+    for table in ("world_state", "general"):
+        columns = _migrated_columns(table)
+        assert columns, f"{table} not found in {MIGRATIONS}"
+        conn.execute(f"CREATE TABLE {table} ({', '.join(columns)})")
+    conn.execute("INSERT INTO world_state (id, current_year, current_month) VALUES (1, 184, 3)")
+    conn.executemany("INSERT INTO general (id, world_id, crew, npc_state) VALUES (?, 1, ?, ?)",
+                     [(1, 700, 0), (2, 300, 2), (3, 0, 5)])
+
+    def run(sql, params=()):
+        # psycopg2's %s → sqlite's ?; a missing table or column raises here.
+        return conn.execute(sql.replace("%s", "?"), params).fetchone()
+
+    assert run(db.NEW_GENERAL_CREW, (1,)) == (700,)
+    assert run(db.NEW_WORLD_TURN, (1,)) == (184, 3)
+    assert run(db.NEW_NPC_COUNT) == (2,)
@@ -0,0 +1,110 @@
+"""
+Offline tests for the realtime fan-out harness — WebSocket and STOMP
+framing, and full runs against the in-process stand-in broker.
+"""
+import asyncio
+
+import pytest
+import requests
+
+from fanout import (
+    OP_TEXT, FanoutHarness, MessageTrigger, StandInBroker, StompClient, StompDecoder, StompError,
+    TurnTrigger, accept_key, encode_frame, encode_stomp, read_frame, ws_url,
+)
+
+
+@pytest.mark.parametrize("size", [0, 125, 126, 65535, 70000])
+@pytest.mark.parametrize("mask", [True, False])
+def test_frame_roundtrip(size, mask):
+    payload = bytes(i % 251 for i in range(size))
+
+    async def roundtrip():
+        reader = asyncio.StreamReader()
+        reader.feed_data(encode_frame(OP_TEXT, payload, mask=mask))
+        return await read_frame(reader)
+
+    assert asyncio.run(roundtrip()) == (True, OP_TEXT, payload)
+
+
+def test_accept_key_rfc_example():
+    assert accept_key("dGhlIHNhbXBsZSBub25jZQ==") == "s3pPLMBiTxaQ9kYGzzhZRbK+xOo="
+
+
+def test_stomp_decoder():
+    frame = encode_stomp("MESSAGE", {"destination": "/topic/a:b", "x": "line\nbreak"}, '{"seq": 1}')
+    decoder = StompDecoder()
+    # Split mid-frame, preceded by heart-beats, two frames in one message.
+    assert decoder.feed("\n\n" + frame[:10]) == []
+    first, second = decoder.feed(frame[10:] + "\r\n" + encode_stomp("RECEIPT", {"receipt-id": "7"}))
+    assert first.command == "MESSAGE" and first.body == '{"seq": 1}'
+    assert first.headers == {"destination": "/topic/a:b", "x": "line\nbreak"}
+    assert (second.command, second.headers, second.body) == ("RECEIPT", {"receipt-id": "7"}, "")
+    # CONNECT headers are sent raw.
+    assert "Authorization:Bearer a:b" in encode_stomp("CONNECT", {"Authorization": "Bearer a:b"})
+
+
+def test_ws_url():
+    assert ws_url("http://game-1:9001") == "ws://game-1:9001/ws/websocket"
+    assert ws_url("https://game.example") == "wss://game.example/ws/websocket"
+
+
+def test_connect_requires_token():
+    with StandInBroker() as broker:
+        async def connect(token):
+            client = await StompClient.connect(broker.url, token=token, timeout=5)
+            await client.close()
+
+        asyncio.run(connect("abc"))
+        with pytest.raises(StompError, match="unauthenticated"):
+            asyncio.run(connect(None))
+
+
+def test_message_fanout_grows_without_drops():
+    with StandInBroker() as broker:
+        harness = FanoutHarness(broker.url, MessageTrigger("run1"), tokens=["a", "b"], timeout=5)
+        report = asyncio.run(harness.run([10, 40], events=5, interval=0.01))
+    first, second = report["steps"]
+    assert (first["subscribers"], second["subscribers"]) == (10, 40)
+    assert second["expected"] == second["delivered"] == 200
+    assert second["dropped"] == second["duplicates"] == second["unexpected"] == 0
+    assert second["latency_ms"]["count"] == 200 and second["completion_ms"]["count"] == 5
+    assert second["connect_ms"]["count"] == 40
+
+
+def test_dropped_deliveries_are_counted():
+    with StandInBroker(drop_rate=0.1, seed=3) as broker:
+        harness = FanoutHarness(broker.url, MessageTrigger("run2"), tokens=["a"], timeout=0.5)
+
+        async def run():
+            await harness.grow(30)
+            await harness._await_ready()
+            before = broker.dropped
+            try:
+                return await harness.step(10, 0.0), broker.dropped - before
+            finally:
+                await harness.close()
+
+        step, dropped = asyncio.run(run())
+    assert dropped > 0
+    assert step["dropped"] == dropped and step["delivered"] == 300 - dropped
+
+
+def test_turn_trigger_against_stand_in():
+    with StandInBroker(world_id=3) as broker:
+        trigger = TurnTrigger(3, lambda: requests.post(f"{broker.base}/api/turns/run", timeout=5)
+                              .raise_for_status())
+        assert trigger.destination == "/topic/world/3/turn"
+        report = asyncio.run(FanoutHarness(broker.url, trigger, tokens=["a"], timeout=5)
+                             .run([8], events=3))
+    [step] = report["steps"]
+    assert report["trigger"] == "turn"
+    assert step["delivered"] == 24 and step["dropped"] == 0
+
+
+def test_turn_index_ignores_untriggered_turns():
+    trigger = TurnTrigger(1, lambda: None)
+    trigger.reset()
+    assert trigger.index({"year": 184, "month": 2}, fired=1) == 0
+    assert trigger.index({"year": 184, "month": 2}, fired=1) == 0
+    assert trigger.index({"year": 184, "month": 3}, fired=1) is None    # the scheduled tick
+    assert trigger.index({"probe": "x"}, fired=1) is None
@@ -0,0 +1,188 @@
+"""
+Offline tests for change-impact selection — route matching, the Kotlin
+reference graph on a synthetic backend, path rules, and the test → endpoint
+index of this suite.
+"""
+import os
+
+import pytest
+
+import impact
+from impact import IndexedTest, Selection, path_matches, read_selection, scan_backend, scan_tests, select
+
+KOTLIN = {
+    "gateway-app/src/main/kotlin/g/AuthController.kt": """
+package g
+data class LoginBody(val id: String)
+
+@RestController
+@RequestMapping("/api/auth")
+class AuthController(private val auth: AuthService) {
+    @PostMapping("/login")
+    fun login() = auth.login()
+}
+""",
+    "gateway-app/src/main/kotlin/g/AuthService.kt": "package g\nclass AuthService { fun login() = 1 }\n",
+    "gateway-app/src/main/kotlin/g/CatchAll.kt": """
+package g
+@RestController
+class CatchAll {
+    @RequestMapping("/api/**")
+    fun proxy() = Unit
+}
+""",
+    "game-app/src/main/kotlin/app/controller/BattleController.kt": """
+package app.controller
+import app.service.BattleService
+
+@RestController
+@RequestMapping("/api/battle")
+class BattleController(private val battle: BattleService) {
+    @PostMapping("/simulate")
+    fun simulate() = battle.run()
+}
+""",
+    "game-app/src/main/kotlin/app/controller/CityController.kt": """
+package app.controller
+import app.service.*
+
+@RestController
+class CityController(private val cities: CityService) {
+    @GetMapping("/api/worlds/{worldId}/cities")
+    fun list() = cities.all()
+}
+""",
+    "game-app/src/main/kotlin/app/service/BattleService.kt": """
+package app.service
+import app.engine.Engine
+
+// CityService is mentioned here but not used.
+class BattleService(private val engine: Engine) { fun run() = engine.fight() }
+""",
+    "game-app/src/main/kotlin/app/service/CityService.kt": """
+package app.service
+class CityService { fun all() = formatCity("x") }
+""",
+    "game-app/src/main/kotlin/app/service/Format.kt": "package app.service\nfun formatCity(s: String) = s\n",
+    "game-app/src/main/kotlin/app/engine/Engine.kt": "package app.engine\ninterface Engine { fun fight(): Int }\n",
+    "game-app/src/main/kotlin/app/engine/DefaultEngine.kt": """
+package app.engine
+@Component
+class DefaultEngine(
+    private val rounds: Int,
+) : Engine {
+    override fun fight() = rounds
+}
+""",
+    "game-app/src/main/kotlin/app/engine/TurnDaemon.kt": "package app.engine\nclass TurnDaemon { fun tick() = 0 }\n",
+    "game-app/src/main/kotlin/app/entity/WorldState.kt": "package app.entity\nclass WorldState(val year: Int)\n",
+}
+K = "backend/game-app/src/main/kotlin/app/"
+
+
+@pytest.fixture(scope="module")
+def backend(tmp_path_factory):
+    root = tmp_path_factory.mktemp("repo")
+    for rel, text in KOTLIN.items():
+        path = root / "backend" / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+    return scan_backend(str(root))
+
+
+TESTS = [
+    IndexedTest("tests/test_01_auth.py::TestLogin::test_login", "tests/test_01_auth.py", {"/api/auth/login", "Global/Login"}),
+    IndexedTest("tests/test_05_battle.py::test_sim", "tests/test_05_battle.py", {"/api/battle/simulate"}),
+    IndexedTest("tests/test_02_game_init.py::test_cities", "tests/test_02_game_init.py", {"/api/worlds/1/cities"}),
+    IndexedTest("tests/test_03_commands.py::test_missing", "tests/test_03_commands.py", {"/api/generals/{}/commands"}),
+    IndexedTest("tests/test_06_turn_processing.py::test_db", "tests/test_06_turn_processing.py", set(), True),
+]
+
+
+def _selected(changed, backend):
+    sel = select(changed, backend=backend, tests=TESTS)
+    return sel.full, {n.split("::")[-1] for n in sel.tests}
+
+
+def test_path_matches():
+    assert path_matches("/api/worlds/{worldId}/cities", "/api/worlds/1/cities")
+    assert path_matches("/api/worlds/{worldId}/cities", "/api/worlds/{}/cities")
+    assert not path_matches("/api/worlds/{worldId}", "/api/worlds/1/cities")
+    assert path_matches("/api/**", "/api/anything/at/all")
+    assert path_matches("/api/public/cached-map", "/api/public/cached-map?worldId=1")
+
+
+def test_routes_and_resolution(backend):
+    routes = {(r.method, r.pattern) for r in backend.routes}
+    assert {("POST", "/api/auth/login"), ("POST", "/api/battle/simulate"),
+            ("GET", "/api/worlds/{worldId}/cities"), ("ANY", "/api/**")} <= routes
+    # The gateway's own controller wins; other /api paths go via the proxy.
+    assert {os.path.basename(p) for p in backend.resolve("/api/auth/login")} == {"AuthController.kt"}
+    assert {os.path.basename(p) for p in backend.resolve("/api/battle/simulate")} == \
+        {"CatchAll.kt", "BattleController.kt"}
+
+
+def test_engine_change_reaches_its_controller(backend):
+    # DefaultEngine is only reachable through the interface BattleService injects.
+    full, tests = _selected([K + "engine/DefaultEngine.kt"], backend)
+    assert not full
+    # test_missing: no controller serves its endpoint, so any game controller may.
+    assert tests == {"test_sim", "test_missing"}
+
+
+def test_same_package_function_and_wildcard_import(backend):
+    assert _selected([K + "service/Format.kt"], backend) == (False, {"test_cities", "test_missing"})
+
+
+def test_comment_mentions_are_not_references(backend):
+    # BattleService's comment names CityService; only the real user counts.
+    reached = backend.reaching_controllers(K + "service/CityService.kt")
+    assert {os.path.basename(p) for p in reached} == {"CityController.kt"}
+
+
+def test_entity_change_selects_db_readers(backend):
+    assert _selected([K + "entity/WorldState.kt"], backend) == (False, {"test_db"})
+
+
+def test_unattributable_changes_run_everything(backend):
+    full, _ = _selected([K + "engine/TurnDaemon.kt"], backend)
+    assert full
+    assert _selected(["backend/game-app/src/main/resources/db/migration/V2__x.sql"], backend)[0]
+    assert _selected(["qa/parity-test/conftest.py"], backend)[0]
+
+
+def test_ignored_and_direct_paths(backend):
+    assert _selected(["docs/notes.md", "frontend/src/App.vue", "backend/game-app/src/test/X.kt",
+                      "qa/parity-test/tests/test_shapes.py"], backend) == (False, set())
+    assert _selected(["qa/parity-test/tests/test_05_battle.py"], backend) == (False, {"test_sim"})
+    assert _selected(["legacy/hwe/sammo/API/Global/Login.php"], backend) == (False, {"test_login"})
+
+
+def test_selection_keeps_other_items(tmp_path):
+    path = tmp_path / "selection.txt"
+    path.write_text("tests/test_05_battle.py::test_sim\n")
+    sel = read_selection(str(path))
+    assert sel.keeps("tests/test_05_battle.py::test_sim[param-1]")
+    assert not sel.keeps("tests/test_05_battle.py::test_other")
+    assert sel.keeps("tests/test_impact.py::test_path_matches")      # offline tests always run
+    path.write_text("*\n")
+    assert read_selection(str(path)).keeps("tests/test_05_battle.py::test_other")
+    assert Selection(full=True).nodeids() == ["*"]
+
+
+def test_suite_index():
+    by_id = {t.nodeid: t for t in scan_tests()}
+    battle = by_id["tests/test_05_battle.py::TestBattleFuzz::test_outcome_distributions_match"]
+    assert battle.endpoints == {"/api/battle/simulate", "Global/BattleSimulate"}   # via battle_fuzz
+    soak = by_id["tests/test_06_turn_processing.py::TestTurnAdvance::test_turn_advance_parity"]
+    assert "/api/turns/run" in soak.endpoints and soak.reads_db                     # via turns
+    reserve = by_id["tests/test_03_commands.py::TestCommandReservation::test_reserve_command_structure"]
+    assert "/api/generals/{gid}/commands" in reserve.endpoints                      # COMMAND_MAP
+    assert "General/GetCommandTable" in reserve.endpoints                           # autouse _setup
+
+
+def test_helper_change_follows_imports():
+    sel = impact.select(["qa/parity-test/battle_fuzz.py"])
+    files = {n.split("::")[0] for n in sel.tests}
+    assert "tests/test_05_battle.py" in files
+    assert "tests/test_01_auth.py" not in files
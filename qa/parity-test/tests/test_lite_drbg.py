@@ -0,0 +1,91 @@
+"""
+Offline checks — Python ``LiteHashDRBG`` port.
+
+Vectors are the ones ``LiteHashDRBGTest.kt`` pins against the PHP engine.
+"""
+import pytest
+
+from lite_drbg import BUFFER_BYTE_SIZE, MAX_RNG_SUPPORT_BIT, LiteHashDRBG, deterministic_rng
+
+TEST_VECTOR = bytes.fromhex(
+    "24d9ccd648556255fd0ee9f5b29918de90617341958b3b354d572167e4dee02b757816a2bbe0b502c52413ffd384381a9d7b4e193df6f4345d6a95e111d661c4"
+    "2e9264512f6f4b080cf1376b74fab6878ecf4a6e185942d2e5b22cf923885b9952d40601a414225d6901417fd4ce9368ac77e4a63d3fc9b58ab952bb8c33f165"
+    "8e2ebf5af6283a1b18f4c044c86c20d02be3890613c4cc8b7c6b7b35581263b972a82630df69a9289988422d7c3a9be5edf78d5de16fabd01e5dd4e458068d8a"
+    "398596047ba547bfe371ec863a3e019ab0dbc4bb3b27e9077685aae4283ff6bbccfd981d92f9358f7efffbb72a940414802d98466d132e2ad0a16a12946d5f47"
+    "b3606fe9b18c4aa7315e78bb9e47cb51cc4e203fcc2e631f0405c1b872c8e1cb5b6415ea74bbb77fffaaadb002b47cb4f4628dc0709634365b187667f5c708cb"
+)
+
+
+class _DummyBlockRng(LiteHashDRBG):
+    """Repeats one fixed block instead of hashing (``LiteHashDummyBlockRng``)."""
+
+    def __init__(self, block: bytes):
+        self._block = block
+        super().__init__("")
+
+    def _fill(self, need):
+        tail = self._buf[self._pos:]
+        self._buf = tail + self._block * (need // BUFFER_BYTE_SIZE + 1)
+        self._pos = 0
+
+
+@pytest.mark.parametrize("refill_blocks", [1, 3, 64])
+def test_block_sequence_matches_engine_vector(refill_blocks):
+    rng = LiteHashDRBG("HelloWorld", refill_blocks=refill_blocks)
+    assert b"".join(rng.next_bytes(BUFFER_BYTE_SIZE) for _ in range(5)) == TEST_VECTOR
+    rng = LiteHashDRBG("HelloWorld", refill_blocks=refill_blocks)
+    assert rng.next_bytes(len(TEST_VECTOR)) == TEST_VECTOR
+
+
+def test_offset_reads_match_engine_vector():
+    rng = LiteHashDRBG("HelloWorld")
+    offset = 0
+    for size in (10, 32, 1, 64, 5, 16):
+        assert rng.next_bytes(size) == TEST_VECTOR[offset:offset + size]
+        offset += size
+
+
+def test_state_and_resume():
+    rng = LiteHashDRBG("HelloWorld")
+    assert rng.state == (1, 0)
+    rng.next_bytes(64)
+    assert rng.state == (2, 0)  # Kotlin hashes the next block eagerly
+    rng.next_bytes(70)
+    assert rng.state == (3, 6)
+    resumed = LiteHashDRBG("HelloWorld", 2, 6)
+    assert resumed.next_bytes(100) == TEST_VECTOR[134:234]
+
+
+def test_legacy_int_and_float_match_dummy_block_vectors():
+    block = bytes(range(0x00, 0x100, 0x11)) * 4
+    rng = _DummyBlockRng(block)
+    rng.next_bytes(7)
+    assert rng.next_legacy_int(0xFF) == 0x77
+
+    rng = _DummyBlockRng(block)
+    rng.next_bytes(11)
+    top = float(1 << MAX_RNG_SUPPORT_BIT)
+    a = rng.next_float1()
+    assert a == 0x1100FFEEDDCCBB / top
+    assert 0.5313720383 < a < 0.5313720384
+    assert rng.next_float1() == 0x08776655443322 / top
+
+
+@pytest.mark.parametrize("max_value", [1, 5, 99, 255, 256, 1000, 2**31 - 1, 2**53 - 1, -7, 0])
+def test_batched_draws_match_scalar(max_value):
+    scalar, batched = LiteHashDRBG("batch"), LiteHashDRBG("batch")
+    for count in (1, 17, 3000):
+        assert batched.legacy_ints(max_value, count) == [
+            scalar.next_legacy_int(max_value) for _ in range(count)
+        ]
+        assert batched.state == scalar.state
+    assert batched.floats(500) == [scalar.next_float1() for _ in range(500)]
+    assert batched.next_int(3, 9) == scalar.next_int(3, 9)
+
+
+def test_deterministic_rng_tags():
+    a = deterministic_rng("world1", "general", 1, 200, True)
+    assert a.seed == "world1|general|1|200|true"
+    b = deterministic_rng("world1", "general", 1, 200, True)
+    assert [a.next_int() for _ in range(10)] == [b.next_int() for _ in range(10)]
+    assert all(0 <= v < 10 for v in deterministic_rng("x").legacy_ints(9, 100))
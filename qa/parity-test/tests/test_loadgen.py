@@ -0,0 +1,100 @@
+"""
+Offline tests for the virtual-user load generator — HDR histogram maths and
+full runs against the in-process stub server.
+"""
+import asyncio
+import random
+
+import pytest
+
+from commands import COMMAND_MAP
+from loadgen import (
+    ENDPOINTS, Histogram, LoadGenerator, StubServer, command_mix, list_general_ids, login_user,
+    open_pool,
+)
+
+
+class TestHistogram:
+    def test_small_values_exact(self):
+        h = Histogram()
+        for v in range(1, 101):
+            h.record(v)
+        assert h.value_at_percentile(50) == 50
+        assert h.value_at_percentile(99) == 99
+        assert h.value_at_percentile(100) == 100
+        assert (h.min, h.max, h.total) == (1, 100, 100)
+
+    def test_relative_precision(self):
+        rnd = random.Random(1)
+        values = sorted(rnd.randint(1, 10_000_000) for _ in range(5000))
+        h = Histogram(sub_bucket_bits=8)
+        for v in values:
+            h.record(v)
+        for p in (50, 90, 95, 99):
+            exact = values[int(len(values) * p / 100) - 1]
+            assert abs(h.value_at_percentile(p) - exact) <= exact / 128 + 1
+
+    def test_merge_matches_single(self):
+        a, b, both = Histogram(), Histogram(), Histogram()
+        for v in range(0, 5000, 7):
+            (a if v % 2 else b).record(v)
+            both.record(v)
+        a.merge(b)
+        assert a.counts == both.counts
+        assert a.summary() == both.summary()
+
+    def test_distribution_ends_at_one(self):
+        h = Histogram()
+        for v in (10, 20, 20, 3000):
+            h.record(v)
+        rows = h.percentile_distribution()
+        assert rows[-1]["percentile"] == 1
+        assert rows[-1]["total_count"] == 4
+        assert rows[-1]["inverse"] is None
+
+    def test_negative_rejected(self):
+        with pytest.raises(ValueError):
+            Histogram().record(-1)
+
+
+def test_command_mix_covers_command_map():
+    mix = dict(command_mix(COMMAND_MAP))
+    assert len(mix) == len(COMMAND_MAP)
+    assert {"훈련", "사기진작", "징병", "상업투자", "농지개간", "출병"} <= set(mix)
+    assert all(w > 0 for w in mix.values())
+
+
+def _run(stub: StubServer, *, vus: int, rate: float, duration: float) -> dict:
+    async def go():
+        lister = login_user(stub.base, "admin", "pw")
+        ids = list_general_ids(lister, stub.world_id)
+        users = await open_pool(stub.base, vus, ids, login_prefix="vu", password="pw", register=True)
+        assert sum(len(u.general_ids) for u in users) == len(ids)
+        gen = LoadGenerator(users, rate=rate, duration=duration, mix=command_mix(COMMAND_MAP))
+        return await gen.run()
+    return asyncio.run(go())
+
+
+def test_run_against_stub():
+    with StubServer(generals=40) as stub:
+        report = _run(stub, vus=20, rate=200, duration=0.5)
+        assert report["requests"] == 100
+        assert report["error_rate"] == 0
+        assert report["virtual_users"] == 20
+        counted = sum(report["endpoints"][e]["requests"] for e in ENDPOINTS)
+        assert counted == sum(stub.hits.values()) == 100
+        # Reservations landed with registry action codes.
+        codes = {t["actionCode"] for turns in stub.turns.values() for t in turns}
+        assert codes and codes <= {code for code, _ in command_mix(COMMAND_MAP)}
+
+
+def test_latency_and_errors_accounted():
+    with StubServer(generals=10, delay=0.02, error_rate=0.3, seed=3) as stub:
+        report = _run(stub, vus=10, rate=100, duration=0.5)
+    assert 0.1 < report["error_rate"] < 0.5
+    for e in ENDPOINTS:
+        stats = report["endpoints"][e]
+        if stats["requests"]:
+            assert set(stats["errors"]) <= {"HTTP 500"}
+            assert stats["latency_ms"]["p50"] >= 20
+            assert stats["latency_ms"]["p99"] >= stats["service_ms"]["p50"]
@@ -0,0 +1,144 @@
+"""
+Offline tests for the NPC decision sampler — bulk reads from both stacks'
+turn tables on sqlite, code → category mapping, accumulation across samples
+and the per-nation divergence tests.
+"""
+import random
+import sqlite3
+
+import pytest
+
+from npc_decisions import OTHER, REST, DecisionSampler, categorize, general_categories, js_divergence
+
+CATS = general_categories()
+# (legacy code, new code, weight) — the mix both AIs should draw from.
+MIX = [("che_농업투자", "농지개간", 4), ("che_상업투자", "상업투자", 3), ("che_징병", "징병", 2),
+       ("che_정비훈련", "훈련", 2), ("휴식", "휴식", 1)]
+
+
+def _legacy() -> sqlite3.Connection:
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE nation (nation INTEGER PRIMARY KEY, name TEXT)")
+    conn.execute("CREATE TABLE general (no INTEGER PRIMARY KEY, nation INTEGER, npc INTEGER, "
+                 "officer_level INTEGER)")
+    conn.execute("CREATE TABLE general_turn (general_id INTEGER, turn_idx INTEGER, action TEXT)")
+    conn.execute("CREATE TABLE nation_turn (nation_id INTEGER, officer_level INTEGER, turn_idx INTEGER, "
+                 "action TEXT)")
+    conn.executemany("INSERT INTO nation VALUES (?, ?)", [(1, "위"), (2, "촉")])
+    return conn
+
+
+def _new() -> sqlite3.Connection:
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE nation (id INTEGER PRIMARY KEY, world_id INTEGER, name TEXT)")
+    conn.execute("CREATE TABLE general (id INTEGER PRIMARY KEY, world_id INTEGER, nation_id INTEGER, "
+                 "npc_state INTEGER, officer_level INTEGER)")
+    conn.execute("CREATE TABLE general_turn (general_id INTEGER, turn_idx INTEGER, action_code TEXT)")
+    conn.execute("CREATE TABLE nation_turn (nation_id INTEGER, officer_level INTEGER, turn_idx INTEGER, "
+                 "action_code TEXT)")
+    conn.executemany("INSERT INTO nation VALUES (?, 1, ?)", [(11, "위"), (12, "촉")])
+    return conn
+
+
+def _populate(legacy, new, generals: int, rnd: random.Random, *, new_mix=MIX, seed_offset=0):
+    """``generals`` NPCs per nation (plus a player and a ronin) with one reserved turn."""
+    lgen, ngen = [], []
+    for nation, (lid, nid) in enumerate(((1, 11), (2, 12))):
+        for i in range(generals):
+            gid = seed_offset + nation * 10_000 + i
+            lgen.append((gid, lid, 2, 12 if i == 0 else 1))
+            ngen.append((gid, 1, nid, 2, 12 if i == 0 else 1))
+    # A player general (npc 0) and an unaffiliated NPC.
+    lgen += [(seed_offset + 90_000, 1, 0, 1), (seed_offset + 90_001, 0, 2, 0)]
+    ngen += [(seed_offset + 90_000, 1, 11, 0, 1), (seed_offset + 90_001, 1, 0, 2, 0)]
+    legacy.executemany("INSERT INTO general VALUES (?, ?, ?, ?)", lgen)
+    new.executemany("INSERT INTO general VALUES (?, ?, ?, ?, ?)", ngen)
+
+    def draw(mix):
+        return rnd.choices(mix, weights=[w for *_, w in mix])[0]
+    legacy.executemany("INSERT INTO general_turn VALUES (?, 0, ?)",
+                       [(g[0], draw(MIX)[0]) for g in lgen])
+    new.executemany("INSERT INTO general_turn VALUES (?, 0, ?)",
+                    [(g[0], draw(new_mix)[1]) for g in ngen])
+    # Later slots are outside the default horizon.
+    legacy.executemany("INSERT INTO general_turn VALUES (?, 1, 'che_출병')", [(g[0],) for g in lgen])
+
+
+def test_categorize_both_stacks():
+    assert categorize("che_정비훈련", CATS) == "che_정비훈련"
+    assert categorize("훈련", CATS) == "che_정비훈련"
+    assert categorize("농지개간", CATS) == "che_농업투자"
+    assert categorize("징병", CATS) == "che_징병"
+    assert categorize("휴식", CATS) == REST
+    assert categorize(None, CATS) == REST
+    assert categorize("che_이동", CATS) == categorize("이동", CATS) == OTHER
+
+
+def test_js_divergence_bounds():
+    assert js_divergence([5, 5], [10, 10]) == 0
+    assert js_divergence([1, 0], [0, 1]) == pytest.approx(1.0)
+    assert js_divergence([0, 0], [1, 1]) == 0
+
+
+def test_sample_reads_npc_turns_per_nation():
+    legacy, new = _legacy(), _new()
+    _populate(legacy, new, 5, random.Random(1))
+    legacy.execute("INSERT INTO nation_turn VALUES (1, 12, 0, 'che_포상')")
+    legacy.execute("INSERT INTO nation_turn VALUES (1, 11, 0, 'che_발령')")  # office 11 is vacant
+    new.execute("INSERT INTO nation_turn VALUES (11, 12, 0, '포상')")
+    sampler = DecisionSampler(legacy, new)
+    read = sampler.sample()
+    # 5 NPCs per nation + the ronin; players and slot 1 are excluded.
+    assert read["legacy"]["general"] == read["new"]["general"] == 11
+    assert set(sampler.counts["general"]["legacy"]) == {"위", "촉", "중립"}
+    assert sampler.categories["nation"] == ["포상"]
+    assert sampler.vector("nation", "legacy", "위").tolist() == [1]
+    assert sampler.vector("nation", "new", "위").tolist() == [1]
+    assert sum(sampler.vector("general", "legacy")) == 11
+
+
+def test_nation_categories_grow():
+    legacy, new = _legacy(), _new()
+    _populate(legacy, new, 1, random.Random(2))
+    legacy.execute("INSERT INTO nation_turn VALUES (1, 12, 0, 'che_포상')")
+    sampler = DecisionSampler(legacy, new)
+    sampler.sample()
+    new.execute("INSERT INTO nation_turn VALUES (12, 12, 0, '천도')")
+    sampler.sample()
+    assert sampler.categories["nation"] == ["포상", "천도"]
+    assert sampler.vector("nation", "legacy", "위").tolist() == [2, 0]
+    assert sampler.vector("nation", "new", "촉").tolist() == [0, 1]
+    assert sampler.samples == 2
+
+
+def _run(new_mix, turns=6, generals=80) -> dict:
+    legacy, new = _legacy(), _new()
+    sampler = DecisionSampler(legacy, new)
+    rnd = random.Random(7)
+    for turn in range(turns):
+        for conn in (legacy, new):
+            conn.execute("DELETE FROM general_turn")
+            conn.execute("DELETE FROM general")
+        _populate(legacy, new, generals, rnd, new_mix=new_mix, seed_offset=turn * 100_000)
+        sampler.sample()
+    return sampler.summarize()
+
+
+def test_same_policy_does_not_diverge():
+    report = _run(MIX)
+    overall = report["general"]["overall"]
+    assert overall["n"]["legacy"] == overall["n"]["new"] == 6 * 161
+    assert "test" in report["general"]["nations"]["위"]
+    assert "test" not in report["general"]["nations"]["중립"]     # 6 samples < MIN
+    assert not report["diverged"], report["flagged"]
+
+
+def test_skewed_policy_is_flagged():
+    # The new AI never recruits and rests three times as often.
+    skewed = [("che_농업투자", "농지개간", 4), ("che_상업투자", "상업투자", 3),
+              ("che_정비훈련", "훈련", 2), ("휴식", "휴식", 3)]
+    report = _run(skewed)
+    flagged = {(f["kind"], f["nation"]) for f in report["flagged"]}
+    assert {("general", None), ("general", "위"), ("general", "촉")} <= flagged
+    counts = report["general"]["overall"]["counts"]["new"]
+    assert counts["che_징병"] == 0 and counts[REST] > 0
@@ -0,0 +1,166 @@
+"""
+Offline tests for phase profiling — self-time accounting of nested spans,
+the instrumented comparison / HTTP / cursor paths, and keeping captures of
+only the slowest tests.
+"""
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import profiling
+import timing
+from comparison import coerce_types, compare_responses, normalize_keys
+from conftest import LegacyClient, NewClient, PairedClient
+from loadgen import StubServer
+from profiling import PhaseProfiler, SlowestCaptures, StackSampler, capture_file, prune
+
+
+@pytest.fixture
+def prof(monkeypatch):
+    """A fresh profiler in place of the one timing the current test."""
+    p = PhaseProfiler("spans")
+    monkeypatch.setattr(profiling, "PROFILER", p)
+    p.start("t")
+    return p
+
+
+def test_nested_spans_record_self_time(prof):
+    with profiling.span("http"):
+        time.sleep(0.02)
+        with profiling.span("json"):
+            time.sleep(0.06)
+    result = prof.stop()
+    http, json_ = result["phases"]["http"], result["phases"]["json"]
+    # Without subtracting the child, http would be at least 0.08.
+    assert 0.02 <= http["seconds"] < 0.06 <= json_["seconds"]
+    assert http["count"] == json_["count"] == 1
+    assert result["total"] >= http["seconds"] + json_["seconds"] + result["other"] - 1e-6
+
+
+def test_spans_only_count_on_the_test_thread(prof):
+    worker = threading.Thread(target=lambda: profiling.span("db").__enter__().__exit__())
+    worker.start()
+    worker.join()
+    with profiling.span("db"):
+        pass
+    assert prof.stop()["phases"]["db"]["count"] == 1
+    with profiling.span("db"):          # between tests
+        pass
+    assert prof.tests["t"]["phases"]["db"]["count"] == 1
+
+
+def test_off_mode_records_nothing():
+    p = PhaseProfiler("off")
+    p.start("t")
+    assert p.span("http") is profiling._NULL
+    assert p.stop() is None and not p.tests
+    with pytest.raises(ValueError):
+        PhaseProfiler("always")
+
+
+def test_profiling_is_opt_in(monkeypatch):
+    env = {k: v for k, v in os.environ.items() if k != "PARITY_PROFILE"}
+    probe = "import profiling; print(profiling.MODE, profiling.PROFILER.enabled)"
+    out = subprocess.run([sys.executable, "-c", probe], env=env, cwd=os.path.dirname(profiling.__file__),
+                         capture_output=True, text=True, check=True).stdout
+    assert out.split() == ["off", "False"]
+    monkeypatch.setattr(profiling, "PROFILER", profiling.PROFILER)
+    monkeypatch.setattr(profiling, "MODE", profiling.MODE)
+    p = profiling.configure("spans")
+    assert profiling.PROFILER is p and profiling.MODE == "spans" and p.enabled
+
+
+def test_comparison_phases(prof):
+    legacy = {"장수번호": "1", "generals": [{"이름": "조조", "통솔": "80"}]}
+    new = {"generalId": 1, "generals": [{"name": "조조", "leadership": 81}]}
+    assert not compare_responses(legacy, new)["equal"]
+    normalize_keys(legacy)
+    coerce_types(legacy)
+    phases = prof.stop()["phases"]
+    assert phases["normalize"]["count"] == 3        # two fused walks + normalize_keys
+    assert phases["coerce"]["count"] == 1           # once, not per node
+    assert phases["shape"]["count"] == 2
+    assert phases["diff"]["count"] == 1
+
+
+def test_http_json_and_paired_wait(prof):
+    with StubServer(generals=3) as stub:
+        legacy, new = LegacyClient(stub.base), NewClient(stub.base)
+        new.get("/api/worlds/1/generals").json()
+        paired = PairedClient(legacy, new)
+        try:
+            paired.get("General/GetCommandTable", "/api/worlds/1/generals")
+        finally:
+            paired.close()
+    phases = prof.stop()["phases"]
+    # One direct call plus the paired wait; the halves themselves ran on
+    # pool threads.
+    assert phases["http"]["count"] == 2
+    assert phases["json"]["count"] == 1
+    timing.RECORDER.clear()
+
+
+def test_timed_cursor(prof):
+    conn = sqlite3.connect(":memory:")
+    cur = conn.cursor(profiling.timed_cursor(sqlite3.Cursor))
+    cur.execute("CREATE TABLE t (x INTEGER)")
+    cur.executemany("INSERT INTO t VALUES (?)", [(1,), (2,)])
+    assert cur.execute("SELECT SUM(x) FROM t").fetchone() == (3,)
+    assert type(cur).__name__ == "TimedCursor"
+    assert prof.stop()["phases"]["db"]["count"] == 3
+
+
+def test_report_and_merge():
+    a, b = PhaseProfiler("spans"), PhaseProfiler("spans")
+    a.tests["x"] = profiling.breakdown(2.0, {"http": [1.5, 3]})
+    b.tests["y"] = profiling.breakdown(5.0, {"db": [1.0, 10], "diff": [0.5, 1]})
+    a.merge_json(b.to_json())
+    report = a.report(top=1)
+    assert report["slowest"] == ["y"]
+    assert report["totals"]["http"] == 1.5 and report["totals"]["other"] == pytest.approx(4.0)
+    assert report["tests"]["y"]["phases"]["db"] == {"seconds": 1.0, "count": 10}
+    [line] = profiling.format_slowest(report, limit=1)
+    assert line.split()[:3] == ["5.00s", "other", "3.50"] and line.endswith("y")
+
+
+def test_capture_file_names():
+    a = capture_file("tests/test_05_battle.py::TestX::test_y[seed-1]", ".prof")
+    b = capture_file("tests/test_05_battle.py::TestX::test_y[seed 1]", ".prof")
+    assert a != b and a.endswith(".prof") and "/" not in a and ":" not in a
+    assert len(capture_file("t::" + "x" * 500, ".folded")) < 120
+
+
+def _busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_stack_sampler_collapses_the_test_thread():
+    sampler = StackSampler(interval=0.001)
+    sampler.start()
+    _busy(0.2)
+    sampler.stop()
+    assert sum(sampler.stacks.values()) > 5
+    assert any(stack.endswith("test_profiling:_busy") for stack in sampler.stacks)
+
+
+@pytest.mark.parametrize("mode, suffix", [("cprofile", ".prof"), ("folded", ".folded")])
+def test_only_the_slowest_captures_are_kept(tmp_path, mode, suffix):
+    captures = SlowestCaptures(mode, str(tmp_path), top=2, interval=0.001)
+    for nodeid, seconds in (("a", 1.0), ("b", 3.0), ("c", 0.5), ("d", 2.0)):
+        capture = captures.begin()
+        _busy(0.005)
+        captures.end(capture, nodeid, seconds)
+    assert sorted(os.listdir(tmp_path)) == sorted(capture_file(n, suffix) for n in ("b", "d"))
+
+    # Another worker's capture, trimmed to the run-wide slowest.
+    (tmp_path / capture_file("e", suffix)).write_text("")
+    kept = prune(str(tmp_path), ["e", "b"], mode)
+    assert sorted(os.path.basename(p) for p in kept) == sorted(capture_file(n, suffix) for n in ("b", "e"))
+    assert len(os.listdir(tmp_path)) == 2
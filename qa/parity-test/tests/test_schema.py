@@ -0,0 +1,143 @@
+"""
+Offline tests for the schema registry — bulk introspection, the version-keyed
+disk cache and the legacy → new column matching, on two sqlite databases.
+"""
+import json
+import os
+import sqlite3
+
+import pytest
+
+from schema import SchemaRegistry, api_field, introspect, load_schema, match_columns, schema_version
+from snapshot import SCHEMA_MAP, diff_world
+
+
+def _legacy() -> sqlite3.Connection:
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE general (no INTEGER PRIMARY KEY, name TEXT, nation INTEGER, city INTEGER, "
+                 "leadership INTEGER, intel INTEGER, crew INTEGER, crewtype INTEGER, weapon TEXT, "
+                 "killturn INTEGER, turntime TEXT, dex1 INTEGER, npcmsg TEXT)")
+    conn.execute("CREATE TABLE city (city INTEGER PRIMARY KEY, name TEXT, level INTEGER, "
+                 "pop INTEGER, agri INTEGER)")
+    conn.execute("CREATE TABLE nation (nation INTEGER PRIMARY KEY, name TEXT, gold INTEGER)")
+    conn.execute("CREATE TABLE game_env (year INTEGER, month INTEGER, turn INTEGER)")
+    conn.execute("CREATE TABLE emperior (id INTEGER PRIMARY KEY, name TEXT)")
+    conn.execute("CREATE TABLE storage (namespace TEXT, key TEXT, value TEXT)")
+    conn.executemany("INSERT INTO city VALUES (?, ?, 1, ?, ?)", [(1, "낙양", 1000, 50), (2, "허창", 900, 40)])
+    return conn
+
+
+def _new() -> sqlite3.Connection:
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE general (id INTEGER PRIMARY KEY, world_id INTEGER, name TEXT, "
+                 "nation_id INTEGER, city_id INTEGER, leadership INTEGER, intel INTEGER, crew INTEGER, "
+                 "crew_type INTEGER, weapon_code TEXT, kill_turn INTEGER, turn_time TEXT, dex_1 INTEGER, "
+                 "politics INTEGER)")
+    conn.execute("CREATE TABLE city (id INTEGER PRIMARY KEY, world_id INTEGER, name TEXT, level INTEGER, "
+                 "pop INTEGER, agri INTEGER)")
+    conn.execute("CREATE TABLE nation (id INTEGER PRIMARY KEY, world_id INTEGER, name TEXT, gold INTEGER)")
+    conn.execute("CREATE TABLE world_state (id INTEGER, current_year INTEGER, current_month INTEGER)")
+    conn.execute("CREATE TABLE emperor (id INTEGER PRIMARY KEY, name TEXT)")
+    conn.execute("CREATE TABLE app_user (id INTEGER PRIMARY KEY, login_id TEXT)")
+    conn.executemany("INSERT INTO city VALUES (?, 1, ?, 1, ?, ?)", [(1, "낙양", 1000, 50), (2, "허창", 905, 40)])
+    return conn
+
+
+@pytest.fixture
+def registry():
+    return SchemaRegistry(load_schema(_legacy(), "legacy", cache_dir=None),
+                          load_schema(_new(), "new", cache_dir=None))
+
+
+def test_introspect_keeps_ordinal_order():
+    tables = introspect(_legacy())
+    assert list(tables["city"]) == ["city", "name", "level", "pop", "agri"]
+    assert tables["city"]["pop"] == "integer"
+
+
+def test_general_columns_pair_up(registry):
+    general = registry.table("general")
+    pairs = general.legacy_to_new()
+    assert pairs["no"] == "id"                     # SCHEMA_MAP key
+    assert pairs["nation"] == "nation_id"          # SCHEMA_MAP column
+    assert pairs["crewtype"] == "crew_type"        # SCHEMA_MAP column
+    assert pairs["turntime"] == "turn_time"        # underscore-insensitive
+    assert pairs["weapon"] == "weapon_code"        # suffix rule
+    assert pairs["leadership"] == "leadership"     # identical
+    assert general.legacy_only == ("npcmsg",)
+    assert set(general.new_only) == {"world_id", "politics"}
+    # SCHEMA_MAP lists columns these trimmed tables lack.
+    assert ("gold", "gold") in general.broken
+
+
+def test_fields_merge_with_korean_labels(registry):
+    by_legacy = {c.legacy: c for c in registry.table("general").columns}
+    assert (by_legacy["no"].field, by_legacy["no"].label) == ("generalId", "장수번호")
+    assert (by_legacy["intel"].field, by_legacy["intel"].label) == ("intelligence", "지력")
+    assert by_legacy["nation"].field == "nationId"
+    assert by_legacy["crewtype"].field == "crewType" and by_legacy["crewtype"].label is None
+    assert registry.table("city").field_map()["pop"] == "population"
+    assert api_field("city", "id") == "cityId"
+
+
+def test_renamed_tables(registry):
+    env = registry.table("game_env")
+    assert env.new_table == "world_state"
+    assert env.legacy_to_new() == {"year": "current_year", "month": "current_month"}
+    assert env.legacy_only == ("turn",)
+    assert registry.table("emperior").projection() == (["id", "name"], ["id", "name"])
+    assert registry.unmatched() == {"legacy": ["storage"], "new": ["app_user"]}
+    assert set(registry.tables()) == {"city", "emperior", "game_env", "general", "nation"}
+
+
+def test_one_side_unknown_keeps_explicit_mapping():
+    registry = SchemaRegistry(None, load_schema(_new(), "new", cache_dir=None))
+    assert registry.present("general") == (False, True)
+    general = registry.table("general")
+    # Only the explicit SCHEMA_MAP pairs whose new column exists survive.
+    assert general.legacy_to_new()["crewtype"] == "crew_type"
+    assert "gold" not in general.legacy_to_new()
+    assert general.legacy_only == ()
+
+
+def test_match_is_one_to_one():
+    mapping = match_columns("x", "x", ["a_b", "ab", "c"], ["a_b", "c_id", "c_code"])
+    # "ab" cannot also claim "a_b"; "c" has two suffix candidates → unmapped.
+    assert mapping.legacy_to_new() == {"a_b": "a_b"}
+    assert mapping.legacy_only == ("ab", "c")
+
+
+def test_cache_keyed_by_schema_version(tmp_path):
+    conn = _legacy()
+    first = load_schema(conn, "legacy", identity="h:1/db", cache_dir=str(tmp_path))
+    files = os.listdir(tmp_path)
+    assert len(files) == 1 and first.version == schema_version(conn)
+
+    # Same version → served from disk (prove it by editing the cached copy).
+    path = tmp_path / files[0]
+    data = json.loads(path.read_text())
+    data["tables"]["cached_marker"] = {}
+    path.write_text(json.dumps(data))
+    assert "cached_marker" in load_schema(conn, "legacy", identity="h:1/db", cache_dir=str(tmp_path)).tables
+
+    # DDL bumps the version → re-introspected into a new cache file.
+    conn.execute("ALTER TABLE city ADD COLUMN trust INTEGER")
+    fresh = load_schema(conn, "legacy", identity="h:1/db", cache_dir=str(tmp_path))
+    assert "trust" in fresh.tables["city"] and "cached_marker" not in fresh.tables
+    assert len(os.listdir(tmp_path)) == 2
+
+    # Another server with the same version does not reuse the cache.
+    other = load_schema(conn, "legacy", identity="h:2/db", cache_dir=str(tmp_path))
+    assert "cached_marker" not in other.tables
+
+
+def test_diff_world_uses_registry_projection(registry):
+    report = diff_world(_legacy(), _new(), ["city"], schema=registry, exact_rng=True)
+    city = report["city"]
+    assert city["matched"] == 2
+    assert city["columns"]["pop"]["mismatched"] == 1
+    # Registry-projected: columns SCHEMA_MAP lists but these tables lack are
+    # not even attempted.
+    assert city["missing_columns"] == {"legacy": [], "new": []}
+    assert set(city["columns"]) == {"name", "level", "pop", "agri"}
+    assert set(SCHEMA_MAP["city"].columns) > set(city["columns"])
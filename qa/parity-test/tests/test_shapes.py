@@ -0,0 +1,101 @@
+"""
+Offline checks — Merkle shape signatures (``shapes.py``).
+"""
+import random
+
+import pytest
+
+from comparison import compare_responses, structural_shape
+from shapes import ShapeTable, diff_shapes, shape_signature
+from tests.test_comparison import _random_payload
+
+
+def _general(i, **extra):
+    return {"generalId": i, "name": f"g{i}", "stats": [70, 80, 90], **extra}
+
+
+class TestSignature:
+    def test_values_do_not_matter(self):
+        a = {"list": [_general(i) for i in range(50)], "year": 190}
+        b = {"year": 215, "list": [_general(i * 7) for i in range(3)]}
+        assert shape_signature(a) == shape_signature(b)
+
+    def test_types_matter(self):
+        assert shape_signature({"a": 1}) != shape_signature({"a": "1"})
+        assert shape_signature({"a": 1}) != shape_signature({"b": 1})
+        assert shape_signature([]) != shape_signature([1])
+
+    def test_heterogeneous_list_detected(self):
+        homogeneous = [_general(1), _general(2)]
+        mixed = [_general(1), _general(2, extra=True)]
+        # The sampled shape only looks at obj[0] and misses it.
+        assert structural_shape(homogeneous)[0] == structural_shape(mixed)[0]
+        assert shape_signature(homogeneous) != shape_signature(mixed)
+
+    def test_stable_across_tables(self):
+        rnd = random.Random(7)
+        for _ in range(200):
+            payload = _random_payload(rnd)
+            assert ShapeTable().signature(payload) == ShapeTable().signature(payload)
+
+    def test_equal_signature_renders_equal(self):
+        rnd = random.Random(3)
+        t = ShapeTable()
+        for _ in range(300):
+            a, b = _random_payload(rnd), _random_payload(rnd)
+            if shape_signature(a, t) == shape_signature(b, t):
+                assert t.render(shape_signature(a, t)) == t.render(shape_signature(b, t))
+
+    def test_repeated_subshapes_interned(self):
+        t = ShapeTable()
+        t.signature({"generals": [_general(i) for i in range(1000)]})
+        # int, str, [int], general, [general], root
+        assert len(t) == 6
+
+    def test_no_recursion_limit(self):
+        deep = root = []
+        for _ in range(20_000):
+            child = [1]
+            deep.append(child)
+            deep = child
+        assert len(shape_signature(root)) == 16
+
+
+class TestDiffShapes:
+    def test_reports_exact_paths(self):
+        legacy = {"cities": [{"id": 1, "pop": 10, "meta": {"a": 1}}], "year": 190, "gone": 1}
+        new = {"cities": [{"id": 1, "pop": "10", "meta": {"a": 1, "b": 2}}], "year": 190, "added": []}
+        mismatches = diff_shapes(shape_signature(legacy), shape_signature(new))
+        found = {(m["path"], m["kind"]) for m in mismatches}
+        assert found == {
+            ("root['gone']", "missing_in_new"),
+            ("root['added']", "missing_in_legacy"),
+            ("root['cities'][*]['pop']", "type"),
+            ("root['cities'][*]['meta']['b']", "missing_in_legacy"),
+        }
+
+    def test_mixed_list_elements(self):
+        legacy = {"xs": [{"a": 1}, {"a": "x"}]}
+        new = {"xs": [{"a": 1}]}
+        [m] = diff_shapes(shape_signature(legacy), shape_signature(new))
+        assert m["path"] == "root['xs'][*]" and m["kind"] == "list_elements"
+        assert m["legacy"] == [{"a": "str"}] and m["new"] == []
+
+    def test_empty_vs_filled_list(self):
+        [m] = diff_shapes(shape_signature({"xs": []}), shape_signature({"xs": [1]}))
+        assert m["legacy"] == ["<empty_list>"] and m["new"] == ["int"]
+
+    def test_identical_is_empty(self):
+        sig = shape_signature({"a": [1, 2]})
+        assert diff_shapes(sig, sig) == []
+
+
+@pytest.mark.parametrize("structural_only", [True, False])
+def test_compare_responses_reports_mismatch_paths(structural_only):
+    legacy = {"장수번호": "1", "통솔": "70", "list": [{"x": "1"}, {"x": "2", "y": "3"}]}
+    new = {"generalId": 1, "leadership": 70, "list": [{"x": 1}, {"x": 2}]}
+    cmp = compare_responses(legacy, new, structural_only=structural_only)
+    assert not cmp["structural_match"]
+    assert [m["path"] for m in cmp["shape_mismatches"]] == ["root['list'][*]"]
+    ok = compare_responses({"통솔": "70"}, {"leadership": 71}, structural_only=structural_only)
+    assert ok["structural_match"] and ok["shape_mismatches"] == []
@@ -0,0 +1,156 @@
+"""
+Offline checks — bulk snapshot differ against SQLite stand-ins.
+
+Two in-memory SQLite databases mimic the legacy (``city.city``, ``pop`` …)
+and new (``city.id`` + ``world_id``) schemas.
+"""
+import sqlite3
+
+import pytest
+
+from snapshot import SCHEMA_MAP, TableMap, diff_table, diff_world
+
+CITY_MAP = SCHEMA_MAP["city"]
+
+
+def _legacy_city_db(rows):
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE city (city INTEGER PRIMARY KEY, name TEXT, level INTEGER, "
+                 "nation INTEGER, pop INTEGER, agri INTEGER, trust REAL)")
+    conn.executemany("INSERT INTO city VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+    return conn
+
+
+def _new_city_db(rows, world_id=1):
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE city (id INTEGER PRIMARY KEY, world_id INTEGER, name TEXT, "
+                 "level INTEGER, nation_id INTEGER, pop INTEGER, agri INTEGER, trust REAL, "
+                 "region INTEGER)")
+    conn.executemany("INSERT INTO city VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)",
+                     [(r[0], world_id, *r[1:]) for r in rows])
+    return conn
+
+
+def _rows(n):
+    return [(i, f"도시{i}", 1 + i % 8, i % 5, 10000 + i, 500 + i, 50.0) for i in range(1, n + 1)]
+
+
+def test_identical_worlds_are_equal():
+    rows = _rows(500)
+    diff = diff_table(_legacy_city_db(rows), _new_city_db(rows), CITY_MAP, batch_size=64)
+    assert diff["equal"]
+    assert diff["matched"] == 500
+    assert diff["columns"]["agri"]["compared"] == 500
+    # Mapped columns absent from the stand-in schemas are reported, not fatal.
+    assert "region" in diff["missing_columns"]["legacy"]
+    assert "def" in diff["missing_columns"]["legacy"]
+
+
+def test_drift_and_orphans_are_reported():
+    rows = _rows(100)
+    new_rows = [list(r) for r in rows if r[0] != 7]
+    new_rows.append([101, "신도시", 1, 0, 1, 1, 50.0])
+    for r in new_rows:
+        if r[0] % 10 == 0:
+            r[5] += 3   # agri drift
+        r[4] += 1       # pop is RNG-dependent
+    diff = diff_table(_legacy_city_db(rows), _new_city_db([tuple(r) for r in new_rows]),
+                      CITY_MAP, batch_size=16)
+    assert diff["legacy_only"] == 1 and diff["legacy_only_sample"] == [7]
+    assert diff["new_only"] == 1 and diff["new_only_sample"] == [101]
+    agri = diff["columns"]["agri"]
+    assert agri["mismatched"] == 10 and agri["max_abs_diff"] == 3
+    assert agri["sample"][0] == {"id": 10, "legacy": 510, "new": 513}
+    assert diff["columns"]["pop"]["rng"] and diff["columns"]["pop"]["mismatched"] == 99
+    assert not diff["equal"]
+
+
+def test_tolerance_and_world_filter():
+    rows = _rows(20)
+    new = _new_city_db([(r[0], *r[1:6], 50.4) for r in rows])
+    new.executemany("INSERT INTO city VALUES (?, 2, 'other', 1, 0, 0, 0, 0, 0)",
+                    [(1000 + i,) for i in range(5)])
+    diff = diff_table(_legacy_city_db(rows), new, CITY_MAP, tolerance=0.5)
+    assert diff["new_only"] == 0
+    assert diff["columns"]["trust"]["mismatched"] == 0
+    assert diff["columns"]["trust"]["max_abs_diff"] == pytest.approx(0.4)
+
+
+def test_custom_table_map():
+    legacy = sqlite3.connect(":memory:")
+    legacy.execute("CREATE TABLE t (k INTEGER, v TEXT)")
+    legacy.executemany("INSERT INTO t VALUES (?, ?)", [(2, "b"), (1, "a")])
+    new = sqlite3.connect(":memory:")
+    new.execute("CREATE TABLE u (id INTEGER, value TEXT)")
+    new.executemany("INSERT INTO u VALUES (?, ?)", [(1, "a"), (2, "B")])
+    tm = TableMap("t", "u", "k", "id", {"v": "value"}, new_world_column=None)
+    diff = diff_table(legacy, new, tm)
+    assert diff["columns"]["value"]["mismatched"] == 1
+
+
+def test_exact_rng_counts_rng_columns():
+    rows = _rows(10)
+    new_rows = [(*r[:4], r[4] + 1, *r[5:]) for r in rows]  # pop is RNG-dependent
+    legacy, new = _legacy_city_db(rows), _new_city_db(new_rows)
+    assert diff_table(legacy, new, CITY_MAP, exact_rng=False)["equal"]
+    assert not diff_table(legacy, new, CITY_MAP, exact_rng=True)["equal"]
+
+
+def test_cities_join_by_name_through_the_map():
+    rows = _rows(30)
+    # New-stack serials: same cities inserted in another order, IDs 501…
+    shuffled = sorted(rows, key=lambda r: -r[0])
+    new = _new_city_db([(500 + i, *r[1:]) for i, r in enumerate(shuffled, start=1)])
+    new.execute("INSERT INTO city VALUES (900, 1, '장안', 8, 0, 1, 1, 50.0, 0)")
+    ids = {f"도시{i}": i for i in range(1, 31)}
+    by_id = diff_table(_legacy_city_db(rows), new, CITY_MAP)
+    assert by_id["join"] == "id" and by_id["matched"] == 0
+
+    diff = diff_table(_legacy_city_db(rows), new, CITY_MAP, join_ids=ids, batch_size=8)
+    assert diff["join"] == "name" and diff["matched"] == 30
+    assert diff["columns"]["level"]["mismatched"] == diff["columns"]["name"]["mismatched"] == 0
+    # A name the map does not know keeps its own key.
+    assert diff["new_only_sample"] == [900] and not diff["equal"]
+
+
+def _worlds():
+    """Two cities, two nations, three generals; the new stack's serials
+    follow another insert order and start after an extra general_ex row."""
+    legacy = sqlite3.connect(":memory:")
+    legacy.execute("CREATE TABLE city (city INTEGER PRIMARY KEY, name TEXT, nation INTEGER, pop INTEGER)")
+    legacy.execute("CREATE TABLE nation (nation INTEGER PRIMARY KEY, name TEXT, capital INTEGER, gold INTEGER)")
+    legacy.execute("CREATE TABLE general (no INTEGER PRIMARY KEY, name TEXT, nation INTEGER, city INTEGER, "
+                   "troop INTEGER, crew INTEGER)")
+    legacy.executemany("INSERT INTO city VALUES (?, ?, ?, ?)", [(1, "낙양", 1, 900), (2, "허창", 2, 800)])
+    legacy.executemany("INSERT INTO nation VALUES (?, ?, ?, ?)", [(1, "위", 1, 5000), (2, "촉", 2, 4000)])
+    legacy.executemany("INSERT INTO general VALUES (?, ?, ?, ?, ?, ?)",
+                       [(1, "조조", 1, 1, 1, 700), (2, "유비", 2, 2, 2, 600), (3, "여포", 0, 1, 0, 300)])
+
+    new = sqlite3.connect(":memory:")
+    new.execute("CREATE TABLE city (id INTEGER PRIMARY KEY, world_id INTEGER, name TEXT, nation_id INTEGER, "
+                "pop INTEGER)")
+    new.execute("CREATE TABLE nation (id INTEGER PRIMARY KEY, world_id INTEGER, name TEXT, "
+                "capital_city_id INTEGER, gold INTEGER)")
+    new.execute("CREATE TABLE general (id INTEGER PRIMARY KEY, world_id INTEGER, name TEXT, nation_id INTEGER, "
+                "city_id INTEGER, troop_id INTEGER, crew INTEGER)")
+    new.executemany("INSERT INTO city VALUES (?, 1, ?, ?, ?)", [(11, "허창", 21, 800), (12, "낙양", 22, 900)])
+    new.executemany("INSERT INTO nation VALUES (?, 1, ?, ?, ?)", [(21, "촉", 11, 4000), (22, "위", 12, 5000)])
+    new.executemany("INSERT INTO general VALUES (?, 1, ?, ?, ?, ?, ?)",
+                    [(1, "관우", 21, 11, 0, 500), (2, "여포", 0, 12, 0, 300),
+                     (3, "유비", 21, 11, 41, 600), (4, "조조", 22, 12, 42, 700)])
+    return legacy, new
+
+
+def test_world_joins_by_name_and_translates_foreign_keys():
+    legacy, new = _worlds()
+    by_id = diff_table(legacy, new, SCHEMA_MAP["general"], exact_rng=True)
+    assert by_id["join"] == "id" and by_id["columns"]["crew"]["mismatched"]
+
+    report = diff_world(legacy, new, exact_rng=True)
+    general, nation, city = report["general"], report["nation"], report["city"]
+    assert [t["join"] for t in (general, nation, city)] == ["name"] * 3
+    assert general["translated"] == ["city_id", "nation_id"] and "troop_id" not in general["columns"]
+    assert nation["translated"] == ["capital_city_id"] and city["translated"] == ["nation_id"]
+    assert general["matched"] == 3 and general["new_only"] == 1     # the general_ex row
+    assert nation["equal"] and city["equal"]
+    assert all(c["mismatched"] == 0 for t in report.values() for c in t["columns"].values())
@@ -0,0 +1,115 @@
+"""
+Offline checks — streaming JSON comparison.
+
+Payloads are split into deliberately awkward chunk sizes so tokens straddle
+chunk boundaries.
+"""
+import copy
+import json
+import random
+
+import pytest
+
+import streaming
+from comparison import FIELD_MAP_KR_EN, RNG_DEPENDENT_FIELDS, normalize_payload
+from streaming import build_value, compare_chunks, iter_events, iter_leaves
+
+
+def _chunks(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+def _legacy_world() -> dict:
+    return {
+        "년": "190",
+        "cityList": [
+            {"도시번호": str(i), "도시명": f"도시{i}", "인구": str(1000 * i), "민심": "55.5",
+             "connections": [str(i + 1), str(i + 2)]}
+            for i in range(1, 60)
+        ],
+        "flags": {"supply": "true", "empty": [], "none": {}},
+    }
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 4096])
+def test_events_survive_chunk_boundaries(size):
+    doc = {"a": [1, -2.5e3, "x\"y\\é", True, None, {}], "한글": {"b": []}}
+    data = json.dumps(doc, ensure_ascii=False).encode()
+    leaves = list(iter_leaves(iter_events(_chunks(data, size)), coerce=False))
+    assert [p for p, _ in leaves] == [
+        ("a", 0), ("a", 1), ("a", 2), ("a", 3), ("a", 4), ("a", 5), ("한글", "b"),
+    ]
+    assert leaves[1][1] == -2500.0
+    assert leaves[2][1] == doc["a"][2]
+
+
+@pytest.mark.parametrize("size", [1, 5, 4096])
+def test_build_value_matches_json_loads(size):
+    doc = _legacy_world()
+    doc["nested"] = [[], [{}], [[1, [2.5, None]]], "끝"]
+    data = json.dumps(doc, ensure_ascii=False).encode()
+    assert build_value(iter_events(_chunks(data, size))) == doc
+    assert build_value(iter_events([b" 42 "])) == 42
+
+
+def test_truncated_document_is_rejected():
+    with pytest.raises(ValueError):
+        list(iter_events([b'{"a": [1, 2']))
+
+
+def test_shuffled_equivalent_payloads_are_equal():
+    legacy = _legacy_world()
+    new, _ = normalize_payload(legacy, FIELD_MAP_KR_EN)
+    random.Random(1).shuffle(new["cityList"])
+    result = compare_chunks(
+        _chunks(json.dumps(legacy, ensure_ascii=False).encode(), 64),
+        _chunks(json.dumps(new).encode(), 100),
+    )
+    assert result["equal"], result["diff"]
+
+
+def test_value_differences_are_keyed():
+    legacy = _legacy_world()
+    new, _ = normalize_payload(legacy, FIELD_MAP_KR_EN)
+    new = copy.deepcopy(new)
+    new["cityList"][4]["population"] += 1
+    del new["cityList"][0]
+    new["extra"] = 1
+    result = compare_chunks(
+        [json.dumps(legacy, ensure_ascii=False).encode()], [json.dumps(new).encode()],
+        ignore_fields=set(),
+    )
+    diff = result["diff"]
+    assert list(diff["values_changed"]) == ["root['cityList'][cityId=5]['population']"]
+    assert list(diff["iterable_item_removed"]) == ["root['cityList'][cityId=1]"]
+    assert diff["dictionary_item_added"] == ["root['extra']"]
+    # RNG-dependent fields can be excluded by name
+    assert "values_changed" not in compare_chunks(
+        [json.dumps(legacy, ensure_ascii=False).encode()], [json.dumps(new).encode()],
+        ignore_fields={"population"},
+    )["diff"]
+
+
+@pytest.mark.parametrize("seeded", [False, True])
+def test_rng_fields_ignored_by_default_unless_seeded(monkeypatch, seeded):
+    monkeypatch.setattr(streaming, "RNG_IGNORE_FIELDS", frozenset() if seeded else RNG_DEPENDENT_FIELDS)
+    legacy = _legacy_world()
+    new, _ = normalize_payload(legacy, FIELD_MAP_KR_EN)
+    new["cityList"][4]["population"] += 1
+    result = compare_chunks([json.dumps(legacy, ensure_ascii=False).encode()], [json.dumps(new).encode()])
+    assert result["equal"] is not seeded
+
+
+def test_structural_mode_stops_at_first_divergence():
+    legacy = _legacy_world()
+    new, _ = normalize_payload(legacy, FIELD_MAP_KR_EN)
+    new["cityList"][2]["trust"] = "high"
+    result = compare_chunks(
+        [json.dumps(legacy, ensure_ascii=False).encode()],
+        _chunks(json.dumps(new).encode(), 32),
+        structural_only=True,
+    )
+    assert result["stopped_early"]
+    assert list(result["diff"]["type_changes"]) == ["root['cityList'][*]['trust']"]
+    assert result["leaves"]["new"] < 59 * 6
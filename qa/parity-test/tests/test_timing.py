@@ -0,0 +1,94 @@
+"""
+Offline tests for the per-call timing instrumentation, against the
+load-generator stub server.
+"""
+import pytest
+
+import timing
+from conftest import LegacyClient, NewClient, PairedClient
+from loadgen import StubServer
+
+
+@pytest.fixture(scope="module")
+def stub():
+    with StubServer(generals=5) as s:
+        yield s
+
+
+@pytest.fixture
+def recorder():
+    timing.RECORDER.clear()
+    yield timing.RECORDER
+    timing.RECORDER.clear()
+
+
+@pytest.mark.parametrize("method, url, key", [
+    ("get", "http://legacy/api.php?path=General/GetCommandTable", "GET General/GetCommandTable"),
+    ("post", "http://new:8080/api/generals/12/turns", "POST /api/generals/{id}/turns"),
+    ("GET", "http://new/api/worlds/1/generals?x=2", "GET /api/worlds/{id}/generals"),
+    ("GET", "http://new/api/v2/maps/che", "GET /api/v2/maps/che"),
+])
+def test_endpoint_key(method, url, key):
+    assert timing.endpoint_key(method, url) == key
+
+
+def test_session_records_call_and_decode(stub):
+    rec = timing.Recorder()
+    session = timing.TimedSession("new", rec)
+    for gid in (1, 2, 3):
+        r = session.get(f"{stub.base}/api/worlds/1/generals")
+        r.json()
+        r.json()  # only the first decode is timed
+    session.get(f"{stub.base}/api/generals/{gid}/turns")  # 401, never decoded
+    report = rec.report()["stacks"]["new"]
+    gens = report["GET /api/worlds/{id}/generals"]
+    assert gens["calls"] == 3 and gens["status"] == {"200": 3}
+    assert gens["decode_ms"]["count"] == 3
+    assert gens["bytes"]["min"] == len(r.content)
+    assert gens["ttfb_ms"]["p50"] <= gens["total_ms"]["max"]
+    assert report["GET /api/generals/{id}/turns"]["status"] == {"401": 1}
+    assert r.timing["decode_us"] >= 0
+
+
+def test_connection_error_recorded():
+    rec = timing.Recorder()
+    session = timing.TimedSession("legacy", rec)
+    with pytest.raises(Exception):
+        session.get("http://127.0.0.1:9/api.php?path=Global/GetMap", timeout=1)
+    stats = rec.report()["stacks"]["legacy"]["GET Global/GetMap"]
+    assert stats["status"] == {"error": 1}
+
+
+def test_paired_client_side_by_side(stub, recorder):
+    paired = PairedClient(LegacyClient(stub.base), NewClient(stub.base))
+    try:
+        for _ in range(4):
+            paired.get("General/GetCommandTable", "/api/worlds/1/generals")
+    finally:
+        paired.close()
+    [pair] = recorder.report()["pairs"]
+    assert (pair["legacy"], pair["new"]) == ("GET General/GetCommandTable", "GET /api/worlds/{id}/generals")
+    assert pair["count"] == 4
+    assert pair["p50_ratio"] is not None
+    assert timing.format_pairs(recorder.report())[1].strip().startswith("x")
+
+
+def test_worker_merge_roundtrip(stub):
+    a, b = timing.Recorder(), timing.Recorder()
+    for rec in (a, b):
+        s = timing.TimedSession("new", rec)
+        s.get(f"{stub.base}/api/worlds/1/generals").json()
+        s.post(f"{stub.base}/api/auth/login", json={"loginId": "x"})
+    merged = timing.Recorder()
+    merged.merge_json(a.to_json())
+    merged.merge_json(b.to_json())
+    new = merged.report()["stacks"]["new"]
+    assert new["GET /api/worlds/{id}/generals"]["calls"] == 2
+    assert new["POST /api/auth/login"]["decode_ms"]["count"] == 0
+
+
+def test_histogram_json_roundtrip():
+    h = timing.Histogram()
+    for v in (0, 5, 300, 70000):
+        h.record(v)
+    assert timing.Histogram.from_json(h.to_json()).summary() == h.summary()
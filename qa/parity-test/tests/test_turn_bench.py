@@ -0,0 +1,89 @@
+"""
+Offline checks — turn benchmark planning, scaling fit, baseline comparison,
+and the per-turn measurement loop against a SQLite ``world_state``.
+"""
+import sqlite3
+
+import pytest
+
+from turn_bench import (
+    build_plan, compare_baseline, default_scenarios, fit_scaling, measure_turns, scenario_sizes,
+    summarize_turns,
+)
+
+
+def test_scenario_sizes_from_data():
+    sizes = scenario_sizes()
+    assert len(sizes) > 10
+    assert max(sizes.values()) > 500
+
+
+def test_default_scenarios_spread():
+    sizes = {"a": 0, "b": 10, "c": 50, "d": 100, "e": 400}
+    assert default_scenarios(sizes) == ["b", "d", "e"]
+
+
+def test_plan_pads_largest_in_order():
+    sizes = {"small": 100, "big": 800}
+    plan = build_plan(["big", "small"], sizes, (500, 2000, 1000))
+    assert [(p["scenario"], p["target"]) for p in plan] == [
+        ("small", None), ("big", None), ("big", 1000), ("big", 2000),
+    ]
+    with pytest.raises(ValueError):
+        build_plan(["nope"], sizes)
+
+
+def _point(n, ms, scenario="s", target=None):
+    return {"scenario": scenario, "target": target, "generals": n,
+            "summary": {"p50_ms": ms}}
+
+
+@pytest.mark.parametrize("power", [1.0, 2.0])
+def test_fit_recovers_exponent(power):
+    points = [_point(n, 0.01 * n ** power) for n in (500, 1000, 2000, 4000)]
+    fit = fit_scaling(points)
+    assert fit["exponent"] == pytest.approx(power, abs=1e-6)
+    assert fit_scaling(points[:1]) is None
+
+
+def test_baseline_regressions():
+    base = {"points": [_point(500, 100), _point(2000, 400, target=2000), _point(90, 10, "t")]}
+    cur = {"points": [_point(500, 110), _point(2000, 600, target=2000), _point(90, 25, "t")]}
+    regs = compare_baseline(cur, base)
+    # +10% is under threshold; 10 -> 25 ms is under the noise floor.
+    assert [(r["target"], r["ratio"]) for r in regs] == [(2000, 1.5)]
+
+
+def test_measure_turns_one_at_a_time():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE world_state (id INTEGER, current_year INTEGER, current_month INTEGER)")
+    conn.execute("INSERT INTO world_state VALUES (7, 190, 11)")
+    calls = []
+
+    def trigger():
+        calls.append("run")
+        conn.execute("UPDATE world_state SET current_year = current_year + current_month / 12, "
+                     "current_month = current_month % 12 + 1 WHERE id = 7")
+
+    per_turn = measure_turns(
+        conn, 7, turns=3, make_due=lambda: calls.append("due"),
+        resume=lambda: calls.append("resume"), trigger=trigger,
+        pause=lambda: calls.append("pause"), poll_interval=0.001,
+    )
+    assert calls == ["pause"] + ["due", "resume", "run", "pause"] * 3
+    assert [t["to"] for t in per_turn] == [
+        {"year": 190, "month": 12}, {"year": 191, "month": 1}, {"year": 191, "month": 2},
+    ]
+    assert summarize_turns(per_turn)["turns"] == 3
+
+
+def test_measure_turns_times_out_and_pauses():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE world_state (id INTEGER, current_year INTEGER, current_month INTEGER)")
+    conn.execute("INSERT INTO world_state VALUES (1, 190, 1)")
+    calls = []
+    with pytest.raises(TimeoutError):
+        measure_turns(conn, 1, turns=1, make_due=lambda: None, resume=lambda: None,
+                      trigger=lambda: None, pause=lambda: calls.append("pause"),
+                      settle_timeout=0.05, poll_interval=0.01)
+    assert calls == ["pause", "pause"]
@@ -0,0 +1,123 @@
+"""
+Offline checks — turn-advance driver against SQLite stand-ins.
+
+The "advance" callables bump the turn counter and mutate city rows directly,
+standing in for ``Global/ExecuteEngine`` and ``/api/turns/run``.
+"""
+import sqlite3
+
+from turns import TurnDriver, compare_states, compute_delta, delta_cells, replay_states
+
+
+def _legacy_db(n):
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    conn.execute("CREATE TABLE game_env (year INTEGER, month INTEGER)")
+    conn.execute("INSERT INTO game_env VALUES (190, 1)")
+    conn.execute("CREATE TABLE city (city INTEGER PRIMARY KEY, name TEXT, level INTEGER, "
+                 "nation INTEGER, agri INTEGER, pop INTEGER)")
+    conn.executemany("INSERT INTO city VALUES (?, ?, 1, 0, 100, 1000)",
+                     [(i, f"도시{i}") for i in range(1, n + 1)])
+    return conn
+
+
+def _new_db(n):
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    conn.execute("CREATE TABLE world_state (id INTEGER, current_year INTEGER, current_month INTEGER)")
+    conn.execute("INSERT INTO world_state VALUES (1, 190, 1)")
+    conn.execute("CREATE TABLE city (id INTEGER PRIMARY KEY, world_id INTEGER, name TEXT, "
+                 "level INTEGER, nation_id INTEGER, agri INTEGER, pop INTEGER)")
+    conn.executemany("INSERT INTO city VALUES (?, 1, ?, 1, 0, 100, 1000)",
+                     [(i, f"도시{i}") for i in range(1, n + 1)])
+    return conn
+
+
+def _advance(conn, env_sql, city_table, key, *, drift_from=None):
+    def advance():
+        conn.execute(env_sql)
+        conn.execute(f"UPDATE {city_table} SET agri = agri + 10, pop = pop + abs(random() % 7) "
+                     f"WHERE {key} % 3 = 0")
+        if drift_from is not None:
+            drift_from["turns"] += 1
+            if drift_from["turns"] >= drift_from["at"]:
+                conn.execute(f"UPDATE {city_table} SET level = level + 1 WHERE {key} = 5")
+        conn.commit()
+    return advance
+
+
+def _driver(tmp_path, n=40, drift_at=None):
+    legacy, new = _legacy_db(n), _new_db(n)
+    drift = {"turns": 0, "at": drift_at} if drift_at else None
+    return TurnDriver(
+        legacy, new,
+        _advance(legacy, "UPDATE game_env SET month = month + 1", "city", "city"),
+        _advance(new, "UPDATE world_state SET current_month = current_month + 1", "city", "id",
+                 drift_from=drift),
+        tables=("city",), log_path=str(tmp_path / "turns.jsonl.gz"), poll_interval=0.01,
+    )
+
+
+def test_no_divergence_ignores_rng_columns(tmp_path):
+    report = _driver(tmp_path).run(5)
+    assert report["first_divergence"] is None
+    assert [t["env"]["new"]["month"] for t in report["turns"]] == [2, 3, 4, 5, 6]
+    # Only every third city changes, so the delta is far smaller than the table.
+    assert all(t["delta_cells"]["legacy"] <= 2 * 13 for t in report["turns"])
+
+
+def test_first_divergent_turn_is_reported(tmp_path):
+    report = _driver(tmp_path, drift_at=3).run(5)
+    assert report["first_divergence"] == 3
+    assert report["turns"][2]["comparison"]["tables"]["city"]["mismatched"] == {"level": 1}
+
+
+def test_log_replays_every_turn(tmp_path):
+    driver = _driver(tmp_path)
+    driver.run(4)
+    states = list(replay_states(driver.log_path, "legacy"))
+    assert [turn for turn, _ in states] == [0, 1, 2, 3, 4]
+    turn, final = states[-1]
+    assert final["env"] == {"year": 190, "month": 5}
+    rows = final["tables"]["city"]["rows"]
+    agri = final["tables"]["city"]["columns"].index("agri")
+    assert rows[3][agri] == 140 and rows[4][agri] == 100
+
+
+def test_compute_delta_rows_added_and_removed():
+    prev = {"tables": {"t": {"columns": ["a", "b"], "rows": {1: (1, 2), 2: (3, 4)}}}}
+    cur = {"tables": {"t": {"columns": ["a", "b"], "rows": {1: (1, 5), 3: (6, 7)}}}}
+    delta = compute_delta(prev, cur)
+    assert delta == {"t": {"columns": {"b": {1: 5}}, "added": {3: (6, 7)}, "removed": [2]}}
+    assert delta_cells(delta) == 3
+
+
+def _state(tables):
+    return {"env": {"year": 190, "month": 1},
+            "tables": {name: {"columns": columns, "rows": rows} for name, (columns, rows) in tables.items()}}
+
+
+def test_states_join_by_name_and_translate_foreign_keys():
+    legacy = _state({
+        "city": (["name", "nation_id", "level"], {1: ("낙양", 1, 8), 2: ("허창", 2, 6)}),
+        "nation": (["name", "capital_city_id"], {1: ("위", 1), 2: ("촉", 2)}),
+        "general": (["name", "nation_id", "city_id", "troop_id"],
+                    {1: ("조조", 1, 1, 1), 2: ("유비", 2, 2, 2)}),
+    })
+    # New-stack serials in another insert order, after a general_ex row.
+    new = _state({
+        "city": (["name", "nation_id", "level"], {11: ("허창", 21, 6), 12: ("낙양", 22, 8)}),
+        "nation": (["name", "capital_city_id"], {21: ("촉", 11), 22: ("위", 12)}),
+        "general": (["name", "nation_id", "city_id", "troop_id"],
+                    {1: ("관우", 21, 11, 0), 2: ("유비", 21, 11, 41), 3: ("조조", 22, 12, 42)}),
+    })
+    report = compare_states(legacy, new)
+    tables = report["tables"]
+    assert all(not t["mismatched"] for t in tables.values())
+    assert tables["general"]["only"] == {"legacy": 0, "new": 1}
+    assert tables["city"]["only"] == tables["nation"]["only"] == {"legacy": 0, "new": 0}
+
+    # A map-supplied city join wins over the legacy names: rows still line up,
+    # and new-stack city references now carry the map's IDs.
+    shifted = compare_states(legacy, new, join_ids={"city": {"낙양": 2, "허창": 1}})["tables"]
+    assert not shifted["city"]["mismatched"]
+    assert shifted["nation"]["mismatched"] == {"capital_city_id": 2}
+    assert shifted["general"]["mismatched"] == {"city_id": 2}
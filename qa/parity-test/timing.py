@@ -0,0 +1,335 @@
+"""
+Per-call timing and payload-size instrumentation for the parity clients.
+
+``LegacyClient`` / ``NewClient`` use a ``TimedSession``, which records for
+every call
+
+  - time to first byte (``Response.elapsed``: request sent → headers parsed)
+  - total time, including the body download for non-streamed calls
+  - response bytes
+  - JSON decode time (the first ``Response.json()`` call)
+  - status code
+
+into the process-wide ``RECORDER``, aggregated per stack and per endpoint
+(numeric path segments folded to ``{id}``; legacy calls keyed by their
+``api.php?path=`` value).  ``PairedClient`` additionally records both halves
+of each parity check as a pair, so the report can line the stacks up side by
+side.  conftest merges xdist workers and adds the result to
+``report.json`` under ``"timing"``.
+"""
+from __future__ import annotations
+
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+import profiling
+
+_ID_SEGMENT = re.compile(r"(?<=/)\d+(?=/|$)")
+METRICS = ("ttfb", "total", "decode", "bytes")
+
+
+# ── HDR-style histogram ──────────────────────────────────────────────────────
+class Histogram:
+    """Log-linear histogram of non-negative integer values (HdrHistogram layout).
+
+    Values below ``2**sub_bucket_bits`` are stored exactly; above that each
+    power-of-two range is split into ``2**(sub_bucket_bits - 1)`` equal
+    buckets, so any recorded value is reported within
+    ``1 / 2**(sub_bucket_bits - 1)`` of its true value (< 1 % at the default 8
+    bits) regardless of magnitude.
+    """
+
+    def __init__(self, sub_bucket_bits: int = 8):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.counts: Counter = Counter()
+        self.total = 0
+        self.min: int | None = None
+        self.max = 0
+        self._sum = 0
+
+    def _bucket(self, value: int) -> int:
+        """Lowest value equivalent to ``value`` (the bucket key)."""
+        shift = max(0, value.bit_length() - self.sub_bucket_bits)
+        return (value >> shift) << shift
+
+    def _highest_equivalent(self, low: int) -> int:
+        shift = max(0, low.bit_length() - self.sub_bucket_bits)
+        return low + (1 << shift) - 1
+
+    def record(self, value: int, count: int = 1):
+        if value < 0:
+            raise ValueError(f"negative value {value}")
+        self.counts[self._bucket(value)] += count
+        self.total += count
+        self._sum += value * count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other: "Histogram") -> "Histogram":
+        if other.sub_bucket_bits != self.sub_bucket_bits:
+            raise ValueError("cannot merge histograms with different precision")
+        self.counts.update(other.counts)
+        self.total += other.total
+        self._sum += other._sum
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def mean(self) -> float:
+        return self._sum / self.total if self.total else 0.0
+
+    def value_at_percentile(self, percentile: float) -> int:
+        """Highest equivalent value at ``percentile`` (0–100), capped at max."""
+        if not self.total:
+            return 0
+        rank = max(1, -(-self.total * percentile // 100))
+        seen = 0
+        for low in sorted(self.counts):
+            seen += self.counts[low]
+            if seen >= rank:
+                return min(self._highest_equivalent(low), self.max)
+        return self.max
+
+    def percentile_distribution(self, scale: float = 1.0) -> list[dict]:
+        """HdrHistogram ``outputPercentileDistribution`` rows, one per bucket."""
+        rows = []
+        seen = 0
+        for low in sorted(self.counts):
+            seen += self.counts[low]
+            p = seen / self.total
+            rows.append({
+                "value": min(self._highest_equivalent(low), self.max) / scale,
+                "percentile": round(p, 6),
+                "total_count": seen,
+                "inverse": None if p >= 1 else round(1 / (1 - p), 2),
+            })
+        return rows
+
+    def summary(self, scale: float = 1.0) -> dict:
+        """count / min / mean / p50 / p90 / p95 / p99 / p99.9 / max, divided by ``scale``."""
+        def s(v):
+            return round(v / scale, 3)
+        return {
+            "count": self.total,
+            "min": s(self.min or 0),
+            "mean": s(self.mean),
+            "p50": s(self.value_at_percentile(50)),
+            "p90": s(self.value_at_percentile(90)),
+            "p95": s(self.value_at_percentile(95)),
+            "p99": s(self.value_at_percentile(99)),
+            "p99.9": s(self.value_at_percentile(99.9)),
+            "max": s(self.max),
+        }
+
+    def to_json(self) -> dict:
+        """Plain-JSON form (e.g. for xdist ``workeroutput``)."""
+        return {
+            "bits": self.sub_bucket_bits,
+            "counts": sorted(self.counts.items()),
+            "total": self.total, "min": self.min, "max": self.max, "sum": self._sum,
+        }
+
+    @classmethod
+    def from_json(cls, data: dict) -> "Histogram":
+        h = cls(data["bits"])
+        h.counts.update({int(low): n for low, n in data["counts"]})
+        h.total, h.min, h.max, h._sum = data["total"], data["min"], data["max"], data["sum"]
+        return h
+
+
+# ── Recording ────────────────────────────────────────────────────────────────
+def endpoint_key(method: str, url: str) -> str:
+    """``"GET /api/generals/{id}/turns"`` / ``"POST General/GetCommandTable"``."""
+    parts = urlsplit(url)
+    path = parts.path
+    if path.endswith("/api.php"):
+        path = parse_qs(parts.query).get("path", [path])[0]
+    return f"{method.upper()} {_ID_SEGMENT.sub('{id}', path)}"
+
+
+class _Stats:
+    __slots__ = ("status", "ttfb", "total", "decode", "bytes")
+
+    def __init__(self):
+        self.status: Counter = Counter()
+        self.ttfb = Histogram()
+        self.total = Histogram()
+        self.decode = Histogram()
+        self.bytes = Histogram()
+
+
+class Recorder:
+    """Thread-safe per-(stack, endpoint) aggregates.  Times are µs."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.endpoints: dict[tuple[str, str], _Stats] = defaultdict(_Stats)
+        self.pairs: dict[tuple[str, str], dict[str, Histogram]] = defaultdict(
+            lambda: {"legacy": Histogram(), "new": Histogram()})
+
+    def call(self, stack: str, endpoint: str, status: int | None, ttfb_us: int | None,
+             total_us: int, size: int | None):
+        with self._lock:
+            s = self.endpoints[(stack, endpoint)]
+            s.status[str(status) if status is not None else "error"] += 1
+            if ttfb_us is not None:
+                s.ttfb.record(ttfb_us)
+            s.total.record(total_us)
+            if size is not None:
+                s.bytes.record(size)
+
+    def decode(self, stack: str, endpoint: str, decode_us: int):
+        with self._lock:
+            self.endpoints[(stack, endpoint)].decode.record(decode_us)
+
+    def pair(self, legacy: requests.Response, new: requests.Response):
+        """Record a legacy/new response pair from one parity check."""
+        lt, nt = getattr(legacy, "timing", None), getattr(new, "timing", None)
+        if lt is None or nt is None:
+            return
+        with self._lock:
+            hists = self.pairs[(lt["endpoint"], nt["endpoint"])]
+            hists["legacy"].record(lt["total_us"])
+            hists["new"].record(nt["total_us"])
+
+    def clear(self):
+        with self._lock:
+            self.endpoints.clear()
+            self.pairs.clear()
+
+    # ── Transfer / merge ─────────────────────────────────────────────────────
+    def to_json(self) -> dict:
+        with self._lock:
+            return {
+                "endpoints": [
+                    {"stack": stack, "endpoint": ep, "status": dict(s.status),
+                     **{m: getattr(s, m).to_json() for m in METRICS}}
+                    for (stack, ep), s in self.endpoints.items()
+                ],
+                "pairs": [
+                    {"endpoints": [lep, nep],
+                     **{side: h.to_json() for side, h in hists.items()}}
+                    for (lep, nep), hists in self.pairs.items()
+                ],
+            }
+
+    def merge_json(self, data: dict):
+        with self._lock:
+            for e in data.get("endpoints", []):
+                s = self.endpoints[(e["stack"], e["endpoint"])]
+                s.status.update(e["status"])
+                for m in METRICS:
+                    getattr(s, m).merge(Histogram.from_json(e[m]))
+            for p in data.get("pairs", []):
+                hists = self.pairs[tuple(p["endpoints"])]
+                for side in ("legacy", "new"):
+                    hists[side].merge(Histogram.from_json(p[side]))
+
+    # ── Report ───────────────────────────────────────────────────────────────
+    def report(self) -> dict:
+        """Per-stack endpoint stats (ms / bytes) and new-vs-legacy pairs,
+        slowest new/legacy median ratio first."""
+        with self._lock:
+            stacks: dict[str, dict] = defaultdict(dict)
+            for (stack, ep), s in sorted(self.endpoints.items()):
+                stacks[stack][ep] = {
+                    "calls": sum(s.status.values()),
+                    "status": dict(s.status),
+                    "ttfb_ms": s.ttfb.summary(1000),
+                    "total_ms": s.total.summary(1000),
+                    "decode_ms": s.decode.summary(1000),
+                    "bytes": s.bytes.summary(),
+                }
+            pairs = []
+            for (lep, nep), hists in self.pairs.items():
+                legacy, new = hists["legacy"].summary(1000), hists["new"].summary(1000)
+                pairs.append({
+                    "legacy": lep, "new": nep, "count": legacy["count"],
+                    "legacy_total_ms": legacy, "new_total_ms": new,
+                    "p50_ratio": _ratio(new["p50"], legacy["p50"]),
+                    "p95_ratio": _ratio(new["p95"], legacy["p95"]),
+                })
+        pairs.sort(key=lambda p: -(p["p50_ratio"] or 0))
+        return {"stacks": dict(stacks), "pairs": pairs}
+
+
+def _ratio(a: float, b: float) -> float | None:
+    return round(a / b, 3) if b else None
+
+
+RECORDER = Recorder()
+
+
+# ── Session ──────────────────────────────────────────────────────────────────
+class TimedSession(requests.Session):
+    """``requests.Session`` that reports every call to ``recorder``.
+
+    Each response carries ``response.timing`` (stack, endpoint, µs figures)
+    and its ``json()`` is wrapped to time the first decode.
+    """
+
+    def __init__(self, stack: str, recorder: Recorder | None = None):
+        super().__init__()
+        self.stack = stack
+        self.recorder = recorder or RECORDER
+
+    def request(self, method, url, *args, **kwargs):
+        endpoint = endpoint_key(method, url)
+        t0 = time.perf_counter_ns()
+        try:
+            with profiling.span("http"):
+                r = super().request(method, url, *args, **kwargs)
+        except Exception:
+            self.recorder.call(self.stack, endpoint, None, None,
+                               (time.perf_counter_ns() - t0) // 1000, None)
+            raise
+        total_us = (time.perf_counter_ns() - t0) // 1000
+        ttfb_us = int(r.elapsed.total_seconds() * 1e6) if r.elapsed else None
+        if kwargs.get("stream"):
+            length = r.headers.get("Content-Length")
+            size = int(length) if length and length.isdigit() else None
+        else:
+            size = len(r.content)
+        self.recorder.call(self.stack, endpoint, r.status_code, ttfb_us, total_us, size)
+        r.timing = {"stack": self.stack, "endpoint": endpoint, "status": r.status_code,
+                    "ttfb_us": ttfb_us, "total_us": total_us, "bytes": size}
+        self._time_json(r, endpoint)
+        return r
+
+    def _time_json(self, r: requests.Response, endpoint: str):
+        decode = r.json
+        state = {"done": False}
+
+        def timed_json(**kwargs):
+            if state["done"]:
+                with profiling.span("json"):
+                    return decode(**kwargs)
+            t0 = time.perf_counter_ns()
+            try:
+                with profiling.span("json"):
+                    return decode(**kwargs)
+            finally:
+                state["done"] = True
+                us = (time.perf_counter_ns() - t0) // 1000
+                r.timing["decode_us"] = us
+                self.recorder.decode(self.stack, endpoint, us)
+
+        r.json = timed_json
+
+
+def format_pairs(report: dict, limit: int = 15) -> list[str]:
+    """Terminal lines: paired endpoints where the new stack is slowest."""
+    lines = [f"{'new/legacy p50':>14}  {'legacy p50':>10}  {'new p50':>8}  {'n':>5}  endpoints"]
+    for p in report["pairs"][:limit]:
+        ratio = f"x{p['p50_ratio']:.2f}" if p["p50_ratio"] is not None else "-"
+        lines.append(f"{ratio:>14}  {p['legacy_total_ms']['p50']:>8.1f}ms  "
+                     f"{p['new_total_ms']['p50']:>6.1f}ms  {p['count']:>5}  "
+                     f"{p['legacy']}  |  {p['new']}")
+    return lines
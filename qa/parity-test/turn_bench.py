@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+Turn-processing throughput benchmark, scaled by general count.
+
+For every point of the plan a fresh world is created from a scenario
+(``POST /api/worlds``), optionally padded with synthetic NPC generals cloned
+from the scenario's own rows up to the target count, and driven one turn at a
+time:
+
+  1. ``world_state.updated_at`` is rewound one tick so exactly one turn is due
+  2. ``POST /internal/turn/resume`` on the world's game instance, then
+     ``POST /api/turns/run`` (the daemon's ``tick()``)
+  3. poll ``world_state`` until ``current_year`` / ``current_month`` moves
+  4. ``POST /internal/turn/pause`` so the scheduled tick cannot run a turn
+     between measurements
+
+Per-turn wall time (resume → turn counter moved) and the ``world_state``
+progression are recorded.  The report is a scaling curve — turn time against
+general count — with a log-log fit, and ``--baseline`` compares it with the
+report of a previous release to flag regressions.
+
+Every world sharing the game instance's commit SHA is processed by the same
+tick, so run it against an otherwise idle stack.
+
+    python turn_bench.py --scenarios 1100,2601 --sizes 1000,2000,4000 --turns 5 \\
+        --out /results/turn_bench.json --baseline /results/turn_bench-prev.json
+"""
+from __future__ import annotations
+
+import argparse
+import glob
+import json
+import math
+import os
+import statistics
+import sys
+import time
+from typing import Any, Callable
+
+from turns import read_env
+
+DATA_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "..", "..", "backend", "shared", "src", "main", "resources", "data",
+)
+DEFAULT_SIZES = (1000, 2000, 4000)
+DEFAULT_TURNS = 5
+# Regression threshold: a point is flagged when its median turn time grows by
+# more than this fraction *and* by more than NOISE_FLOOR_MS.
+REGRESSION_THRESHOLD = 0.2
+NOISE_FLOOR_MS = 20.0
+
+
+# ── Plan ─────────────────────────────────────────────────────────────────────
+def scenario_sizes(data_dir: str = DATA_DIR) -> dict[str, int]:
+    """``{scenario_code: len(general)}`` for every ``scenario_*.json``."""
+    sizes = {}
+    for path in glob.glob(os.path.join(data_dir, "scenarios", "scenario_*.json")):
+        code = os.path.basename(path)[len("scenario_"):-len(".json")]
+        with open(path, encoding="utf-8") as f:
+            sizes[code] = len(json.load(f).get("general") or [])
+    return sizes
+
+
+def default_scenarios(sizes: dict[str, int], count: int = 3) -> list[str]:
+    """``count`` scenarios spread evenly over the non-empty size range."""
+    ranked = sorted((n, code) for code, n in sizes.items() if n > 0)
+    if len(ranked) <= count:
+        return [code for _, code in ranked]
+    step = (len(ranked) - 1) / (count - 1)
+    return list(dict.fromkeys(ranked[round(i * step)][1] for i in range(count)))
+
+
+def build_plan(scenarios: list[str], sizes: dict[str, int],
+               targets: tuple[int, ...] = DEFAULT_SIZES) -> list[dict]:
+    """Points in increasing general count.
+
+    Every scenario is measured at its native size; the largest one is then
+    padded to each target above that.
+    """
+    missing = [s for s in scenarios if s not in sizes]
+    if missing:
+        raise ValueError(f"unknown scenario(s): {', '.join(missing)}")
+    points = [{"scenario": s, "target": None, "expected": sizes[s]} for s in scenarios]
+    base = max(scenarios, key=lambda s: sizes[s])
+    points += [{"scenario": base, "target": t, "expected": t}
+               for t in sorted(targets) if t > sizes[base]]
+    return sorted(points, key=lambda p: p["expected"])
+
+
+# ── Analysis ─────────────────────────────────────────────────────────────────
+def summarize_turns(per_turn: list[dict]) -> dict:
+    wall = [t["wall_ms"] for t in per_turn]
+    if not wall:
+        return {"turns": 0}
+    return {
+        "turns": len(wall),
+        "min_ms": round(min(wall), 2),
+        "p50_ms": round(statistics.median(wall), 2),
+        "mean_ms": round(statistics.fmean(wall), 2),
+        "max_ms": round(max(wall), 2),
+    }
+
+
+def fit_scaling(points: list[dict]) -> dict | None:
+    """Least-squares fits of median turn time against general count.
+
+    ``exponent`` is the log-log slope (1.0 = linear scaling, 2.0 = quadratic)
+    and ``ms_per_1k_generals`` the linear slope.
+    """
+    xy = [(p["generals"], p["summary"]["p50_ms"]) for p in points
+          if p.get("generals") and p.get("summary", {}).get("p50_ms")]
+    if len(xy) < 2 or len({x for x, _ in xy}) < 2:
+        return None
+
+    def slope(pairs):
+        mx = statistics.fmean(x for x, _ in pairs)
+        my = statistics.fmean(y for _, y in pairs)
+        sxx = sum((x - mx) ** 2 for x, _ in pairs)
+        return sum((x - mx) * (y - my) for x, y in pairs) / sxx, mx, my
+
+    k, mx, my = slope([(math.log(x), math.log(y)) for x, y in xy])
+    b, lx, ly = slope(xy)
+    return {
+        "exponent": round(k, 3),
+        "coefficient_ms": round(math.exp(my - k * mx), 6),
+        "ms_per_1k_generals": round(b * 1000, 3),
+        "intercept_ms": round(ly - b * lx, 3),
+    }
+
+
+def _point_key(point: dict) -> tuple:
+    return point["scenario"], point["target"]
+
+
+def compare_baseline(report: dict, baseline: dict, *, threshold: float = REGRESSION_THRESHOLD,
+                     noise_floor_ms: float = NOISE_FLOOR_MS) -> list[dict]:
+    """Points whose median turn time regressed against ``baseline``."""
+    previous = {_point_key(p): p for p in baseline.get("points", [])}
+    regressions = []
+    for point in report["points"]:
+        old = previous.get(_point_key(point))
+        if not old:
+            continue
+        cur_ms = point["summary"].get("p50_ms")
+        old_ms = old["summary"].get("p50_ms")
+        if cur_ms is None or old_ms is None:
+            continue
+        if cur_ms > old_ms * (1 + threshold) and cur_ms - old_ms > noise_floor_ms:
+            regressions.append({
+                "scenario": point["scenario"], "target": point["target"],
+                "generals": point.get("generals"),
+                "baseline_ms": old_ms, "current_ms": cur_ms,
+                "ratio": round(cur_ms / old_ms, 3),
+            })
+    return regressions
+
+
+# ── Measurement ──────────────────────────────────────────────────────────────
+def measure_turns(
+    conn,
+    world_id: int,
+    *,
+    turns: int,
+    make_due: Callable[[], Any],
+    resume: Callable[[], Any],
+    trigger: Callable[[], Any],
+    pause: Callable[[], Any],
+    settle_timeout: float = 600.0,
+    poll_interval: float = 0.02,
+) -> list[dict]:
+    """Run ``turns`` turns of ``world_id``, one at a time, and time each one."""
+    per_turn = []
+    pause()
+    for turn in range(1, turns + 1):
+        before = read_env(conn, "new", world_id)
+        make_due()
+        start = time.perf_counter()
+        try:
+            resume()
+            t0 = time.perf_counter()
+            trigger()
+            trigger_ms = (time.perf_counter() - t0) * 1000
+            deadline = start + settle_timeout
+            while (after := read_env(conn, "new", world_id)) == before:
+                if time.perf_counter() > deadline:
+                    raise TimeoutError(f"world {world_id} did not advance past {before} "
+                                       f"within {settle_timeout}s")
+                time.sleep(poll_interval)
+            wall_ms = (time.perf_counter() - start) * 1000
+        finally:
+            pause()
+        per_turn.append({
+            "turn": turn, "from": before, "to": after,
+            "wall_ms": round(wall_ms, 2), "trigger_ms": round(trigger_ms, 2),
+        })
+    return per_turn
+
+
+def pad_generals(conn, world_id: int, target: int) -> int:
+    """Clone the world's NPC generals (round-robin) until it has ``target``.
+
+    Clones get a ``#n`` name suffix, no owner and at least ``npc_state`` 2 so
+    the AI drives them like the originals.  Returns the rows inserted.
+    """
+    with conn.cursor() as cur:
+        cur.execute("SELECT count(*) FROM general WHERE world_id = %s", (world_id,))
+        missing = target - cur.fetchone()[0]
+        if missing <= 0:
+            return 0
+        cur.execute(
+            "SELECT column_name FROM information_schema.columns "
+            "WHERE table_name = 'general' AND table_schema = current_schema() "
+            "ORDER BY ordinal_position")
+        columns = [c for (c,) in cur.fetchall() if c != "id"]
+        overrides = {
+            "name": "src.name || '#' || g.n",
+            "user_id": "NULL",
+            "npc_state": "GREATEST(src.npc_state, 2)",
+        }
+        select = ", ".join(overrides.get(c, f'src."{c}"') for c in columns)
+        cur.execute(
+            f"""
+            WITH src AS (
+                SELECT *, row_number() OVER (ORDER BY id) - 1 AS rn
+                FROM general WHERE world_id = %(world)s AND user_id IS NULL
+            ), cnt AS (SELECT count(*) AS c FROM src)
+            INSERT INTO general ({", ".join(f'"{c}"' for c in columns)})
+            SELECT {select}
+            FROM generate_series(0, %(missing)s - 1) AS g(n)
+            CROSS JOIN cnt
+            JOIN src ON src.rn = g.n %% cnt.c
+            """,
+            {"world": world_id, "missing": missing},
+        )
+        return cur.rowcount
+
+
+def make_due(conn, world_id: int):
+    """Rewind ``updated_at`` one tick so TurnService runs exactly one turn."""
+    with conn.cursor() as cur:
+        cur.execute(
+            "UPDATE world_state SET updated_at = now() - make_interval(secs => tick_seconds) "
+            "WHERE id = %s", (world_id,))
+
+
+def count_generals(conn, world_id: int) -> int:
+    with conn.cursor() as cur:
+        cur.execute("SELECT count(*) FROM general WHERE world_id = %s", (world_id,))
+        return cur.fetchone()[0]
+
+
+def game_base_url(admin, world_id: int) -> str:
+    """Base URL of the game instance serving ``world_id``.
+
+    ``/internal/turn/*`` and the STOMP endpoint live on game-app, not the
+    gateway; the gateway's route table says where each world is served.
+    """
+    r = admin.get("/internal/worlds/routes")
+    r.raise_for_status()
+    routes = {int(x["worldId"]): x["baseUrl"] for x in r.json()}
+    if not routes:
+        raise RuntimeError("gateway has no world routes; pass --game-base")
+    return routes.get(world_id) or next(iter(routes.values()))
+
+
+class TurnBench:
+    """Create, pad, drive and delete one benchmark world per plan point."""
+
+    def __init__(self, admin, conn, *, game_base: str | None = None, turns: int = DEFAULT_TURNS,
+                 tick_seconds: int = 60, commit_sha: str | None = None,
+                 settle_timeout: float = 600.0, keep_worlds: bool = False):
+        self.admin = admin
+        self.conn = conn
+        self.game_base = game_base
+        self.turns = turns
+        self.tick_seconds = tick_seconds
+        self.commit_sha = commit_sha
+        self.settle_timeout = settle_timeout
+        self.keep_worlds = keep_worlds
+
+    def _commit_sha(self) -> str | None:
+        """Commit SHA of an existing world, so the same game instance picks it up."""
+        if self.commit_sha is None:
+            with self.conn.cursor() as cur:
+                cur.execute("SELECT commit_sha FROM world_state ORDER BY id LIMIT 1")
+                row = cur.fetchone()
+            self.commit_sha = row[0] if row else None
+        return self.commit_sha
+
+    def _game_client(self, world_id: int):
+        """``NewClient`` on the game instance serving ``world_id``."""
+        from conftest import NewClient
+
+        return NewClient(self.game_base or game_base_url(self.admin, world_id))
+
+    def create_world(self, scenario: str, name: str) -> int:
+        body = {"scenarioCode": scenario, "name": name, "tickSeconds": self.tick_seconds}
+        if self._commit_sha():
+            body["commitSha"] = self.commit_sha
+        r = self.admin.post("/api/worlds", body)
+        r.raise_for_status()
+        return int(r.json()["id"])
+
+    def run_point(self, point: dict) -> dict:
+        scenario, target = point["scenario"], point["target"]
+        world_id = self.create_world(scenario, f"turn-bench-{scenario}-{target or 'native'}")
+        try:
+            padded = pad_generals(self.conn, world_id, target) if target else 0
+            game = self._game_client(world_id)
+            per_turn = measure_turns(
+                self.conn, world_id, turns=self.turns,
+                make_due=lambda: make_due(self.conn, world_id),
+                resume=lambda: game.post("/internal/turn/resume").raise_for_status(),
+                trigger=lambda: self.admin.post("/api/turns/run"),
+                pause=lambda: game.post("/internal/turn/pause").raise_for_status(),
+                settle_timeout=self.settle_timeout,
+            )
+            return {
+                "scenario": scenario, "target": target, "world_id": world_id,
+                "generals": count_generals(self.conn, world_id), "synthetic": padded,
+                "summary": summarize_turns(per_turn), "per_turn": per_turn,
+            }
+        finally:
+            if not self.keep_worlds:
+                self.admin.delete(f"/api/worlds/{world_id}")
+
+    def run(self, plan: list[dict], *, label: str | None = None) -> dict:
+        start = time.monotonic()
+        points = []
+        for point in plan:
+            result = self.run_point(point)
+            s = result["summary"]
+            print(f"  {result['scenario']:>6} {result['generals']:>6} generals: "
+                  f"p50 {s.get('p50_ms')} ms, max {s.get('max_ms')} ms", file=sys.stderr)
+            points.append(result)
+        return {
+            "label": label,
+            "turns_per_point": self.turns,
+            "points": points,
+            "fit": fit_scaling(points),
+            "seconds": round(time.monotonic() - start, 3),
+        }
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--scenarios", default=None, help="comma-separated scenario codes "
+                    "(default: smallest, median and largest)")
+    ap.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                    help="general counts to pad the largest scenario to")
+    ap.add_argument("--turns", type=int, default=DEFAULT_TURNS, help="turns measured per point")
+    ap.add_argument("--tick-seconds", type=int, default=60)
+    ap.add_argument("--game-base", default=os.environ.get("NEW_GAME_BASE_URL"),
+                    help="game-app base URL for /internal/turn/* (default: gateway route table)")
+    ap.add_argument("--label", default=os.environ.get("TAG"), help="release label stored in the report")
+    ap.add_argument("--baseline", default=None, help="previous report to compare against")
+    ap.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD)
+    ap.add_argument("--keep-worlds", action="store_true")
+    ap.add_argument("--out", default=None, help="write the JSON report here")
+    args = ap.parse_args(argv)
+
+    from conftest import NEW_BASE, NewClient, connect_new_db
+
+    sizes = scenario_sizes()
+    scenarios = args.scenarios.split(",") if args.scenarios else default_scenarios(sizes)
+    targets = tuple(int(s) for s in args.sizes.split(",") if s)
+    plan = build_plan(scenarios, sizes, targets)
+
+    admin = NewClient(NEW_BASE)
+    admin.login(os.environ.get("ADMIN_LOGIN_ID", "admin"), os.environ.get("ADMIN_PASSWORD", ""))
+    conn = connect_new_db()
+    try:
+        bench = TurnBench(admin, conn, game_base=args.game_base, turns=args.turns,
+                          tick_seconds=args.tick_seconds, keep_worlds=args.keep_worlds)
+        report = bench.run(plan, label=args.label)
+    finally:
+        conn.close()
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_baseline(report, baseline, threshold=args.threshold)
+        report["baseline"] = {"label": baseline.get("label"), "regressions": regressions}
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+    for r in regressions:
+        print(f"REGRESSION {r['scenario']} ({r['generals']} generals): "
+              f"{r['baseline_ms']} -> {r['current_ms']} ms (x{r['ratio']})", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
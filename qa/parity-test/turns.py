@@ -0,0 +1,346 @@
+"""
+Turn-advance parity driver.
+
+Advances both stacks one turn at a time, captures ``game_env`` /
+``world_state`` plus the general, city and nation tables after every turn,
+and reports the first turn at which the stacks diverge beyond tolerance.
+
+Only the base snapshot and per-turn *columnar deltas* are persisted — for
+each table, ``{column: {id: new_value}}`` for cells that changed, plus added
+and removed rows — so a 100-turn soak costs roughly the churn of the world
+rather than 100 full copies.  ``replay_states`` rebuilds any turn from the
+log.
+
+Log format (gzip'd JSON lines, one line per stack per turn)::
+
+    {"turn": 0, "stack": "legacy", "env": {...}, "base": {table: {...}}}
+    {"turn": 3, "stack": "new", "env": {...}, "delta": {table: {...}}}
+"""
+from __future__ import annotations
+
+import gzip
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterator
+
+from comparison import RNG_SEED
+from snapshot import SCHEMA_MAP, _placeholder, _rekey, _translate, open_rows, read_table, unique_ids, values_equal
+
+TABLES = ("general", "city", "nation")
+
+# Turn counters per stack.  Legacy keeps them in game_env, the new stack in
+# world_state (V1__core_tables.sql).
+ENV_QUERIES = {
+    "legacy": "SELECT year, month FROM game_env LIMIT 1",
+    "new": "SELECT current_year, current_month FROM world_state WHERE id = {ph}",
+}
+
+
+# ── Capture ──────────────────────────────────────────────────────────────────
+def read_env(conn, side: str, world_id: int = 1) -> dict:
+    sql = ENV_QUERIES[side].format(ph=_placeholder(conn))
+    params = (world_id,) if "{ph}" in ENV_QUERIES[side] else ()
+    with open_rows(conn, sql, params) as (_, rows):
+        row = next(rows, None)
+    if row is None:
+        return {}
+    return {"year": int(row[0]), "month": int(row[1])}
+
+
+def capture_world(conn, side: str, *, world_id: int = 1, tables: tuple[str, ...] = TABLES) -> dict:
+    """``{"env": {...}, "tables": {name: {"columns": [...], "rows": {id: tuple}}}}``"""
+    state = {"env": read_env(conn, side, world_id), "tables": {}}
+    for name in tables:
+        columns, rows = read_table(conn, SCHEMA_MAP[name], side, world_id=world_id)
+        state["tables"][name] = {"columns": columns, "rows": rows}
+    return state
+
+
+# ── Deltas ───────────────────────────────────────────────────────────────────
+def compute_delta(prev: dict, cur: dict) -> dict:
+    """Columnar delta between two captured states of one stack."""
+    delta = {}
+    for name, table in cur["tables"].items():
+        before = prev["tables"][name]["rows"]
+        after = table["rows"]
+        columns = table["columns"]
+        changed: dict[str, dict[int, Any]] = {}
+        added = {}
+        for row_id, row in after.items():
+            old = before.get(row_id)
+            if old is None:
+                added[row_id] = row
+                continue
+            if old == row:
+                continue
+            for col, a, b in zip(columns, old, row):
+                if a != b:
+                    changed.setdefault(col, {})[row_id] = b
+        removed = [row_id for row_id in before if row_id not in after]
+        if changed or added or removed:
+            delta[name] = {"columns": changed, "added": added, "removed": removed}
+    return delta
+
+
+def apply_delta(state: dict, delta: dict) -> dict:
+    """Apply ``compute_delta`` output to ``state`` in place and return it."""
+    for name, change in delta.items():
+        table = state["tables"][name]
+        rows = table["rows"]
+        index = {col: i for i, col in enumerate(table["columns"])}
+        for row_id in change.get("removed", ()):
+            rows.pop(int(row_id), None)
+        for row_id, row in change.get("added", {}).items():
+            rows[int(row_id)] = tuple(row)
+        for col, cells in change.get("columns", {}).items():
+            i = index[col]
+            for row_id, value in cells.items():
+                row = list(rows[int(row_id)])
+                row[i] = value
+                rows[int(row_id)] = tuple(row)
+    return state
+
+
+def delta_cells(delta: dict) -> int:
+    return sum(
+        sum(len(cells) for cells in change["columns"].values())
+        + len(change["added"]) + len(change["removed"])
+        for change in delta.values()
+    )
+
+
+class DeltaLog:
+    """Append-only gzip'd JSON-lines store of base snapshots and turn deltas."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._f = gzip.open(path, "wt", encoding="utf-8")
+
+    def _write(self, record: dict):
+        self._f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=str))
+        self._f.write("\n")
+
+    def base(self, stack: str, state: dict):
+        self._write({"turn": 0, "stack": stack, "env": state["env"], "base": {
+            name: {"columns": t["columns"], "rows": t["rows"]} for name, t in state["tables"].items()
+        }})
+
+    def delta(self, turn: int, stack: str, env: dict, delta: dict):
+        self._write({"turn": turn, "stack": stack, "env": env, "delta": delta})
+
+    def close(self):
+        self._f.close()
+
+
+def replay_states(path: str, stack: str) -> Iterator[tuple[int, dict]]:
+    """Rebuild ``(turn, state)`` for one stack from a DeltaLog file."""
+    state = None
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            if record["stack"] != stack:
+                continue
+            if "base" in record:
+                state = {"env": record["env"], "tables": {
+                    name: {"columns": t["columns"],
+                           "rows": {int(k): tuple(v) for k, v in t["rows"].items()}}
+                    for name, t in record["base"].items()
+                }}
+            else:
+                apply_delta(state, record["delta"])
+                state["env"] = record["env"]
+            yield record["turn"], state
+
+
+# ── Comparison ───────────────────────────────────────────────────────────────
+def _joined(legacy: dict, new: dict, join_ids: dict[str, dict[Any, int]]) -> tuple[dict, dict, dict]:
+    """Both stacks' rows keyed by shared ID, as ``snapshot.diff_world`` joins them.
+
+    Tables with a ``join_column`` are re-keyed through ``join_ids`` (default:
+    the legacy state's own names) and the new stack's foreign keys translated
+    to the same IDs.  Returns ``(legacy rows, new rows, untranslated columns)``
+    per table; untranslated reference columns are not comparable.
+    """
+    shared, keys = {}, {}
+    for name, ltable in legacy["tables"].items():
+        jc, ntable = SCHEMA_MAP[name].join_column, new["tables"][name]
+        if jc in ltable["columns"] and jc in ntable["columns"]:
+            li, ni = ltable["columns"].index(jc), ntable["columns"].index(jc)
+            ids = join_ids.get(name) or unique_ids((k, row[li]) for k, row in ltable["rows"].items())
+            keys[name] = ids, li + 1, ni + 1
+            shared[name] = {k: ids[row[ni]] for k, row in ntable["rows"].items() if row[ni] in ids}
+
+    joined_legacy, joined_new, untranslated = {}, {}, {}
+    for name, ltable in legacy["tables"].items():
+        ntable = new["tables"][name]
+        refs = SCHEMA_MAP[name].references
+        at = {ntable["columns"].index(c) + 1: shared[ref] for c, ref in refs.items()
+              if ref in shared and c in ntable["columns"]}
+        lrows = ((k, *row) for k, row in ltable["rows"].items())
+        nrows = _translate(((k, *row) for k, row in ntable["rows"].items()), at)
+        if name in keys:
+            ids, li, ni = keys[name]
+            lrows, nrows = _rekey(lrows, li, ids, 1), _rekey(nrows, ni, ids, 2)
+        joined_legacy[name] = {row[0]: row[1:] for row in lrows}
+        joined_new[name] = {row[0]: row[1:] for row in nrows}
+        untranslated[name] = {c for c, ref in refs.items() if ref not in shared}
+    return joined_legacy, joined_new, untranslated
+
+
+def compare_states(
+    legacy: dict, new: dict, *, tolerance: float = 0.0, include_rng: bool = RNG_SEED is not None,
+    join_ids: dict[str, dict[Any, int]] | None = None,
+) -> dict:
+    """Per-table, per-column mismatch counts between two captured states.
+
+    Rows are joined by name and foreign keys translated (``_joined``), since
+    the new stack's IDs are insert-order serials.  RNG-dependent columns
+    (``TableMap.rng_columns``) are skipped unless ``include_rng`` (default:
+    when both stacks share ``PARITY_RNG_SEED``).  ``diverged`` is true when
+    the turn counters differ, row sets differ, or any compared column has a
+    mismatch beyond ``tolerance``.
+    """
+    report = {"env_equal": legacy["env"] == new["env"], "tables": {}}
+    diverged = not report["env_equal"]
+    joined_legacy, joined_new, untranslated = _joined(legacy, new, join_ids or {})
+    for name, ltable in legacy["tables"].items():
+        ntable = new["tables"][name]
+        rng = SCHEMA_MAP[name].rng_columns
+        lindex = {c: i for i, c in enumerate(ltable["columns"])}
+        nindex = {c: i for i, c in enumerate(ntable["columns"])}
+        cols = [c for c in ltable["columns"]
+                if c in nindex and c not in untranslated[name] and (include_rng or c not in rng)]
+        lrows, nrows = joined_legacy[name], joined_new[name]
+        mismatched = {}
+        for row_id in lrows.keys() & nrows.keys():
+            lrow, nrow = lrows[row_id], nrows[row_id]
+            for c in cols:
+                if not values_equal(lrow[lindex[c]], nrow[nindex[c]], tolerance)[0]:
+                    mismatched[c] = mismatched.get(c, 0) + 1
+        only = {"legacy": len(lrows.keys() - nrows.keys()), "new": len(nrows.keys() - lrows.keys())}
+        report["tables"][name] = {"mismatched": mismatched, "only": only}
+        if mismatched or only["legacy"] or only["new"]:
+            diverged = True
+    report["diverged"] = diverged
+    return report
+
+
+# ── Driver ───────────────────────────────────────────────────────────────────
+def http_advancers(legacy, new) -> tuple[Callable[[], Any], Callable[[], Any]]:
+    """Default turn triggers: legacy ``Global/ExecuteEngine``, new ``/api/turns/run``.
+
+    ``new`` must be logged in with an account holding the ``openClose``
+    permission.
+    """
+    return (
+        lambda: legacy.call("Global/ExecuteEngine"),
+        lambda: new.post("/api/turns/run"),
+    )
+
+
+class TurnDriver:
+    """Advance both stacks N turns and record per-turn deltas and divergence."""
+
+    def __init__(
+        self,
+        legacy_db,
+        new_db,
+        advance_legacy: Callable[[], Any],
+        advance_new: Callable[[], Any],
+        *,
+        world_id: int = 1,
+        tables: tuple[str, ...] = TABLES,
+        tolerance: float = 0.0,
+        include_rng: bool = RNG_SEED is not None,
+        join_ids: dict[str, dict[Any, int]] | None = None,
+        log_path: str | None = None,
+        settle_timeout: float = 60.0,
+        poll_interval: float = 0.5,
+    ):
+        self.dbs = {"legacy": legacy_db, "new": new_db}
+        self.advance = {"legacy": advance_legacy, "new": advance_new}
+        self.world_id = world_id
+        self.tables = tables
+        self.tolerance = tolerance
+        self.include_rng = include_rng
+        self.join_ids = join_ids
+        self.log_path = log_path
+        self.settle_timeout = settle_timeout
+        self.poll_interval = poll_interval
+
+    def _fresh(self, side: str):
+        """End any open read transaction so the next query sees the latest turn.
+
+        pymysql connections are not autocommit; under REPEATABLE READ the
+        poll loop would otherwise keep reading the pre-turn snapshot.
+        """
+        conn = self.dbs[side]
+        conn.commit()
+        return conn
+
+    def _capture(self, side: str) -> dict:
+        self._fresh(side)
+        return capture_world(self.dbs[side], side, world_id=self.world_id, tables=self.tables)
+
+    def _advance_and_settle(self, side: str, before: dict) -> float:
+        """Trigger one turn and poll until the turn counter moves; returns seconds."""
+        start = time.monotonic()
+        self.advance[side]()
+        deadline = start + self.settle_timeout
+        while read_env(self._fresh(side), side, self.world_id) == before:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"{side} stack did not advance past {before} "
+                                   f"within {self.settle_timeout}s")
+            time.sleep(self.poll_interval)
+        return time.monotonic() - start
+
+    def step(self, envs: dict[str, dict] | None = None) -> dict[str, float]:
+        """Advance both stacks one turn concurrently; seconds taken per stack.
+
+        ``envs`` is each stack's turn counter before the trigger (read here
+        when omitted).
+        """
+        if envs is None:
+            envs = {side: read_env(self._fresh(side), side, self.world_id) for side in self.dbs}
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="turns") as pool:
+            futures = {side: pool.submit(self._advance_and_settle, side, envs[side]) for side in self.dbs}
+            return {side: f.result() for side, f in futures.items()}
+
+    def run(self, turns: int, *, stop_on_divergence: bool = False) -> dict:
+        log = DeltaLog(self.log_path) if self.log_path else None
+        states = {side: self._capture(side) for side in self.dbs}
+        if log:
+            for side, state in states.items():
+                log.base(side, state)
+        per_turn = []
+        first_divergence = None
+        try:
+            for turn in range(1, turns + 1):
+                seconds = self.step({side: states[side]["env"] for side in self.dbs})
+                cells = {}
+                for side in self.dbs:
+                    cur = self._capture(side)
+                    delta = compute_delta(states[side], cur)
+                    cells[side] = delta_cells(delta)
+                    if log:
+                        log.delta(turn, side, cur["env"], delta)
+                    states[side] = cur
+                cmp = compare_states(states["legacy"], states["new"],
+                                     tolerance=self.tolerance, include_rng=self.include_rng,
+                                     join_ids=self.join_ids)
+                per_turn.append({
+                    "turn": turn,
+                    "env": {side: states[side]["env"] for side in self.dbs},
+                    "seconds": seconds,
+                    "delta_cells": cells,
+                    "comparison": cmp,
+                })
+                if cmp["diverged"] and first_divergence is None:
+                    first_divergence = turn
+                    if stop_on_divergence:
+                        break
+        finally:
+            if log:
+                log.close()
+        return {"turns": per_turn, "first_divergence": first_divergence, "log_path": self.log_path}
@@ -40,4 +40,18 @@ DBEOF
     chown www-data:www-data /var/www/html/d_setting/DB.php
 fi
 
+# Pin the engine's hidden RNG seed so parity runs can compare RNG-dependent
+# values exactly (the new stack gets the same seed in world_state.config).
+# The seed is spliced into a sed expression and a PHP string literal, so only
+# a plain token is accepted.
+if [ -n "${PARITY_RNG_SEED}" ] && [[ ! "${PARITY_RNG_SEED}" =~ ^[A-Za-z0-9_-]+$ ]]; then
+    echo "[entrypoint] PARITY_RNG_SEED must match ^[A-Za-z0-9_-]+\$, got '${PARITY_RNG_SEED}'" >&2
+    exit 1
+fi
+if [ -n "${PARITY_RNG_SEED}" ] && [ -f /var/www/html/d_setting/UniqueConst.php ]; then
+    echo "[entrypoint] Setting hiddenSeed from PARITY_RNG_SEED..."
+    sed -i -E "s/(hiddenSeed[^=]*=[[:space:]]*)'[^']*'/\1'${PARITY_RNG_SEED}'/" \
+        /var/www/html/d_setting/UniqueConst.php
+fi
+
 exec "$@"